@@ -0,0 +1,13 @@
+# -*- coding: UTF-8 -*-
+# Author  : AitrusC
+# FileName: bake
+# Time    : 2024-10-02
+# Contact : 906629272@qq.com
+# Description : 无界面批量烘焙入口: python bake.py library.pdlib clips/ -o baked/
+
+import sys
+
+from interface.bake import main
+
+if __name__ == '__main__':
+    sys.exit(main())
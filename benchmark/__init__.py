@@ -0,0 +1,43 @@
+# -*- coding: UTF-8 -*-
+# Author  : AitrusC
+# FileName: __init__.py
+# Time    : 2024-09-20
+# Contact : 906629272@qq.com
+# Description : 无界面(offscreen)性能测试, 不依赖Maya
+
+import os
+import sys
+
+# 保证以 python -m benchmark.xxx 运行时可以导入gui与interface
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _ROOT not in sys.path:
+    sys.path.insert(0, _ROOT)
+
+
+def currentRss():
+    """
+    获取当前进程常驻内存(字节), 无法获取时返回0
+    :return:
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        # macOS为字节, Linux为KB(峰值)
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss if sys.platform == "darwin" else rss * 1024
+    except ImportError:
+        return 0
+
+
+def qtApplication():
+    """
+    获取QApplication(默认使用offscreen平台)
+    :return:
+    """
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PySide2.QtWidgets import QApplication
+    return QApplication.instance() or QApplication([])
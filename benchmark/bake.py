@@ -0,0 +1,92 @@
+# -*- coding: UTF-8 -*-
+# Author  : AitrusC
+# FileName: bake
+# Time    : 2024-10-02
+# Contact : 906629272@qq.com
+# Description : 批量烘焙测试: 单进程与多进程吞吐量、加速比、断点续算(第二次运行跳过全部片段)
+#               python -m benchmark.bake --clips 64 --frames 2000 --workers 4
+
+import argparse
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from .poseLibrary import buildLibrary
+from .solver import randomQuaternions
+
+
+def writeClips(directory, library, clips, frames, seed = 6):
+    """
+    生成随机片段(包含数据库中的全部骨骼与一个数据库中不存在的骨骼)
+    :param directory: 片段目录
+    :param library: PoseLibrary
+    :param clips: 片段数量
+    :param frames: 每个片段的平均帧数
+    :param seed:
+    :return:
+    """
+    rng = np.random.default_rng(seed)
+    joints = np.array(library.jointNames() + ["unknown_joint"])
+    for i in range(clips):
+        count = int(frames * rng.uniform(0.5, 1.5))
+        path = os.path.join(directory, "char{}".format(i % 4), "clip{:03d}.npz".format(i))
+        os.makedirs(os.path.dirname(path), exist_ok = True)
+        np.savez(path, joints = joints, rotations = randomQuaternions((count, len(joints)), seed + i))
+
+
+def run(clips = 64, frames = 2000, joints = 20, workers = None):
+    """
+    测试批量烘焙
+    :param clips: 片段数量
+    :param frames: 每个片段的平均帧数
+    :param joints: 骨骼数量(每个骨骼20个pose)
+    :param workers: 多进程数量, 默认为CPU数量
+    :return: 结果字典
+    """
+    from interface.bake import bake
+    from interface.solver import RBFSolver
+    workers = workers or os.cpu_count() or 1
+    library = buildLibrary(joints * 20)
+    directory = tempfile.mkdtemp()
+    try:
+        clip_dir = os.path.join(directory, "clips")
+        writeClips(clip_dir, library, clips, frames)
+        library_path = os.path.join(directory, "library.pdlib")
+        library.save(library_path)
+        serial = bake(library_path, clip_dir, os.path.join(directory, "serial"), workers = 0, progress = None)
+        output_dir = os.path.join(directory, "parallel")
+        parallel = bake(library_path, clip_dir, output_dir, workers = workers, progress = None)
+        resume = bake(library_path, clip_dir, output_dir, workers = workers, progress = None)
+
+        # 与直接求解对比第一个片段的第一个骨骼
+        with np.load(os.path.join(clip_dir, "char0", "clip000.npz")) as data:
+            expected = RBFSolver(library.jointRotations(0)).evaluate(data["rotations"][:, 0], dtype = np.float32)
+        with np.load(os.path.join(output_dir, "char0", "clip000.npz")) as data:
+            match = bool(np.allclose(data["weights"][:, library.poseSlice(0)], expected, atol = 1e-5))
+    finally:
+        shutil.rmtree(directory, ignore_errors = True)
+    return {"name": "bake", "clips": clips, "frames": serial["frames"], "joints": joints, "workers": workers,
+            "serial_s": serial["seconds"], "parallel_s": parallel["seconds"],
+            "speedup": serial["seconds"] / parallel["seconds"], "resume_s": resume["seconds"],
+            "resume_skipped": resume["skipped"], "match": match}
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "批量烘焙测试")
+    parser.add_argument("--clips", type = int, default = 64)
+    parser.add_argument("--frames", type = int, default = 2000)
+    parser.add_argument("--joints", type = int, default = 20)
+    parser.add_argument("--workers", type = int, default = None)
+    args = parser.parse_args()
+    r = run(args.clips, args.frames, args.joints, args.workers)
+    print(f"{r['name']} clips={r['clips']} frames={r['frames']} joints={r['joints']} match={r['match']}")
+    print(f"serial: {r['serial_s']:.2f} s ({r['frames'] / r['serial_s']:.0f} frames/s)")
+    print(f"{r['workers']} workers: {r['parallel_s']:.2f} s ({r['frames'] / r['parallel_s']:.0f} frames/s) "
+          f"speedup {r['speedup']:.2f}x")
+    print(f"resume: {r['resume_s']:.3f} s, {r['resume_skipped']} clips skipped")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+# -*- coding: UTF-8 -*-
+# Author  : AitrusC
+# FileName: blendShape
+# Time    : 2024-10-01
+# Contact : 906629272@qq.com
+# Description : 稀疏blendShape测试: 按权重求和(与完整偏移矩阵对比)、内存占用、修正形提取耗时与精度
+#               python -m benchmark.blendShape --vertices 100000 --targets 200
+
+import argparse
+import time
+
+import numpy as np
+
+
+def randomMesh(vertex_count, seed = 0):
+    """
+    单位球面上的随机顶点
+    :param vertex_count:
+    :param seed:
+    :return: (V, 3)
+    """
+    rng = np.random.default_rng(seed)
+    points = rng.normal(size = (vertex_count, 3))
+    return points / np.linalg.norm(points, axis = 1, keepdims = True)
+
+
+def regionTargets(points, target_count, coverage = 0.02, seed = 1):
+    """
+    每个目标只影响一个区域(距随机中心最近的coverage比例的顶点), 偏移随距离衰减
+    :param points: (V, 3)
+    :param target_count:
+    :param coverage: 每个目标影响的顶点比例
+    :param seed:
+    :return: [(名称, 顶点索引, 偏移), ...]
+    """
+    rng = np.random.default_rng(seed)
+    count = max(1, int(len(points) * coverage))
+    targets = []
+    for i in range(target_count):
+        center = points[rng.integers(len(points))]
+        distance = np.linalg.norm(points - center, axis = 1)
+        indices = np.argpartition(distance, count - 1)[:count]
+        falloff = 1.0 - distance[indices] / (distance[indices].max() + 1e-9)
+        deltas = rng.normal(scale = 0.05, size = 3) * falloff[:, None] + rng.normal(scale = 0.002, size = (count, 3))
+        targets.append(("target{}".format(i), indices, deltas))
+    return targets
+
+
+def randomSkin(points, joint_count = 24, influence_count = 4, seed = 2):
+    """
+    随机蒙皮: 每个顶点受最近的若干骨骼影响, 骨骼矩阵为随机旋转+平移(行向量约定)
+    :param points: (V, 3)
+    :param joint_count:
+    :param influence_count:
+    :param seed:
+    :return: (影响骨骼 (V, K), 权重 (V, K), 矩阵 (J, 4, 4))
+    """
+    rng = np.random.default_rng(seed)
+    joints = rng.normal(size = (joint_count, 3))
+    distance = np.linalg.norm(points[:, None] - joints[None], axis = 2)
+    influences = np.argsort(distance, axis = 1)[:, :influence_count]
+    weights = 1.0 / (np.take_along_axis(distance, influences, axis = 1) + 1e-3)
+    weights /= weights.sum(axis = 1, keepdims = True)
+    matrices = np.tile(np.eye(4), (joint_count, 1, 1))
+    # 每个骨骼绕随机轴旋转最多60度
+    axes = rng.normal(size = (joint_count, 3))
+    axes /= np.linalg.norm(axes, axis = 1, keepdims = True)
+    angles = rng.uniform(-np.pi / 3, np.pi / 3, joint_count)
+    for matrix, axis, angle in zip(matrices, axes, angles):
+        k = np.array([[0, -axis[2], axis[1]], [axis[2], 0, -axis[0]], [-axis[1], axis[0], 0]])
+        matrix[:3, :3] = (np.eye(3) + np.sin(angle) * k + (1 - np.cos(angle)) * k @ k).T
+    matrices[:, 3, :3] = rng.normal(scale = 0.3, size = (joint_count, 3))
+    return influences, weights, matrices
+
+
+def run(vertices = 100000, targets = 200, coverage = 0.02, active = 1.0, repeat = 20):
+    """
+    测试稀疏blendShape
+    :param vertices: 顶点数量
+    :param targets: 目标数量
+    :param coverage: 每个目标影响的顶点比例
+    :param active: 权重不为0的目标比例
+    :param repeat: 求和次数
+    :return: 结果字典
+    """
+    from interface.blendShape import SparseTargets, extractCorrective, skinPoints
+    points = randomMesh(vertices)
+    target_list = regionTargets(points, targets, coverage)
+
+    start = time.perf_counter()
+    sparse = SparseTargets.fromTargets(target_list)
+    build = time.perf_counter() - start
+    dense = np.zeros((targets, vertices, 3), dtype = np.float32)
+    for i, (_, indices, deltas) in enumerate(target_list):
+        dense[i, indices] = deltas
+
+    rng = np.random.default_rng(3)
+    frames = rng.uniform(0.0, 1.0, (repeat, targets))
+    frames[rng.uniform(size = frames.shape) >= active] = 0.0
+    out = np.empty((vertices, 3))
+    start = time.perf_counter()
+    for weights in frames:
+        out[:] = points
+        sparse.evaluate(weights, vertices, out)
+    evaluate = (time.perf_counter() - start) / repeat
+    flat = dense.reshape(targets, -1)
+    start = time.perf_counter()
+    for weights in frames:
+        dense_out = points + (weights.astype(np.float32) @ flat).reshape(vertices, 3)
+    evaluate_dense = (time.perf_counter() - start) / repeat
+    match = bool(np.allclose(out, dense_out, atol = 1e-4))
+
+    # 修正形提取: 蒙皮前加上修正形后蒙皮, 再反算修正形
+    influences, weights, matrices = randomSkin(points)
+    name, indices, deltas = target_list[0]
+    corrected = points.copy()
+    corrected[indices] += deltas
+    sculpt = skinPoints(corrected, influences, weights, matrices)
+    start = time.perf_counter()
+    extracted_indices, extracted = extractCorrective(sculpt, points, influences, weights, matrices)
+    extract = time.perf_counter() - start
+    error = np.abs(sparse.dense(0, vertices)[extracted_indices] - extracted).max() if len(extracted) else 0.0
+    return {"name": "blendShape", "vertices": vertices, "targets": targets, "nnz": sparse.nnz,
+            "active": active, "build_ms": build * 1000, "sparse_mb": sparse.nbytes / 1e6,
+            "dense_mb": dense.nbytes / 1e6, "evaluate_ms": evaluate * 1000,
+            "evaluate_dense_ms": evaluate_dense * 1000, "match": match, "extract_ms": extract * 1000,
+            "extract_vertices": len(extracted_indices), "extract_expected": len(indices),
+            "extract_error": float(error)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "稀疏blendShape测试")
+    parser.add_argument("--vertices", type = int, default = 100000)
+    parser.add_argument("--targets", type = int, default = 200)
+    parser.add_argument("--coverage", type = float, default = 0.02)
+    parser.add_argument("--active", type = float, default = 1.0, help = "权重不为0的目标比例")
+    args = parser.parse_args()
+    r = run(args.vertices, args.targets, args.coverage, args.active)
+    print(f"{r['name']} vertices={r['vertices']} targets={r['targets']} nnz={r['nnz']} "
+          f"build={r['build_ms']:.1f} ms")
+    print(f"memory: {r['sparse_mb']:.1f} MB (dense {r['dense_mb']:.1f} MB)")
+    print(f"evaluate active={r['active']:.2f}: {r['evaluate_ms']:.2f} ms "
+          f"(dense {r['evaluate_dense_ms']:.2f} ms) match={r['match']}")
+    print(f"extract corrective: {r['extract_ms']:.2f} ms, {r['extract_vertices']}/{r['extract_expected']} vertices, "
+          f"max error {r['extract_error']:.2e}")
+
+
+if __name__ == '__main__':
+    main()
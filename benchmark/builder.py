@@ -0,0 +1,129 @@
+# -*- coding: UTF-8 -*-
+# Author  : AitrusC
+# FileName: builder
+# Time    : 2024-09-27
+# Contact : 906629272@qq.com
+# Description : 构建驱动系统测试(内存场景): 计划规模、生成耗时, 批量执行与逐个调用对比, 增量重建
+#               python -m benchmark.builder --poses 20 --overhead 50
+
+import argparse
+import time
+
+from .solver import randomQuaternions
+
+
+def buildLibrary(poses_per_joint = 20, targets_per_pose = 4):
+    """
+    生成全部骨骼组(左右)的pose数据库, 每个骨骼带pose与blendShape目标
+    :param poses_per_joint: 每个骨骼的pose数量
+    :param targets_per_pose: 每个pose驱动的blendShape权重数量
+    :return: PoseLibrary
+    """
+    from interface.builder import specsFromGroups
+    from interface.poseLibrary import PoseLibrary
+    joints = [spec.joint for spec in specsFromGroups(["ALL"])]
+    rotations = randomQuaternions((len(joints) * poses_per_joint,), 8)
+
+    def records():
+        for j, joint in enumerate(joints):
+            for p in range(poses_per_joint):
+                targets = {"%s_bs.%s_pose%d_%d" % (joint, joint, p, k): 1.0 if k == 0 else 0.5
+                           for k in range(targets_per_pose)}
+                yield joint, "pose%d" % p, rotations[j * poses_per_joint + p], targets
+
+    return PoseLibrary.build(records())
+
+
+def executeEach(plan, scene):
+    """
+    逐个操作调用场景(对比用, 相当于按骨骼/pose逐个构建)
+    :param plan: BuildPlan
+    :param scene: SceneBackend
+    :return:
+    """
+    for name in plan.requires:
+        scene.exists([name])
+    for node in plan.nodes.values():
+        scene.createNodes([(node.name, node.type, node.parent)])
+    for attr in plan.attrs:
+        scene.addAttrs([(attr.node, attr.attr, attr.type)])
+    for value in plan.values:
+        scene.setAttrs([(value.plug, value.value)])
+    for connection in plan.connections:
+        scene.connectAttrs([(connection.source, connection.destination)])
+
+
+def run(poses_per_joint = 20, overhead_us = 50.0):
+    """
+    测试构建计划
+    :param poses_per_joint: 每个骨骼的pose数量
+    :param overhead_us: 模拟每次场景调用开销(微秒)
+    :return: 结果字典
+    """
+    from interface.builder import BuildPlanner, FakeScene, specsFromGroups
+    specs = specsFromGroups(["ALL"], library = buildLibrary(poses_per_joint))
+    start = time.perf_counter()
+    plan = BuildPlanner().plan(specs)
+    plan_time = time.perf_counter() - start
+
+    scene = FakeScene(plan.requires, overhead_us * 1e-6)
+    start = time.perf_counter()
+    stats = plan.execute(scene)
+    batch_time = time.perf_counter() - start
+    batch_calls = scene.calls
+
+    scene = FakeScene(plan.requires, overhead_us * 1e-6)
+    start = time.perf_counter()
+    executeEach(plan, scene)
+    each_time = time.perf_counter() - start
+
+    result = {"name": "builder", "drivers": len(specs), "poses": sum(len(spec.poses) for spec in specs),
+              "plan_ops": len(plan), "plan_ms": plan_time * 1000, "batch_ms": batch_time * 1000,
+              "batch_calls": batch_calls, "each_ms": each_time * 1000, "each_calls": scene.calls}
+    result.update(stats)
+    return result
+
+
+def runIncremental(poses_per_joint = 20, overhead_us = 50.0):
+    """
+    测试增量构建: 全身构建后修改一个手指pose再次构建
+    :param poses_per_joint: 每个骨骼的pose数量
+    :param overhead_us: 模拟每次场景调用开销(微秒)
+    :return: 结果字典
+    """
+    from interface.builder import BuildPlanner, FakeScene, IncrementalBuilder, specsFromGroups
+    library = buildLibrary(poses_per_joint)
+    specs = specsFromGroups(["ALL"], library = library)
+    scene = FakeScene(BuildPlanner().plan(specs).requires, overhead_us * 1e-6)
+    builder = IncrementalBuilder(scene)
+    start = time.perf_counter()
+    builder.build(specs)
+    full_time = time.perf_counter() - start
+
+    joint = library.jointIndex("IndexFinger2_L")
+    pose = library.poseSlice(joint).start
+    library.setRotation(pose, library.rotations[pose][::-1])
+    start = time.perf_counter()
+    report = builder.build(specsFromGroups(["ALL"], library = library))
+    tweak_time = time.perf_counter() - start
+    return {"name": "builder.incremental", "full_ms": full_time * 1000, "tweak_ms": tweak_time * 1000,
+            "reused": len(report.reused), "rebuilt": report.rebuilt, "tweak_nodes": report.stats["nodes"]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "构建驱动系统测试")
+    parser.add_argument("--poses", type = int, default = 20, help = "每个骨骼的pose数量")
+    parser.add_argument("--overhead", type = float, default = 50.0, help = "模拟每次场景调用开销(微秒)")
+    args = parser.parse_args()
+    r = run(args.poses, args.overhead)
+    print(f"{r['name']} drivers={r['drivers']} poses={r['poses']} ops={r['plan_ops']} nodes={r['nodes']} "
+          f"attrs={r['attrs']} values={r['values']} connections={r['connections']}")
+    print(f"plan={r['plan_ms']:.1f} ms batch={r['batch_ms']:.1f} ms ({r['batch_calls']} calls) "
+          f"each={r['each_ms']:.1f} ms ({r['each_calls']} calls)")
+    r = runIncremental(args.poses, args.overhead)
+    print(f"{r['name']} full={r['full_ms']:.1f} ms one_finger_pose={r['tweak_ms']:.1f} ms "
+          f"reused={r['reused']} rebuilt={r['rebuilt']} nodes={r['tweak_nodes']}")
+
+
+if __name__ == '__main__':
+    main()
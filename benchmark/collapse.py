@@ -0,0 +1,152 @@
+# -*- coding: UTF-8 -*-
+# Author  : AitrusC
+# FileName: collapse
+# Time    : 2024-10-06
+# Contact : 906629272@qq.com
+# Description : 折叠动画测试: 同时展开/折叠列表中的全部骨骼, 对比每个折叠控件各自的动画组与共享动画时钟的CPU耗时、帧耗时,
+#               以及立即展开/折叠全部的耗时
+#               python -m benchmark.collapse --boxes 20 100 300
+
+import argparse
+import time
+
+from . import qtApplication
+
+
+def _legacyBox():
+    """
+    每个折叠控件各自持有QParallelAnimationGroup的折叠控件(对比用, 与共享动画时钟之前的写法相同)
+    :return: LegacyCollapsibleBox
+    """
+    from PySide2.QtCore import QAbstractAnimation, QParallelAnimationGroup, QPropertyAnimation
+    from gui.widget.widgetT import _CollapsibleBox
+
+    class LegacyCollapsibleBox(_CollapsibleBox):
+        def __init__(self, *args, **kwargs):
+            _CollapsibleBox.__init__(self, *args, **kwargs)
+            self.setMinimumHeight(0)
+            self.setMaximumHeight(16777215)
+            self.toggle_animation = QParallelAnimationGroup(self)
+            for target, name, start, end in ((self, b"minimumHeight", 0, 0), (self, b"maximumHeight", 0, 0),
+                                             (self.content_area, b"maximumHeight", 0, self._content_height)):
+                animation = QPropertyAnimation(target, name)
+                animation.setDuration(self.animation_duration)
+                animation.setStartValue(start or self._collapsed_height)
+                animation.setEndValue(end or self._collapsed_height + self._content_height)
+                self.toggle_animation.addAnimation(animation)
+            content_animation = self.toggle_animation.animationAt(2)
+            content_animation.setStartValue(0)
+            content_animation.setEndValue(self._content_height)
+
+        def setExpanded(self, expanded, animate = True):
+            self.toggle_button.setDoubleClicked(expanded)
+            direction = QAbstractAnimation.Forward if expanded else QAbstractAnimation.Backward
+            self.toggle_animation.setDirection(direction)
+            self.toggle_animation.start()
+
+    return LegacyCollapsibleBox
+
+
+def _buildList(box_class, boxes):
+    """
+    创建只包含box_class折叠控件的JPlistWidget
+    :param box_class: 折叠控件类
+    :param boxes: 折叠控件数量
+    :return: JPlistWidget
+    """
+    from gui.icons import IconPath
+    from gui.widget.widgetT import JPlistWidget
+    widget = JPlistWidget()
+    for box in widget.boxes():
+        widget.main_layout.removeWidget(box)
+        box.deleteLater()
+    for _ in range(boxes):
+        widget.main_layout.addWidget(box_class("骨骼列表", icon_path = IconPath.PLUS_PATH.value))
+    widget.resize(250, 700)
+    return widget
+
+
+def _playAll(app, widget, expanded, timeout = 5.0):
+    """
+    同时切换全部折叠控件并运行事件循环直到动画结束
+    :param app: QApplication
+    :param widget: JPlistWidget
+    :param expanded: 是否展开
+    :param timeout: 最长等待时间(秒)
+    :return: (CPU耗时秒, 帧数, 最大帧耗时秒, 播放动画的折叠控件数量)
+    """
+    from gui.widget.widgetT import collapseAnimator
+    boxes = widget.boxes()
+    for box in boxes:
+        box.setExpanded(expanded)
+    animator = collapseAnimator()
+    animated = sum(hasattr(box, "toggle_animation") or animator.isAnimating(box) for box in boxes)
+    target = boxes[0]._collapsed_height + (boxes[0]._content_height if expanded else 0)
+    cpu = time.process_time()
+    frames, longest = 0, 0.0
+    end = time.perf_counter() + timeout
+    while time.perf_counter() < end:
+        start = time.perf_counter()
+        app.processEvents()
+        elapsed = time.perf_counter() - start
+        frames += 1
+        longest = max(longest, elapsed)
+        if all(box.height() == target for box in boxes):
+            break
+        time.sleep(0.001)
+    return time.process_time() - cpu, frames, longest, animated
+
+
+def run(boxes = 100):
+    """
+    测试折叠动画
+    :param boxes: 折叠控件数量
+    :return: 结果字典
+    """
+    app = qtApplication()
+    from gui.widget.widgetT import _CollapsibleBox, collapseAnimator
+    result = {"name": "collapse", "boxes": boxes}
+    for label, box_class in (("legacy", _legacyBox()), ("shared", _CollapsibleBox)):
+        widget = _buildList(box_class, boxes)
+        widget.show()
+        app.processEvents()
+        animator_frames = collapseAnimator().frames
+        expand_cpu, frames, longest, animated = _playAll(app, widget, True)
+        collapse_cpu, _, collapse_longest, _ = _playAll(app, widget, False)
+        result[label + "_expand_cpu_ms"] = expand_cpu * 1000
+        result[label + "_collapse_cpu_ms"] = collapse_cpu * 1000
+        result[label + "_frame_max_ms"] = max(longest, collapse_longest) * 1000
+        if label == "shared":
+            result["shared_ticks"] = collapseAnimator().frames - animator_frames
+            result["shared_animated"] = animated
+            start = time.perf_counter()
+            widget.expandAll()
+            app.processEvents()
+            result["expand_all_ms"] = (time.perf_counter() - start) * 1000
+            start = time.perf_counter()
+            widget.collapseAll()
+            app.processEvents()
+            result["collapse_all_ms"] = (time.perf_counter() - start) * 1000
+        widget.close()
+        widget.deleteLater()
+        app.processEvents()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "折叠动画测试")
+    parser.add_argument("--boxes", type = int, nargs = "+", default = [20, 100, 300])
+    args = parser.parse_args()
+    for boxes in args.boxes:
+        r = run(boxes)
+        print(f"{r['name']} boxes={r['boxes']}")
+        print(f"  legacy: expand {r['legacy_expand_cpu_ms']:.1f} ms cpu, collapse {r['legacy_collapse_cpu_ms']:.1f} ms cpu, "
+              f"max frame {r['legacy_frame_max_ms']:.1f} ms")
+        print(f"  shared: expand {r['shared_expand_cpu_ms']:.1f} ms cpu, collapse {r['shared_collapse_cpu_ms']:.1f} ms cpu, "
+              f"max frame {r['shared_frame_max_ms']:.1f} ms, {r['shared_ticks']} ticks, "
+              f"{r['shared_animated']} on-screen")
+        print(f"  expandAll {r['expand_all_ms']:.1f} ms, collapseAll {r['collapse_all_ms']:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
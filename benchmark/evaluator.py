@@ -0,0 +1,103 @@
+# -*- coding: UTF-8 -*-
+# Author  : AitrusC
+# FileName: evaluator
+# Time    : 2024-09-30
+# Contact : 906629272@qq.com
+# Description : 后台求解测试: 模拟60fps拖拽旋转, 统计界面帧间隔、求解延迟与丢弃的请求, 与在界面线程中同步求解对比
+#               python -m benchmark.evaluator --drivers 80 --poses 500 --seconds 2
+
+import argparse
+import time
+
+import numpy as np
+
+from . import qtApplication
+from .solver import randomQuaternions
+
+
+def _drag(app, drivers, seconds, evaluate):
+    """
+    以60fps的定时器模拟拖拽, 每帧提交一次所有驱动的旋转
+    :param app: QApplication
+    :param drivers: 驱动名称列表
+    :param seconds: 拖拽时长
+    :param evaluate: 每帧调用 evaluate({驱动名称: 四元数})
+    :return: 帧间隔(毫秒)数组
+    """
+    from PySide2.QtCore import QTimer
+    rotations = randomQuaternions((int(seconds * 60) + 10,), 21)
+    frames = []
+    timer = QTimer()
+    timer.setInterval(16)
+    timer.timeout.connect(lambda: (frames.append(time.perf_counter()),
+                                   evaluate({name: rotations[len(frames) % len(rotations)] for name in drivers})))
+    timer.start()
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        app.processEvents()
+        time.sleep(0.0005)
+    timer.stop()
+    return np.diff(frames) * 1000
+
+
+def run(drivers = 80, poses = 500, seconds = 2.0):
+    """
+    测试后台求解
+    :param drivers: 驱动骨骼数量
+    :param poses: 每个驱动的pose数量
+    :param seconds: 拖拽时长
+    :return: 结果字典
+    """
+    app = qtApplication()
+    from gui.evaluator import PoseEvaluator
+    from interface.solver import RBFSolver
+    names = ["driver%d" % i for i in range(drivers)]
+    solvers = {name: RBFSolver(randomQuaternions((poses,), i)) for i, name in enumerate(names)}
+    evaluator = PoseEvaluator()
+    for name, solver in solvers.items():
+        evaluator.setSolver(name, solver)
+    results = []
+    evaluator.weightsReady.connect(results.append)
+
+    threaded = _drag(app, names, seconds, evaluator.requestMany)
+    end = time.perf_counter() + 0.5
+    while time.perf_counter() < end and evaluator.evaluated + evaluator.dropped < evaluator.requests:
+        app.processEvents()
+    stats = evaluator.latencyStats()
+    evaluator.stop()
+
+    def evaluateSync(rotations):
+        for name, q in rotations.items():
+            solvers[name].evaluate(q[None], dtype = np.float32)
+
+    start = time.perf_counter()
+    evaluateSync({name: randomQuaternions((), 3) for name in names})
+    sync_eval = (time.perf_counter() - start) * 1000
+    synchronous = _drag(app, names, seconds, evaluateSync)
+    result = {"name": "evaluator", "drivers": drivers, "poses": poses, "seconds": seconds,
+              "frame_p95_ms": float(np.percentile(threaded, 95)), "frame_max_ms": float(threaded.max()),
+              "fps": 1000.0 / float(np.mean(threaded)),
+              "sync_frame_p95_ms": float(np.percentile(synchronous, 95)),
+              "sync_frame_max_ms": float(synchronous.max()), "sync_fps": 1000.0 / float(np.mean(synchronous)),
+              "sync_eval_ms": sync_eval, "results": len(results)}
+    result.update(stats)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "后台求解测试")
+    parser.add_argument("--drivers", type = int, default = 80)
+    parser.add_argument("--poses", type = int, default = 500)
+    parser.add_argument("--seconds", type = float, default = 2.0)
+    args = parser.parse_args()
+    r = run(args.drivers, args.poses, args.seconds)
+    print(f"{r['name']} drivers={r['drivers']} poses={r['poses']} one evaluation={r['sync_eval_ms']:.1f} ms")
+    print(f"background: fps={r['fps']:.1f} frame p95={r['frame_p95_ms']:.1f} ms max={r['frame_max_ms']:.1f} ms "
+          f"requests={r['requests']} evaluated={r['evaluated']} dropped={r['dropped']} "
+          f"latency median={r['latency_ms']:.1f} ms p95={r['latency_p95_ms']:.1f} ms")
+    print(f"gui thread: fps={r['sync_fps']:.1f} frame p95={r['sync_frame_p95_ms']:.1f} ms "
+          f"max={r['sync_frame_max_ms']:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+# -*- coding: UTF-8 -*-
+# Author  : AitrusC
+# FileName: frameless
+# Time    : 2024-09-30
+# Contact : 906629272@qq.com
+# Description : 无边框窗口拖拽缩放测试: 按帧合并的几何更新次数与布局耗时, 与每个鼠标事件都setGeometry对比
+#               python -m benchmark.frameless --poses 10000 --events 300 --rate 500
+
+import argparse
+import time
+
+from . import qtApplication
+from .poseLibrary import buildLibrary
+
+
+def _mouseEvent(event_type, window, global_pos, buttons):
+    """
+    生成鼠标事件
+    :param event_type: QEvent类型
+    :param window: 窗口
+    :param global_pos: 全局坐标
+    :param buttons: 按下的按键
+    :return: QMouseEvent
+    """
+    from PySide2.QtCore import QPointF, Qt
+    from PySide2.QtGui import QMouseEvent
+    local = window.mapFromGlobal(global_pos)
+    return QMouseEvent(event_type, QPointF(local), QPointF(global_pos), Qt.LeftButton, buttons, Qt.NoModifier)
+
+
+def _drag(app, window, events, rate, legacy = False):
+    """
+    从窗口右下角拖拽缩放
+    :param app: QApplication
+    :param window: FramelessWindow
+    :param events: 鼠标移动事件数量
+    :param rate: 鼠标事件频率(Hz)
+    :param legacy: 每个事件都直接setGeometry(对比用)
+    :return: (耗时(秒), 几何更新次数, 布局耗时(毫秒))
+    """
+    from PySide2.QtCore import QEvent, QPoint, QRect, Qt
+    window.setGeometry(100, 100, 1080, 720)
+    app.processEvents()
+    applied = []
+    window.geometryApplied.connect(lambda rect, ms: applied.append(ms))
+    corner = window.geometry().bottomRight()
+    app.sendEvent(window, _mouseEvent(QEvent.MouseButtonPress, window, corner, Qt.LeftButton))
+    interval = 1.0 / rate
+    start = time.perf_counter()
+    for i in range(events):
+        pos = corner + QPoint(i % 100 * 3, i % 100 * 2)
+        if legacy:
+            # 不按帧合并, 每个事件都立即setGeometry
+            window._pending_geometry = QRect(window.geometry().topLeft(), pos)
+            window._applyPendingGeometry(restart = False)
+        else:
+            app.sendEvent(window, _mouseEvent(QEvent.MouseMove, window, pos, Qt.LeftButton))
+        app.processEvents()
+        # 模拟鼠标事件间隔
+        next_time = start + (i + 1) * interval
+        while time.perf_counter() < next_time:
+            app.processEvents()
+    app.sendEvent(window, _mouseEvent(QEvent.MouseButtonRelease, window, corner, Qt.NoButton))
+    app.processEvents()
+    elapsed = time.perf_counter() - start
+    window.geometryApplied.disconnect()
+    return elapsed, len(applied), sum(applied)
+
+
+def run(poses = 10000, events = 300, rate = 500):
+    """
+    测试拖拽缩放
+    :param poses: 左侧列表pose数量
+    :param events: 鼠标移动事件数量
+    :param rate: 鼠标事件频率(Hz)
+    :return: 结果字典
+    """
+    app = qtApplication()
+    from gui.ui import MainWindow
+    window = MainWindow()
+    window.body_widget.left_widget.joint_pose_list.setLibrary(buildLibrary(poses))
+    window.show()
+    app.processEvents()
+    coalesced = _drag(app, window, events, rate)
+    legacy = _drag(app, window, events, rate, legacy = True)
+    result = {"name": "frameless", "poses": poses, "events": events, "rate": rate,
+              "frame_ms": window.frameInterval(),
+              "coalesced_updates": coalesced[1], "coalesced_layout_ms": coalesced[2],
+              "legacy_updates": legacy[1], "legacy_layout_ms": legacy[2]}
+    window.deleteLater()
+    app.processEvents()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "无边框窗口拖拽缩放测试")
+    parser.add_argument("--poses", type = int, default = 10000)
+    parser.add_argument("--events", type = int, default = 300, help = "鼠标移动事件数量")
+    parser.add_argument("--rate", type = float, default = 500, help = "鼠标事件频率(Hz)")
+    args = parser.parse_args()
+    r = run(args.poses, args.events, args.rate)
+    print(f"{r['name']} poses={r['poses']} events={r['events']} @ {r['rate']:.0f} Hz frame={r['frame_ms']} ms")
+    print(f"coalesced: {r['coalesced_updates']} geometry updates, layout {r['coalesced_layout_ms']:.1f} ms")
+    print(f"per event: {r['legacy_updates']} geometry updates, layout {r['legacy_layout_ms']:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
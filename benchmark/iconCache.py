@@ -0,0 +1,73 @@
+# -*- coding: UTF-8 -*-
+# Author  : AitrusC
+# FileName: iconCache
+# Time    : 2024-09-28
+# Contact : 906629272@qq.com
+# Description : 图标缓存测试: 构建pose面板时每个图标文件是否只解码一次, 与逐控件解码的耗时对比
+#               python -m benchmark.iconCache --joints 200
+
+import argparse
+import time
+
+from . import qtApplication
+
+
+def run(joints = 200):
+    """
+    构建逐控件pose面板(每个骨骼10行)与左侧窗口, 统计图标缓存命中情况
+    :param joints: 骨骼数量
+    :return: 结果字典
+    """
+    app = qtApplication()
+    from PySide2.QtGui import QPixmap
+    from gui.icons import IconPath, iconCache
+    from gui.ui import LeftWidget
+    from gui.widget.widgetT import JPlistWidget, _CollapsibleBox
+    iconCache.clear()
+    iconCache.resetStats()
+
+    start = time.perf_counter()
+    iconCache.preload()
+    preload = time.perf_counter() - start
+    preload_stats = iconCache.stats()
+
+    start = time.perf_counter()
+    panel = JPlistWidget()
+    for _ in range(max(0, joints - 10)):
+        panel.main_layout.addWidget(_CollapsibleBox("骨骼列表", icon_path = IconPath.PLUS_PATH.value))
+    left = LeftWidget()
+    build = time.perf_counter() - start
+    stats = iconCache.stats()
+
+    # 对比: 每行都解码一次图标
+    rows = joints * 11
+    start = time.perf_counter()
+    for _ in range(rows):
+        QPixmap(IconPath.TITLEBAR_PATH.value).scaled(20, 20)
+    decode_each = time.perf_counter() - start
+
+    result = {"name": "iconCache", "joints": joints, "rows": rows, "preload_ms": preload * 1000,
+              "build_ms": build * 1000, "decode_each_ms": decode_each * 1000,
+              "files": len(IconPath), "preload_decodes": preload_stats["decodes"],
+              "build_decodes": stats["decodes"] - preload_stats["decodes"],
+              "hits": stats["hits"] - preload_stats["hits"], "misses": stats["misses"] - preload_stats["misses"],
+              "entries": stats["entries"]}
+    for widget in (panel, left):
+        widget.deleteLater()
+    app.processEvents()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "图标缓存测试")
+    parser.add_argument("--joints", type = int, default = 200)
+    args = parser.parse_args()
+    r = run(args.joints)
+    print(f"{r['name']} joints={r['joints']} icon_files={r['files']} entries={r['entries']} "
+          f"preload={r['preload_ms']:.1f} ms ({r['preload_decodes']} decodes)")
+    print(f"build panel={r['build_ms']:.1f} ms decodes={r['build_decodes']} hits={r['hits']} misses={r['misses']} "
+          f"(decoding per row would cost {r['decode_each_ms']:.1f} ms for {r['rows']} rows)")
+
+
+if __name__ == '__main__':
+    main()
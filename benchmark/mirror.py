@@ -0,0 +1,143 @@
+# -*- coding: UTF-8 -*-
+# Author  : AitrusC
+# FileName: mirror
+# Time    : 2024-09-28
+# Contact : 906629272@qq.com
+# Description : 镜像SDK/Locator/pose旋转测试, 与逐条曲线逐个关键帧的镜像对比
+#               python -m benchmark.mirror --joints 400 --curves 10 --keys 7
+
+import argparse
+import re
+import time
+
+import numpy as np
+
+from .solver import randomQuaternions
+
+_ATTRS = ("translateX", "translateY", "translateZ", "rotateX", "rotateY", "rotateZ")
+
+# 名称映射正确性检查: (右侧名称, 期望的左侧名称或None)
+NAME_CASES = (("Wrist_R", "Wrist_L"), ("R_arm", "L_arm"), ("armRight", "armLeft"), ("RightArm", "LeftArm"),
+              ("right_eye", "left_eye"), ("ns:R_arm", "ns:L_arm"), ("|grp|R_arm", "|grp|L_arm"),
+              ("FOOTROLLER_R", "FOOTROLLER_L"), ("LOWER_R", "LOWER_L"), ("CHAR_Wrist_R", "CHAR_Wrist_L"),
+              ("Bright_R", "Bright_L"), ("Main_RIG", None), ("Ring_01", None), ("BRight", None))
+
+
+def buildRig(joints = 400, curves_per_joint = 10, keys = 7, poses_per_joint = 20):
+    """
+    生成左右对称的测试数据(一半骨骼在右侧)
+    :param joints: 骨骼总数
+    :param curves_per_joint: 每个骨骼的SDK曲线数量
+    :param keys: 每条曲线的关键帧数量
+    :param poses_per_joint: 每个骨骼的pose数量
+    :return: (SDKCurves, Locator名称, 位置, 旋转, PoseLibrary)
+    """
+    from interface.mirror import SDKCurves
+    from interface.poseLibrary import PoseLibrary
+    rng = np.random.default_rng(3)
+    names = ["face%03d_%s" % (j // 2, "R" if j % 2 == 0 else "L") for j in range(joints)]
+    curves = []
+    for joint in names:
+        for c in range(curves_per_joint):
+            inputs = np.sort(rng.uniform(-90, 90, keys))
+            curves.append(("%s_ctrl.%s" % (joint, _ATTRS[c % 6]), "%s.%s" % (joint, _ATTRS[(c + 1) % 6]),
+                           inputs, rng.normal(size = keys), rng.normal(size = keys), rng.normal(size = keys)))
+    rotations = randomQuaternions((joints * poses_per_joint,), 9)
+
+    def records():
+        for j, joint in enumerate(names):
+            for p in range(poses_per_joint):
+                yield joint, "pose%d" % p, rotations[j * poses_per_joint + p], {"bs_%s.pose%d" % (joint, p): 1.0}
+
+    positions = rng.normal(size = (joints, 3))
+    return (SDKCurves.fromCurves(curves), [n + "_loc" for n in names], positions,
+            randomQuaternions((joints,), 10), PoseLibrary.build(records()))
+
+
+def mirrorEach(curves):
+    """
+    逐条曲线、逐个关键帧镜像(对比用, 相当于按曲线写的脚本)
+    :param curves: SDKCurves
+    :return: [(驱动属性, 被驱动属性, [(驱动值, 被驱动值), ...]), ...]
+    """
+    from interface.mirror import attrSign
+    result = []
+    for i in range(len(curves)):
+        driver, driven, inputs, outputs = curves.curve(i)
+        if not re.search(r"_R(?![a-z0-9])", driven):
+            continue
+        in_sign, out_sign = attrSign(driver), attrSign(driven)
+        keys = []
+        for k in range(len(inputs)):
+            keys.append((float(inputs[k]) * in_sign, float(outputs[k]) * out_sign))
+        keys.sort()
+        result.append((re.sub(r"_R(?![a-z0-9])", "_L", driver), re.sub(r"_R(?![a-z0-9])", "_L", driven), keys))
+    return result
+
+
+def checkNames(cases = NAME_CASES):
+    """
+    检查名称映射
+    :param cases: [(右侧名称, 期望的左侧名称), ...]
+    :return: [(名称, 期望, 实际), ...] 不一致的情况
+    """
+    from interface.mirror import NameMirror, RIGHT_TO_LEFT
+    names = NameMirror()
+    failures = []
+    for name, expected in cases:
+        actual = names.counterpart(name, RIGHT_TO_LEFT)
+        if actual != expected:
+            failures.append((name, expected, actual))
+    return failures
+
+
+def run(joints = 400, curves_per_joint = 10, keys = 7):
+    """
+    测试镜像耗时
+    :param joints: 骨骼总数
+    :param curves_per_joint: 每个骨骼的SDK曲线数量
+    :param keys: 每条曲线的关键帧数量
+    :return: 结果字典
+    """
+    from interface.mirror import Mirror, REFLECT, RIGHT_TO_LEFT
+    curves, loc_names, positions, loc_rotations, library = buildRig(joints, curves_per_joint, keys)
+    mirror = Mirror(mode = REFLECT)
+
+    start = time.perf_counter()
+    merged, mirrored = mirror.applyCurves(curves, RIGHT_TO_LEFT)
+    curve_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    mirror.mirrorLocators(loc_names, positions, loc_rotations, RIGHT_TO_LEFT)
+    locator_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    mirrored_library = mirror.mirrorLibrary(library, RIGHT_TO_LEFT)
+    library_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    each = mirrorEach(curves)
+    each_time = time.perf_counter() - start
+    return {"name": "mirror", "joints": joints, "curves": len(curves), "keys": curves.keyCount,
+            "mirrored_curves": len(mirrored), "curve_ms": curve_time * 1000, "each_ms": each_time * 1000,
+            "locator_ms": locator_time * 1000, "library_ms": library_time * 1000,
+            "poses": mirrored_library.poseCount, "match": len(each) == len(mirrored), "name_failures": checkNames()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "镜像测试")
+    parser.add_argument("--joints", type = int, default = 400)
+    parser.add_argument("--curves", type = int, default = 10, help = "每个骨骼的SDK曲线数量")
+    parser.add_argument("--keys", type = int, default = 7, help = "每条曲线的关键帧数量")
+    args = parser.parse_args()
+    r = run(args.joints, args.curves, args.keys)
+    print(f"{r['name']} joints={r['joints']} curves={r['curves']} keys={r['keys']} poses={r['poses']}")
+    print(f"sdk={r['curve_ms']:.1f} ms ({r['mirrored_curves']} curves, per-key loop {r['each_ms']:.1f} ms) "
+          f"locators={r['locator_ms']:.2f} ms poses={r['library_ms']:.1f} ms match={r['match']}")
+    print(f"names: {len(NAME_CASES) - len(r['name_failures'])}/{len(NAME_CASES)} ok")
+    for name, expected, actual in r["name_failures"]:
+        print(f"  {name}: expected {expected}, got {actual}")
+
+
+if __name__ == '__main__':
+    main()
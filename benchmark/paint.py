@@ -0,0 +1,139 @@
+# -*- coding: UTF-8 -*-
+# Author  : AitrusC
+# FileName: paint
+# Time    : 2024-09-30
+# Contact : 906629272@qq.com
+# Description : 绘制开销测试: 模拟拖拽缩放与悬停时各控件的绘制次数与耗时, 与每次绘制都计算颜色的写法对比
+#               python -m benchmark.paint --frames 120
+
+import argparse
+import time
+
+from . import qtApplication
+
+
+def _legacyButtons():
+    """
+    每次绘制都计算颜色的按钮(对比用, 与缓存颜色之前的绘制方式相同)
+    :return: (LegacyRoundButton, LegacyIconButton)
+    """
+    from PySide2.QtCore import QPointF, QRectF, QSizeF, Qt
+    from PySide2.QtGui import QColor, QPainter
+    from gui.widget.widgetT import IconButton, RoundButton, _setLuminance, _setOpacity
+
+    class LegacyRoundButton(RoundButton):
+        def paintEvent(self, event):
+            background_color = QColor(self._grcolor[0], self._grcolor[1], self._grcolor[2])
+            if self._state == self.HOVER:
+                background_color = _setLuminance(self._grcolor, True, 0.2)
+                background_color = QColor(background_color[0], background_color[1], background_color[2])
+            elif self._state == self.PRESS:
+                background_color = _setLuminance(self._grcolor, True, 0.35)
+                background_color = QColor(background_color[0], background_color[1], background_color[2])
+            painter = QPainter(self)
+            painter.setRenderHint(QPainter.Antialiasing)
+            painter.setPen(Qt.NoPen)
+            painter.setBrush(background_color)
+            painter.drawEllipse(QRectF(QPointF(0, 0), QSizeF(self._radius, self._radius)))
+            painter.end()
+
+    class LegacyIconButton(IconButton):
+        def paintEvent(self, event):
+            painter = QPainter(self)
+            hover_color = QColor(self.hover_color[0], self.hover_color[1], self.hover_color[2], self.hover_color[3])
+            pressed_color = _setOpacity(self.hover_color, True, 0.5)
+            pressed_color = QColor(pressed_color[0], pressed_color[1], pressed_color[2], pressed_color[3])
+            if self._pressed:
+                painter.setPen(Qt.NoPen)
+                painter.setBrush(pressed_color)
+                painter.drawRect(self.rect())
+            elif self._hover:
+                painter.setPen(Qt.NoPen)
+                painter.setBrush(hover_color)
+                painter.drawRect(self.rect())
+            painter.drawPixmap(self.rect().adjusted(self.margin, self.margin, -self.margin, -self.margin), self.icon)
+            painter.end()
+
+    return LegacyRoundButton, LegacyIconButton
+
+
+def _paintButtons(buttons, image, repeats):
+    """
+    按NORMAL/HOVER/PRESS循环绘制按钮
+    :param buttons: 按钮列表
+    :param image: 绘制目标
+    :param repeats: 每个按钮绘制次数
+    :return: 耗时(秒)
+    """
+    from gui.widget.widgetT import RoundButton
+    start = time.perf_counter()
+    for i in range(repeats):
+        state = i % 3
+        for button in buttons:
+            if isinstance(button, RoundButton):
+                button._state = state
+            else:
+                button._hover, button._pressed = state == 1, state == 2
+            button.render(image)
+    return time.perf_counter() - start
+
+
+def run(frames = 120, repeats = 2000):
+    """
+    模拟拖拽缩放窗口与悬停按钮, 统计绘制次数与耗时
+    :param frames: 缩放帧数
+    :param repeats: 按钮单独绘制次数
+    :return: 结果字典
+    """
+    app = qtApplication()
+    from PySide2.QtGui import QImage
+    from gui.icons import IconPath
+    from gui.ui import MainWindow
+    from gui.widget.widgetT import IconButton, RoundButton, paintCounter
+    window = MainWindow()
+    window.show()
+    app.processEvents()
+    buttons = [window.title_bar.min_button, window.title_bar.max_button, window.title_bar.close_button]
+    paintCounter.reset()
+    paintCounter.enabled = True
+    start = time.perf_counter()
+    for frame in range(frames):
+        window.resize(1080 + frame % 40 * 5, 720 + frame % 40 * 3)
+        buttons[frame % 3].set_state(RoundButton.HOVER if frame % 2 else RoundButton.NORMAL)
+        window.repaint()
+        app.processEvents()
+    drag = time.perf_counter() - start
+    drag_stats = paintCounter.stats()
+    paint_count = paintCounter.total()
+    paintCounter.enabled = False
+
+    legacy_round, legacy_icon = _legacyButtons()
+    image = QImage(40, 40, QImage.Format_ARGB32_Premultiplied)
+    cached = [RoundButton(20, (17, 101, 154)), IconButton(IconPath.TITLEBAR_PATH.value, 20)]
+    legacy = [legacy_round(20, (17, 101, 154)), legacy_icon(IconPath.TITLEBAR_PATH.value, 20)]
+    _paintButtons(cached + legacy, image, 50)
+    cached_time = _paintButtons(cached, image, repeats)
+    legacy_time = _paintButtons(legacy, image, repeats)
+    window.deleteLater()
+    for button in cached + legacy:
+        button.deleteLater()
+    app.processEvents()
+    return {"name": "paint", "frames": frames, "drag_ms": drag * 1000, "paints": paint_count,
+            "by_widget": drag_stats, "buttons": repeats * 2,
+            "cached_us": cached_time * 1e6 / (repeats * 2), "legacy_us": legacy_time * 1e6 / (repeats * 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "绘制开销测试")
+    parser.add_argument("--frames", type = int, default = 120)
+    parser.add_argument("--repeats", type = int, default = 2000, help = "按钮单独绘制次数")
+    args = parser.parse_args()
+    r = run(args.frames, args.repeats)
+    print(f"{r['name']} frames={r['frames']} drag={r['drag_ms']:.1f} ms paints={r['paints']}")
+    for name, stat in sorted(r["by_widget"].items()):
+        print(f"  {name}: {stat['paints']} paints {stat['ms']:.2f} ms ({stat['us_per_paint']:.1f} us/paint)")
+    print(f"button paint cached={r['cached_us']:.1f} us legacy={r['legacy_us']:.1f} us ({r['buttons']} paints each)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+# -*- coding: UTF-8 -*-
+# Author  : AitrusC
+# FileName: poseIO
+# Time    : 2024-09-26
+# Contact : 906629272@qq.com
+# Description : pose设置流式导入导出吞吐量(MB/s)与内存测试
+#               python -m benchmark.poseIO --poses 100000 --targets 16
+
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from .poseLibrary import buildLibrary
+
+
+def run(poses = 100000, targets_per_pose = 16, extension = ".jsonl"):
+    """
+    测试导出/导入吞吐量、导出峰值内存与按骨骼导入耗时
+    :param poses: pose数量
+    :param targets_per_pose: 每个pose的blendShape权重数量
+    :param extension: .jsonl或.json
+    :return: 结果字典
+    """
+    from interface import poseIO
+    library = buildLibrary(poses, targets_per_pose = targets_per_pose)
+    path = os.path.join(tempfile.mkdtemp(), "poses" + extension)
+
+    start = time.perf_counter()
+    poseIO.exportLibrary(library, path)
+    export = time.perf_counter() - start
+    size = os.path.getsize(path) / 1048576.0
+
+    # 峰值内存单独测量(tracemalloc会拖慢速度)
+    tracemalloc.start()
+    poseIO.exportLibrary(library, path)
+    export_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    count = sum(1 for _ in poseIO.readPoses(path))
+    read = time.perf_counter() - start
+
+    start = time.perf_counter()
+    imported = poseIO.importLibrary(path)
+    import_time = time.perf_counter() - start
+
+    joint = library.jointName(library.jointCount // 2)
+    start = time.perf_counter()
+    partial = list(poseIO.readPoses(path, [joint]))
+    partial_time = time.perf_counter() - start
+
+    result = {"name": "poseIO" + extension, "poses": count, "file_mb": size,
+              "export_s": export, "export_mbs": size / export, "export_peak_mb": export_peak / 1048576.0,
+              "read_s": read, "read_mbs": size / read, "import_s": import_time,
+              "partial_ms": partial_time * 1000, "partial_poses": len(partial),
+              "roundtrip": imported.poseCount == library.poseCount}
+    os.remove(path)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "pose导入导出测试")
+    parser.add_argument("--poses", type = int, default = 100000)
+    parser.add_argument("--targets", type = int, default = 16)
+    parser.add_argument("--json", action = "store_true", help = "使用.json格式(默认.jsonl)")
+    args = parser.parse_args()
+    r = run(args.poses, args.targets, ".json" if args.json else ".jsonl")
+    print(f"{r['name']} poses={r['poses']} file={r['file_mb']:.1f} MB roundtrip={r['roundtrip']}")
+    print(f"export={r['export_s']:.2f} s ({r['export_mbs']:.1f} MB/s, peak +{r['export_peak_mb']:.2f} MB) "
+          f"read={r['read_s']:.2f} s ({r['read_mbs']:.1f} MB/s) import={r['import_s']:.2f} s "
+          f"one_joint={r['partial_ms']:.2f} ms ({r['partial_poses']} poses)")
+
+
+if __name__ == '__main__':
+    main()
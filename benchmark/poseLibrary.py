@@ -0,0 +1,87 @@
+# -*- coding: UTF-8 -*-
+# Author  : AitrusC
+# FileName: poseLibrary
+# Time    : 2024-09-25
+# Contact : 906629272@qq.com
+# Description : pose数据库保存/打开/切片耗时与内存测试
+#               python -m benchmark.poseLibrary --poses 100000
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from . import currentRss
+from .solver import randomQuaternions
+
+
+def buildLibrary(poses = 100000, poses_per_joint = 20, targets_per_pose = 4):
+    """
+    生成测试数据库
+    :param poses: pose数量
+    :param poses_per_joint: 每个骨骼的pose数量
+    :param targets_per_pose: 每个pose驱动的目标数量
+    :return: PoseLibrary
+    """
+    from interface.poseLibrary import PoseLibrary
+    rotations = randomQuaternions((poses,), 4)
+    rng = np.random.default_rng(5)
+
+    def records():
+        for p in range(poses):
+            j = p // poses_per_joint
+            targets = {f"bs_{j:05d}.corrective{(p + k) % 32}": float(v)
+                       for k, v in enumerate(rng.random(targets_per_pose))}
+            yield f"joint_{j:05d}", f"joint_{j:05d}_pose{p % poses_per_joint:02d}", rotations[p], targets
+
+    return PoseLibrary.build(records())
+
+
+def run(poses = 100000):
+    """
+    测试保存、内存映射打开与按骨骼切片
+    :param poses: pose数量
+    :return: 结果字典
+    """
+    from interface.poseLibrary import PoseLibrary
+    start = time.perf_counter()
+    library = buildLibrary(poses)
+    build = time.perf_counter() - start
+    path = os.path.join(tempfile.mkdtemp(), "library.pdl")
+    start = time.perf_counter()
+    library.save(path)
+    save = time.perf_counter() - start
+    del library
+    rss = currentRss()
+    start = time.perf_counter()
+    loaded = PoseLibrary.load(path)
+    load = time.perf_counter() - start
+    open_rss = currentRss() - rss
+    start = time.perf_counter()
+    joint = loaded.jointIndex("joint_%05d" % (loaded.jointCount // 2))
+    rotations = loaded.jointRotations(joint)
+    offsets, targets, values = loaded.jointTargets(joint)
+    names = loaded.jointPoseNames(joint)
+    query = time.perf_counter() - start
+    result = {"name": "PoseLibrary", "poses": loaded.poseCount, "joints": loaded.jointCount,
+              "targets": loaded.targetCount, "file_mb": os.path.getsize(path) / 1048576.0,
+              "build_s": build, "save_ms": save * 1000, "open_ms": load * 1000, "open_rss_mb": open_rss / 1048576.0,
+              "joint_query_ms": query * 1000, "zero_copy": rotations.base is not None and len(names) == len(rotations)}
+    os.remove(path)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "pose数据库测试")
+    parser.add_argument("--poses", type = int, default = 100000)
+    args = parser.parse_args()
+    r = run(args.poses)
+    print(f"{r['name']} poses={r['poses']} joints={r['joints']} targets={r['targets']} file={r['file_mb']:.1f} MB")
+    print(f"build={r['build_s']:.2f} s save={r['save_ms']:.1f} ms open={r['open_ms']:.2f} ms "
+          f"open_rss=+{r['open_rss_mb']:.2f} MB joint_query={r['joint_query_ms']:.3f} ms zero_copy={r['zero_copy']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+# -*- coding: UTF-8 -*-
+# Author  : AitrusC
+# FileName: poseList
+# Time    : 2024-09-20
+# Contact : 906629272@qq.com
+# Description : 骨骼与POSE列表构建耗时与内存测试
+#               python -m benchmark.poseList --poses 10000 [--legacy]
+
+import argparse
+import time
+
+from . import currentRss, qtApplication
+
+
+def _demoData(pose_count, poses_per_joint):
+    """
+    生成测试数据
+    :param pose_count: pose总数
+    :param poses_per_joint: 每个骨骼的pose数量
+    :return:
+    """
+    data = []
+    joint_count = (pose_count + poses_per_joint - 1) // poses_per_joint
+    for j in range(joint_count):
+        count = min(poses_per_joint, pose_count - j * poses_per_joint)
+        data.append((f"joint_{j:04d}", [f"joint_{j:04d}_pose_{p:02d}" for p in range(count)]))
+    return data
+
+
+def runTreeView(pose_count = 10000, poses_per_joint = 10):
+    """
+    测试JPTreeView
+    :param pose_count: pose总数
+    :param poses_per_joint: 每个骨骼的pose数量
+    :return: 结果字典
+    """
+    app = qtApplication()
+    from gui.widget.poseView import JPTreeView
+    data = _demoData(pose_count, poses_per_joint)
+    rss = currentRss()
+    start = time.perf_counter()
+    view = JPTreeView()
+    view.setPoseData(data)
+    view.expandAll()
+    view.resize(250, 700)
+    build = time.perf_counter() - start
+    start = time.perf_counter()
+    view.show()
+    app.processEvents()
+    show = time.perf_counter() - start
+    result = {"name": "JPTreeView", "poses": pose_count, "build_s": build, "show_s": show,
+              "rss_mb": (currentRss() - rss) / 1048576.0}
+    view.close()
+    view.deleteLater()
+    app.processEvents()
+    return result
+
+
+def runLegacy(pose_count = 10000, poses_per_joint = 10):
+    """
+    测试JPlistWidget(逐控件构建)
+    :param pose_count: pose总数
+    :param poses_per_joint: 每个骨骼的pose数量(_CollapsibleBox固定为10)
+    :return: 结果字典
+    """
+    app = qtApplication()
+    from gui.widget.widgetT import JPlistWidget, _CollapsibleBox
+    from gui.icons import IconPath
+    rss = currentRss()
+    start = time.perf_counter()
+    widget = JPlistWidget()
+    for _ in range(max(0, pose_count // poses_per_joint - 10)):
+        widget.main_layout.addWidget(_CollapsibleBox("骨骼列表", icon_path = IconPath.PLUS_PATH.value))
+    widget.resize(250, 700)
+    build = time.perf_counter() - start
+    start = time.perf_counter()
+    widget.show()
+    app.processEvents()
+    show = time.perf_counter() - start
+    result = {"name": "JPlistWidget", "poses": pose_count, "build_s": build, "show_s": show,
+              "rss_mb": (currentRss() - rss) / 1048576.0}
+    widget.close()
+    widget.deleteLater()
+    app.processEvents()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "骨骼与POSE列表构建测试")
+    parser.add_argument("--poses", type = int, default = 10000)
+    parser.add_argument("--poses-per-joint", type = int, default = 10)
+    parser.add_argument("--legacy", action = "store_true", help = "同时测试JPlistWidget")
+    args = parser.parse_args()
+    results = [runTreeView(args.poses, args.poses_per_joint)]
+    if args.legacy:
+        results.append(runLegacy(args.poses, args.poses_per_joint))
+    for r in results:
+        print(f"{r['name']:<14} poses={r['poses']:<8} build={r['build_s'] * 1000:9.1f} ms  "
+              f"show={r['show_s'] * 1000:9.1f} ms  rss=+{r['rss_mb']:.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+# -*- coding: UTF-8 -*-
+# Author  : AitrusC
+# FileName: posePlane
+# Time    : 2024-09-30
+# Contact : 906629272@qq.com
+# Description : pose旋转平面绘制与点选测试: 10万采样帧在不同缩放下的绘制耗时, 网格索引点选与逐点计算对比
+#               python -m benchmark.posePlane --samples 100000 --poses 500
+
+import argparse
+import time
+
+import numpy as np
+
+from . import qtApplication
+
+
+def _paintTime(app, view, image, repeats):
+    """
+    绘制耗时(毫秒, 取中位数)
+    :param app: QApplication
+    :param view: PosePlaneView
+    :param image: 绘制目标
+    :param repeats: 次数
+    :return:
+    """
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        view.render(image)
+        times.append(time.perf_counter() - start)
+    return float(np.median(times)) * 1000
+
+
+def run(samples = 100000, poses = 500, queries = 10000):
+    """
+    测试pose旋转平面
+    :param samples: 采样帧数量
+    :param poses: pose数量
+    :param queries: 点选次数
+    :return: 结果字典
+    """
+    app = qtApplication()
+    from PySide2.QtCore import QPoint
+    from PySide2.QtGui import QImage
+    from gui.widget.posePlane import PosePlaneView
+    rng = np.random.default_rng(11)
+    # 采样帧集中在几条动画轨迹附近
+    t = rng.uniform(0, 2 * np.pi, samples)
+    track = rng.integers(0, 8, samples)
+    sample_swing = np.stack((np.cos(t + track) * (0.4 + 0.1 * track), np.sin(2 * t) * 0.5), axis = -1)
+    sample_swing += rng.normal(scale = 0.02, size = sample_swing.shape)
+    pose_swing = rng.uniform(-1.5, 1.5, (poses, 2))
+
+    view = PosePlaneView()
+    view.resize(1080, 690)
+    view.setPoses(["pose%d" % i for i in range(poses)], pose_swing)
+    view.setSamples(sample_swing)
+    view.setView((0, 0), 200)
+    image = QImage(view.size(), QImage.Format_ARGB32_Premultiplied)
+
+    start = time.perf_counter()
+    view.render(image)
+    first = (time.perf_counter() - start) * 1000
+    cached = _paintTime(app, view, image, 20)
+    zoomed_out_lod = view.lod
+
+    # 平移: 网格图片不重新生成, 采样图层重新生成
+    pan = []
+    for i in range(20):
+        view.setView((0.01 * i, 0.0), 200)
+        start = time.perf_counter()
+        view.render(image)
+        pan.append(time.perf_counter() - start)
+
+    view.setView((0.4, 0.0), 8000)
+    view.render(image)
+    zoomed_in = _paintTime(app, view, image, 20)
+    zoomed_in_lod = view.lod
+    view.setView((0, 0), 200)
+
+    points = [QPoint(int(x), int(y)) for x, y in rng.uniform((0, 0), (1080, 690), (queries, 2))]
+    start = time.perf_counter()
+    hits = [view.poseAt(p) for p in points]
+    grid = (time.perf_counter() - start) / queries * 1e6
+
+    radius = view.PickRadius / view.scale()
+    start = time.perf_counter()
+    brute = []
+    for p in points:
+        d = np.linalg.norm(pose_swing - view.mapToPlane(p), axis = -1)
+        i = int(np.argmin(d))
+        brute.append(i if d[i] <= radius else -1)
+    brute_us = (time.perf_counter() - start) / queries * 1e6
+
+    start = time.perf_counter()
+    sample_hits = [view.sampleAt(p) for p in points[:1000]]
+    sample_us = (time.perf_counter() - start) / 1000 * 1e6
+    view.deleteLater()
+    app.processEvents()
+    return {"name": "posePlane", "samples": samples, "poses": poses, "first_ms": first, "cached_ms": cached,
+            "zoomed_out_lod": zoomed_out_lod, "pan_ms": float(np.median(pan)) * 1000,
+            "zoomed_in_ms": zoomed_in, "zoomed_in_lod": zoomed_in_lod,
+            "pick_us": grid, "pick_brute_us": brute_us, "pick_match": hits == brute,
+            "sample_pick_us": sample_us, "sample_hits": sum(h >= 0 for h in sample_hits)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "pose旋转平面测试")
+    parser.add_argument("--samples", type = int, default = 100000)
+    parser.add_argument("--poses", type = int, default = 500)
+    args = parser.parse_args()
+    r = run(args.samples, args.poses)
+    print(f"{r['name']} samples={r['samples']} poses={r['poses']}")
+    print(f"paint first={r['first_ms']:.1f} ms cached={r['cached_ms']:.1f} ms pan={r['pan_ms']:.1f} ms "
+          f"({r['zoomed_out_lod']}) zoomed_in={r['zoomed_in_ms']:.1f} ms ({r['zoomed_in_lod']})")
+    print(f"pick pose={r['pick_us']:.1f} us brute={r['pick_brute_us']:.1f} us match={r['pick_match']} "
+          f"pick sample={r['sample_pick_us']:.1f} us")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+# -*- coding: UTF-8 -*-
+# Author  : AitrusC
+# FileName: rbfUpdate
+# Time    : 2024-09-24
+# Contact : 906629272@qq.com
+# Description : RBF增量更新与整体重新求解耗时对比
+#               python -m benchmark.rbfUpdate --poses 200
+
+import argparse
+import time
+
+import numpy as np
+
+from .solver import randomQuaternions
+
+
+def run(poses = 200, repeat = 20, radius = 0.3):
+    """
+    测试添加/删除/修改pose的增量更新耗时
+    :param poses: pose数量
+    :param repeat: 每种操作重复次数
+    :param radius: 高斯核半径
+    :return: 结果字典
+    """
+    from interface.solver import RBFSolver
+    pose_q = randomQuaternions((poses, 1), 1)
+    extra_q = randomQuaternions((repeat * 2, 1), 2)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        RBFSolver(pose_q, radius = radius)
+    rebuild = (time.perf_counter() - start) / repeat
+    solver = RBFSolver(pose_q, radius = radius)
+    rng = np.random.default_rng(0)
+    timings = {"add": [], "remove": [], "set": []}
+    for i in range(repeat):
+        start = time.perf_counter()
+        solver.addPose(extra_q[i], index = int(rng.integers(0, solver.poseCount + 1)))
+        timings["add"].append(time.perf_counter() - start)
+        start = time.perf_counter()
+        solver.removePose(int(rng.integers(0, solver.poseCount)))
+        timings["remove"].append(time.perf_counter() - start)
+        start = time.perf_counter()
+        solver.setPose(int(rng.integers(0, solver.poseCount)), extra_q[repeat + i])
+        timings["set"].append(time.perf_counter() - start)
+    frames = randomQuaternions((1000, 1), 3)
+    error = float(np.abs(solver.evaluate(frames) - RBFSolver(solver.poses, radius = radius).evaluate(frames)).max())
+    result = {"name": "RBFSolver update", "poses": poses, "rebuild_ms": rebuild * 1000, "max_error": error,
+              "full_rebuilds": solver.rebuild_count - 1}
+    for name, values in timings.items():
+        result[name + "_ms"] = sum(values) / len(values) * 1000
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "RBF增量更新测试")
+    parser.add_argument("--poses", type = int, default = 200)
+    parser.add_argument("--repeat", type = int, default = 20)
+    args = parser.parse_args()
+    r = run(args.poses, args.repeat)
+    print(f"{r['name']} poses={r['poses']} rebuild={r['rebuild_ms']:.2f} ms add={r['add_ms']:.2f} ms "
+          f"remove={r['remove_ms']:.2f} ms set={r['set_ms']:.2f} ms "
+          f"max_error={r['max_error']:.2e} full_rebuilds={r['full_rebuilds']}")
+
+
+if __name__ == '__main__':
+    main()
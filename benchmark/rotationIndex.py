@@ -0,0 +1,120 @@
+# -*- coding: UTF-8 -*-
+# Author  : AitrusC
+# FileName: rotationIndex
+# Time    : 2024-10-01
+# Contact : 906629272@qq.com
+# Description : 旋转最近邻索引测试: 单次/批量k近邻与半径查询, 与逐个计算全部夹角对比
+#               python -m benchmark.rotationIndex --poses 10000 --frames 100000
+
+import argparse
+import time
+
+import numpy as np
+
+from .solver import randomQuaternions
+
+
+def bruteKnn(poses, queries, k, chunk_size = 1024):
+    """
+    逐个计算全部夹角的k近邻(对比用)
+    :param poses: (N, 4)
+    :param queries: (F, 4)
+    :param k:
+    :param chunk_size: 每次计算的查询数量
+    :return: (索引 (F, k), 夹角 (F, k))
+    """
+    indices = np.empty((len(queries), k), dtype = np.int64)
+    angles = np.empty((len(queries), k))
+    for start in range(0, len(queries), chunk_size):
+        # |q . p|越大夹角越小, 只对前k个计算arccos
+        dots = -np.abs(queries[start:start + chunk_size] @ poses.T)
+        top = np.argpartition(dots, k - 1, axis = 1)[:, :k] if k < dots.shape[1] else np.argsort(dots, axis = 1)
+        order = np.argsort(np.take_along_axis(dots, top, axis = 1), axis = 1)
+        top = np.take_along_axis(top, order, axis = 1)
+        indices[start:start + chunk_size] = top
+        angles[start:start + chunk_size] = 2.0 * np.arccos(np.clip(-np.take_along_axis(dots, top, axis = 1), 0.0, 1.0))
+    return indices, angles
+
+
+def run(poses = 10000, frames = 100000, singles = 1000, k = 4, use_scipy = True):
+    """
+    测试旋转最近邻索引
+    :param poses: pose数量
+    :param frames: 批量查询帧数
+    :param singles: 单次查询次数
+    :param k: 批量k近邻数量
+    :param use_scipy: 是否使用scipy实现
+    :return: 结果字典
+    """
+    from interface.spatial import RotationIndex
+    # pose聚集在若干方向附近, 一半取反(测试q/-q)
+    rng = np.random.default_rng(4)
+    centers = randomQuaternions((64,), 5)
+    pose_q = centers[rng.integers(0, 64, poses)] + rng.normal(scale = 0.05, size = (poses, 4))
+    pose_q /= np.linalg.norm(pose_q, axis = -1, keepdims = True)
+    pose_q[::2] *= -1
+    clip = centers[rng.integers(0, 64, frames)] + rng.normal(scale = 0.08, size = (frames, 4))
+    clip /= np.linalg.norm(clip, axis = -1, keepdims = True)
+
+    start = time.perf_counter()
+    index = RotationIndex(pose_q, use_scipy = use_scipy)
+    index.knn(clip[0])
+    build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    nearest = [index.nearest(q)[0] for q in clip[:singles]]
+    single = (time.perf_counter() - start) / singles
+    start = time.perf_counter()
+    brute_nearest = [int(np.argmax(np.abs(pose_q @ q))) for q in clip[:singles]]
+    single_brute = (time.perf_counter() - start) / singles
+
+    # 单个查询在数量较多时才使用树
+    large = RotationIndex(np.concatenate([pose_q] * 10) + rng.normal(scale = 1e-3, size = (poses * 10, 4)),
+                          use_scipy = use_scipy)
+    large.nearest(clip[0])
+    start = time.perf_counter()
+    large_nearest = [large.nearest(q)[0] for q in clip[:singles]]
+    single_large = (time.perf_counter() - start) / singles
+    start = time.perf_counter()
+    large_brute = [int(np.argmax(np.abs(large.rotations @ q))) for q in clip[:singles]]
+    single_large_brute = (time.perf_counter() - start) / singles
+
+    start = time.perf_counter()
+    indices, angles = index.knn(clip, k)
+    batch = time.perf_counter() - start
+    start = time.perf_counter()
+    brute_indices, brute_angles = bruteKnn(pose_q, clip, k)
+    batch_brute = time.perf_counter() - start
+
+    start = time.perf_counter()
+    within = index.radius(clip[:singles], np.radians(5.0))
+    radius = (time.perf_counter() - start) / singles
+    return {"name": "rotationIndex", "backend": "scipy" if index.use_scipy else "numpy", "poses": poses,
+            "frames": frames, "k": k, "build_ms": build * 1000, "single_us": single * 1e6,
+            "single_brute_us": single_brute * 1e6, "single_match": nearest == brute_nearest,
+            "large_poses": len(large), "single_large_us": single_large * 1e6,
+            "single_large_brute_us": single_large_brute * 1e6, "single_large_match": large_nearest == large_brute,
+            "batch_s": batch, "batch_brute_s": batch_brute,
+            "batch_match": bool(np.allclose(angles, brute_angles, atol = 1e-6)),
+            "radius_us": radius * 1e6, "radius_hits": float(np.mean([len(ids) for ids, _ in within]))}
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "旋转最近邻索引测试")
+    parser.add_argument("--poses", type = int, default = 10000)
+    parser.add_argument("--frames", type = int, default = 100000)
+    parser.add_argument("--k", type = int, default = 4)
+    parser.add_argument("--numpy", action = "store_true", help = "不使用scipy")
+    args = parser.parse_args()
+    r = run(args.poses, args.frames, k = args.k, use_scipy = not args.numpy)
+    print(f"{r['name']} backend={r['backend']} poses={r['poses']} build={r['build_ms']:.1f} ms")
+    print(f"nearest: {r['single_us']:.1f} us (brute {r['single_brute_us']:.1f} us) match={r['single_match']}")
+    print(f"nearest in {r['large_poses']} poses: {r['single_large_us']:.1f} us "
+          f"(brute {r['single_large_brute_us']:.1f} us) match={r['single_large_match']}")
+    print(f"clip knn k={r['k']} frames={r['frames']}: {r['batch_s']:.2f} s (brute {r['batch_brute_s']:.2f} s) "
+          f"match={r['batch_match']}")
+    print(f"radius 5deg: {r['radius_us']:.1f} us/query, {r['radius_hits']:.1f} hits")
+
+
+if __name__ == '__main__':
+    main()
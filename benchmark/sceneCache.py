@@ -0,0 +1,174 @@
+# -*- coding: UTF-8 -*-
+# Author  : AitrusC
+# FileName: sceneCache
+# Time    : 2024-10-03
+# Contact : 906629272@qq.com
+# Description : 场景查询缓存测试(内存场景): 模拟界面选择pose时的查询与穿插的场景修改, 统计命中率与每次选择的耗时,
+#               并在每次修改后检查全部缓存条目与场景一致
+#               python -m benchmark.sceneCache --selections 2000 --overhead 50
+
+import argparse
+import random
+import time
+
+from .builder import buildLibrary
+
+
+def buildScene(poses_per_joint = 10, overhead_us = 50.0):
+    """
+    在内存场景中构建全部骨骼组的驱动系统
+    :param poses_per_joint: 每个骨骼的pose数量
+    :param overhead_us: 构建完成后每次场景调用的开销(微秒)
+    :return: (MemoryScene, [(驱动骨骼, [pose名称, ...]), ...])
+    """
+    from interface.builder import BuildPlanner, specsFromGroups
+    from interface.scene import MemoryScene
+    library = buildLibrary(poses_per_joint)
+    specs = specsFromGroups(["ALL"], library = library)
+    plan = BuildPlanner().plan(specs)
+    scene = MemoryScene(sorted(plan.requires))
+    plan.execute(scene)
+    scene.call_overhead = overhead_us * 1e-6
+    return scene, [(spec.joint, [pose[0] for pose in spec.poses]) for spec in specs]
+
+
+def selectPose(cache, joint, pose):
+    """
+    界面选择pose时的查询: 驱动列表、驱动属性、pose连接的目标及其驱动值、层级
+    :param cache: SceneCache
+    :param joint: 驱动骨骼
+    :param pose: pose名称
+    :return: 查询结果
+    """
+    out = joint + "_poseDriver_out"
+    grp = joint + "_poseDriver_grp"
+    drivers = cache.listNodeType("network")
+    attrs = cache.listAttrs([out])[0]
+    destinations = cache.connectedPlugs([out + "." + pose])[0]
+    # 经过multDoubleLinear缩放的目标再向下查找一层
+    scaled = [plug for plug in destinations if plug.endswith(".input1")]
+    values = cache.getAttrs([plug.rsplit(".", 1)[0] + ".input2" for plug in scaled])
+    targets = cache.connectedPlugs([plug.rsplit(".", 1)[0] + ".output" for plug in scaled])
+    hierarchy = cache.children([grp]), cache.parents([grp, joint])
+    return drivers, attrs, destinations, values, targets, hierarchy
+
+
+def mutate(scene, rng, joints):
+    """
+    随机修改场景: 设置驱动值、重命名/删除/新建节点、断开重连
+    :param scene: MemoryScene
+    :param rng: random.Random
+    :param joints: [(驱动骨骼, [pose名称, ...]), ...]
+    :return:
+    """
+    joint, poses = rng.choice(joints)
+    mdls = [name for name in scene.nodes if name.startswith(joint + "_") and name.endswith("_mdl")]
+    action = rng.randrange(5)
+    if action == 0 and mdls:
+        scene.setAttrs([(rng.choice(mdls) + ".input2", rng.random())])
+    elif action == 1 and mdls:
+        name = rng.choice(mdls)
+        scene.renameNode(name, name[:-4] + "x_mdl")
+    elif action == 2:
+        plug = joint + "_poseDriver_out." + rng.choice(poses)
+        pairs = [(src, dst) for dst, src in scene.connections.items() if src == plug]
+        if pairs:
+            scene.disconnectAttrs(pairs[:1])
+        else:
+            scene.connectAttrs([(plug, joint + "_bs.extra_" + plug.rsplit(".", 1)[1])])
+    elif action == 3:
+        scene.createNodes([("%s_extra%d_grp" % (joint, rng.randrange(1 << 30)), "network",
+                            joint + "_poseDriver_grp")])
+    else:
+        extra = [name for name in scene.nodes if name.startswith(joint + "_extra")]
+        if extra:
+            scene.deleteNodes([rng.choice(extra)])
+
+
+def verify(cache):
+    """
+    检查全部缓存条目与场景一致
+    :param cache: SceneCache
+    :return: 不一致的条目数量
+    """
+    source = cache.source
+    errors = 0
+    for kind, entries in cache._caches.items():
+        keys = list(entries)
+        if keys:
+            fresh = getattr(source, kind)(keys)
+            errors += sum(sorted(entries[key] or ()) != sorted(value or ()) if kind != "parents" and
+                          kind != "nodeTypes" else entries[key] != value for key, value in zip(keys, fresh))
+    for node, values in cache._values.items():
+        plugs = [node + "." + attr for attr in values]
+        errors += sum(values[plug.split(".", 1)[1]] != value for plug, value in zip(plugs, source.getAttrs(plugs)))
+    return errors
+
+
+def run(selections = 2000, mutate_every = 10, overhead_us = 50.0, poses_per_joint = 10, check = True):
+    """
+    测试场景查询缓存
+    :param selections: 选择次数
+    :param mutate_every: 每隔多少次选择修改一次场景
+    :param overhead_us: 每次场景调用开销(微秒)
+    :param poses_per_joint: 每个骨骼的pose数量
+    :param check: 是否检查缓存一致性(不计时, 单独运行一遍)
+    :return: 结果字典
+    """
+    from interface.scene import SceneCache
+    results = {"name": "sceneCache", "selections": selections, "mutate_every": mutate_every,
+               "overhead_us": overhead_us}
+    for mode in ("uncached", "cached"):
+        scene, joints = buildScene(poses_per_joint, overhead_us)
+        cache = SceneCache(scene)
+        rng = random.Random(3)
+        calls = scene.calls
+        elapsed = 0.0
+        for i in range(selections):
+            if i and i % mutate_every == 0:
+                mutate(scene, rng, joints)
+            joint, poses = rng.choice(joints)
+            if mode == "uncached":
+                cache.clear()
+            start = time.perf_counter()
+            selectPose(cache, joint, rng.choice(poses))
+            elapsed += time.perf_counter() - start
+        results[mode + "_us"] = elapsed / selections * 1e6
+        results[mode + "_calls"] = cache.calls
+        if mode == "cached":
+            results.update(hit_rate = cache.hitRate, invalidations = cache.invalidations,
+                           scene_calls = scene.calls - calls)
+
+    if check:
+        scene, joints = buildScene(poses_per_joint, 0.0)
+        cache = SceneCache(scene)
+        rng = random.Random(3)
+        errors = 0
+        for i in range(min(selections, 500)):
+            if i and i % mutate_every == 0:
+                mutate(scene, rng, joints)
+                errors += verify(cache)
+            joint, poses = rng.choice(joints)
+            selectPose(cache, joint, rng.choice(poses))
+        results["stale_entries"] = errors
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "场景查询缓存测试")
+    parser.add_argument("--selections", type = int, default = 2000)
+    parser.add_argument("--mutate-every", type = int, default = 10)
+    parser.add_argument("--overhead", type = float, default = 50.0, help = "每次场景调用开销(微秒)")
+    parser.add_argument("--poses", type = int, default = 10)
+    args = parser.parse_args()
+    r = run(args.selections, args.mutate_every, args.overhead, args.poses)
+    print(f"{r['name']} selections={r['selections']} mutate every {r['mutate_every']} "
+          f"overhead={r['overhead_us']:.0f} us")
+    print(f"uncached: {r['uncached_us']:.1f} us/selection, {r['uncached_calls']} calls")
+    print(f"cached:   {r['cached_us']:.1f} us/selection, {r['cached_calls']} calls, "
+          f"hit rate {r['hit_rate']:.1%}, {r['invalidations']} invalidations")
+    print(f"stale entries after mutations: {r.get('stale_entries', '-')}")
+
+
+if __name__ == '__main__':
+    main()
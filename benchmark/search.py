@@ -0,0 +1,90 @@
+# -*- coding: UTF-8 -*-
+# Author  : AitrusC
+# FileName: search
+# Time    : 2024-09-21
+# Contact : 906629272@qq.com
+# Description : 搜索索引逐键输入耗时测试
+#               python -m benchmark.search --entries 50000
+
+import argparse
+import random
+import time
+
+from . import currentRss
+
+
+_SIDES = ("L", "R", "C")
+_PARTS = ("shoulder", "elbow", "wrist", "hip", "knee", "ankle", "thumb", "index", "middle",
+          "ring", "pinky", "neck", "jaw", "brow", "cheek")
+_QUERIES = ("L_elbow", "upfront", "wristcor", "lej", "bs_kneeCor", "pinky12")
+
+
+def buildIndex(entries = 50000, seed = 0):
+    """
+    生成测试索引(每个骨骼12个pose, 每3个pose一个驱动目标)
+    :param entries: 条目数量(近似)
+    :param seed: 随机种子
+    :return: SearchIndex
+    """
+    from interface.search import SearchIndex
+    rng = random.Random(seed)
+    index = SearchIndex()
+    joint = 0
+    while len(index) < entries:
+        joint_name = f"{rng.choice(_SIDES)}_{rng.choice(_PARTS)}{joint}_jnt"
+        index.addJoint(joint_name)
+        for p in range(12):
+            pose_name = f"{joint_name}_poseUpFront{p}"
+            index.addPose(joint_name, pose_name)
+            if p % 3 == 0:
+                index.addTarget(joint_name, pose_name, f"bs_{rng.choice(_PARTS)}Corrective{joint}_{p}")
+        joint += 1
+    return index
+
+
+def run(entries = 50000, limit = 200):
+    """
+    模拟逐键输入, 统计每次搜索耗时
+    :param entries: 条目数量
+    :param limit: 每次搜索返回数量
+    :return: 结果字典
+    """
+    rss = currentRss()
+    start = time.perf_counter()
+    index = buildIndex(entries)
+    index.search("x")
+    build = time.perf_counter() - start
+    timings = []
+    for query in _QUERIES:
+        for n in range(1, len(query) + 1):
+            start = time.perf_counter()
+            index.search(query[:n], limit = limit)
+            timings.append(time.perf_counter() - start)
+    # 增量更新: 添加并删除一个pose后再次搜索
+    start = time.perf_counter()
+    index.addPose("L_elbow0_jnt", "L_elbow0_newPose")
+    index.search("newpose", limit = limit)
+    index.removePose("L_elbow0_jnt", "L_elbow0_newPose")
+    incremental = time.perf_counter() - start
+    timings.sort()
+    return {"name": "SearchIndex", "entries": len(index), "build_s": build,
+            "keystroke_mean_ms": sum(timings) / len(timings) * 1000,
+            "keystroke_p95_ms": timings[int(len(timings) * 0.95)] * 1000,
+            "keystroke_max_ms": timings[-1] * 1000,
+            "incremental_ms": incremental * 1000,
+            "rss_mb": (currentRss() - rss) / 1048576.0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "搜索索引逐键输入测试")
+    parser.add_argument("--entries", type = int, default = 50000)
+    parser.add_argument("--limit", type = int, default = 200)
+    args = parser.parse_args()
+    r = run(args.entries, args.limit)
+    print(f"{r['name']} entries={r['entries']} build={r['build_s'] * 1000:.0f} ms rss=+{r['rss_mb']:.1f} MB")
+    print(f"keystroke mean={r['keystroke_mean_ms']:.2f} ms p95={r['keystroke_p95_ms']:.2f} ms "
+          f"max={r['keystroke_max_ms']:.2f} ms incremental={r['incremental_ms']:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
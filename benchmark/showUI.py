@@ -0,0 +1,86 @@
+# -*- coding: UTF-8 -*-
+# Author  : AitrusC
+# FileName: showUI
+# Time    : 2024-09-29
+# Contact : 906629272@qq.com
+# Description : 窗口复用测试: 首次showUI、关闭后再次showUI、数据库变化后的增量同步与整体重置对比
+#               python -m benchmark.showUI --poses 10000 --runs 20
+
+import argparse
+import statistics
+import time
+
+from . import qtApplication
+from .poseLibrary import buildLibrary
+
+
+def run(poses = 10000, runs = 20):
+    """
+    测试showUI复用窗口与增量绑定
+    :param poses: pose数量
+    :param runs: 关闭/再次显示的次数
+    :return: 结果字典
+    """
+    app = qtApplication()
+    from gui.ui import showUI, teardownUI
+    library = buildLibrary(poses)
+
+    start = time.perf_counter()
+    window = showUI(library)
+    app.processEvents()
+    first = time.perf_counter() - start
+    view = window.body_widget.left_widget.joint_pose_list
+    model = view.model()
+    view.expand(model.index(0, 0))
+    app.processEvents()
+    view.verticalScrollBar().setValue(view.verticalScrollBar().maximum() // 2)
+    scroll = view.verticalScrollBar().value()
+
+    reopen = []
+    same = True
+    for _ in range(runs):
+        window.close()
+        app.processEvents()
+        start = time.perf_counter()
+        same &= showUI(library) is window
+        app.processEvents()
+        reopen.append(time.perf_counter() - start)
+    kept = view.verticalScrollBar().value() == scroll and view.isExpanded(model.index(0, 0))
+
+    # 修改一个骨骼的pose后增量同步
+    library.renamePose(library.poseSlice(0).start, "renamed")
+    start = time.perf_counter()
+    changed = window.bindLibrary(library)
+    app.processEvents()
+    sync = time.perf_counter() - start
+    kept &= view.verticalScrollBar().value() == scroll and view.isExpanded(model.index(0, 0))
+
+    start = time.perf_counter()
+    model.setLibrary(library)
+    app.processEvents()
+    reset = time.perf_counter() - start
+
+    start = time.perf_counter()
+    teardownUI()
+    app.processEvents()
+    teardown = time.perf_counter() - start
+    return {"name": "showUI", "poses": poses, "first_ms": first * 1000,
+            "reopen_ms": statistics.median(reopen) * 1000, "same_window": same, "state_kept": kept,
+            "changed_joints": changed, "sync_ms": sync * 1000, "reset_ms": reset * 1000,
+            "teardown_ms": teardown * 1000}
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "窗口复用测试")
+    parser.add_argument("--poses", type = int, default = 10000)
+    parser.add_argument("--runs", type = int, default = 20)
+    args = parser.parse_args()
+    r = run(args.poses, args.runs)
+    print(f"{r['name']} poses={r['poses']} first={r['first_ms']:.1f} ms reopen={r['reopen_ms']:.2f} ms "
+          f"same_window={r['same_window']} state_kept={r['state_kept']}")
+    print(f"sync one joint={r['sync_ms']:.1f} ms ({r['changed_joints']} changed) full reset={r['reset_ms']:.1f} ms "
+          f"teardown={r['teardown_ms']:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
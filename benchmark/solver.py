@@ -0,0 +1,87 @@
+# -*- coding: UTF-8 -*-
+# Author  : AitrusC
+# FileName: solver
+# Time    : 2024-09-22
+# Contact : 906629272@qq.com
+# Description : pose求解器吞吐量测试(帧/秒)
+#               python -m benchmark.solver --poses 500 --frames 100000
+
+import argparse
+import time
+
+import numpy as np
+
+
+def randomQuaternions(shape, seed = 0):
+    """
+    生成均匀分布的随机单位四元数
+    :param shape: 前置形状
+    :param seed: 随机种子
+    :return: shape + (4,)
+    """
+    rng = np.random.default_rng(seed)
+    q = rng.normal(size = tuple(shape) + (4,))
+    return q / np.linalg.norm(q, axis = -1, keepdims = True)
+
+
+def checkInterpolation(pose_counts = (1, 2, 3, 50)):
+    """
+    检查RBF求解器在pose处的输出(输出pose权重时第i个pose处应为单位向量), 包含只有一个pose的情况
+    :param pose_counts: pose数量
+    :return: {"核函数 pose数量": 最大误差}
+    """
+    from interface import solver
+    errors = {}
+    for count in pose_counts:
+        pose_q = randomQuaternions((count, 1), 4)
+        for kernel in (solver.GAUSSIAN, solver.THIN_PLATE):
+            weights = solver.RBFSolver(pose_q, kernel = kernel).evaluate(pose_q)
+            errors["%s %d" % (kernel, count)] = float(np.abs(weights - np.eye(count)).max())
+    return errors
+
+
+def run(poses = 500, frames = 100000, drivers = 1):
+    """
+    测试各求解器的吞吐量
+    :param poses: pose数量
+    :param frames: 帧数
+    :param drivers: 驱动骨骼数量
+    :return: [结果字典, ...]
+    """
+    from interface import solver
+    pose_q = randomQuaternions((poses, drivers), 1)
+    frame_q = randomQuaternions((frames, drivers), 2)
+    cases = (
+        ("RBF gaussian", lambda: solver.RBFSolver(pose_q, kernel = solver.GAUSSIAN)),
+        ("RBF thinPlate", lambda: solver.RBFSolver(pose_q, kernel = solver.THIN_PLATE)),
+        ("VectorAngleReader", lambda: solver.VectorAngleReader(pose_q)),
+        ("ConeReader", lambda: solver.ConeReader(pose_q, twist_range = np.pi * 0.5)),
+    )
+    results = []
+    for name, create in cases:
+        start = time.perf_counter()
+        s = create()
+        setup = time.perf_counter() - start
+        start = time.perf_counter()
+        s.evaluate(frame_q, dtype = np.float32)
+        elapsed = time.perf_counter() - start
+        results.append({"name": name, "poses": poses, "frames": frames, "drivers": drivers,
+                        "setup_ms": setup * 1000, "evaluate_s": elapsed, "fps": frames / elapsed})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "pose求解器吞吐量测试")
+    parser.add_argument("--poses", type = int, default = 500)
+    parser.add_argument("--frames", type = int, default = 100000)
+    parser.add_argument("--drivers", type = int, default = 1)
+    args = parser.parse_args()
+    for r in run(args.poses, args.frames, args.drivers):
+        print(f"{r['name']:<18} poses={r['poses']} frames={r['frames']} drivers={r['drivers']} "
+              f"setup={r['setup_ms']:.1f} ms evaluate={r['evaluate_s']:.2f} s fps={r['fps']:,.0f}")
+    errors = checkInterpolation()
+    print("interpolation max error: " + ", ".join(f"{name}={error:.1e}" for name, error in errors.items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+# -*- coding: UTF-8 -*-
+# Author  : AitrusC
+# FileName: startup
+# Time    : 2024-09-29
+# Contact : 906629272@qq.com
+# Description : 冷启动耗时测试, 按阶段统计(导入、样式表、控件构建、首次绘制)
+#               每次在新的子进程中运行; 默认先导入PySide2(与Maya中相同), 只统计工具自身的导入
+#               python -m benchmark.startup --runs 5 [--cold-qt]
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 在子进程中执行的测量脚本
+_PROBE = r"""
+import json, os, sys, time
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, %(root)r)
+phases = {}
+start = time.perf_counter()
+from PySide2.QtCore import QEvent, QObject
+from PySide2.QtWidgets import QApplication
+app = QApplication.instance() or QApplication([])
+phases["qt"] = time.perf_counter() - start
+
+start = time.perf_counter()
+from gui.ui import MainWindow
+from gui.widget import widgetT
+phases["import"] = time.perf_counter() - start
+
+start = time.perf_counter()
+widgetT.loadStyleSheet()
+phases["style"] = time.perf_counter() - start
+
+start = time.perf_counter()
+window = MainWindow()
+phases["build"] = time.perf_counter() - start
+
+
+class PaintWatcher(QObject):
+    painted = False
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint:
+            PaintWatcher.painted = True
+        return False
+
+
+watcher = PaintWatcher()
+window.installEventFilter(watcher)
+start = time.perf_counter()
+window.show()
+while not PaintWatcher.painted and time.perf_counter() - start < 5.0:
+    app.processEvents()
+phases["first_paint"] = time.perf_counter() - start
+
+start = time.perf_counter()
+second = MainWindow()
+phases["second_build"] = time.perf_counter() - start
+print(json.dumps(phases))
+"""
+
+
+def runOnce(cold_qt = False):
+    """
+    在子进程中测量一次冷启动
+    :param cold_qt: 是否把PySide2的导入也算进import阶段
+    :return: {阶段: 秒}
+    """
+    probe = _PROBE % {"root": _ROOT}
+    if cold_qt:
+        probe = probe.replace('phases["qt"] = time.perf_counter() - start\n\nstart = time.perf_counter()\n', "")
+    output = subprocess.run([sys.executable, "-c", probe], stdout = subprocess.PIPE, stderr = subprocess.DEVNULL,
+                            check = True, universal_newlines = True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run(runs = 5, cold_qt = False):
+    """
+    多次测量, 取每个阶段的中位数
+    :param runs: 次数
+    :param cold_qt: 是否把PySide2的导入也算进import阶段
+    :return: {"name": ..., 阶段_ms: 毫秒}
+    """
+    samples = [runOnce(cold_qt) for _ in range(runs)]
+    result = {"name": "startup", "runs": runs}
+    for phase in samples[0]:
+        values = sorted(sample[phase] for sample in samples)
+        result[phase + "_ms"] = values[len(values) // 2] * 1000
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "冷启动耗时测试")
+    parser.add_argument("--runs", type = int, default = 5)
+    parser.add_argument("--cold-qt", action = "store_true", help = "PySide2的导入也计入import阶段")
+    args = parser.parse_args()
+    r = run(args.runs, args.cold_qt)
+    phases = [key for key in r if key.endswith("_ms")]
+    print(f"{r['name']} runs={r['runs']} (median) " +
+          " ".join(f"{key[:-3]}={r[key]:.1f} ms" for key in phases))
+
+
+if __name__ == '__main__':
+    main()
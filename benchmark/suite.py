@@ -0,0 +1,263 @@
+# -*- coding: UTF-8 -*-
+# Author  : AitrusC
+# FileName: suite
+# Time    : 2024-10-06
+# Contact : 906629272@qq.com
+# Description : 无界面(offscreen)测试集: pose列表构建(多个数量)、搜索逐键延迟、RoundButton/IconButton绘制、求解器吞吐量、
+#               构建计划在FakeScene上的执行、折叠控件展开/折叠; 结果保存为JSON基准, compare对比基准并在超过阈值时返回非0
+#               python -m benchmark.suite run --output baseline.json
+#               python -m benchmark.suite compare baseline.json [current.json] --threshold 0.15
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import sys
+
+from . import qtApplication
+
+# 越大越好的指标(后缀), 其余指标越小越好
+_HIGHER_IS_BETTER = ("fps",)
+
+# 文件格式版本
+FORMAT_VERSION = 1
+
+
+def _poseList(sizes, legacy_limit):
+    """
+    :param sizes: pose数量
+    :param legacy_limit: JPlistWidget只测试不超过该数量的情况(逐控件构建很慢)
+    :return: {指标: 值}
+    """
+    from .poseList import runLegacy, runTreeView
+    metrics = {}
+    for size in sizes:
+        r = runTreeView(size)
+        metrics["treeView.%d.build_ms" % size] = r["build_s"] * 1000
+        metrics["treeView.%d.show_ms" % size] = r["show_s"] * 1000
+        if size <= legacy_limit:
+            r = runLegacy(size)
+            metrics["listWidget.%d.build_ms" % size] = r["build_s"] * 1000
+            metrics["listWidget.%d.show_ms" % size] = r["show_s"] * 1000
+    return metrics
+
+
+def _search(entries):
+    from .search import run
+    r = run(entries)
+    return {"keystroke_mean_ms": r["keystroke_mean_ms"], "keystroke_p95_ms": r["keystroke_p95_ms"],
+            "incremental_ms": r["incremental_ms"], "build_ms": r["build_s"] * 1000}
+
+
+def _paint(frames, repeats):
+    from .paint import run
+    r = run(frames, repeats)
+    return {"button_us": r["cached_us"], "drag_ms": r["drag_ms"]}
+
+
+def _solver(poses, frames):
+    from .solver import run
+    return {r["name"].replace(" ", "_") + ".fps": r["fps"] for r in run(poses, frames)}
+
+
+def _builder(poses_per_joint):
+    from .builder import run, runIncremental
+    r = run(poses_per_joint, 0.0)
+    incremental = runIncremental(poses_per_joint, 0.0)
+    return {"plan_ms": r["plan_ms"], "execute_ms": r["batch_ms"], "tweak_ms": incremental["tweak_ms"]}
+
+
+def _collapse(boxes):
+    from .collapse import run
+    r = run(boxes)
+    return {"expand_cpu_ms": r["shared_expand_cpu_ms"], "collapse_cpu_ms": r["shared_collapse_cpu_ms"],
+            "expand_all_ms": r["expand_all_ms"], "collapse_all_ms": r["collapse_all_ms"]}
+
+
+def cases(quick = False):
+    """
+    测试用例
+    :param quick: 是否使用较小的数据量(快速检查, 与完整基准不可比较)
+    :return: {名称: 无参函数(返回{指标: 值})}
+    """
+    if quick:
+        return {"poseList": lambda: _poseList((500, 2000), 500),
+                "search": lambda: _search(10000),
+                "paint": lambda: _paint(30, 500),
+                "solver": lambda: _solver(200, 20000),
+                "builder": lambda: _builder(5),
+                "collapse": lambda: _collapse(20)}
+    return {"poseList": lambda: _poseList((1000, 10000, 50000), 1000),
+            "search": lambda: _search(50000),
+            "paint": lambda: _paint(120, 2000),
+            "solver": lambda: _solver(500, 100000),
+            "builder": lambda: _builder(20),
+            "collapse": lambda: _collapse(100)}
+
+
+def higherIsBetter(metric):
+    """
+    :param metric: 指标名称
+    :return: 是否越大越好
+    """
+    return metric.rsplit(".", 1)[-1].endswith(_HIGHER_IS_BETTER)
+
+
+def environment():
+    """
+    运行环境(对比时提示基准与当前环境不同)
+    :return: dict
+    """
+    try:
+        import PySide2
+        qt = PySide2.__version__
+    except ImportError:
+        qt = None
+    import numpy
+    return {"python": platform.python_version(), "platform": platform.platform(), "machine": platform.machine(),
+            "cpus": os.cpu_count(), "numpy": numpy.__version__, "pyside2": qt}
+
+
+def run(only = None, repeat = 3, quick = False, progress = None):
+    """
+    运行测试集, 每个用例重复repeat次取中位数
+    :param only: 只运行的用例名称, 默认为全部
+    :param repeat: 重复次数
+    :param quick: 是否使用较小的数据量
+    :param progress: 进度回调 progress(用例名称, 第几次)
+    :return: {"version", "created", "quick", "repeat", "environment", "metrics": {"用例.指标": 值}}
+    """
+    qtApplication()
+    selected = cases(quick)
+    if only:
+        unknown = set(only) - set(selected)
+        if unknown:
+            raise ValueError("unknown benchmark case: %s" % ", ".join(sorted(unknown)))
+        selected = {name: selected[name] for name in only}
+    samples = {}
+    for name, case in selected.items():
+        for i in range(repeat):
+            if progress:
+                progress(name, i)
+            for metric, value in case().items():
+                samples.setdefault(name + "." + metric, []).append(float(value))
+    return {"version": FORMAT_VERSION, "created": datetime.datetime.now().isoformat(timespec = "seconds"),
+            "quick": quick, "repeat": repeat, "environment": environment(),
+            "metrics": {metric: statistics.median(values) for metric, values in samples.items()}}
+
+
+def save(result, path):
+    """
+    保存结果
+    :param result: run的返回值
+    :param path: JSON路径
+    :return:
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding = "utf-8") as f:
+        json.dump(result, f, indent = 2, sort_keys = True)
+    os.replace(tmp_path, path)
+
+
+def load(path):
+    """
+    读取结果
+    :param path: JSON路径
+    :return: run的返回值
+    """
+    with open(path, encoding = "utf-8") as f:
+        result = json.load(f)
+    if result.get("version") != FORMAT_VERSION:
+        raise ValueError("unsupported benchmark file version: %s" % result.get("version"))
+    return result
+
+
+def compare(baseline, current, threshold = 0.15):
+    """
+    对比两次结果
+    :param baseline: 基准(run的返回值)
+    :param current: 当前结果
+    :param threshold: 变差超过该比例时视为退化
+    :return: [(指标, 基准值, 当前值, 变化比例(正数为变差), 状态), ...], 状态为regression/improved/ok/new/missing
+    """
+    base_metrics, current_metrics = baseline["metrics"], current["metrics"]
+    rows = []
+    for metric in sorted(set(base_metrics) | set(current_metrics)):
+        base, value = base_metrics.get(metric), current_metrics.get(metric)
+        if base is None or value is None:
+            rows.append((metric, base, value, None, "new" if base is None else "missing"))
+            continue
+        if base == 0:
+            change = 0.0 if value == 0 else float("inf")
+        elif higherIsBetter(metric):
+            change = base / value - 1.0 if value else float("inf")
+        else:
+            change = value / base - 1.0
+        status = "regression" if change > threshold else "improved" if change < -threshold else "ok"
+        rows.append((metric, base, value, change, status))
+    return rows
+
+
+def _printRows(rows):
+    for metric, base, value, change, status in rows:
+        base_text = "-" if base is None else "%.4g" % base
+        value_text = "-" if value is None else "%.4g" % value
+        change_text = "" if change is None else "%+.1f%%" % (change * 100)
+        print(f"  {metric:<44} {base_text:>12} {value_text:>12} {change_text:>9}  {status}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "无界面性能测试集")
+    commands = parser.add_subparsers(dest = "command")
+    run_parser = commands.add_parser("run", help = "运行并保存结果")
+    run_parser.add_argument("--output", default = None, help = "结果JSON路径(作为基准保存)")
+    compare_parser = commands.add_parser("compare", help = "与基准对比, 有退化时返回1")
+    compare_parser.add_argument("baseline", help = "基准JSON路径")
+    compare_parser.add_argument("current", nargs = "?", default = None, help = "当前结果JSON路径, 默认为重新运行")
+    compare_parser.add_argument("--threshold", type = float, default = 0.15, help = "退化阈值(比例)")
+    compare_parser.add_argument("--output", default = None, help = "保存重新运行的结果")
+    for sub in (run_parser, compare_parser):
+        sub.add_argument("--only", nargs = "+", default = None, choices = sorted(cases()), help = "只运行的用例")
+        sub.add_argument("--repeat", type = int, default = 3)
+        sub.add_argument("--quick", action = "store_true", help = "使用较小的数据量")
+    args = parser.parse_args()
+    if args.command is None:
+        parser.print_help()
+        return 2
+
+    def progress(name, i):
+        print(f"running {name} ({i + 1}/{args.repeat})", file = sys.stderr)
+
+    if args.command == "compare" and args.current:
+        current = load(args.current)
+    else:
+        baseline = load(args.baseline) if args.command == "compare" else None
+        quick = baseline["quick"] if baseline and not args.quick else args.quick
+        current = run(args.only, args.repeat, quick, progress)
+        if args.output:
+            save(current, args.output)
+    if args.command == "run":
+        print(f"suite repeat={current['repeat']} quick={current['quick']}")
+        for metric, value in current["metrics"].items():
+            print(f"  {metric:<44} {value:>12.4g}")
+        return 0
+
+    baseline = load(args.baseline)
+    if baseline["quick"] != current["quick"]:
+        print("warning: baseline and current results use different data sizes (--quick)")
+    if baseline["environment"] != current["environment"]:
+        print(f"warning: environment differs from baseline ({baseline['created']})")
+    rows = compare(baseline, current, args.threshold)
+    if args.only:
+        rows = [row for row in rows if row[0].split(".", 1)[0] in args.only]
+    print(f"{'metric':<46} {'baseline':>12} {'current':>12} {'change':>9}  threshold {args.threshold:.0%}")
+    _printRows(rows)
+    regressions = [row for row in rows if row[4] == "regression"]
+    print(f"{len(regressions)} regression(s), {sum(row[4] == 'improved' for row in rows)} improved")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,74 @@
+# -*- coding: UTF-8 -*-
+# Author  : AitrusC
+# FileName: swingTwist
+# Time    : 2024-09-23
+# Contact : 906629272@qq.com
+# Description : 整段动画摆动/扭转分解耗时测试
+#               python -m benchmark.swingTwist --frames 10000 --joints 100
+
+import argparse
+import math
+import time
+
+from .solver import randomQuaternions
+
+
+def _decomposeLoop(q, axis):
+    """
+    逐帧逐骨骼的纯Python分解(对照组)
+    :param q: (F, J, 4)
+    :param axis: 扭转轴
+    :return:
+    """
+    from interface.rotation import planeBasis
+    b, c = planeBasis(axis)
+    ax, b, c = [float(v) for v in axis], [float(v) for v in b], [float(v) for v in c]
+    out = []
+    for frame in q.tolist():
+        row = []
+        for x, y, z, w in frame:
+            p = x * ax[0] + y * ax[1] + z * ax[2]
+            vb = x * b[0] + y * b[1] + z * b[2]
+            vc = x * c[0] + y * c[1] + z * c[2]
+            n = math.sqrt(p * p + w * w)
+            sb, sc = (w * vb - p * vc) / n, (w * vc + p * vb) / n
+            s = math.sqrt(sb * sb + sc * sc)
+            k = 2.0 * math.atan2(s, n) / s if s > 1e-12 else 2.0
+            row.append((sb * k, sc * k, 2.0 * math.atan2(p, w)))
+        out.append(row)
+    return out
+
+
+def run(frames = 10000, joints = 100, loop_frames = 500):
+    """
+    测试批量分解与逐个分解的耗时
+    :param frames: 帧数
+    :param joints: 骨骼数量
+    :param loop_frames: 对照组实际计算的帧数(结果按比例换算)
+    :return: 结果字典
+    """
+    from interface.rotation import X_AXIS, decomposeSwingTwist
+    q = randomQuaternions((frames, joints), 3)
+    start = time.perf_counter()
+    decomposeSwingTwist(q, X_AXIS)
+    vectorized = time.perf_counter() - start
+    loop_frames = min(loop_frames, frames)
+    start = time.perf_counter()
+    _decomposeLoop(q[:loop_frames], X_AXIS)
+    loop = (time.perf_counter() - start) * frames / loop_frames
+    return {"name": "decomposeSwingTwist", "frames": frames, "joints": joints,
+            "vectorized_s": vectorized, "loop_s": loop, "speedup": loop / vectorized}
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "摆动/扭转分解测试")
+    parser.add_argument("--frames", type = int, default = 10000)
+    parser.add_argument("--joints", type = int, default = 100)
+    args = parser.parse_args()
+    r = run(args.frames, args.joints)
+    print(f"{r['name']} frames={r['frames']} joints={r['joints']} vectorized={r['vectorized_s'] * 1000:.1f} ms "
+          f"python loop={r['loop_s'] * 1000:.0f} ms (x{r['speedup']:.0f})")
+
+
+if __name__ == '__main__':
+    main()
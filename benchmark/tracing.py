@@ -0,0 +1,180 @@
+# -*- coding: UTF-8 -*-
+# Author  : AitrusC
+# FileName: tracing
+# Time    : 2024-10-05
+# Contact : 906629272@qq.com
+# Description : 追踪开销与导出测试: 未启用/启用时span与traced的单次开销, 界面构建+搜索+求解+场景构建的完整trace导出,
+#               以及界面线程阻塞时卡顿检测记录的调用栈
+#               python -m benchmark.tracing --calls 200000 --stall 300 [--output trace.json]
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+
+def _noop():
+    return None
+
+
+def measureOverhead(calls = 200000):
+    """
+    测量单次调用的额外开销
+    :param calls: 调用次数
+    :return: {"bare_ns", "traced_off_ns", "span_off_ns", "traced_on_ns", "span_on_ns"}
+    """
+    from interface import tracing
+    recorder = tracing.tracer
+    wrapped = tracing.traced("noop", "benchmark")(_noop)
+
+    def timeLoop(body):
+        start = time.perf_counter()
+        body()
+        return (time.perf_counter() - start) / calls * 1e9
+
+    def bare():
+        for _ in range(calls):
+            _noop()
+
+    def decorated():
+        for _ in range(calls):
+            wrapped()
+
+    def spans():
+        for _ in range(calls):
+            with tracing.span("noop", "benchmark"):
+                _noop()
+
+    was_enabled = recorder.enabled
+    recorder.disable()
+    result = {"bare_ns": timeLoop(bare), "traced_off_ns": timeLoop(decorated), "span_off_ns": timeLoop(spans)}
+    recorder.enable(clear = True)
+    result["traced_on_ns"] = timeLoop(decorated)
+    result["span_on_ns"] = timeLoop(spans)
+    recorder.clear()
+    if not was_enabled:
+        recorder.disable()
+    return result
+
+
+def traceSession(output):
+    """
+    启用追踪后构建主界面、逐键搜索、求解与场景构建, 导出Chrome trace
+    :param output: 导出路径
+    :return: {"events", "spans": 汇总, "categories": [...]}
+    """
+    from PySide2.QtWidgets import QApplication
+
+    from gui.ui import MainWindow
+    from gui.widget.widgetT import JPlistWidget
+    from interface import tracing
+    from interface import solver
+    from interface.builder import BuildPlanner, FakeScene, specsFromGroups
+    from . import qtApplication
+    from .builder import buildLibrary
+    from .search import buildIndex
+    from .solver import randomQuaternions
+
+    app = qtApplication()
+    tracing.enable(clear = True)
+    try:
+        window = MainWindow()
+        window.show()
+        for _ in range(5):
+            app.processEvents()
+        pose_list = JPlistWidget()
+        index = buildIndex(5000)
+        for n in range(1, len("L_elbow") + 1):
+            index.search("L_elbow"[:n])
+        solver.RBFSolver(randomQuaternions((50, 1), 1)).evaluate(randomQuaternions((2000, 1), 2))
+        specs = specsFromGroups(["ALL"], library = buildLibrary(5))
+        plan = BuildPlanner().plan(specs)
+        plan.execute(FakeScene(plan.requires))
+        tracing.counter("benchmark.sessions")
+        pose_list.deleteLater()
+        window.close()
+        QApplication.processEvents()
+    finally:
+        tracing.disable()
+    events = tracing.exportChrome(output)
+    with open(output, encoding = "utf-8") as f:
+        data = json.load(f)
+    return {"events": events, "spans": tracing.tracer.summary(),
+            "categories": sorted({event["cat"] for event in data["traceEvents"] if "cat" in event})}
+
+
+def detectStall(stall_ms = 300.0, threshold_ms = 100.0):
+    """
+    在事件循环中阻塞界面线程, 检查卡顿检测记录的时长与调用栈
+    :param stall_ms: 阻塞时长(毫秒)
+    :param threshold_ms: 卡顿阈值(毫秒)
+    :return: {"stalls", "stall_ms", "stack_has_block", "trace_stalls"}
+    """
+    from PySide2.QtCore import QTimer
+
+    from gui import ui
+    from interface import tracing
+    from . import qtApplication
+
+    app = qtApplication()
+    tracing.enable(clear = True)
+    watchdog = ui.startStallWatchdog(threshold_ms)
+    try:
+        def blockGuiThread():
+            time.sleep(stall_ms / 1000.0)
+
+        QTimer.singleShot(int(threshold_ms), blockGuiThread)
+        end = time.perf_counter() + (stall_ms + threshold_ms * 4) / 1000.0
+        while time.perf_counter() < end:
+            app.processEvents()
+            time.sleep(0.002)
+        stalls = list(watchdog.stalls)
+    finally:
+        ui.stopStallWatchdog()
+        tracing.disable()
+    longest = max(stalls, key = lambda stall: stall["ms"]) if stalls else None
+    return {"stalls": len(stalls), "stall_ms": longest["ms"] if longest else 0.0,
+            "stack_has_block": bool(longest) and any("blockGuiThread" in line for line in longest["stack"]),
+            "trace_stalls": sum(1 for event in tracing.tracer.events() if event[1] == "stall")}
+
+
+def run(calls = 200000, stall_ms = 300.0, output = None):
+    """
+    测试追踪
+    :param calls: 开销测试的调用次数
+    :param stall_ms: 模拟卡顿时长(毫秒)
+    :param output: trace导出路径, 默认为临时文件
+    :return: 结果字典
+    """
+    result = {"name": "tracing", "calls": calls}
+    result.update(measureOverhead(calls))
+    if output is None:
+        output = os.path.join(tempfile.mkdtemp(prefix = "poseTrace"), "trace.json")
+    result["output"] = output
+    result.update(traceSession(output))
+    result.update(detectStall(stall_ms))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "追踪开销与导出测试")
+    parser.add_argument("--calls", type = int, default = 200000)
+    parser.add_argument("--stall", type = float, default = 300.0, help = "模拟卡顿时长(毫秒)")
+    parser.add_argument("--output", default = None, help = "trace导出路径")
+    args = parser.parse_args()
+    r = run(args.calls, args.stall, args.output)
+    print(f"{r['name']} calls={r['calls']}")
+    print(f"  bare {r['bare_ns']:.0f} ns, disabled: traced +{r['traced_off_ns'] - r['bare_ns']:.0f} ns, "
+          f"span +{r['span_off_ns'] - r['bare_ns']:.0f} ns")
+    print(f"  enabled: traced +{r['traced_on_ns'] - r['bare_ns']:.0f} ns, "
+          f"span +{r['span_on_ns'] - r['bare_ns']:.0f} ns")
+    print(f"  trace {r['output']}: {r['events']} events, categories {', '.join(r['categories'])}")
+    for name, stat in list(r["spans"].items())[:8]:
+        print(f"    {name:<36} x{stat['count']:<5} total {stat['total_ms']:.1f} ms max {stat['max_ms']:.1f} ms")
+    print(f"  stall: {r['stalls']} detected, {r['stall_ms']:.0f} ms, stack has block={r['stack_has_block']}, "
+          f"in trace={r['trace_stalls']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+# -*- coding: UTF-8 -*-
+# Author  : AitrusC
+# FileName: undo
+# Time    : 2024-10-04
+# Contact : 906629272@qq.com
+# Description : 撤销栈测试: 不同数据库大小下的随机编辑(添加/删除/移动/重命名/拖拽旋转/修改驱动值),
+#               撤销/重做耗时、栈内存与快照方式对比, 全部撤销后与原数据库一致
+#               python -m benchmark.undo --sizes 1000 10000 100000 --edits 500
+
+import argparse
+import random
+import time
+
+import numpy as np
+
+from .poseLibrary import buildLibrary
+
+
+def snapshot(library):
+    """
+    数据库数组的副本(对比用)
+    :param library: PoseLibrary
+    :return: {名称: 数组}
+    """
+    return {name: np.array(array) for name, array in library.arrays().items() if not name.startswith("string")}
+
+
+def sameState(library, state):
+    """
+    数据库是否与快照一致(名称按字符串比较, 字符串表只会增加)
+    :param library: PoseLibrary
+    :param state: (快照, pose名称列表)
+    :return: bool
+    """
+    arrays, names = state
+    current = snapshot(library)
+    return (all(np.array_equal(current[name], arrays[name]) for name in arrays if name != "pose_names")
+            and [library.poseName(p) for p in range(library.poseCount)] == names)
+
+
+def randomEdits(stack, edits, drag_steps = 30, seed = 7):
+    """
+    随机编辑
+    :param stack: UndoStack
+    :param edits: 编辑次数(一次拖拽算一次)
+    :param drag_steps: 每次拖拽的修改次数
+    :param seed:
+    :return:
+    """
+    rng = random.Random(seed)
+    library = stack.library
+    for i in range(edits):
+        action = rng.randrange(6)
+        pose = rng.randrange(library.poseCount)
+        joint = int(library.pose_joints[pose])
+        span = library.poseSlice(joint)
+        if action == 0:
+            stack.addPose(joint, "new%d" % i, (0.0, 0.0, 0.0, 1.0), {"bs.new%d" % (i % 8): 0.5},
+                          rng.randrange(span.stop - span.start + 1))
+        elif action == 1 and span.stop - span.start > 1:
+            stack.removePose(pose)
+        elif action == 2:
+            stack.movePose(pose, rng.randrange(span.stop - span.start))
+        elif action == 3:
+            stack.renamePose(pose, "renamed%d" % i)
+        elif action == 4:
+            count = len(library.poseTargets(pose)[0])
+            for step in range(drag_steps):
+                stack.setPoseValues(pose, np.full(count, step / drag_steps), merge_id = ("values", i))
+        else:
+            q = np.array(library.rotations[pose])
+            for step in range(drag_steps):
+                q = q + np.random.default_rng(step).normal(scale = 0.01, size = 4)
+                stack.setRotation(pose, q / np.linalg.norm(q), merge_id = ("drag", i))
+
+
+def run(sizes = (1000, 10000, 100000), edits = 500):
+    """
+    测试撤销栈
+    :param sizes: 数据库pose数量
+    :param edits: 编辑次数
+    :return: [结果字典, ...]
+    """
+    from interface.undo import UndoStack
+    results = []
+    for size in sizes:
+        library = buildLibrary(size)
+        before = (snapshot(library), [library.poseName(p) for p in range(library.poseCount)])
+        snapshot_bytes = sum(array.nbytes for array in library.arrays().values())
+        stack = UndoStack(library, budget = 1 << 30)
+        start = time.perf_counter()
+        randomEdits(stack, edits)
+        edit = time.perf_counter() - start
+        after = (snapshot(library), [library.poseName(p) for p in range(library.poseCount)])
+        commands = len(stack)
+        undo_times, redo_times = [], []
+        while stack.canUndo():
+            start = time.perf_counter()
+            stack.undo()
+            undo_times.append(time.perf_counter() - start)
+        restored = sameState(library, before)
+        while stack.canRedo():
+            start = time.perf_counter()
+            stack.redo()
+            redo_times.append(time.perf_counter() - start)
+        replayed = sameState(library, after)
+        # 小预算: 丢弃最早的命令
+        small = UndoStack(buildLibrary(size), budget = 16 << 10)
+        randomEdits(small, edits)
+        undo_times = np.array(undo_times) * 1e6
+        results.append({"name": "undo", "poses": size, "edits": edits, "commands": commands,
+                        "merged": stack.merged, "edit_ms": edit * 1000 / edits,
+                        "undo_us": float(np.median(undo_times)), "undo_p95_us": float(np.percentile(undo_times, 95)),
+                        "redo_us": float(np.median(np.array(redo_times) * 1e6)),
+                        "stack_kb": stack.nbytes / 1024, "snapshot_mb": snapshot_bytes * commands / 1e6,
+                        "restored": restored, "replayed": replayed, "small_kb": small.nbytes / 1024,
+                        "small_commands": len(small), "small_dropped": small.dropped})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "撤销栈测试")
+    parser.add_argument("--sizes", type = int, nargs = "+", default = [1000, 10000, 100000])
+    parser.add_argument("--edits", type = int, default = 500)
+    args = parser.parse_args()
+    for r in run(args.sizes, args.edits):
+        print(f"{r['name']} poses={r['poses']} edits={r['edits']} commands={r['commands']} merged={r['merged']}")
+        print(f"  undo {r['undo_us']:.1f} us (p95 {r['undo_p95_us']:.1f} us), redo {r['redo_us']:.1f} us, "
+              f"edit {r['edit_ms']:.2f} ms")
+        print(f"  stack {r['stack_kb']:.1f} KB (snapshots {r['snapshot_mb']:.1f} MB) "
+              f"restored={r['restored']} replayed={r['replayed']}")
+        print(f"  16 KB budget: {r['small_commands']} commands, {r['small_kb']:.1f} KB, "
+              f"{r['small_dropped']} dropped")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,254 @@
+# -*- coding: UTF-8 -*-
+# Author  : AitrusC
+# FileName: evaluator
+# Time    : 2024-09-30
+# Contact : 906629272@qq.com
+# Description : 后台求解pose权重
+#               拖拽旋转时界面线程只提交请求, 后台线程只求解最新的请求(中间的请求直接丢弃), 结果通过信号返回界面线程
+
+import threading
+import time
+
+import numpy as np
+from PySide2.QtGui import *
+from PySide2.QtCore import *
+from PySide2.QtWidgets import *
+
+from interface import tracing
+
+
+class _EvaluationThread(QThread):
+    """
+    求解线程(由PoseEvaluator创建)
+    """
+    # 求解完成(请求编号, {驱动名称: 权重}, 请求时间, 求解耗时(秒))
+    evaluated = Signal(int, object, float, float)
+
+    def __init__(self, evaluator):
+        QThread.__init__(self)
+        self._evaluator = evaluator
+
+    def run(self):
+        """
+        等待请求并求解, 每次只取最新的请求
+        :return:
+        """
+        evaluator = self._evaluator
+        while True:
+            with evaluator._condition:
+                while evaluator._pending is None and not evaluator._stopping:
+                    evaluator._condition.wait()
+                if evaluator._stopping:
+                    return
+                request_id, rotations, request_time = evaluator._pending
+                evaluator._pending = None
+                solvers = evaluator._solvers
+            start = time.perf_counter()
+            weights = {}
+            for name, q in rotations.items():
+                solver = solvers.get(name)
+                if solver is not None:
+                    weights[name] = solver.evaluate(np.asarray(q, dtype = np.float64)[None], dtype = np.float32)[0]
+            self.evaluated.emit(request_id, weights, request_time, time.perf_counter() - start)
+
+
+class PoseEvaluator(QObject):
+    """
+    后台pose权重求解
+        request提交驱动骨骼的旋转, 后台线程求解时只使用最新一次请求的旋转(每个驱动保留最新值), 中间的请求被丢弃
+        求解器在界面线程中替换(setSolver), 不要在求解过程中原地修改求解器
+    """
+    # 权重更新({驱动名称: (K,) 权重})
+    weightsReady = Signal(object)
+    # 延迟统计(求解耗时(毫秒), 请求到界面收到结果的延迟(毫秒))
+    latencyReported = Signal(float, float)
+
+    def __init__(self, parent = None):
+        """
+        初始化后台求解
+        :param parent:
+        """
+        QObject.__init__(self, parent)
+        self._condition = threading.Condition()
+        self._solvers = {}
+        self._pending = None
+        self._stopping = False
+        self._request_id = 0
+        # 统计
+        self.requests = 0
+        self.dropped = 0
+        self.evaluated = 0
+        self.last_eval_ms = 0.0
+        self.last_latency_ms = 0.0
+        self._latencies = []
+        self._thread = None
+
+    def start(self):
+        """
+        启动求解线程(第一次请求时自动启动)
+        :return:
+        """
+        if self._thread is not None and self._thread.isRunning():
+            return
+        if self._thread is None:
+            # 退出程序前停止线程
+            QCoreApplication.instance().aboutToQuit.connect(self.stop)
+        self._stopping = False
+        self._thread = _EvaluationThread(self)
+        self._thread.evaluated.connect(self.__onEvaluated)
+        self._thread.start()
+
+    def stop(self):
+        """
+        停止求解线程(丢弃未求解的请求)
+        :return:
+        """
+        if self._thread is None:
+            return
+        with self._condition:
+            self._stopping = True
+            self._pending = None
+            self._condition.notify()
+        self._thread.wait()
+        self._thread = None
+
+    def isRunning(self):
+        return self._thread is not None and self._thread.isRunning()
+
+    def setSolver(self, name, solver):
+        """
+        设置/替换驱动的求解器
+        :param name: 驱动名称
+        :param solver: interface.solver.PoseSolver, 为None时删除
+        :return:
+        """
+        with self._condition:
+            solvers = dict(self._solvers)
+            if solver is None:
+                solvers.pop(name, None)
+            else:
+                solvers[name] = solver
+            # 替换整个字典, 求解线程使用的旧字典不受影响
+            self._solvers = solvers
+
+    def clear(self):
+        """
+        删除全部求解器与未求解的请求
+        :return:
+        """
+        with self._condition:
+            self._solvers = {}
+            self._pending = None
+
+    def request(self, name, rotation_q):
+        """
+        提交一个驱动的旋转
+        :param name: 驱动名称
+        :param rotation_q: (4,)或(N, 4) 四元数
+        :return: 请求编号
+        """
+        return self.requestMany({name: rotation_q})
+
+    def requestMany(self, rotations):
+        """
+        提交多个驱动的旋转(与未求解的请求合并, 每个驱动保留最新值)
+        :param rotations: {驱动名称: 四元数}
+        :return: 请求编号
+        """
+        if not self.isRunning():
+            self.start()
+        with self._condition:
+            self._request_id += 1
+            self.requests += 1
+            merged = dict(rotations)
+            if self._pending is not None:
+                self.dropped += 1
+                merged = dict(self._pending[1], **merged)
+            self._pending = (self._request_id, merged, time.perf_counter())
+            self._condition.notify()
+            return self._request_id
+
+    def latencyStats(self):
+        """
+        延迟统计
+        :return: {"requests", "evaluated", "dropped", "eval_ms", "latency_ms", "latency_p95_ms"}
+        """
+        latencies = np.asarray(self._latencies) if self._latencies else np.zeros(1)
+        return {"requests": self.requests, "evaluated": self.evaluated, "dropped": self.dropped,
+                "eval_ms": self.last_eval_ms, "latency_ms": float(np.median(latencies)),
+                "latency_p95_ms": float(np.percentile(latencies, 95))}
+
+    def resetStats(self):
+        self.requests = self.dropped = self.evaluated = 0
+        self._latencies = []
+
+    def __onEvaluated(self, request_id, weights, request_time, seconds):
+        """
+        界面线程收到结果
+        :param request_id: 请求编号
+        :param weights: {驱动名称: 权重}
+        :param request_time: 请求时间
+        :param seconds: 求解耗时
+        :return:
+        """
+        self.evaluated += 1
+        self.last_eval_ms = seconds * 1000
+        self.last_latency_ms = (time.perf_counter() - request_time) * 1000
+        self._latencies.append(self.last_latency_ms)
+        del self._latencies[:-1000]
+        tracing.gauge("evaluator.latency_ms", self.last_latency_ms)
+        tracing.gauge("evaluator.dropped", self.dropped)
+        self.weightsReady.emit(weights)
+        self.latencyReported.emit(self.last_eval_ms, self.last_latency_ms)
+
+
+class LatencyOverlay(QWidget):
+    """
+    调试信息浮层: 显示求解耗时、延迟与丢弃的请求数量(覆盖在父控件右上角, 不接收鼠标事件)
+    """
+    TextColor = QColor(220, 225, 228)
+    BackgroundColor = QColor(0, 0, 0, 140)
+
+    def __init__(self, evaluator, parent):
+        """
+        初始化调试浮层
+        :param evaluator: PoseEvaluator
+        :param parent: 覆盖的控件
+        """
+        QWidget.__init__(self, parent)
+        self.setAttribute(Qt.WA_TransparentForMouseEvents)
+        self._evaluator = evaluator
+        self._text = "eval -"
+        self.resize(260, 22)
+        evaluator.latencyReported.connect(self.__onLatency)
+        parent.installEventFilter(self)
+        self.__place()
+
+    def __onLatency(self, eval_ms, latency_ms):
+        self._text = "eval {:.2f} ms  latency {:.2f} ms  dropped {}".format(eval_ms, latency_ms,
+                                                                            self._evaluator.dropped)
+        self.update()
+
+    def __place(self):
+        self.move(self.parentWidget().width() - self.width() - 4, 4)
+
+    def eventFilter(self, watched, event):
+        """
+        父控件缩放时保持在右上角
+        :param watched:
+        :param event:
+        :return:
+        """
+        if watched is self.parentWidget() and event.type() == QEvent.Resize:
+            self.__place()
+        return False
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), self.BackgroundColor)
+        painter.setPen(self.TextColor)
+        painter.drawText(self.rect().adjusted(6, 0, -6, 0), Qt.AlignVCenter | Qt.AlignLeft, self._text)
+        painter.end()
+
+
+__all__ = ['PoseEvaluator', 'LatencyOverlay']
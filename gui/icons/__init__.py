@@ -5,15 +5,19 @@
 # Contact : 906629272@qq.com
 
 import os
+from collections import OrderedDict
 from enum import Enum
 
+from PySide2.QtCore import Qt
+from PySide2.QtGui import QGuiApplication, QIcon, QPixmap
+
 
 class IconPath(Enum):
     """
     包含所有图标路径的枚举类
     """
     # 标题栏图标路径
-    TITLEBAR_PATH = os.path.join(os.path.dirname(__file__), 'titlebar.png')
+    TITLEBAR_PATH = os.path.join(os.path.dirname(__file__), 'titleBar.png')
     # 删除图标路径
     DELETE_PATH = os.path.join(os.path.dirname(__file__), 'delete.png')
     # 添加图标路径
@@ -26,3 +30,157 @@ class IconPath(Enum):
     UP_ARROW_PATH = os.path.join(os.path.dirname(__file__), 'up_arrow.png')
     # 下箭头图标路径
     DOWN_ARROW_PATH = os.path.join(os.path.dirname(__file__), 'down_arrow.png')
+
+
+class IconCache(object):
+    """
+    进程内共享的图标缓存(LRU)
+        key为(图标路径, 宽, 高, 设备像素比), 同一图标文件只解码一次, 不同尺寸由原图缩放后缓存
+        hits/misses/decodes/evictions用于确认图标没有被重复解码
+    """
+    # 默认最多缓存的条目数量
+    Capacity = 256
+
+    def __init__(self, capacity = None):
+        """
+        初始化图标缓存
+        :param capacity: 最多缓存的条目数量
+        """
+        self.capacity = capacity or self.Capacity
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.decodes = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _path(icon_path):
+        """
+        :param icon_path: IconPath或路径字符串
+        :return: 路径字符串
+        """
+        return icon_path.value if isinstance(icon_path, IconPath) else icon_path
+
+    @staticmethod
+    def devicePixelRatio():
+        """
+        主屏幕设备像素比(没有QApplication时为1)
+        :return:
+        """
+        app = QGuiApplication.instance()
+        screen = app.primaryScreen() if app is not None else None
+        return screen.devicePixelRatio() if screen is not None else 1.0
+
+    def _get(self, key):
+        """
+        获取缓存条目并更新最近使用顺序
+        :param key:
+        :return: 不存在时返回None
+        """
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return value
+
+    def _put(self, key, value):
+        """
+        添加缓存条目, 超出容量时淘汰最久未使用的条目
+        :param key:
+        :param value:
+        :return:
+        """
+        self._entries[key] = value
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last = False)
+            self.evictions += 1
+        return value
+
+    def pixmap(self, icon_path, size = None, device_pixel_ratio = None):
+        """
+        获取图标
+        :param icon_path: IconPath或路径字符串
+        :param size: int或(宽, 高)逻辑尺寸, 为空时为原图
+        :param device_pixel_ratio: 设备像素比, 为空时使用主屏幕的设备像素比(原图不缩放时忽略)
+        :return: QPixmap(共享, 不要修改)
+        """
+        path = self._path(icon_path)
+        if size is None:
+            key = (path, None, None, 1.0)
+            pixmap = self._get(key)
+            if pixmap is None:
+                self.decodes += 1
+                pixmap = self._put(key, QPixmap(path))
+            return pixmap
+        width, height = (size, size) if isinstance(size, int) else size
+        ratio = float(device_pixel_ratio or self.devicePixelRatio())
+        key = (path, width, height, ratio)
+        pixmap = self._get(key)
+        if pixmap is None:
+            source = self.pixmap(path)
+            if source.isNull():
+                # 图标文件不存在时缓存空图标, 不再重复尝试
+                return self._put(key, source)
+            pixmap = source.scaled(int(round(width * ratio)), int(round(height * ratio)),
+                                   Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+            pixmap.setDevicePixelRatio(ratio)
+            self._put(key, pixmap)
+        return pixmap
+
+    def icon(self, icon_path):
+        """
+        获取QIcon(由缓存的原图创建, 同一路径共享一个QIcon)
+        :param icon_path: IconPath或路径字符串
+        :return: QIcon
+        """
+        path = self._path(icon_path)
+        key = (path, "icon", None, None)
+        icon = self._get(key)
+        if icon is None:
+            icon = self._put(key, QIcon(self.pixmap(path)))
+        return icon
+
+    def preload(self, icon_paths = None, sizes = (16, 20), device_pixel_ratio = None):
+        """
+        预加载图标(原图与QIcon)并预缩放
+        :param icon_paths: 为空时为全部IconPath
+        :param sizes: 逻辑尺寸列表
+        :param device_pixel_ratio: 设备像素比, 为空时使用主屏幕的设备像素比
+        :return:
+        """
+        for icon_path in (icon_paths or list(IconPath)):
+            self.icon(icon_path)
+            for size in sizes:
+                self.pixmap(icon_path, size, device_pixel_ratio)
+
+    def stats(self):
+        """
+        :return: 统计信息
+        """
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                "decodes": self.decodes, "evictions": self.evictions}
+
+    def resetStats(self):
+        """
+        清零统计
+        :return:
+        """
+        self.hits = self.misses = self.decodes = self.evictions = 0
+
+    def clear(self):
+        """
+        清空缓存
+        :return:
+        """
+        self._entries.clear()
+
+
+# 全局图标缓存
+iconCache = IconCache()
+
+__all__ = ['IconPath', 'IconCache', 'iconCache']
@@ -9,19 +9,37 @@ from PySide2.QtCore import *
 from PySide2.QtGui import *
 from PySide2.QtWidgets import *
 
-from .icons import IconPath
-from .widget.widgetT import FramelessWindow, IconButton, SearchLine, JPlistWidget
+from .icons import IconPath, iconCache
+from .widget import widgetT
+from .widget.widgetT import FramelessWindow, IconButton, SearchLine, countPaint
+
+try:
+    from maya import OpenMayaUI
+    from shiboken2 import wrapInstance
+except ImportError:
+    OpenMayaUI = None
+
+# 主窗口objectName, 用于在模块重新加载后找回已存在的窗口
+WindowName = "PoseDriveUI"
 
 
 class LeftWidget(QWidget):
     """
     左侧窗口
     """
+    Width = 250
+    BackgroundColor = QColor(69, 76, 73)
 
-    def __init__(self, parent = None):
+    def __init__(self, parent = None, virtual_list = True):
+        """
+        初始化左侧窗口
+        :param parent:
+        :param virtual_list: 是否使用模型/视图列表(JPTreeView), False时使用逐控件列表(JPlistWidget)
+        """
         QWidget.__init__(self, parent)
         self.setMouseTracking(True)
-        self.setFixedWidth(250)
+        self.setAttribute(Qt.WA_OpaquePaintEvent)
+        self.setFixedWidth(self.Width)
         self.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Expanding)
         # 读取窗口样式(子类化QWidget后使用QSS不能生效, 需在自定义Widget中重写paintEvent函数以确保QSS的正确应用)
         # with open(__file__ + "/../qss/leftWidget.qss", "rb") as f:
@@ -42,27 +60,39 @@ class LeftWidget(QWidget):
         self.main_layout.setSpacing(2)
 
         self.search_line = SearchLine(parent = self)
-        self.joint_pose_list = JPlistWidget(self)
+        # 列表模块在构建时才导入
+        if virtual_list:
+            from .widget.poseView import JPTreeView
+            self.joint_pose_list = JPTreeView(parent = self)
+            self.joint_pose_list.setPoseData([(f"骨骼列表 {j}", [f"item {i}" for i in range(10)]) for j in range(10)])
+        else:
+            from .widget.widgetT import JPlistWidget
+            self.joint_pose_list = JPlistWidget(self)
         self.main_layout.addWidget(self.search_line)
         self.main_layout.addWidget(self.joint_pose_list)
+        if virtual_list:
+            # 输入时实时过滤骨骼与pose列表
+            self.search_line.textChanged.connect(self.joint_pose_list.setFilterText)
 
+    @countPaint
     def paintEvent(self, event):
         """
-        绘制背景
+        绘制背景(只填充需要重绘的区域)
         :param event:
         :return:
         """
         painter = QPainter(self)
-        painter.setPen(Qt.NoPen)
-        painter.setBrush(QColor(69, 76, 73))
-        painter.drawRect(self.rect())
+        painter.fillRect(event.rect(), self.BackgroundColor)
         painter.end()
 
 
 class RightWidget(QWidget):
     """
     右侧窗口
+        pose旋转平面, 拖拽旋转时在后台线程求解当前骨骼的pose权重并实时显示
     """
+    # 是否显示求解延迟调试浮层
+    DebugOverlay = False
 
     def __init__(self, parent = None):
         QWidget.__init__(self, parent)
@@ -71,14 +101,196 @@ class RightWidget(QWidget):
         self.main_layout = QVBoxLayout()
         self.setLayout(self.main_layout)
         self.main_layout.setContentsMargins(0, 0, 0, 0)
-        button = QLabel("右侧窗口")
-        button.setMouseTracking(True)
-        self.main_layout.addWidget(button)
+        # pose旋转平面与后台求解(构建时才导入)
+        from .evaluator import LatencyOverlay, PoseEvaluator
+        from .widget.posePlane import PosePlaneView
+        self.pose_plane = PosePlaneView(self)
+        self.main_layout.addWidget(self.pose_plane)
+        self.evaluator = PoseEvaluator(self)
+        self.latency_overlay = LatencyOverlay(self.evaluator, self.pose_plane)
+        self.latency_overlay.setVisible(self.DebugOverlay)
+        self._joint = None
+        self._axis = None
+        # 当前骨骼的数据库与索引, 拖拽pose时通过撤销栈修改旋转
+        self._library = None
+        self._joint_index = -1
+        self._undo_stack = None
+        # 拖拽标识, 同一次拖拽的修改合并为一个撤销命令
+        self._drag_id = 0
+        self.pose_plane.probeMoved.connect(self.__onRotationDragged)
+        self.pose_plane.poseMoved.connect(self.__onPoseMoved)
+        self.pose_plane.poseMoveFinished.connect(self.__onPoseMoveFinished)
+        self.evaluator.weightsReady.connect(self.__onWeightsReady)
+
+    def setDebugOverlay(self, visible):
+        """
+        显示/隐藏求解延迟调试浮层
+        :param visible:
+        :return:
+        """
+        self.latency_overlay.setVisible(visible)
+        self.latency_overlay.raise_()
+
+    def setJoint(self, library, joint, axis = None, undo_stack = None):
+        """
+        显示骨骼的全部pose, 并为后台求解创建该骨骼的求解器
+        :param library: interface.poseLibrary.PoseLibrary
+        :param joint: 骨骼索引
+        :param axis: 扭转轴, 默认X轴
+        :param undo_stack: interface.undo.UndoStack, 不为空时可以拖拽pose修改旋转(可撤销)
+        :return:
+        """
+        from interface import rotation
+        self._library = library
+        self._joint_index = joint
+        self._undo_stack = undo_stack if undo_stack is not None and undo_stack.library is library else None
+        self._joint = library.jointName(joint)
+        self._axis = rotation.X_AXIS if axis is None else axis
+        self.pose_plane.setEditable(self._undo_stack is not None)
+        self.__updateJoint()
+
+    def syncJoints(self, library, joints):
+        """
+        撤销/重做后刷新(当前骨骼被修改时重新显示)
+        :param library: interface.poseLibrary.PoseLibrary
+        :param joints: 修改的骨骼索引
+        :return:
+        """
+        if library is self._library and self._joint_index in joints:
+            if library.jointName(self._joint_index) != self._joint:
+                # 骨骼索引已变化, 不再显示
+                self._library = None
+                self._joint = None
+                return
+            self.__updateJoint()
+
+    def __updateJoint(self):
+        """
+        显示当前骨骼的pose并创建求解器
+        :return:
+        """
+        from interface.solver import RBFSolver
+        library, joint = self._library, self._joint_index
+        rotations = library.jointRotations(joint)
+        self.pose_plane.setPoseRotations(library.jointPoseNames(joint), rotations, self._axis)
+        self.evaluator.clear()
+        if len(rotations):
+            self.evaluator.setSolver(self._joint, RBFSolver(rotations))
+
+    def __onRotationDragged(self, b, c):
+        """
+        拖拽旋转时提交后台求解(界面线程不等待结果)
+        :param b: 摆动坐标b
+        :param c: 摆动坐标c
+        :return:
+        """
+        if self._joint is None:
+            return
+        import numpy as np
+        from interface import rotation
+        self.evaluator.request(self._joint, rotation.composeSwingTwist(np.array((b, c)), 0.0, self._axis))
+
+    def __onPoseMoved(self, index, b, c):
+        """
+        拖拽pose: 通过撤销栈修改旋转(保持原扭转, 同一次拖拽合并为一个命令), 并预览权重
+        :param index: 骨骼中的pose索引
+        :param b: 摆动坐标b
+        :param c: 摆动坐标c
+        :return:
+        """
+        self.__onRotationDragged(b, c)
+        if self._undo_stack is None or self._joint is None:
+            return
+        import numpy as np
+        from interface import rotation
+        pose = self._library.poseSlice(self._joint_index).start + index
+        twist = rotation.decomposeSwingTwist(self._library.rotations[pose], self._axis)[1]
+        self._undo_stack.setRotation(pose, rotation.composeSwingTwist(np.array((b, c)), twist, self._axis),
+                                     merge_id = ("posePlane", self._drag_id))
+
+    def __onPoseMoveFinished(self, index):
+        """
+        拖拽结束: 之后的拖拽为新的撤销命令, 用修改后的旋转重建求解器
+        :param index: 骨骼中的pose索引
+        :return:
+        """
+        self._drag_id += 1
+        if self._undo_stack is not None and self._joint is not None:
+            from interface.solver import RBFSolver
+            self.evaluator.setSolver(self._joint, RBFSolver(self._library.jointRotations(self._joint_index)))
+
+    def __onWeightsReady(self, weights):
+        """
+        显示求解结果
+        :param weights: {骨骼名称: 权重}
+        :return:
+        """
+        if self._joint in weights:
+            self.pose_plane.setPoseWeights(weights[self._joint])
+
+    def releaseCaches(self):
+        """
+        停止后台求解并释放求解器
+        :return:
+        """
+        self.evaluator.stop()
+        self.evaluator.clear()
+        self._joint = None
+        self._library = None
+        self._undo_stack = None
+
+
+class _DeferredPanel(QWidget):
+    """
+    延迟构建的面板: 第一次显示(或第一次访问widget)时才调用factory创建内容控件
+    """
+    # 内容控件创建完成
+    built = Signal(QWidget)
+
+    def __init__(self, factory, parent = None):
+        """
+        初始化延迟面板
+        :param factory: 无参数, 返回内容控件
+        :param parent:
+        """
+        QWidget.__init__(self, parent)
+        self.setMouseTracking(True)
+        self._factory = factory
+        self._widget = None
+        self.main_layout = QVBoxLayout(self)
+        self.main_layout.setContentsMargins(0, 0, 0, 0)
+
+    @property
+    def isBuilt(self):
+        return self._widget is not None
+
+    @property
+    def widget(self):
+        """
+        内容控件(未创建时立即创建)
+        :return:
+        """
+        if self._widget is None:
+            self._widget = self._factory()
+            self.main_layout.addWidget(self._widget)
+            self.built.emit(self._widget)
+        return self._widget
+
+    def showEvent(self, event):
+        """
+        第一次显示时创建内容控件
+        :param event:
+        :return:
+        """
+        if self._widget is None:
+            self.widget
+        QWidget.showEvent(self, event)
 
 
 class BodyWidget(QWidget):
     """
     测试窗口
+        左右面板在第一次显示时才构建
     """
 
     def __init__(self, parent = None):
@@ -89,10 +301,63 @@ class BodyWidget(QWidget):
         self.main_layout.setContentsMargins(5, 5, 5, 5)
         # self.main_layout.setSpacing(5)
         self.main_layout.setAlignment(Qt.AlignCenter)
-        self.left_widget = LeftWidget(self)
-        self.right_widget = RightWidget(self)
-        self.main_layout.addWidget(self.left_widget)
-        self.main_layout.addWidget(self.right_widget)
+        self._search_text = ""
+        # pose编辑的撤销栈(由MainWindow绑定数据库时设置)
+        self.undo_stack = None
+        self.left_panel = _DeferredPanel(LeftWidget, self)
+        self.left_panel.setFixedWidth(LeftWidget.Width)
+        self.left_panel.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Expanding)
+        self.left_panel.built.connect(self.__onLeftBuilt)
+        self.right_panel = _DeferredPanel(RightWidget, self)
+        self.right_panel.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        self.main_layout.addWidget(self.left_panel)
+        self.main_layout.addWidget(self.right_panel)
+
+    @property
+    def left_widget(self):
+        return self.left_panel.widget
+
+    @property
+    def right_widget(self):
+        return self.right_panel.widget
+
+    def __onLeftBuilt(self, widget):
+        """
+        左侧面板创建后应用构建前输入的搜索文本, 双击pose时在右侧平面显示该骨骼
+        :param widget:
+        :return:
+        """
+        if self._search_text:
+            widget.search_line.setText(self._search_text)
+        if hasattr(widget.joint_pose_list, "poseDoubleClicked"):
+            widget.joint_pose_list.poseDoubleClicked.connect(self.__onPoseDoubleClicked)
+
+    def __onPoseDoubleClicked(self, joint_name, pose_name):
+        """
+        在右侧平面显示骨骼的全部pose并选中双击的pose
+        :param joint_name: 骨骼名称
+        :param pose_name: pose名称
+        :return:
+        """
+        library = self.left_widget.joint_pose_list.model().library
+        joint = library.jointIndex(joint_name) if library is not None else -1
+        if joint < 0:
+            return
+        self.right_widget.setJoint(library, joint, undo_stack = self.undo_stack)
+        pose = library.poseIndex(joint, pose_name)
+        if pose >= 0:
+            self.right_widget.pose_plane.setSelectedPose(pose - library.poseSlice(joint).start)
+
+    @Slot(str)
+    def setSearchText(self, text):
+        """
+        设置左侧面板搜索文本(面板未构建时保存, 构建后应用)
+        :param text:
+        :return:
+        """
+        self._search_text = text
+        if self.left_panel.isBuilt:
+            self.left_panel.widget.search_line.setText(text)
 
 
 class MainWindow(FramelessWindow):
@@ -103,16 +368,203 @@ class MainWindow(FramelessWindow):
     def __init__(self, parent = None):
         body_widget = BodyWidget()
         FramelessWindow.__init__(self, content_widget = body_widget, parent = parent)
+        self.body_widget = body_widget
         self.min_size = QSize(1080, 720)
-        self.setObjectName("PoseDriveUI")
+        self.setObjectName(WindowName)
+        # 当前绑定的pose数据库
+        self.library = None
         self.setWindowFlags(self.windowFlags() | Qt.FramelessWindowHint | Qt.Window)
         self.resize(1080, 720)
         self.setMinimumSize(self.min_size)
+        # 标题栏全局搜索
+        self.global_search = SearchLine("全局搜索...", parent = self.title_bar)
+        self.global_search.setFixedWidth(400)
+        self.title_bar.main_layout.insertWidget(2, self.global_search)
+        self.title_bar.main_layout.insertStretch(3, 0)
+        self.global_search.textChanged.connect(body_widget.setSearchText)
+        # 缩放拖拽时暂停左右面板的布局
+        self.addHeavyWidget(body_widget)
+        # pose编辑的撤销栈(绑定数据库时创建)
+        self.undo_stack = None
+        QShortcut(QKeySequence.Undo, self, self.undo)
+        QShortcut(QKeySequence.Redo, self, self.redo)
+
+    def bindLibrary(self, library):
+        """
+        绑定pose数据库
+            与当前数据库内容相同时不做任何处理, 否则增量同步列表(只更新变化的骨骼, 保留滚动位置与展开状态)
+        :param library: interface.poseLibrary.PoseLibrary
+        :return: 发生变化的骨骼数量
+        """
+        pose_list = self.body_widget.left_widget.joint_pose_list
+        if not hasattr(pose_list, "syncLibrary"):
+            return 0
+        if library is not self.library:
+            from interface.undo import UndoStack
+            self.undo_stack = UndoStack(library)
+            self.body_widget.undo_stack = self.undo_stack
+        self.library = library
+        return pose_list.syncLibrary(library)
 
+    @Slot()
+    def undo(self):
+        """
+        撤销pose编辑并只刷新修改的骨骼
+        :return:
+        """
+        if self.undo_stack is None:
+            return
+        revision = self.library.revision
+        if self.undo_stack.undo():
+            self.__syncJoints(self.undo_stack.last_joints, revision)
 
-def showUI():
+    @Slot()
+    def redo(self):
+        """
+        重做pose编辑并只刷新修改的骨骼
+        :return:
+        """
+        if self.undo_stack is None:
+            return
+        revision = self.library.revision
+        if self.undo_stack.redo():
+            self.__syncJoints(self.undo_stack.last_joints, revision)
+
+    def __syncJoints(self, joints, revision):
+        """
+        同步列表中修改的骨骼
+        :param joints: 骨骼索引
+        :param revision: 修改前数据库的修改计数
+        :return:
+        """
+        pose_list = self.body_widget.left_widget.joint_pose_list
+        if hasattr(pose_list, "syncJoints"):
+            pose_list.syncJoints(self.library, joints, revision)
+        if self.body_widget.right_panel.isBuilt:
+            self.body_widget.right_widget.syncJoints(self.library, joints)
+
+    def releaseCaches(self):
+        """
+        释放窗口持有的数据与缓存(模型数据与搜索索引)
+        :return:
+        """
+        self.library = None
+        self.undo_stack = None
+        self.body_widget.undo_stack = None
+        if self.body_widget.left_panel.isBuilt:
+            model = self.body_widget.left_widget.joint_pose_list.model()
+            if hasattr(model, "clear"):
+                model.clear()
+        if self.body_widget.right_panel.isBuilt:
+            self.body_widget.right_widget.releaseCaches()
+
+
+def mayaMainWindow():
+    """
+    获取Maya主窗口(不在Maya中时返回None)
+    :return:
+    """
+    if OpenMayaUI is None:
+        return None
+    pointer = OpenMayaUI.MQtUtil.mainWindow()
+    return wrapInstance(int(pointer), QWidget) if pointer else None
+
+
+def findWindow():
+    """
+    查找已存在的主窗口
+        通过objectName在顶层窗口中查找, 模块重新加载(reload)后也能找回之前创建的窗口
+    :return: MainWindow或None
+    """
+    app = QApplication.instance()
+    if app is None:
+        return None
+    for widget in app.topLevelWidgets():
+        if widget.objectName() == WindowName:
+            return widget
+    return None
+
+
+def showUI(library = None, parent = None):
     """
     窗口显示
+        窗口只创建一次, 关闭只是隐藏, 再次调用时直接显示已存在的窗口(保留列表模型、滚动位置、搜索索引与缓存)
+        不在Maya中且没有QApplication时创建QApplication并进入事件循环
+    :param library: interface.poseLibrary.PoseLibrary, 不为空时增量绑定到窗口
+    :param parent: 父窗口, 默认为Maya主窗口
+    :return: MainWindow
+    """
+    app = QApplication.instance()
+    standalone = app is None
+    if standalone:
+        app = QApplication([])
+    window = findWindow()
+    if window is None:
+        window = MainWindow(parent = parent if parent is not None else mayaMainWindow())
+    if library is not None:
+        window.bindLibrary(library)
+    if window.isMinimized():
+        window.showNormal()
+    else:
+        window.show()
+    window.raise_()
+    window.activateWindow()
+    if standalone:
+        app.exec_()
+    return window
+
+
+def teardownUI():
+    """
+    销毁窗口并释放缓存(重新加载模块前调用)
+    :return: 是否销毁了已存在的窗口
+    """
+    window = findWindow()
+    if window is not None:
+        window.close()
+        window.releaseCaches()
+        # 清除objectName, 避免deleteLater生效前被findWindow找到
+        window.setObjectName("")
+        window.deleteLater()
+    stopStallWatchdog()
+    iconCache.clear()
+    widgetT._style_sheets.clear()
+    return window is not None
+
+
+# 界面线程卡顿检测(startStallWatchdog创建)
+_watchdog = None
+_heartbeat = None
+
+
+def startStallWatchdog(threshold_ms = 200.0):
+    """
+    开始检测界面线程卡顿: 事件循环中的定时器发送心跳, 超过threshold_ms没有心跳时记录界面线程的Python调用栈
+        卡顿记录在返回值的stalls中, 追踪启用时同时写入trace(interface.tracing.exportChrome导出)
+    :param threshold_ms: 卡顿阈值(毫秒)
+    :return: interface.tracing.StallWatchdog
+    """
+    global _watchdog, _heartbeat
+    from interface.tracing import StallWatchdog
+    stopStallWatchdog()
+    _watchdog = StallWatchdog(threshold_ms)
+    _heartbeat = QTimer()
+    _heartbeat.setInterval(max(int(threshold_ms / 4), 1))
+    _heartbeat.timeout.connect(_watchdog.beat)
+    _heartbeat.start()
+    _watchdog.start()
+    return _watchdog
+
+
+def stopStallWatchdog():
+    """
+    停止卡顿检测
     :return:
     """
-    pass
+    global _watchdog, _heartbeat
+    if _heartbeat is not None:
+        _heartbeat.stop()
+        _heartbeat = None
+    if _watchdog is not None:
+        _watchdog.stop()
+        _watchdog = None
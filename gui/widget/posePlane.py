@@ -0,0 +1,496 @@
+# -*- coding: UTF-8 -*-
+# Author  : AitrusC
+# FileName: posePlane
+# Time    : 2024-09-30
+# Contact : 906629272@qq.com
+# Description : pose旋转平面: 在摆动(swing)平面上显示骨骼的全部pose与采样动画帧
+#               背景网格缓存为图片, 采样点数量较多时按像素密度绘制, pose点选/拖拽使用网格索引
+
+import math
+
+import numpy as np
+from PySide2.QtGui import *
+from PySide2.QtCore import *
+from PySide2.QtWidgets import *
+
+from interface import rotation
+from interface.spatial import GridIndex
+from .widgetT import countPaint
+
+
+class PosePlaneView(QWidget):
+    """
+    pose旋转平面视图
+        坐标为decomposeSwingTwist输出的二维摆动坐标(弧度), 向上为正
+        滚轮缩放(以鼠标位置为中心), 中键/右键拖拽平移, 左键选择pose, 可编辑时左键拖拽pose,
+        在空白处左键拖拽时发出probeMoved(用于实时预览pose权重)
+    """
+    # 选中pose(pose索引, 没有选中时为-1)
+    poseSelected = Signal(int)
+    # 拖拽pose(pose索引, 摆动坐标b, 摆动坐标c)
+    poseMoved = Signal(int, float, float)
+    # 拖拽结束(pose索引)
+    poseMoveFinished = Signal(int)
+    # 在空白处拖拽旋转(摆动坐标b, 摆动坐标c)
+    probeMoved = Signal(float, float)
+
+    BackgroundColor = QColor(48, 55, 52)
+    GridColor = QColor(60, 68, 65)
+    AxisColor = QColor(96, 108, 103)
+    SampleColor = (120, 200, 255)
+    PoseColor = QColor(230, 170, 60)
+    SelectedColor = QColor(255, 90, 70)
+    TextColor = QColor(196, 203, 207)
+    WeightColor = QColor(90, 220, 140)
+    # 网格间隔候选(度), 按缩放选择像素间隔不小于MinGridPixels的最小间隔
+    GridSteps = (1, 2, 5, 10, 15, 30, 45, 90)
+    MinGridPixels = 32
+    # 可见采样点超过该数量时按像素密度绘制, 否则逐点绘制
+    PointLimit = 4000
+    # 可见pose不超过该数量时绘制名称
+    LabelLimit = 64
+    PoseRadius = 5
+    # 点选半径(像素)
+    PickRadius = 8
+    MinScale, MaxScale = 20.0, 20000.0
+
+    def __init__(self, parent = None):
+        """
+        初始化pose旋转平面视图
+        :param parent:
+        """
+        QWidget.__init__(self, parent)
+        self.setMouseTracking(True)
+        self.setAttribute(Qt.WA_OpaquePaintEvent)
+        self.setFocusPolicy(Qt.StrongFocus)
+        self.setMinimumSize(200, 200)
+        # 视图: 中心点坐标(弧度)与缩放(像素/弧度)
+        self._center = np.zeros(2)
+        self._scale = 120.0
+        # pose
+        self.pose_names = []
+        self.pose_index = GridIndex(cell_size = 0.1)
+        self._selected = -1
+        self._hover = -1
+        self._dragging = -1
+        self._editable = False
+        self._snap = False
+        # 采样点
+        self.sample_index = GridIndex(cell_size = 0.05)
+        self._samples_version = 0
+        # 缓存: 背景网格与采样点图层
+        self._grid_cache = None
+        self._grid_key = None
+        self._sample_cache = None
+        self._sample_key = None
+        self._pan_pos = None
+        self.lod = "points"
+        # 拖拽中的旋转与pose权重预览
+        self._probe = None
+        self._weights = None
+
+    # ---------------------------------------------------------------- 数据
+
+    def setPoses(self, names, swing):
+        """
+        设置pose
+        :param names: pose名称列表
+        :param swing: (n, 2) 摆动坐标(弧度)
+        :return:
+        """
+        self.pose_names = list(names)
+        self.pose_index.setPoints(swing)
+        self._selected = self._hover = self._dragging = -1
+        self._weights = None
+        self.update()
+
+    def setPoseRotations(self, names, rotations, axis = rotation.X_AXIS):
+        """
+        由四元数设置pose
+        :param names: pose名称列表
+        :param rotations: (n, 4) 四元数
+        :param axis: 扭转轴(骨骼指向轴)
+        :return:
+        """
+        swing, _ = rotation.decomposeSwingTwist(np.asarray(rotations, dtype = np.float64).reshape(-1, 4), axis)
+        self.setPoses(names, swing)
+
+    def setSamples(self, swing):
+        """
+        设置采样动画帧
+        :param swing: (m, 2) 摆动坐标(弧度)
+        :return:
+        """
+        self.sample_index.setPoints(swing)
+        self._samples_version += 1
+        self._sample_key = None
+        self.update()
+
+    def setSampleRotations(self, rotations, axis = rotation.X_AXIS):
+        """
+        由四元数设置采样动画帧
+        :param rotations: (m, 4) 四元数
+        :param axis: 扭转轴(骨骼指向轴)
+        :return:
+        """
+        swing, _ = rotation.decomposeSwingTwist(np.asarray(rotations, dtype = np.float64).reshape(-1, 4), axis)
+        self.setSamples(swing)
+
+    def posePosition(self, index):
+        """
+        pose摆动坐标
+        :param index: pose索引
+        :return: (2,)
+        """
+        return self.pose_index.points[index].copy()
+
+    def selectedPose(self):
+        return self._selected
+
+    def setSelectedPose(self, index):
+        """
+        选中pose
+        :param index: pose索引, -1取消选中
+        :return:
+        """
+        if index != self._selected:
+            self._selected = index
+            self.poseSelected.emit(index)
+            self.update()
+
+    def setPoseWeights(self, weights):
+        """
+        设置pose权重预览(绘制为pose外圈, 大小与权重成正比)
+        :param weights: (n,) 权重, 为None时清除
+        :return:
+        """
+        self._weights = None if weights is None else np.asarray(weights, dtype = np.float64)
+        self.update()
+
+    def setEditable(self, editable, snap = False):
+        """
+        设置是否可以拖拽编辑pose
+        :param editable: 是否可编辑
+        :param snap: 拖拽时是否吸附到网格
+        :return:
+        """
+        self._editable = bool(editable)
+        self._snap = bool(snap)
+
+    # ---------------------------------------------------------------- 视图
+
+    def scale(self):
+        return self._scale
+
+    def setView(self, center, scale):
+        """
+        设置视图中心与缩放
+        :param center: (2,) 中心坐标(弧度)
+        :param scale: 像素/弧度
+        :return:
+        """
+        self._center = np.array(center, dtype = np.float64)
+        self._scale = float(min(self.MaxScale, max(self.MinScale, scale)))
+        self.update()
+
+    def frameAll(self, margin = 0.1):
+        """
+        缩放到显示全部pose与采样点
+        :param margin: 边距比例
+        :return:
+        """
+        points = [p for p in (self.pose_index.points, self.sample_index.points) if len(p)]
+        if not points:
+            return
+        points = np.concatenate(points)
+        low, high = points.min(axis = 0), points.max(axis = 0)
+        size = np.maximum(high - low, 1e-3) * (1.0 + 2.0 * margin)
+        self.setView((low + high) * 0.5, min(self.width() / size[0], self.height() / size[1]))
+
+    def mapToPlane(self, pos):
+        """
+        控件坐标转为摆动坐标
+        :param pos: QPoint/QPointF
+        :return: (2,)
+        """
+        return np.array((self._center[0] + (pos.x() - self.width() * 0.5) / self._scale,
+                         self._center[1] - (pos.y() - self.height() * 0.5) / self._scale))
+
+    def mapFromPlane(self, points):
+        """
+        摆动坐标批量转为控件坐标
+        :param points: (n, 2)
+        :return: (n, 2)
+        """
+        points = np.asarray(points, dtype = np.float64)
+        x = (points[..., 0] - self._center[0]) * self._scale + self.width() * 0.5
+        y = (self._center[1] - points[..., 1]) * self._scale + self.height() * 0.5
+        return np.stack((x, y), axis = -1)
+
+    def visibleRect(self):
+        """
+        可见区域的摆动坐标范围
+        :return: (low (2,), high (2,))
+        """
+        half = np.array((self.width(), self.height())) * 0.5 / self._scale
+        return self._center - half, self._center + half
+
+    def gridStep(self):
+        """
+        当前缩放下的网格间隔(弧度)
+        :return:
+        """
+        for step in self.GridSteps:
+            if math.radians(step) * self._scale >= self.MinGridPixels:
+                return math.radians(step)
+        return math.radians(self.GridSteps[-1])
+
+    # ---------------------------------------------------------------- 绘制
+
+    def _gridPixmap(self):
+        """
+        背景网格图片(缓存)
+            图片比控件大一个网格间隔, 平移时只改变绘制偏移, 只有尺寸或缩放变化时重新生成
+        :return: (QPixmap, 网格像素间隔)
+        """
+        dpr = self.devicePixelRatioF()
+        spacing = self.gridStep() * self._scale
+        key = (self.width(), self.height(), round(spacing, 3), dpr)
+        if self._grid_key != key:
+            size = QSize(int((self.width() + spacing * 2) * dpr), int((self.height() + spacing * 2) * dpr))
+            pixmap = QPixmap(size)
+            pixmap.setDevicePixelRatio(dpr)
+            pixmap.fill(self.BackgroundColor)
+            painter = QPainter(pixmap)
+            painter.setPen(QPen(self.GridColor, 0))
+            width, height = size.width() / dpr, size.height() / dpr
+            lines = [QLineF(i * spacing, 0, i * spacing, height) for i in range(int(width / spacing) + 1)]
+            lines += [QLineF(0, i * spacing, width, i * spacing) for i in range(int(height / spacing) + 1)]
+            painter.drawLines(lines)
+            painter.end()
+            self._grid_cache, self._grid_key = pixmap, key
+        return self._grid_cache, spacing
+
+    def _sampleLayer(self):
+        """
+        采样点图层(缓存, 视图或采样点变化时重新生成)
+            可见点数超过PointLimit时按像素累计数量生成密度图片(对数映射透明度), 否则返回可见点坐标逐点绘制
+        :return: QImage或(n, 2)控件坐标
+        """
+        key = (self.width(), self.height(), tuple(self._center), self._scale, self._samples_version,
+               self.devicePixelRatioF())
+        if self._sample_key == key:
+            return self._sample_cache
+        self._sample_key = key
+        points = self.sample_index.points
+        if not len(points):
+            self._sample_cache = None
+            self.lod = "points"
+            return None
+        dpr = self.devicePixelRatioF()
+        width, height = int(self.width() * dpr), int(self.height() * dpr)
+        screen = self.mapFromPlane(points) * dpr
+        inside = (screen[:, 0] >= 0) & (screen[:, 0] < width) & (screen[:, 1] >= 0) & (screen[:, 1] < height)
+        screen = screen[inside]
+        if len(screen) <= self.PointLimit:
+            self.lod = "points"
+            self._sample_cache = screen / dpr
+            return self._sample_cache
+        self.lod = "density"
+        pixels = screen.astype(np.int64)
+        counts = np.bincount(pixels[:, 1] * width + pixels[:, 0], minlength = width * height)
+        # 数量 -> ARGB32(预乘透明度)查找表, 透明度按对数映射
+        levels = np.arange(int(counts.max()) + 1)
+        alpha = np.log1p(levels) * (255.0 / np.log1p(levels[-1]))
+        alpha = np.where(levels > 0, np.maximum(alpha, 80.0), 0.0).astype(np.uint32)
+        r, g, b = self.SampleColor
+        lut = (alpha << 24) | ((alpha * r // 255) << 16) | ((alpha * g // 255) << 8) | (alpha * b // 255)
+        data = lut.astype(np.uint32)[counts].reshape(height, width)
+        # QImage不持有数据, 复制前需保持buffer有效
+        buffer = data.tobytes()
+        image = QImage(buffer, width, height, width * 4, QImage.Format_ARGB32_Premultiplied).copy()
+        image.setDevicePixelRatio(dpr)
+        self._sample_cache = image
+        return image
+
+    @countPaint
+    def paintEvent(self, event):
+        """
+        绘制: 缓存网格 -> 坐标轴 -> 采样点 -> pose
+        :param event:
+        :return:
+        """
+        painter = QPainter(self)
+        grid, spacing = self._gridPixmap()
+        origin = self.mapFromPlane(np.zeros(2))
+        painter.drawPixmap(QPointF(origin[0] % spacing - spacing, origin[1] % spacing - spacing), grid)
+        painter.setPen(QPen(self.AxisColor, 0))
+        painter.drawLine(QLineF(origin[0], 0, origin[0], self.height()))
+        painter.drawLine(QLineF(0, origin[1], self.width(), origin[1]))
+
+        samples = self._sampleLayer()
+        if isinstance(samples, QImage):
+            painter.drawImage(QPointF(0, 0), samples)
+        elif samples is not None and len(samples):
+            painter.setPen(QPen(QColor(*self.SampleColor), 2))
+            painter.drawPoints(QPolygonF([QPointF(x, y) for x, y in samples]))
+
+        self._paintPoses(painter)
+        painter.end()
+
+    def _paintPoses(self, painter):
+        """
+        绘制可见pose(超过LabelLimit时不绘制名称)
+        :param painter:
+        :return:
+        """
+        if not len(self.pose_index):
+            return
+        low, high = self.visibleRect()
+        margin = self.PoseRadius / self._scale
+        visible = self.pose_index.inRect(low - margin, high + margin)
+        if not len(visible):
+            return
+        screen = self.mapFromPlane(self.pose_index.points[visible])
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(self.PoseColor)
+        radius = self.PoseRadius
+        for x, y in screen:
+            painter.drawEllipse(QPointF(x, y), radius, radius)
+        highlight = [i for i in (self._selected, self._hover) if i >= 0]
+        if highlight:
+            painter.setBrush(Qt.NoBrush)
+            painter.setPen(QPen(self.SelectedColor, 2))
+            for x, y in self.mapFromPlane(self.pose_index.points[highlight]):
+                painter.drawEllipse(QPointF(x, y), radius + 2, radius + 2)
+        if self._weights is not None and len(self._weights) == len(self.pose_index):
+            weights = self._weights[visible]
+            painter.setBrush(Qt.NoBrush)
+            painter.setPen(QPen(self.WeightColor, 2))
+            for (x, y), weight in zip(screen, weights):
+                if weight > 1e-3:
+                    painter.drawEllipse(QPointF(x, y), radius + 10 * weight, radius + 10 * weight)
+        if self._probe is not None:
+            x, y = self.mapFromPlane(self._probe)
+            painter.setPen(QPen(self.SelectedColor, 1))
+            painter.drawLine(QLineF(x - 8, y, x + 8, y))
+            painter.drawLine(QLineF(x, y - 8, x, y + 8))
+        if len(visible) <= self.LabelLimit:
+            painter.setPen(self.TextColor)
+            for i, (x, y) in zip(visible, screen):
+                painter.drawText(QPointF(x + radius + 3, y - radius), self.pose_names[i])
+
+    # ---------------------------------------------------------------- 交互
+
+    def poseAt(self, pos):
+        """
+        控件坐标处的pose
+        :param pos: QPoint
+        :return: pose索引, 没有时返回-1
+        """
+        return self.pose_index.nearest(self.mapToPlane(pos), self.PickRadius / self._scale)
+
+    def sampleAt(self, pos):
+        """
+        控件坐标处最近的采样帧
+        :param pos: QPoint
+        :return: 采样帧索引, 没有时返回-1
+        """
+        return self.sample_index.nearest(self.mapToPlane(pos), self.PickRadius / self._scale)
+
+    def mousePressEvent(self, event):
+        """
+        左键选择/拖拽pose, 中键/右键平移
+        :param event:
+        :return:
+        """
+        if event.button() == Qt.LeftButton:
+            index = self.poseAt(event.pos())
+            self.setSelectedPose(index)
+            if index >= 0 and self._editable:
+                self._dragging = index
+            elif index < 0:
+                self.__moveProbe(event.pos())
+        elif event.button() in (Qt.MiddleButton, Qt.RightButton):
+            self._pan_pos = event.pos()
+        QWidget.mousePressEvent(self, event)
+
+    def mouseMoveEvent(self, event):
+        """
+        拖拽pose/平移视图/悬停高亮
+        :param event:
+        :return:
+        """
+        if self._dragging >= 0:
+            point = self.mapToPlane(event.pos())
+            if self._snap:
+                step = self.gridStep()
+                point = np.round(point / step) * step
+            self.pose_index.setPoint(self._dragging, point)
+            self.poseMoved.emit(self._dragging, float(point[0]), float(point[1]))
+            self.update()
+        elif self._probe is not None and event.buttons() & Qt.LeftButton:
+            self.__moveProbe(event.pos())
+        elif self._pan_pos is not None:
+            delta = event.pos() - self._pan_pos
+            self._pan_pos = event.pos()
+            self.setView(self._center - np.array((delta.x(), -delta.y())) / self._scale, self._scale)
+        else:
+            hover = self.poseAt(event.pos())
+            if hover != self._hover:
+                self._hover = hover
+                self.update()
+        QWidget.mouseMoveEvent(self, event)
+
+    def mouseReleaseEvent(self, event):
+        """
+        结束拖拽/平移
+        :param event:
+        :return:
+        """
+        if event.button() == Qt.LeftButton and self._dragging >= 0:
+            index, self._dragging = self._dragging, -1
+            self.poseMoveFinished.emit(index)
+        elif event.button() == Qt.LeftButton and self._probe is not None:
+            self._probe = None
+            self.update()
+        elif event.button() in (Qt.MiddleButton, Qt.RightButton):
+            self._pan_pos = None
+        QWidget.mouseReleaseEvent(self, event)
+
+    def __moveProbe(self, pos):
+        """
+        移动预览旋转
+        :param pos: 控件坐标
+        :return:
+        """
+        self._probe = self.mapToPlane(pos)
+        self.probeMoved.emit(float(self._probe[0]), float(self._probe[1]))
+        self.update()
+
+    def wheelEvent(self, event):
+        """
+        以鼠标位置为中心缩放
+        :param event:
+        :return:
+        """
+        factor = 1.2 ** (event.angleDelta().y() / 120.0)
+        anchor = self.mapToPlane(event.pos())
+        scale = min(self.MaxScale, max(self.MinScale, self._scale * factor))
+        # 缩放后鼠标下的坐标保持不变
+        self.setView(anchor - (anchor - self._center) * self._scale / scale, scale)
+
+    def keyPressEvent(self, event):
+        """
+        F键显示全部
+        :param event:
+        :return:
+        """
+        if event.key() == Qt.Key_F:
+            self.frameAll()
+        else:
+            QWidget.keyPressEvent(self, event)
+
+
+__all__ = ['PosePlaneView']
@@ -0,0 +1,687 @@
+# -*- coding: UTF-8 -*-
+# Author  : AitrusC
+# FileName: poseView
+# Time    : 2024-09-20
+# Contact : 906629272@qq.com
+# Description : 骨骼与POSE列表的模型/视图实现(只绘制可见行)
+
+from PySide2.QtGui import *
+from PySide2.QtCore import *
+from PySide2.QtWidgets import *
+
+from interface import tracing
+from interface.search import SearchIndex, JOINT
+
+try:
+    from ..icons import *
+except ImportError:
+    pass
+
+
+class _JointNode(object):
+    """
+    骨骼节点数据(模型内部使用)
+    """
+    __slots__ = ("name", "poses", "row", "targets")
+
+    def __init__(self, name, poses, row, targets = None):
+        """
+        初始化骨骼节点
+        :param name: 骨骼名称
+        :param poses: pose名称列表
+        :param row: 所在行
+        :param targets: 每个pose驱动的目标名称元组(与poses对应, 只用于搜索索引与增量比较)
+        """
+        self.name = name
+        self.poses = poses
+        self.row = row
+        self.targets = targets
+
+
+class PoseTreeModel(QAbstractItemModel):
+    """
+    骨骼与POSE树形模型
+        顶层为骨骼, 子层为该骨骼的pose
+        模型同步维护一个SearchIndex, 设置过滤文本后只显示匹配的骨骼与pose(按匹配程度排序)
+    """
+    # 自定义角色: 区分骨骼行与pose行
+    NodeTypeRole = Qt.UserRole + 1
+    JointType, PoseType = range(2)
+    # 过滤时最多显示的匹配条目数量
+    FilterLimit = 200
+
+    def __init__(self, data = None, parent = None):
+        """
+        初始化模型
+        :param data: [(骨骼名称, [pose名称, ...]), ...]
+        :param parent:
+        """
+        QAbstractItemModel.__init__(self, parent)
+        # 全部骨骼节点
+        self._source = []
+        # 骨骼名称 -> 骨骼节点
+        self._by_name = {}
+        # 当前显示的骨骼节点(未过滤时与_source相同)
+        self._joints = self._source
+        self._filter_text = ""
+        self.search_index = SearchIndex()
+        self.library = None
+        # 最后一次同步时数据库的修改计数
+        self._library_revision = None
+        if data:
+            self.setPoseData(data)
+
+    def setPoseData(self, data):
+        """
+        重置模型数据
+        :param data: [(骨骼名称, [pose名称, ...]), ...]
+        :return:
+        """
+        self._resetNodes([_JointNode(name, list(poses), row) for row, (name, poses) in enumerate(data)])
+
+    def setLibrary(self, library):
+        """
+        从PoseLibrary设置模型数据, 并将pose驱动的目标加入搜索索引
+        :param library: interface.poseLibrary.PoseLibrary
+        :return:
+        """
+        self.library = library
+        self._library_revision = library.revision
+        self._resetNodes(self._libraryNodes(library))
+
+    def updatePoseData(self, data):
+        """
+        增量更新模型数据, 只改动发生变化的骨骼
+        :param data: [(骨骼名称, [pose名称, ...]), ...]
+        :return: 发生变化(新增/修改/删除)的骨骼数量
+        """
+        return self._updateNodes([_JointNode(name, list(poses), row) for row, (name, poses) in enumerate(data)])
+
+    def syncLibrary(self, library):
+        """
+        增量同步PoseLibrary: 未变化的骨骼保留行、展开状态与搜索索引
+            同一数据库且修改计数未变时直接返回
+        :param library: interface.poseLibrary.PoseLibrary
+        :return: 发生变化(新增/修改/删除)的骨骼数量
+        """
+        if library is self.library and library.revision == self._library_revision:
+            return 0
+        self.library = library
+        self._library_revision = library.revision
+        return self._updateNodes(self._libraryNodes(library))
+
+    def syncJoints(self, library, joints, revision = None):
+        """
+        只同步指定骨骼(撤销/重做等已知修改范围的操作), 耗时与数据库大小无关
+            不是当前数据库、骨骼数量变化或模型在修改前已经过期时完整同步(syncLibrary)
+        :param library: interface.poseLibrary.PoseLibrary
+        :param joints: 修改的骨骼索引
+        :param revision: 修改前数据库的修改计数
+        :return: 发生变化的骨骼数量
+        """
+        if (library is not self.library or library.jointCount != len(self._source) or
+                (revision is not None and revision != self._library_revision)):
+            return self.syncLibrary(library)
+        nodes = [self._libraryNode(library, joint) for joint in sorted(set(joints))]
+        if any(self._source[node.row].name != node.name for node in nodes):
+            return self.syncLibrary(library)
+        self._library_revision = library.revision
+        changed = [node for node in nodes
+                   if self._source[node.row].poses != node.poses or self._source[node.row].targets != node.targets]
+        if not changed:
+            return 0
+        for node in changed:
+            self.search_index.removeJoint(node.name)
+            self._indexNode(node)
+        if self.isFiltered():
+            self.beginResetModel()
+            for node in changed:
+                self._source[node.row] = self._by_name[node.name] = node
+            self._joints = self._filterNodes(self._filter_text)
+            self.endResetModel()
+        else:
+            self._replaceChildren(changed)
+        return len(changed)
+
+    def clear(self):
+        """
+        清空模型数据与搜索索引(释放缓存)
+        :return:
+        """
+        self.library = None
+        self._library_revision = None
+        self._resetNodes([])
+
+    @staticmethod
+    def _libraryNodes(library):
+        """
+        从PoseLibrary生成骨骼节点
+        :param library: interface.poseLibrary.PoseLibrary
+        :return: [_JointNode, ...]
+        """
+        return [PoseTreeModel._libraryNode(library, joint) for joint in range(library.jointCount)]
+
+    @staticmethod
+    def _libraryNode(library, joint):
+        """
+        从PoseLibrary生成一个骨骼节点
+        :param library: interface.poseLibrary.PoseLibrary
+        :param joint: 骨骼索引(同时作为行号)
+        :return: _JointNode
+        """
+        offsets, edge_targets, _ = library.jointTargets(joint)
+        names = [library.targetName(int(t)) for t in edge_targets]
+        targets = tuple(tuple(names[offsets[i]:offsets[i + 1]]) for i in range(len(offsets) - 1))
+        return _JointNode(library.jointName(joint), library.jointPoseNames(joint), joint, targets)
+
+    def _indexNode(self, node):
+        """
+        将骨骼节点加入搜索索引
+        :param node: _JointNode
+        :return:
+        """
+        self.search_index.addJoint(node.name)
+        for i, pose in enumerate(node.poses):
+            self.search_index.addPose(node.name, pose)
+            if node.targets:
+                for target in node.targets[i]:
+                    self.search_index.addTarget(node.name, pose, target)
+
+    def _resetNodes(self, nodes):
+        """
+        替换全部骨骼节点并重建搜索索引
+        :param nodes: [_JointNode, ...]
+        :return:
+        """
+        self.beginResetModel()
+        self._source = nodes
+        self._by_name = {node.name: node for node in nodes}
+        self.search_index.clear()
+        for node in nodes:
+            self._indexNode(node)
+        self._joints = self._filterNodes(self._filter_text)
+        self.endResetModel()
+
+    def _updateNodes(self, nodes):
+        """
+        增量替换骨骼节点
+            只重建变化骨骼的搜索索引; 骨骼顺序不变且未过滤时只对变化骨骼的子行发出删除/插入通知,
+            视图的滚动位置与展开状态保持不变, 否则重置模型
+        :param nodes: [_JointNode, ...]
+        :return: 发生变化(新增/修改/删除)的骨骼数量
+        """
+        new_names = {node.name for node in nodes}
+        removed = [name for name in self._by_name if name not in new_names]
+        changed = []
+        for node in nodes:
+            old = self._by_name.get(node.name)
+            if old is None or old.poses != node.poses or old.targets != node.targets:
+                changed.append(node)
+        same_order = [node.name for node in self._source] == [node.name for node in nodes]
+        if not changed and not removed and same_order:
+            return 0
+
+        for name in removed:
+            self.search_index.removeJoint(name)
+        for node in changed:
+            if node.name in self._by_name:
+                self.search_index.removeJoint(node.name)
+            self._indexNode(node)
+
+        if not same_order or self.isFiltered():
+            self.beginResetModel()
+            self._source = nodes
+            self._by_name = {node.name: node for node in nodes}
+            self._joints = self._filterNodes(self._filter_text)
+            self.endResetModel()
+            return len(changed) + len(removed)
+
+        self._replaceChildren(changed)
+        return len(changed)
+
+    def _replaceChildren(self, nodes):
+        """
+        替换骨骼的pose行(未过滤时使用): 只对这些骨骼的子行发出删除/插入通知, 保留滚动位置与展开状态
+        :param nodes: [_JointNode, ...] 名称已在模型中
+        :return:
+        """
+        for node in nodes:
+            old = self._by_name[node.name]
+            parent = self.index(old.row, 0)
+            if old.poses:
+                self.beginRemoveRows(parent, 0, len(old.poses) - 1)
+                old.poses = []
+                self.endRemoveRows()
+            if node.poses:
+                self.beginInsertRows(parent, 0, len(node.poses) - 1)
+                old.poses = node.poses
+                self.endInsertRows()
+            old.targets = node.targets
+
+    def filterText(self):
+        """
+        当前过滤文本
+        :return:
+        """
+        return self._filter_text
+
+    def setFilterText(self, text):
+        """
+        设置过滤文本, 为空时显示全部
+        :param text: 过滤文本
+        :return:
+        """
+        text = text.strip()
+        if text == self._filter_text:
+            return
+        with tracing.span("PoseTreeModel.setFilterText", "search", text = text):
+            self.beginResetModel()
+            self._filter_text = text
+            self._joints = self._filterNodes(text)
+            self.endResetModel()
+
+    def _filterNodes(self, text):
+        """
+        根据搜索结果生成显示节点
+            骨骼匹配时显示其全部pose, pose/驱动目标匹配时只显示匹配的pose
+        :param text: 过滤文本
+        :return: [_JointNode, ...]
+        """
+        if not text:
+            return self._source
+        # 骨骼名称 -> 匹配的pose集合(None表示全部)
+        matched = {}
+        for result in self.search_index.search(text, limit = self.FilterLimit):
+            joint = result.key[1]
+            if joint not in self._by_name:
+                continue
+            if result.kind == JOINT:
+                matched[joint] = None
+            elif joint not in matched:
+                matched[joint] = {result.key[2]}
+            elif matched[joint] is not None:
+                matched[joint].add(result.key[2])
+        nodes = []
+        for row, (joint, poses) in enumerate(matched.items()):
+            source = self._by_name[joint].poses
+            nodes.append(_JointNode(joint, list(source) if poses is None else [p for p in source if p in poses], row))
+        return nodes
+
+    def isFiltered(self):
+        """
+        是否处于过滤状态
+        :return:
+        """
+        return self._joints is not self._source
+
+    def jointCount(self):
+        """
+        骨骼数量(不受过滤影响)
+        :return:
+        """
+        return len(self._source)
+
+    def poseCount(self):
+        """
+        pose总数(不受过滤影响)
+        :return:
+        """
+        return sum(len(node.poses) for node in self._source)
+
+    def jointName(self, row):
+        """
+        获取骨骼名称
+        :param row: 骨骼所在行
+        :return:
+        """
+        return self._joints[row].name
+
+    def poseNames(self, row):
+        """
+        获取骨骼的pose名称列表
+        :param row: 骨骼所在行
+        :return:
+        """
+        return list(self._joints[row].poses)
+
+    def addPose(self, joint_row, pose_name, pose_row = None):
+        """
+        添加pose(过滤状态下重新应用过滤)
+        :param joint_row: 骨骼所在显示行
+        :param pose_name: pose名称
+        :param pose_row: 插入位置(默认末尾)
+        :return: 新pose的索引
+        """
+        node = self._joints[joint_row]
+        source = self._by_name[node.name]
+        self.search_index.addPose(node.name, pose_name)
+        if self.isFiltered():
+            if pose_row is None or node is source:
+                source.poses.insert(len(source.poses) if pose_row is None else pose_row, pose_name)
+            else:
+                source.poses.insert(self._sourcePoseRow(node, source, pose_row), pose_name)
+            self.beginResetModel()
+            self._joints = self._filterNodes(self._filter_text)
+            self.endResetModel()
+            for joint in self._joints:
+                if joint.name == node.name and pose_name in joint.poses:
+                    return self.index(joint.poses.index(pose_name), 0, self.index(joint.row, 0))
+            return QModelIndex()
+        if pose_row is None:
+            pose_row = len(node.poses)
+        parent = self.index(joint_row, 0)
+        self.beginInsertRows(parent, pose_row, pose_row)
+        node.poses.insert(pose_row, pose_name)
+        self.endInsertRows()
+        return self.index(pose_row, 0, parent)
+
+    @staticmethod
+    def _sourcePoseRow(node, source, pose_row):
+        """
+        过滤后的显示行转为完整pose列表中的插入位置(显示行处pose之前, 末尾时为最后一个显示pose之后)
+        :param node: 过滤后的骨骼节点
+        :param source: 完整的骨骼节点
+        :param pose_row: 显示行
+        :return: 完整列表中的位置
+        """
+        if pose_row < len(node.poses):
+            return source.poses.index(node.poses[pose_row])
+        if node.poses:
+            return source.poses.index(node.poses[-1]) + 1
+        return len(source.poses)
+
+    def removePose(self, joint_row, pose_row):
+        """
+        删除pose
+        :param joint_row: 骨骼所在显示行
+        :param pose_row: pose所在显示行
+        :return: 被删除的pose名称
+        """
+        node = self._joints[joint_row]
+        self.beginRemoveRows(self.index(joint_row, 0), pose_row, pose_row)
+        pose_name = node.poses.pop(pose_row)
+        if node is not self._by_name[node.name]:
+            self._by_name[node.name].poses.remove(pose_name)
+        self.endRemoveRows()
+        self.search_index.removePose(node.name, pose_name)
+        return pose_name
+
+    def index(self, row, column, parent = QModelIndex()):
+        """
+        获取索引
+            骨骼行的internalPointer为None, pose行的internalPointer为所属骨骼节点
+        :param row:
+        :param column:
+        :param parent:
+        :return:
+        """
+        if column != 0 or row < 0:
+            return QModelIndex()
+        if not parent.isValid():
+            if row >= len(self._joints):
+                return QModelIndex()
+            return self.createIndex(row, 0)
+        if parent.internalPointer() is not None:
+            return QModelIndex()
+        node = self._joints[parent.row()]
+        if row >= len(node.poses):
+            return QModelIndex()
+        return self.createIndex(row, 0, node)
+
+    def parent(self, index):
+        """
+        获取父索引
+        :param index:
+        :return:
+        """
+        if not index.isValid():
+            return QModelIndex()
+        node = index.internalPointer()
+        if node is None:
+            return QModelIndex()
+        return self.createIndex(node.row, 0)
+
+    def rowCount(self, parent = QModelIndex()):
+        """
+        行数
+        :param parent:
+        :return:
+        """
+        if not parent.isValid():
+            return len(self._joints)
+        if parent.internalPointer() is not None:
+            return 0
+        return len(self._joints[parent.row()].poses)
+
+    def columnCount(self, parent = QModelIndex()):
+        """
+        列数
+        :param parent:
+        :return:
+        """
+        return 1
+
+    def hasChildren(self, parent = QModelIndex()):
+        """
+        是否有子项(骨骼行始终可展开)
+        :param parent:
+        :return:
+        """
+        if not parent.isValid():
+            return bool(self._joints)
+        return parent.internalPointer() is None
+
+    def data(self, index, role = Qt.DisplayRole):
+        """
+        获取数据
+        :param index:
+        :param role:
+        :return:
+        """
+        if not index.isValid():
+            return None
+        node = index.internalPointer()
+        if role == Qt.DisplayRole:
+            if node is None:
+                return self._joints[index.row()].name
+            return node.poses[index.row()]
+        if role == self.NodeTypeRole:
+            return self.JointType if node is None else self.PoseType
+        return None
+
+    def flags(self, index):
+        """
+        项标识
+        :param index:
+        :return:
+        """
+        if not index.isValid():
+            return Qt.NoItemFlags
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable
+
+
+class _PoseItemDelegate(QStyledItemDelegate):
+    """
+    骨骼与POSE绘制代理
+        骨骼行绘制为_ToolButton样式, pose行绘制为_ListItemWidget样式
+    """
+    JointHeight = 25
+    PoseHeight = 20
+    Spacing = 2
+    # 骨骼行颜色(与base.qss中_ToolButton保持一致)
+    JointColor = QColor(87, 106, 95)
+    JointHoverColor = QColor(54, 92, 80)
+    JointExpandedColor = QColor(18, 110, 130)
+    PoseHoverColor = QColor(58, 65, 63)
+    PoseSelectedColor = QColor(53, 60, 58)
+    TextColor = QColor(196, 203, 207)
+
+    def __init__(self, joint_icon_path = None, pose_icon_path = None, parent = None):
+        """
+        初始化绘制代理
+        :param joint_icon_path: 骨骼行图标路径
+        :param pose_icon_path: pose行图标路径
+        :param parent: 所属视图
+        """
+        QStyledItemDelegate.__init__(self, parent)
+        # 图标从共享缓存获取, 所有行共享
+        self.joint_icon = iconCache.icon(joint_icon_path) if joint_icon_path else None
+        self.pose_pixmap = iconCache.pixmap(pose_icon_path) if pose_icon_path else None
+
+    def sizeHint(self, option, index):
+        """
+        行高
+        :param option:
+        :param index:
+        :return:
+        """
+        if index.data(PoseTreeModel.NodeTypeRole) == PoseTreeModel.JointType:
+            return QSize(0, self.JointHeight + self.Spacing)
+        return QSize(0, self.PoseHeight)
+
+    def paint(self, painter, option, index):
+        """
+        绘制行
+        :param painter:
+        :param option:
+        :param index:
+        :return:
+        """
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(Qt.NoPen)
+        text = index.data(Qt.DisplayRole)
+        hover = bool(option.state & QStyle.State_MouseOver)
+        if index.data(PoseTreeModel.NodeTypeRole) == PoseTreeModel.JointType:
+            rect = option.rect.adjusted(0, self.Spacing, 0, 0)
+            view = self.parent()
+            expanded = view is not None and view.isExpanded(index)
+            if hover:
+                painter.setBrush(self.JointHoverColor)
+            elif expanded:
+                painter.setBrush(self.JointExpandedColor)
+            else:
+                painter.setBrush(self.JointColor)
+            painter.drawRoundedRect(rect, 5, 5)
+            # 图标与文字居中
+            text_width = option.fontMetrics.horizontalAdvance(text)
+            icon_size = 16 if self.joint_icon is not None else 0
+            left = rect.x() + (rect.width() - text_width - icon_size - 4) // 2
+            if self.joint_icon is not None:
+                self.joint_icon.paint(painter, QRect(left, rect.center().y() - icon_size // 2, icon_size, icon_size))
+                left += icon_size + 4
+            painter.setPen(self.TextColor)
+            painter.drawText(QRect(left, rect.y(), rect.right() - left, rect.height()), Qt.AlignVCenter, text)
+        else:
+            rect = option.rect
+            if option.state & QStyle.State_Selected:
+                painter.fillRect(rect, self.PoseSelectedColor)
+            elif hover:
+                painter.fillRect(rect, self.PoseHoverColor)
+            left = rect.x()
+            if self.pose_pixmap is not None and not self.pose_pixmap.isNull():
+                size = min(self.pose_pixmap.height(), rect.height())
+                painter.drawPixmap(QRect(left, rect.center().y() - size // 2, size, size), self.pose_pixmap)
+                left += size + 2
+            painter.setPen(self.TextColor)
+            painter.drawText(QRect(left, rect.y(), rect.right() - left, rect.height()), Qt.AlignVCenter, text)
+        painter.restore()
+
+
+class JPTreeView(QTreeView):
+    """
+    骨骼与POSE列表视图
+        与JPlistWidget外观一致, 但只创建可见行, 适用于大量骨骼与pose
+        双击骨骼行展开/折叠, 双击pose行发出poseDoubleClicked信号
+    """
+    # 双击pose信号(骨骼名称, pose名称)
+    poseDoubleClicked = Signal(str, str)
+
+    def __init__(self, model = None, parent = None):
+        """
+        初始化骨骼与POSE列表视图
+        :param model: PoseTreeModel, 为空时创建空模型
+        :param parent:
+        """
+        QTreeView.__init__(self, parent)
+        self.setMouseTracking(True)
+        self.setHeaderHidden(True)
+        self.setIndentation(0)
+        self.setRootIsDecorated(False)
+        self.setItemsExpandable(True)
+        self.setExpandsOnDoubleClick(True)
+        self.setAnimated(True)
+        self.setFrameShape(QFrame.NoFrame)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.setItemDelegate(_PoseItemDelegate(IconPath.PLUS_PATH.value, IconPath.DELETE_PATH.value, self))
+        self.setModel(model if model is not None else PoseTreeModel(parent = self))
+        self.doubleClicked.connect(self.__onDoubleClicked)
+
+    def __onDoubleClicked(self, index):
+        """
+        双击pose行
+        :param index:
+        :return:
+        """
+        if index.data(PoseTreeModel.NodeTypeRole) == PoseTreeModel.PoseType:
+            self.poseDoubleClicked.emit(index.parent().data(Qt.DisplayRole), index.data(Qt.DisplayRole))
+
+    def setPoseData(self, data):
+        """
+        设置骨骼与pose数据
+        :param data: [(骨骼名称, [pose名称, ...]), ...]
+        :return:
+        """
+        self.model().setPoseData(data)
+
+    def setLibrary(self, library):
+        """
+        设置pose数据库
+        :param library: interface.poseLibrary.PoseLibrary
+        :return:
+        """
+        self.model().setLibrary(library)
+
+    def syncLibrary(self, library):
+        """
+        增量同步pose数据库(保留滚动位置与未变化骨骼的展开状态)
+        :param library: interface.poseLibrary.PoseLibrary
+        :return: 发生变化的骨骼数量
+        """
+        return self.model().syncLibrary(library)
+
+    def syncJoints(self, library, joints, revision = None):
+        """
+        只同步指定骨骼(PoseTreeModel.syncJoints)
+        :param library: interface.poseLibrary.PoseLibrary
+        :param joints: 修改的骨骼索引
+        :param revision: 修改前数据库的修改计数
+        :return: 发生变化的骨骼数量
+        """
+        return self.model().syncJoints(library, joints, revision)
+
+    @Slot(str)
+    def setFilterText(self, text):
+        """
+        按搜索文本过滤列表, 过滤状态下展开所有匹配的骨骼
+        :param text: 搜索文本
+        :return:
+        """
+        model = self.model()
+        model.setFilterText(text)
+        if model.isFiltered():
+            self.expandAll()
+
+    def drawBranches(self, painter, rect, index):
+        """
+        不绘制分支线
+        :param painter:
+        :param rect:
+        :param index:
+        :return:
+        """
+        pass
+
+
+__all__ = ['PoseTreeModel', 'JPTreeView']
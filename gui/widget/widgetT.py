@@ -5,15 +5,113 @@
 # Contact : 906629272@qq.com
 # Description : 自定义控件模板
 
+import os
+import time
+from functools import wraps
+
 from PySide2.QtGui import *
 from PySide2.QtCore import *
 from PySide2.QtWidgets import *
 
+from interface import tracing
+
 try:
     from ..icons import *
 except ImportError:
     pass
 
+StyleSheetPath = os.path.join(os.path.dirname(os.path.abspath(__file__)), "qss", "base.qss")
+# 样式表路径 -> 样式表文本, 只从磁盘读取一次, 所有窗口共享
+_style_sheets = {}
+
+
+def loadStyleSheet(path = StyleSheetPath):
+    """
+    读取样式表(缓存)
+    :param path: qss文件路径
+    :return: str
+    """
+    style_sheet = _style_sheets.get(path)
+    if style_sheet is None:
+        with open(path, "rb") as f:
+            style_sheet = _style_sheets[path] = f.read().decode("utf-8")
+    return style_sheet
+
+
+class PaintCounter(object):
+    """
+    绘制计数器
+        启用后统计每个控件类型的paintEvent次数与耗时, 用于测量拖拽/悬停时的绘制开销
+    """
+
+    def __init__(self):
+        self.enabled = False
+        # 控件类型名称 -> [绘制次数, 累计耗时(秒)]
+        self._stats = {}
+
+    def add(self, name, seconds):
+        """
+        记录一次绘制
+        :param name: 控件类型名称
+        :param seconds: 绘制耗时
+        :return:
+        """
+        stat = self._stats.get(name)
+        if stat is None:
+            stat = self._stats[name] = [0, 0.0]
+        stat[0] += 1
+        stat[1] += seconds
+
+    def stats(self):
+        """
+        统计信息
+        :return: {控件类型名称: {"paints": 次数, "ms": 累计耗时, "us_per_paint": 平均耗时}}
+        """
+        return {name: {"paints": count, "ms": seconds * 1000, "us_per_paint": seconds * 1e6 / count}
+                for name, (count, seconds) in self._stats.items()}
+
+    def total(self):
+        """
+        绘制总次数
+        :return:
+        """
+        return sum(count for count, _ in self._stats.values())
+
+    def reset(self):
+        """
+        清空统计
+        :return:
+        """
+        self._stats.clear()
+
+
+paintCounter = PaintCounter()
+
+
+def countPaint(paint_event):
+    """
+    paintEvent装饰器: paintCounter启用时记录绘制次数与耗时, 追踪启用时记录绘制区间(都未启用时只多两次属性判断)
+    :param paint_event: paintEvent函数
+    :return:
+    """
+    tracer = tracing.tracer
+
+    @wraps(paint_event)
+    def wrapper(self, event):
+        if not paintCounter.enabled and not tracer.enabled:
+            return paint_event(self, event)
+        start = time.perf_counter()
+        result = paint_event(self, event)
+        seconds = time.perf_counter() - start
+        name = type(self).__name__
+        if paintCounter.enabled:
+            paintCounter.add(name, seconds)
+        if tracer.enabled:
+            tracer.record(tracing.COMPLETE, name + ".paintEvent", "paint", start, seconds)
+        return result
+
+    return wrapper
+
 
 def _setLuminance(rgb, uord, percent):
     """
@@ -64,6 +162,8 @@ class _TitleBar(QWidget):
     Margins = 5
     # 移动窗口信号
     windowMoved = Signal(QPoint)
+    # 拖拽结束信号
+    dragFinished = Signal()
 
     def __init__(self, parent = None):
         QWidget.__init__(self, parent)
@@ -75,7 +175,7 @@ class _TitleBar(QWidget):
         self.is_drag = False
         # 左侧图标
         self.icon_label = QLabel()
-        self.icon_label.setPixmap(QIcon(IconPath.TITLEBAR_PATH.value).pixmap(20, 20))
+        self.icon_label.setPixmap(iconCache.pixmap(IconPath.TITLEBAR_PATH, 20))
         self.icon_label.setMouseTracking(True)
         # 最大化按钮
         self.max_button = RoundButton(radius = 20, grcolor = (17, 101, 154))
@@ -149,9 +249,10 @@ class _TitleBar(QWidget):
         :param event:
         :return:
         """
-        if event.button() == Qt.LeftButton and self._isDragRegion(event.pos()):
+        if event.button() == Qt.LeftButton and self.is_drag:
             self.is_drag = False
             self.Pos_offset = None
+            self.dragFinished.emit()
             event.accept()
         else:
             event.ignore()
@@ -187,43 +288,176 @@ class _TitleBar(QWidget):
 class FramelessWindow(QWidget):
     """
     主窗口
+        拖拽移动/缩放时几何更新按显示帧合并(每帧最多一次setGeometry),
+        通过addHeavyWidget注册的控件在缩放拖拽过程中暂停布局, 松开鼠标后只布局一次
     """
     Margins = 5
+    BackgroundColor = QColor(48, 55, 52)
+    # 拖拽时两次几何更新的最小间隔(毫秒), 0表示按屏幕刷新率
+    FrameInterval = 0
+    # 尺寸改变后的布局完成信号(窗口几何, 布局耗时(毫秒)), 用于测量拖拽时的布局开销
+    geometryApplied = Signal(QRect, float)
 
     def __init__(self, content_widget = None, parent = None):
         QWidget.__init__(self, parent)
         self.setMouseTracking(True)
+        # 背景完全不透明, 绘制前无需擦除
+        self.setAttribute(Qt.WA_OpaquePaintEvent)
 
         self._pressed = False
         self.direction = set()
         self.gpos = None
-
-        # 读取窗口样式
-        with open(__file__ + "/../qss/base.qss", "rb") as f:
-            self.setStyleSheet(f.read().decode("utf-8"))
+        # 按下鼠标时的窗口几何与鼠标全局坐标(缩放按此计算, 与中间合并掉的事件无关)
+        self._press_geometry = None
+        self._press_global = None
+        # 等待应用的窗口几何
+        self._pending_geometry = None
+        # 开始改变尺寸的时间(窗口在尺寸改变事件中布局, resizeEvent时布局已完成)
+        self._resize_start = None
+        self._geometry_timer = QTimer(self)
+        self._geometry_timer.setSingleShot(True)
+        self._geometry_timer.timeout.connect(self.__onGeometryTimer)
+        # 缩放时暂停布局的控件与已暂停的布局
+        self._heavy_widgets = []
+        self._suspended_layouts = []
+
+        # 窗口样式
+        self.setStyleSheet(loadStyleSheet())
 
         # 窗口布局
-        title_bar = _TitleBar(self)
-        title_bar.windowMoved.connect(self.move)
+        self.title_bar = _TitleBar(self)
+        self.title_bar.windowMoved.connect(self.requestMove)
+        self.title_bar.dragFinished.connect(self.flushGeometry)
         self.main_layout = QVBoxLayout()
         self.setLayout(self.main_layout)
         self.main_layout.setContentsMargins(0, 0, 0, 0)
         self.main_layout.setSpacing(0)
-        self.main_layout.addWidget(title_bar)
+        self.main_layout.addWidget(self.title_bar)
         self.main_layout.addWidget(content_widget)
         # 事件过滤器
         self.installEventFilter(self)
 
+    def frameInterval(self):
+        """
+        几何更新间隔(毫秒)
+        :return:
+        """
+        if self.FrameInterval:
+            return self.FrameInterval
+        # QWidget.screen()需要Qt 5.14
+        window = self.windowHandle()
+        screen = (window.screen() if window is not None else None) or QGuiApplication.primaryScreen()
+        rate = screen.refreshRate() if screen is not None else 60.0
+        return max(1, int(round(1000.0 / (rate or 60.0))))
+
+    def addHeavyWidget(self, widget):
+        """
+        注册布局开销较大的控件, 缩放拖拽过程中暂停其布局
+        :param widget: QWidget(需要有layout)
+        :return:
+        """
+        if widget not in self._heavy_widgets:
+            self._heavy_widgets.append(widget)
+
+    def _suspendLayouts(self):
+        """
+        暂停注册控件的布局
+        :return:
+        """
+        for widget in self._heavy_widgets:
+            layout = widget.layout()
+            if layout is not None and layout.isEnabled():
+                layout.setEnabled(False)
+                self._suspended_layouts.append(layout)
+
+    def _resumeLayouts(self):
+        """
+        恢复注册控件的布局并立即布局一次
+        :return:
+        """
+        if not self._suspended_layouts:
+            return
+        start = time.perf_counter()
+        for layout in self._suspended_layouts:
+            layout.setEnabled(True)
+            layout.invalidate()
+            layout.activate()
+        self._suspended_layouts = []
+        self.geometryApplied.emit(self.geometry(), (time.perf_counter() - start) * 1000)
+
+    def requestGeometry(self, rect):
+        """
+        请求设置窗口几何
+            距上次更新超过一帧时立即应用, 否则只记录最新的几何, 在下一帧应用
+        :param rect: QRect
+        :return:
+        """
+        self._pending_geometry = QRect(rect)
+        if not self._geometry_timer.isActive():
+            self._applyPendingGeometry()
+
+    @Slot(QPoint)
+    def requestMove(self, pos):
+        """
+        请求移动窗口(按帧合并)
+        :param pos: 窗口左上角全局坐标
+        :return:
+        """
+        size = self._pending_geometry.size() if self._pending_geometry is not None else self.geometry().size()
+        self.requestGeometry(QRect(pos, size))
+
+    @Slot()
+    def flushGeometry(self):
+        """
+        结束拖拽: 立即应用等待中的几何并恢复暂停的布局
+        :return:
+        """
+        self._geometry_timer.stop()
+        self._applyPendingGeometry(restart = False)
+        self._resumeLayouts()
+
+    def _applyPendingGeometry(self, restart = True):
+        """
+        应用等待中的几何
+        :param restart: 是否开始下一帧计时
+        :return:
+        """
+        rect, self._pending_geometry = self._pending_geometry, None
+        if rect is None or rect == self.geometry():
+            return
+        self._resize_start = time.perf_counter() if rect.size() != self.size() else None
+        self.setGeometry(rect)
+        if restart:
+            self._geometry_timer.start(self.frameInterval())
+
+    def resizeEvent(self, event):
+        """
+        尺寸改变: 此时布局已完成, 发送从setGeometry到布局完成的耗时(顶层窗口可能在之后的事件中才收到尺寸改变)
+        :param event:
+        :return:
+        """
+        QWidget.resizeEvent(self, event)
+        if self._resize_start is not None:
+            self.geometryApplied.emit(self.geometry(), (time.perf_counter() - self._resize_start) * 1000)
+            self._resize_start = None
+
+    def __onGeometryTimer(self):
+        """
+        下一帧: 应用这一帧内最后一次请求的几何
+        :return:
+        """
+        if self._pending_geometry is not None:
+            self._applyPendingGeometry()
+
+    @countPaint
     def paintEvent(self, event):
         """
-        绘制背景
+        绘制背景(只填充需要重绘的区域)
         :param event:
         :return:
         """
         painter = QPainter(self)
-        painter.setPen(Qt.NoPen)
-        painter.setBrush(QColor(48, 55, 52))
-        painter.drawRect(self.rect())
+        painter.fillRect(event.rect(), self.BackgroundColor)
         painter.end()
 
     def mousePressEvent(self, event):
@@ -236,6 +470,8 @@ class FramelessWindow(QWidget):
             self.gpos = event.pos()
             self._pressed = True
             rect = self.geometry()
+            self._press_geometry = QRect(rect)
+            self._press_global = event.globalPos()
             side_check = {
                 "left": QRect(rect.x(), rect.y(), self.Margins, rect.height()),
                 "right": QRect(rect.x() + rect.width() - self.Margins, rect.y(), self.Margins, rect.height()),
@@ -246,6 +482,8 @@ class FramelessWindow(QWidget):
             for side, rect in side_check.items():
                 if rect.contains(event.globalPos()):
                     self.direction.add(side)
+            if self.direction:
+                self._suspendLayouts()
 
     def mouseReleaseEvent(self, event):
         """
@@ -256,6 +494,7 @@ class FramelessWindow(QWidget):
         if event.button() == Qt.LeftButton:
             self._pressed = False
             self.direction.clear()
+            self.flushGeometry()
 
     def mouseMoveEvent(self, event):
         """
@@ -300,35 +539,35 @@ class FramelessWindow(QWidget):
 
     def _resizeWidget(self, event):
         """
-        窗口缩放事件
+        窗口缩放事件(按下鼠标时的几何加上鼠标移动距离, 按帧合并应用)
         :param event: 鼠标事件
         :return:
         """
-        rect = self.geometry()
-        x, y, w, h = rect.x(), rect.y(), rect.width(), rect.height()
-        # 点击时的坐标与移动时的坐标差值
-        mpos = event.pos() - self.gpos
+        if self._press_geometry is None or not self.direction:
+            return
+        rect = QRect(self._press_geometry)
+        # 按下时的坐标与移动时的坐标差值
+        mpos = event.globalPos() - self._press_global
+        min_w, min_h = self.minimumWidth(), self.minimumHeight()
         if "left" in self.direction:
-            if rect.width() - mpos.x() > self.minimumWidth():
-                x += mpos.x()
-                w -= mpos.x()
+            rect.setLeft(min(rect.left() + mpos.x(), rect.right() + 1 - min_w))
         if "right" in self.direction:
-            w = event.globalX() - rect.x()
+            rect.setRight(max(rect.right() + mpos.x(), rect.left() + min_w - 1))
         if "top" in self.direction:
-            # print(rect.height(), mpos.y(), rect.height() - mpos.y(), self.minimumHeight())
-            if rect.height() - mpos.y() > self.minimumHeight():
-                y += mpos.y()
-                h -= mpos.y()
+            rect.setTop(min(rect.top() + mpos.y(), rect.bottom() + 1 - min_h))
         if "bottom" in self.direction:
-            h = event.globalY() - rect.y()
-        self.setGeometry(x, y, w, h)
+            rect.setBottom(max(rect.bottom() + mpos.y(), rect.top() + min_h - 1))
+        self.requestGeometry(rect)
 
 
 class RoundButton(QAbstractButton):
     """
     圆形按钮控件
+        各状态的颜色在设置颜色时计算一次, 相同颜色的按钮共享
     """
     NORMAL, HOVER, PRESS = range(3)
+    # 按钮颜色(r,g,b) -> 各状态颜色(NORMAL, HOVER, PRESS)
+    _state_colors = {}
 
     def __init__(self, radius = 25, grcolor = None):
         """
@@ -339,11 +578,37 @@ class RoundButton(QAbstractButton):
         """
         QAbstractButton.__init__(self)
         self._radius = radius
-        self._grcolor = grcolor
+        self._rect = QRectF(QPointF(0, 0), QSizeF(self._radius, self._radius))
         self._state = self.NORMAL
+        self.setColor(grcolor)
         self.setCursor(Qt.PointingHandCursor)
         self.setFixedSize(self._radius, self._radius)
 
+    @classmethod
+    def stateColors(cls, grcolor):
+        """
+        获取各状态颜色(缓存)
+        :param grcolor: 颜色(r,g,b)
+        :return: (NORMAL颜色, HOVER颜色, PRESS颜色)
+        """
+        grcolor = tuple(grcolor)
+        colors = cls._state_colors.get(grcolor)
+        if colors is None:
+            colors = cls._state_colors[grcolor] = (QColor(*grcolor),
+                                                   QColor(*_setLuminance(grcolor, True, 0.2)),
+                                                   QColor(*_setLuminance(grcolor, True, 0.35)))
+        return colors
+
+    def setColor(self, grcolor):
+        """
+        设置按钮颜色
+        :param grcolor: 颜色(r,g,b)
+        :return:
+        """
+        self._grcolor = grcolor
+        self._colors = self.stateColors(grcolor) if grcolor is not None else (QColor(), ) * 3
+        self.update()
+
     def sizeHint(self):
         """
         返回控件大小
@@ -403,27 +668,19 @@ class RoundButton(QAbstractButton):
         self.set_state(self.NORMAL)
         QAbstractButton.leaveEvent(self, event)
 
+    @countPaint
     def paintEvent(self, event):
         """
         绘制控件
         :param event:
         :return:
         """
-        # 设置颜色
-        background_color = QColor(self._grcolor[0], self._grcolor[1], self._grcolor[2])
-        if self._state == self.HOVER:
-            background_color = _setLuminance(self._grcolor, True, 0.2)
-            background_color = QColor(background_color[0], background_color[1], background_color[2])
-        elif self._state == self.PRESS:
-            background_color = _setLuminance(self._grcolor, True, 0.35)
-            background_color = QColor(background_color[0], background_color[1], background_color[2])
-        # 开始绘制
         painter = QPainter(self)
         painter.setRenderHint(QPainter.Antialiasing)
         painter.setPen(Qt.NoPen)
         # 绘制圆形
-        painter.setBrush(background_color)
-        painter.drawEllipse(QRectF(QPointF(0, 0), QSizeF(self._radius, self._radius)))
+        painter.setBrush(self._colors[self._state])
+        painter.drawEllipse(self._rect)
         painter.end()
 
 
@@ -447,12 +704,24 @@ class IconButton(QAbstractButton):
         self.icon_path = icon_path
         self.icon_size = icon_size
         self.margin = margin
-        self.hover_color = hover_color
+        self.setHoverColor(hover_color)
 
         self.setFixedSize(QSize(icon_size + margin * 2, icon_size + margin * 2))
+        self._icon_rect = self.rect().adjusted(margin, margin, -margin, -margin)
 
-        self.icon = QPixmap(icon_path)
-        self.icon = self.icon.scaled(icon_size, icon_size)
+        # 同一图标与尺寸的按钮共享缓存中的图标
+        self.icon = iconCache.pixmap(icon_path, icon_size)
+
+    def setHoverColor(self, hover_color):
+        """
+        设置鼠标悬停颜色, 同时计算按下颜色
+        :param hover_color: 悬停颜色(r,g,b,a)
+        :return:
+        """
+        self.hover_color = hover_color
+        self._hover_brush = QBrush(QColor(*hover_color))
+        self._pressed_brush = QBrush(QColor(*_setOpacity(hover_color, True, 0.5)))
+        self.update()
 
     def mousePressEvent(self, event):
         """
@@ -496,24 +765,19 @@ class IconButton(QAbstractButton):
         self.update()
         QAbstractButton.leaveEvent(self, event)
 
+    @countPaint
     def paintEvent(self, event):
+        """
+        绘制控件
+        :param event:
+        :return:
+        """
         painter = QPainter(self)
-        hover_color = QColor(self.hover_color[0], self.hover_color[1], self.hover_color[2], self.hover_color[3])
-        pressed_color = _setOpacity(self.hover_color, True, 0.5)
-        pressed_color = QColor(pressed_color[0], pressed_color[1], pressed_color[2], pressed_color[3])
-        # if self.rect().contains(self.mapFromGlobal(QCursor.pos())):
-        #     painter.setPen(Qt.NoPen)
-        #     painter.setBrush(self.hover_color)
-        #     painter.drawRect(self.rect())
         if self._pressed:
-            painter.setPen(Qt.NoPen)
-            painter.setBrush(pressed_color)
-            painter.drawRect(self.rect())
+            painter.fillRect(self.rect(), self._pressed_brush)
         elif self._hover:
-            painter.setPen(Qt.NoPen)
-            painter.setBrush(hover_color)
-            painter.drawRect(self.rect())
-        painter.drawPixmap(self.rect().adjusted(self.margin, self.margin, -self.margin, -self.margin), self.icon)
+            painter.fillRect(self.rect(), self._hover_brush)
+        painter.drawPixmap(self._icon_rect, self.icon)
         painter.end()
 
 
@@ -618,7 +882,7 @@ class _RootTreeWidgetItem(QTreeWidgetItem):
         item = _ChildTreeWidgetItem(parent)
         item.setText(0, text)
         if icon_path:
-            item.setIcon(0, QIcon(icon_path))
+            item.setIcon(0, iconCache.icon(icon_path))
         self.addChild(item)
         return item
 
@@ -676,6 +940,116 @@ class _ToolButton(QPushButton):
         self._double_click = double_clicked
 
 
+class _CollapseAnimator(QObject):
+    """
+    折叠动画共享时钟
+        所有_CollapsibleBox共用一个定时器: 每帧先更新全部播放中的折叠控件高度, 再对每个容器做一次布局,
+        避免每个折叠控件各自的动画在同一帧内反复触发整个列表重新布局;
+        不可见(未显示或被滚动区域裁剪)的折叠控件不播放动画, 直接跳到结束状态
+    """
+    # 帧间隔(毫秒)
+    FrameInterval = 16
+
+    def __init__(self, parent = None):
+        QObject.__init__(self, parent)
+        # 折叠控件 -> 方向(1展开/-1折叠)
+        self._boxes = {}
+        self._last_tick = 0.0
+        self._timer = QTimer(self)
+        self._timer.setInterval(self.FrameInterval)
+        self._timer.timeout.connect(self._tick)
+        # 已播放的帧数
+        self.frames = 0
+
+    def isRunning(self):
+        return self._timer.isActive()
+
+    def isAnimating(self, box):
+        """
+        折叠控件是否在播放动画
+        :param box: _CollapsibleBox
+        :return:
+        """
+        return box in self._boxes
+
+    def animate(self, box, expanded):
+        """
+        播放折叠控件的展开/折叠动画(从当前进度开始, 播放中反向时不会跳变)
+        :param box: _CollapsibleBox
+        :param expanded: 是否展开
+        :return:
+        """
+        end = 1.0 if expanded else 0.0
+        if box.animation_duration <= 0 or not box.isVisible() or box.visibleRegion().isEmpty():
+            self.stop(box)
+            box.setProgress(end)
+            return
+        if box.progress == end:
+            self.stop(box)
+            return
+        self._boxes[box] = 1 if expanded else -1
+        if not self._timer.isActive():
+            self._last_tick = time.perf_counter()
+            self._timer.start()
+
+    def stop(self, box):
+        """
+        停止折叠控件的动画(保持当前高度)
+        :param box: _CollapsibleBox
+        :return:
+        """
+        self._boxes.pop(box, None)
+        if not self._boxes:
+            self._timer.stop()
+
+    def _tick(self):
+        """
+        播放一帧
+        :return:
+        """
+        now = time.perf_counter()
+        elapsed = (now - self._last_tick) * 1000
+        self._last_tick = now
+        containers = []
+        finished = []
+        for box, direction in list(self._boxes.items()):
+            try:
+                container = box.parentWidget()
+                if container is not None and container not in containers:
+                    containers.append(container)
+                progress = min(max(box.progress + direction * elapsed / box.animation_duration, 0.0), 1.0)
+                box.setProgress(progress)
+            except RuntimeError:
+                # 折叠控件已被销毁
+                finished.append(box)
+                continue
+            if progress == 0.0 or progress == 1.0:
+                finished.append(box)
+        for box in finished:
+            self._boxes.pop(box, None)
+        for container in containers:
+            layout = container.layout()
+            if layout is not None:
+                layout.activate()
+        self.frames += 1
+        if not self._boxes:
+            self._timer.stop()
+
+
+_collapse_animator = None
+
+
+def collapseAnimator():
+    """
+    获取折叠动画共享时钟(首次调用时创建)
+    :return: _CollapseAnimator
+    """
+    global _collapse_animator
+    if _collapse_animator is None:
+        _collapse_animator = _CollapseAnimator()
+    return _collapse_animator
+
+
 class _CollapsibleBox(QWidget):
     """
     折叠控件
@@ -684,8 +1058,10 @@ class _CollapsibleBox(QWidget):
             - 折叠控件
             |- 控件01
             |- 控件02
+        动画由collapseAnimator()统一驱动
     """
 
+    @tracing.traced("_CollapsibleBox.__init__", "widget")
     def __init__(self, title = "", icon_path = None, parent = None, animation_duration = 300):
         """
         初始化
@@ -695,14 +1071,16 @@ class _CollapsibleBox(QWidget):
         """
         QWidget.__init__(self, parent)
         self.animation_duration = animation_duration
+        # 展开进度(0为折叠, 1为展开)
+        self.progress = 0.0
+        self._collapsed_height = 0
+        self._content_height = 0
         # 创建QToolButton用于激活下拉，双击下拉时激活折叠动画
         self.toggle_button = _ToolButton(title)
         if icon_path:
-            self.toggle_button.setIcon(QIcon(icon_path))
+            self.toggle_button.setIcon(iconCache.icon(icon_path))
         # 点击激活self.on_pressed
         self.toggle_button.doubleClicked.connect(self.on_pressed)
-        # 并行动画容器组。在它启动时将启动组内所有动画，即并行运行所有动画。当持续时间最长的动画结束时，动画组结束。
-        self.toggle_animation = QParallelAnimationGroup()
         # QScrollArea滚动控件
         self.content_area = QScrollArea(maximumHeight = 0, minimumHeight = 0)
         # 设置水平与垂直大小调整策略，QSizePolicy类用于描述一个窗口小部件如何在布局中调整自己的大小。
@@ -711,14 +1089,6 @@ class _CollapsibleBox(QWidget):
         self.content_area.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
         # 取消边框
         self.content_area.setFrameShape(QFrame.NoFrame)
-        # 设置动画QPropertyAnimation(QObject target, QByteArray propertyName, QObject parent)
-        # target为准备进行动画动作的对象，可以不填，不填时动画对象创建后要使用setTargetObject来设置动作对象；
-        # propertyName为动作对象变更的属性，可以不填，不填时动画对象创建并设置动画动作的对象要使用setPropertyName来设置变更的属性.
-        # parent为动作对象的父对象，可以不填，不填默认为None。
-        # 将动画添加到动画组中，分别控制控件最小高度、最大高度和内容区域最大高度
-        self.toggle_animation.addAnimation(QPropertyAnimation(self, b"minimumHeight"))
-        self.toggle_animation.addAnimation(QPropertyAnimation(self, b"maximumHeight"))
-        self.toggle_animation.addAnimation(QPropertyAnimation(self.content_area, b"maximumHeight"))
         # 构建布局
         self.main_layout = QVBoxLayout()
         self.main_layout.setSpacing(0)
@@ -740,9 +1110,40 @@ class _CollapsibleBox(QWidget):
         播放动画
         :return:
         """
-        direction = QAbstractAnimation.Forward if checked else QAbstractAnimation.Backward
-        self.toggle_animation.setDirection(direction)
-        self.toggle_animation.start()
+        self.setExpanded(checked)
+
+    def isExpanded(self):
+        """
+        是否展开(动画播放中时为动画的目标状态)
+        :return:
+        """
+        return self.toggle_button._double_click
+
+    def setExpanded(self, expanded, animate = True):
+        """
+        展开/折叠
+        :param expanded: 是否展开
+        :param animate: 是否播放动画, False时立即切换
+        :return:
+        """
+        self.toggle_button.setDoubleClicked(expanded)
+        animator = collapseAnimator()
+        if animate:
+            animator.animate(self, expanded)
+        else:
+            animator.stop(self)
+            self.setProgress(1.0 if expanded else 0.0)
+
+    def setProgress(self, progress):
+        """
+        设置展开进度(同时设置控件高度与内容区域高度)
+        :param progress: 0为折叠, 1为展开
+        :return:
+        """
+        self.progress = progress
+        content_height = int(round(self._content_height * progress))
+        self.setFixedHeight(self._collapsed_height + content_height)
+        self.content_area.setMaximumHeight(content_height)
 
     def setContentLayout(self, content_layout):
         """
@@ -755,19 +1156,9 @@ class _CollapsibleBox(QWidget):
         # 添加布局
         self.content_area.setLayout(content_layout)
         # 计算折叠和展开时的高度
-        collapsed_height = (self.sizeHint().height() - self.content_area.maximumHeight())
-        content_height = content_layout.sizeHint().height()
-        # 更新动画的开始值和结束值
-        for i in range(self.toggle_animation.animationCount()):
-            # 设置动画值
-            animation = self.toggle_animation.animationAt(i)
-            animation.setDuration(self.animation_duration)
-            animation.setStartValue(collapsed_height)
-            animation.setEndValue(collapsed_height + content_height)
-        content_animation = self.toggle_animation.animationAt(self.toggle_animation.animationCount() - 1)
-        content_animation.setDuration(self.animation_duration)
-        content_animation.setStartValue(0)
-        content_animation.setEndValue(content_height)
+        self._collapsed_height = (self.sizeHint().height() - self.content_area.maximumHeight())
+        self._content_height = content_layout.sizeHint().height()
+        self.setProgress(self.progress)
 
 
 class _ListItemWidget(QWidget):
@@ -789,7 +1180,7 @@ class _ListItemWidget(QWidget):
 
         if icon_path:
             icon_label = QLabel(self)
-            icon_label.setPixmap(QPixmap(icon_path))
+            icon_label.setPixmap(iconCache.pixmap(icon_path))
             self.main_layout.addWidget(icon_label)
         self.text_label = QLabel(text, self)
         self.main_layout.addWidget(self.text_label)
@@ -800,6 +1191,7 @@ class JPlistWidget(QScrollArea):
     骨骼与POSE列表控件
     """
 
+    @tracing.traced("JPlistWidget.__init__", "widget")
     def __init__(self, parent = None):
         """
         初始化骨骼与POSE列表控件
@@ -817,8 +1209,32 @@ class JPlistWidget(QScrollArea):
         for i in range(10):
             self.main_layout.addWidget(_CollapsibleBox("骨骼列表", icon_path = IconPath.PLUS_PATH.value))
 
+    def boxes(self):
+        """
+        列表中的折叠控件
+        :return: [_CollapsibleBox, ...]
+        """
+        items = (self.main_layout.itemAt(i).widget() for i in range(self.main_layout.count()))
+        return [widget for widget in items if isinstance(widget, _CollapsibleBox)]
+
+    def setAllExpanded(self, expanded):
+        """
+        立即展开/折叠全部骨骼(不播放动画, 只重新布局与重绘一次)
+        :param expanded: 是否展开
+        :return:
+        """
+        for box in self.boxes():
+            box.setExpanded(expanded, animate = False)
+        self.main_layout.activate()
+
+    def expandAll(self):
+        self.setAllExpanded(True)
+
+    def collapseAll(self):
+        self.setAllExpanded(False)
+
 
-__all__ = ['FramelessWindow', 'RoundButton', 'IconButton', 'SearchLine', 'JPlistWidget']
+__all__ = ['loadStyleSheet', 'PaintCounter', 'paintCounter', 'countPaint', 'FramelessWindow', 'RoundButton', 'IconButton', 'SearchLine', 'JPlistWidget', 'collapseAnimator']
 
 if __name__ == '__main__':
     test = _setLuminance((73, 117, 104), False, 0.1)
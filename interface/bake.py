@@ -0,0 +1,362 @@
+# -*- coding: UTF-8 -*-
+# Author  : AitrusC
+# FileName: bake
+# Time    : 2024-10-02
+# Contact : 906629272@qq.com
+# Description : 多进程批量烘焙pose权重与驱动值(不依赖Maya, 入口为根目录的bake.py)
+#               pose数据库数组放入共享内存, 子进程只映射不复制; 动画片段按大小分配给进程池, 每个片段输出一个npz
+#
+#   片段文件(.npz): joints (J,) 骨骼名称, rotations (F, J, 4) 四元数
+#   输出文件(.npz): weights (F, P) pose权重, values (F, T) 驱动目标的值, key 输入标识(用于断点续算)
+#   输出目录下的bake.json记录列对应的pose与目标名称
+#
+#   python bake.py library.pdlib clips/ -o baked/ --workers 32
+
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import numpy as np
+
+from .poseLibrary import PoseLibrary
+from .solver import RBFSolver, SolverCache
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    # Python 3.7(Maya 2022以前)没有共享内存, 数组随进程初始化参数传递
+    shared_memory = None
+
+# 子进程共享的数据库数组
+SharedArrays = ("joint_offsets", "rotations", "target_offsets", "edge_targets", "edge_values")
+ClipExtension = ".npz"
+ManifestName = "bake.json"
+# 每次求解的帧数
+ChunkSize = 4096
+
+# 子进程中的数据(由_initWorker设置)
+_worker = {}
+
+
+def loadLibrary(path):
+    """
+    加载pose数据库(.jsonl/.json为导出的pose设置, 其他为二进制数据库)
+    :param path: 文件路径
+    :return: PoseLibrary
+    """
+    if os.path.splitext(path)[1].lower() in (".jsonl", ".ndjson", ".json"):
+        from .poseIO import importLibrary
+        return importLibrary(path)
+    return PoseLibrary.load(path)
+
+
+def libraryKey(library):
+    """
+    数据库内容摘要(驱动改变后摘要改变, 已烘焙的片段需要重新烘焙)
+    :param library: PoseLibrary
+    :return: str
+    """
+    digest = hashlib.sha1()
+    for name in SharedArrays:
+        digest.update(np.ascontiguousarray(getattr(library, name)).tobytes())
+    digest.update(json.dumps(library.jointNames()).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def findClips(directory, exclude = None):
+    """
+    查找目录下的全部片段文件
+    :param directory: 片段目录
+    :param exclude: 跳过的子目录(例如位于片段目录中的输出目录)
+    :return: [相对路径, ...]
+    """
+    clips = []
+    exclude = os.path.realpath(exclude) if exclude else None
+    for root, dirs, files in os.walk(directory):
+        if exclude is not None:
+            dirs[:] = [name for name in dirs if os.path.realpath(os.path.join(root, name)) != exclude]
+        for name in files:
+            if name.lower().endswith(ClipExtension):
+                clips.append(os.path.relpath(os.path.join(root, name), directory))
+    return sorted(clips)
+
+
+def clipKey(path, library_key):
+    """
+    片段输入标识: 数据库摘要 + 片段文件大小与修改时间
+    :param path: 片段文件
+    :param library_key: 数据库摘要
+    :return: str
+    """
+    stat = os.stat(path)
+    return "{}:{}:{}".format(library_key, stat.st_size, stat.st_mtime_ns)
+
+
+def isBaked(path, key):
+    """
+    输出文件是否存在且与输入一致
+    :param path: 输出文件
+    :param key: 输入标识
+    :return: bool
+    """
+    if not os.path.isfile(path):
+        return False
+    try:
+        with np.load(path) as data:
+            return str(data["key"]) == key
+    except (OSError, ValueError, KeyError):
+        # 写入中断的文件视为未烘焙
+        return False
+
+
+def _shareArrays(arrays):
+    """
+    将数组复制到一块共享内存
+    :param arrays: {名称: 数组}
+    :return: (SharedMemory, {名称: (dtype, shape, 偏移)})
+    """
+    layout, offset = {}, 0
+    for name, array in arrays.items():
+        layout[name] = (array.dtype.str, array.shape, offset)
+        offset += -(-array.nbytes // 64) * 64
+    block = shared_memory.SharedMemory(create = True, size = max(offset, 1))
+    for name, array in arrays.items():
+        dtype, shape, start = layout[name]
+        np.ndarray(shape, dtype = dtype, buffer = block.buf, offset = start)[...] = array
+    return block, layout
+
+
+def _attachArrays(buffer, layout):
+    """
+    由共享内存创建只读数组视图
+    :param buffer: 共享内存缓冲区
+    :param layout: {名称: (dtype, shape, 偏移)}
+    :return: {名称: 数组}
+    """
+    arrays = {}
+    for name, (dtype, shape, start) in layout.items():
+        array = np.ndarray(shape, dtype = dtype, buffer = buffer, offset = start)
+        array.flags.writeable = False
+        arrays[name] = array
+    return arrays
+
+
+def _initWorker(joint_names, target_count, block_name, layout, arrays):
+    """
+    子进程初始化: 映射共享内存中的数据库数组
+    :param joint_names: [骨骼名称, ...]
+    :param target_count: 目标数量
+    :param block_name: 共享内存名称, 为空时使用arrays
+    :param layout: 共享内存布局
+    :param arrays: 不使用共享内存时的数组
+    :return:
+    """
+    if block_name is not None:
+        block = shared_memory.SharedMemory(name = block_name)
+        # 保持引用, 进程退出前不关闭
+        _worker["block"] = block
+        arrays = _attachArrays(block.buf, layout)
+    _worker["arrays"] = arrays
+    _worker["joints"] = {name: j for j, name in enumerate(joint_names)}
+    _worker["target_count"] = target_count
+    _worker["solvers"] = SolverCache(_jointSolver)
+    _worker["driven"] = {}
+
+
+def _jointSolver(joint):
+    """
+    骨骼的求解器(SolverCache的factory)
+    :param joint: 骨骼索引
+    :return: RBFSolver
+    """
+    arrays = _worker["arrays"]
+    span = slice(int(arrays["joint_offsets"][joint]), int(arrays["joint_offsets"][joint + 1]))
+    return RBFSolver(arrays["rotations"][span])
+
+
+def _jointDriven(joint):
+    """
+    骨骼的pose -> 驱动值矩阵(只包含该骨骼驱动的目标)
+    :param joint: 骨骼索引
+    :return: (目标索引 (U,), 驱动值 (M, U))
+    """
+    driven = _worker["driven"].get(joint)
+    if driven is None:
+        arrays = _worker["arrays"]
+        first, last = int(arrays["joint_offsets"][joint]), int(arrays["joint_offsets"][joint + 1])
+        offsets = arrays["target_offsets"][first:last + 1]
+        edges = slice(int(offsets[0]), int(offsets[-1]))
+        targets, columns = np.unique(arrays["edge_targets"][edges], return_inverse = True)
+        rows = np.repeat(np.arange(last - first), np.diff(offsets))
+        matrix = np.zeros((last - first, len(targets)), dtype = np.float32)
+        np.add.at(matrix, (rows, columns), arrays["edge_values"][edges])
+        driven = _worker["driven"][joint] = (targets, matrix)
+    return driven
+
+
+def bakeClip(clip_path, output_path, key):
+    """
+    烘焙一个片段(在子进程中运行)
+    :param clip_path: 片段文件
+    :param output_path: 输出文件
+    :param key: 输入标识
+    :return: (片段文件, 帧数, 匹配的骨骼数量, 耗时)
+    """
+    start = time.perf_counter()
+    arrays = _worker["arrays"]
+    joint_offsets = arrays["joint_offsets"]
+    with np.load(clip_path) as data:
+        names = [str(name) for name in data["joints"]]
+        rotations = np.asarray(data["rotations"], dtype = np.float64)
+    frames = rotations.shape[0]
+    weights = np.zeros((frames, int(joint_offsets[-1])), dtype = np.float32)
+    values = np.zeros((frames, _worker["target_count"]), dtype = np.float32)
+    matched = 0
+    for column, name in enumerate(names):
+        joint = _worker["joints"].get(name)
+        if joint is None or joint_offsets[joint] == joint_offsets[joint + 1]:
+            continue
+        matched += 1
+        span = slice(int(joint_offsets[joint]), int(joint_offsets[joint + 1]))
+        weights[:, span] = _worker["solvers"].get(joint).evaluate(rotations[:, column], ChunkSize, np.float32)
+        targets, matrix = _jointDriven(joint)
+        if len(targets):
+            values[:, targets] += weights[:, span] @ matrix
+    # 先写临时文件再替换, 中断时不会留下不完整的输出
+    directory = os.path.dirname(output_path)
+    if directory:
+        os.makedirs(directory, exist_ok = True)
+    tmp_path = output_path + ".tmp.npz"
+    np.savez(tmp_path, weights = weights, values = values, key = np.array(key))
+    os.replace(tmp_path, output_path)
+    return clip_path, frames, matched, time.perf_counter() - start
+
+
+def _bakeTask(task):
+    return bakeClip(*task)
+
+
+def printProgress(done, total, clip, frames, elapsed):
+    """
+    默认进度输出
+    :param done: 完成的片段数量
+    :param total: 需要烘焙的片段数量
+    :param clip: 片段文件
+    :param frames: 已烘焙的总帧数
+    :param elapsed: 已用时间(秒)
+    :return:
+    """
+    remaining = elapsed / done * (total - done) if done else 0.0
+    sys.stderr.write("[{}/{}] {:.0f} frames/s  eta {:.0f}s  {}\n".format(
+        done, total, frames / elapsed if elapsed > 0 else 0.0, remaining, clip))
+    sys.stderr.flush()
+
+
+def bake(library, clip_dir, output_dir, workers = None, force = False, progress = printProgress):
+    """
+    批量烘焙
+    :param library: PoseLibrary或数据库文件路径
+    :param clip_dir: 片段目录
+    :param output_dir: 输出目录(保持片段的相对路径)
+    :param workers: 进程数量, 默认为CPU数量; 为0时在当前进程中烘焙
+    :param force: 是否忽略已烘焙的结果
+    :param progress: progress(完成数量, 总数, 片段文件, 总帧数, 已用时间), 为空时不输出
+    :return: {"clips", "baked", "skipped", "frames", "seconds"}
+    """
+    start = time.perf_counter()
+    if os.path.realpath(clip_dir) == os.path.realpath(output_dir):
+        raise ValueError("输出目录不能与片段目录相同: {}".format(output_dir))
+    if not isinstance(library, PoseLibrary):
+        library = loadLibrary(library)
+    key = libraryKey(library)
+    os.makedirs(output_dir, exist_ok = True)
+    with open(os.path.join(output_dir, ManifestName), "w", encoding = "utf-8") as f:
+        json.dump({"library": key, "joints": library.jointNames(),
+                   "poses": [library.poseName(p) for p in range(library.poseCount)],
+                   "targets": [library.targetName(t) for t in range(library.targetCount)]}, f, ensure_ascii = False)
+
+    # 跳过已烘焙的片段, 剩余片段按文件大小从大到小分配(减少最后等待单个大片段的时间)
+    tasks, skipped = [], 0
+    # 输出目录位于片段目录中时跳过, 否则下一次运行会把输出当作片段
+    for clip in findClips(clip_dir, output_dir):
+        clip_path = os.path.join(clip_dir, clip)
+        output_path = os.path.join(output_dir, clip)
+        clip_key = clipKey(clip_path, key)
+        if not force and isBaked(output_path, clip_key):
+            skipped += 1
+            continue
+        tasks.append((clip_path, output_path, clip_key))
+    tasks.sort(key = lambda task: os.path.getsize(task[0]), reverse = True)
+    result = {"clips": len(tasks) + skipped, "baked": 0, "skipped": skipped, "frames": 0, "seconds": 0.0}
+    if not tasks:
+        result["seconds"] = time.perf_counter() - start
+        return result
+
+    arrays = {name: np.ascontiguousarray(getattr(library, name)) for name in SharedArrays}
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(tasks))
+    block = None
+    if workers and shared_memory is not None:
+        block, layout = _shareArrays(arrays)
+        initargs = (library.jointNames(), library.targetCount, block.name, layout, None)
+    else:
+        initargs = (library.jointNames(), library.targetCount, None, None, arrays)
+
+    def report(clip, frames):
+        result["baked"] += 1
+        result["frames"] += frames
+        if progress is not None:
+            progress(result["baked"], len(tasks), clip, result["frames"], time.perf_counter() - start)
+
+    try:
+        if not workers:
+            _initWorker(*initargs)
+            for task in tasks:
+                report(*bakeClip(*task)[:2])
+        else:
+            # 每个进程只使用一个BLAS线程, 并行度由进程数量决定
+            saved = {name: os.environ.get(name) for name in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS",
+                                                             "MKL_NUM_THREADS")}
+            os.environ.update(dict.fromkeys(saved, "1"))
+            try:
+                pool = multiprocessing.get_context("spawn").Pool(workers, _initWorker, initargs)
+            finally:
+                for name, value in saved.items():
+                    if value is None:
+                        os.environ.pop(name, None)
+                    else:
+                        os.environ[name] = value
+            with pool:
+                for clip, frames, _, _ in pool.imap_unordered(_bakeTask, tasks):
+                    report(clip, frames)
+    finally:
+        _worker.clear()
+        if block is not None:
+            block.close()
+            block.unlink()
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "批量烘焙动画片段的pose权重与驱动值")
+    parser.add_argument("library", help = "pose数据库文件(.pdlib二进制或导出的.jsonl/.json)")
+    parser.add_argument("clips", help = "片段目录(.npz: joints, rotations)")
+    parser.add_argument("-o", "--output", required = True, help = "输出目录")
+    parser.add_argument("-j", "--workers", type = int, default = None, help = "进程数量, 默认为CPU数量, 0为单进程")
+    parser.add_argument("--force", action = "store_true", help = "重新烘焙已有结果的片段")
+    parser.add_argument("-q", "--quiet", action = "store_true", help = "不输出进度")
+    args = parser.parse_args(argv)
+    r = bake(args.library, args.clips, args.output, args.workers, args.force,
+             None if args.quiet else printProgress)
+    print("baked {} clips ({} skipped), {} frames in {:.2f}s".format(r["baked"], r["skipped"], r["frames"],
+                                                                     r["seconds"]))
+    return 0
+
+
+__all__ = ['loadLibrary', 'libraryKey', 'findClips', 'bake', 'bakeClip', 'main']
@@ -0,0 +1,266 @@
+# -*- coding: UTF-8 -*-
+# Author  : AitrusC
+# FileName: blendShape
+# Time    : 2024-10-01
+# Contact : 906629272@qq.com
+# Description : 稀疏blendShape目标与修正形提取(不依赖Maya)
+#               目标只保存有偏移的顶点(顶点索引 + float32偏移), 按权重求和时不展开为完整网格
+#               修正形提取: 由雕刻网格与蒙皮后的网格反算蒙皮前的偏移(线性蒙皮, 矩阵为Maya行向量约定)
+#
+#   targets = SparseTargets.fromDense(names, dense_deltas)
+#   deltas = targets.evaluate(weights, vertex_count)      # (T,) -> (V, 3)
+
+import numpy as np
+
+# 偏移长度小于该值的顶点视为没有偏移
+Tolerance = 1e-5
+
+
+def skinMatrices(influences, weights, matrices):
+    """
+    每个顶点的线性蒙皮矩阵: A_i = sum_j w_ij * S_j[:3, :3], t_i = sum_j w_ij * S_j[3, :3]
+    :param influences: (V, K) 每个顶点的影响骨骼索引
+    :param weights: (V, K) 蒙皮权重
+    :param matrices: (J, 4, 4) 每个骨骼的蒙皮矩阵(bindPreMatrix * worldMatrix, 行向量约定)
+    :return: (A (V, 3, 3), t (V, 3))
+    """
+    matrices = np.asarray(matrices, dtype = np.float64)
+    weights = np.asarray(weights, dtype = np.float64)
+    gathered = matrices[np.asarray(influences)]
+    skin = np.einsum("vk,vkij->vij", weights, gathered)
+    return skin[:, :3, :3], skin[:, 3, :3]
+
+
+def skinPoints(points, influences, weights, matrices):
+    """
+    线性蒙皮: p_i = v_i . A_i + t_i
+    :param points: (V, 3) 蒙皮前的顶点
+    :param influences: (V, K)
+    :param weights: (V, K)
+    :param matrices: (J, 4, 4)
+    :return: (V, 3)
+    """
+    linear, translate = skinMatrices(influences, weights, matrices)
+    return np.einsum("vi,vij->vj", np.asarray(points, dtype = np.float64), linear) + translate
+
+
+def extractCorrective(sculpt, base, influences, weights, matrices, tolerance = Tolerance):
+    """
+    提取修正形: 雕刻网格(蒙皮后空间)减去蒙皮后的基础网格, 再乘以蒙皮矩阵的逆回到蒙皮前空间
+        只对雕刻有变化的顶点计算蒙皮矩阵并批量求逆
+    :param sculpt: (V, 3) 在当前pose下雕刻的网格
+    :param base: (V, 3) 蒙皮前的基础网格
+    :param influences: (V, K)
+    :param weights: (V, K)
+    :param matrices: (J, 4, 4) 当前pose的蒙皮矩阵
+    :param tolerance: 偏移长度小于该值的顶点忽略
+    :return: (顶点索引 (n,) int32, 偏移 (n, 3) float32)
+    """
+    sculpt = np.asarray(sculpt, dtype = np.float64)
+    base = np.asarray(base, dtype = np.float64)
+    influences = np.asarray(influences)
+    weights = np.asarray(weights, dtype = np.float64)
+    diff = sculpt - skinPoints(base, influences, weights, matrices)
+    changed = np.flatnonzero(np.einsum("vi,vi->v", diff, diff) > tolerance * tolerance)
+    linear, _ = skinMatrices(influences[changed], weights[changed], matrices)
+    # 行向量: d . A = r  =>  A^T d^T = r^T
+    deltas = np.linalg.solve(np.swapaxes(linear, 1, 2), diff[changed][..., None])[..., 0]
+    return changed.astype(np.int32), deltas.astype(np.float32)
+
+
+class SparseTargets(object):
+    """
+    一组稀疏blendShape目标
+        所有目标的偏移保存在连续数组中, 第i个目标为[offsets[i], offsets[i + 1]), 目标内顶点索引递增
+    """
+
+    def __init__(self, names = None, offsets = None, indices = None, deltas = None):
+        """
+        :param names: [目标名称, ...] (T,)
+        :param offsets: (T + 1,) int64
+        :param indices: (nnz,) int32 顶点索引
+        :param deltas: (nnz, 3) float32 偏移
+        """
+        self.names = list(names or [])
+        self.offsets = np.zeros(1, dtype = np.int64) if offsets is None else np.asarray(offsets, dtype = np.int64)
+        self.indices = np.zeros(0, dtype = np.int32) if indices is None else np.asarray(indices, dtype = np.int32)
+        self.deltas = (np.zeros((0, 3), dtype = np.float32) if deltas is None else
+                       np.asarray(deltas, dtype = np.float32).reshape(-1, 3))
+        # 每个偏移所属的目标(第一次求和时建立)
+        self._owners = None
+
+    @classmethod
+    def fromDense(cls, names, deltas, tolerance = Tolerance):
+        """
+        由完整偏移创建(批量找出有偏移的顶点)
+        :param names: [目标名称, ...] (T,)
+        :param deltas: (T, V, 3)
+        :param tolerance: 偏移长度小于该值的顶点忽略
+        :return: SparseTargets
+        """
+        deltas = np.asarray(deltas, dtype = np.float32)
+        mask = np.einsum("tvi,tvi->tv", deltas, deltas) > tolerance * tolerance
+        targets, vertices = np.nonzero(mask)
+        offsets = np.zeros(len(deltas) + 1, dtype = np.int64)
+        np.cumsum(np.count_nonzero(mask, axis = 1), out = offsets[1:])
+        return cls(names, offsets, vertices.astype(np.int32), deltas[targets, vertices])
+
+    @classmethod
+    def fromTargets(cls, targets):
+        """
+        由稀疏目标列表创建
+        :param targets: 可迭代的 (目标名称, 顶点索引 (n,), 偏移 (n, 3))
+        :return: SparseTargets
+        """
+        names, indices, deltas, counts = [], [], [], []
+        for name, target_indices, target_deltas in targets:
+            target_indices = np.asarray(target_indices, dtype = np.int32)
+            order = np.argsort(target_indices, kind = "stable")
+            names.append(name)
+            indices.append(target_indices[order])
+            deltas.append(np.asarray(target_deltas, dtype = np.float32).reshape(-1, 3)[order])
+            counts.append(len(target_indices))
+        offsets = np.zeros(len(counts) + 1, dtype = np.int64)
+        np.cumsum(counts, out = offsets[1:])
+        if not names:
+            return cls()
+        return cls(names, offsets, np.concatenate(indices), np.concatenate(deltas))
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def nnz(self):
+        """
+        保存的顶点偏移总数
+        :return:
+        """
+        return len(self.indices)
+
+    @property
+    def nbytes(self):
+        return self.offsets.nbytes + self.indices.nbytes + self.deltas.nbytes
+
+    def targetIndex(self, name):
+        """
+        :param name: 目标名称
+        :return: 目标索引, 不存在时返回-1
+        """
+        try:
+            return self.names.index(name)
+        except ValueError:
+            return -1
+
+    def target(self, index):
+        """
+        获取目标(数组视图)
+        :param index: 目标索引
+        :return: (顶点索引 (n,), 偏移 (n, 3))
+        """
+        span = slice(int(self.offsets[index]), int(self.offsets[index + 1]))
+        return self.indices[span], self.deltas[span]
+
+    def dense(self, index, vertex_count):
+        """
+        展开为完整偏移(调试/导出用)
+        :param index: 目标索引
+        :param vertex_count: 顶点数量
+        :return: (V, 3) float32
+        """
+        out = np.zeros((vertex_count, 3), dtype = np.float32)
+        indices, deltas = self.target(index)
+        out[indices] = deltas
+        return out
+
+    def addTarget(self, name, indices, deltas):
+        """
+        添加目标
+        :param name: 目标名称
+        :param indices: (n,) 顶点索引
+        :param deltas: (n, 3) 偏移
+        :return: 目标索引
+        """
+        indices = np.asarray(indices, dtype = np.int32)
+        order = np.argsort(indices, kind = "stable")
+        self.names.append(name)
+        self.indices = np.concatenate((self.indices, indices[order]))
+        self.deltas = np.concatenate((self.deltas, np.asarray(deltas, dtype = np.float32).reshape(-1, 3)[order]))
+        self.offsets = np.append(self.offsets, self.offsets[-1] + len(indices))
+        self._owners = None
+        return len(self.names) - 1
+
+    def addCorrective(self, name, sculpt, base, influences, weights, matrices, tolerance = Tolerance):
+        """
+        由雕刻网格提取修正形并添加为目标
+        :param name: 目标名称
+        :param sculpt: (V, 3) 在当前pose下雕刻的网格
+        :param base: (V, 3) 蒙皮前的基础网格
+        :param influences: (V, K)
+        :param weights: (V, K)
+        :param matrices: (J, 4, 4) 当前pose的蒙皮矩阵
+        :param tolerance: 偏移长度小于该值的顶点忽略
+        :return: 目标索引
+        """
+        indices, deltas = extractCorrective(sculpt, base, influences, weights, matrices, tolerance)
+        return self.addTarget(name, indices, deltas)
+
+    def touchedVertices(self):
+        """
+        所有目标涉及的顶点
+        :return: (n,) 递增的顶点索引
+        """
+        return np.unique(self.indices)
+
+    def evaluate(self, weights, vertex_count, out = None, threshold = 0.0):
+        """
+        按权重求和所有目标的偏移(不展开单个目标)
+        :param weights: (T,) 目标权重
+        :param vertex_count: 顶点数量
+        :param out: (V, 3) 输出数组, 为空时新建; 不为空时偏移累加到out上(可传入基础网格得到变形后的网格)
+        :param threshold: 权重绝对值不大于该值的目标跳过
+        :return: (V, 3) float64
+        """
+        weights = np.asarray(weights, dtype = np.float64)
+        if out is None:
+            out = np.zeros((vertex_count, 3))
+        active = np.flatnonzero(np.abs(weights) > threshold)
+        if not len(active):
+            return out
+        if len(active) == len(self.names):
+            indices, deltas = self.indices, self.deltas
+            if self._owners is None:
+                self._owners = np.repeat(np.arange(len(self.names)), np.diff(self.offsets))
+            scale = weights[self._owners]
+        else:
+            starts, stops = self.offsets[active], self.offsets[active + 1]
+            counts = stops - starts
+            # 活动目标的偏移位置: 每段起点 + 段内序号
+            positions = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+            indices, deltas = self.indices[positions], self.deltas[positions]
+            scale = np.repeat(weights[active], counts)
+        for axis in range(3):
+            out[:, axis] += np.bincount(indices, weights = deltas[:, axis] * scale, minlength = vertex_count)
+        return out
+
+    def save(self, path):
+        """
+        保存为npz
+        :param path: 文件路径
+        :return:
+        """
+        # 名称保存为unicode数组, 读取时不需要pickle
+        np.savez(path, names = np.array(self.names, dtype = str), offsets = self.offsets,
+                 indices = self.indices, deltas = self.deltas)
+
+    @classmethod
+    def load(cls, path):
+        """
+        读取npz
+        :param path: 文件路径
+        :return: SparseTargets
+        """
+        with np.load(path) as data:
+            return cls(data["names"].tolist(), data["offsets"], data["indices"], data["deltas"])
+
+
+__all__ = ['SparseTargets', 'skinMatrices', 'skinPoints', 'extractCorrective']
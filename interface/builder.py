@@ -0,0 +1,763 @@
+# -*- coding: UTF-8 -*-
+# Author  : AitrusC
+# FileName: builder
+# Time    : 2024-09-27
+# Contact : 906629272@qq.com
+# Description : 构建驱动系统(批量)
+#               先收集所选骨骼组需要的全部节点/属性/连接, 按依赖排序成一个构建计划, 再分阶段一次性交给场景后端执行
+#
+#   specs = specsFromGroups(["Wrist", "Finger"], library = library)
+#   plan = BuildPlanner().plan(specs)
+#   plan.execute(FakeScene())       # 或 MayaScene()
+#
+#   builder = IncrementalBuilder(MayaScene())
+#   report = builder.build(specs)   # 只重建内容哈希变化的驱动骨骼
+#
+#   每个驱动骨骼的节点网络(节点名以骨骼名为前缀):
+#       {joint}_poseDriver_grp                     transform, 约束到父骨骼
+#           {joint}_poseDriver_loc                 locator, 静止姿势参考(构建时记录骨骼的局部矩阵)
+#       {joint}_poseDriver_out                     network, 保存全部驱动属性
+#       {joint}_poseDriver_mm                      multMatrix: joint.worldMatrix * loc.worldInverseMatrix
+#       {joint}_poseDriver_vp                      vectorProduct: 骨骼指向轴在静止空间中的方向
+#       {joint}_{reader}_ab / {joint}_{reader}_rv  angleBetween + remapValue: 与读取方向的夹角 -> 0~1 -> out.{reader}
+#   每个读取方向(+Y/-Y/+Z/-Z或pose)一组angleBetween + remapValue, pose的驱动值再连接到blendShape权重/骨骼属性
+
+import hashlib
+import json
+import re
+import time
+from collections import namedtuple, OrderedDict
+
+import numpy as np
+
+from . import rotation, tracing
+
+try:
+    from maya.api import OpenMaya as om
+    from maya import cmds
+except ImportError:
+    om = None
+    cmds = None
+
+# ADV骨骼组 -> 骨骼名称(不含左右后缀)
+JointGroups = OrderedDict((
+    ("Wrist", ("Wrist",)),
+    ("Elbow", ("Elbow",)),
+    ("Shoulder", ("Shoulder",)),
+    ("Ankle", ("Ankle",)),
+    ("Knee", ("Knee",)),
+    ("Hip", ("Hip",)),
+    ("Finger", tuple("%sFinger%d" % (finger, i) for finger in ("Thumb", "Index", "Middle", "Ring", "Pinky")
+                     for i in (1, 2, 3))),
+))
+
+# ADV骨骼 -> 父骨骼(不含左右后缀)
+JointParents = {
+    "Wrist": "Elbow", "Elbow": "Shoulder", "Shoulder": "Scapula",
+    "Ankle": "Knee", "Knee": "Hip", "Hip": "Root",
+    "ThumbFinger1": "Wrist", "IndexFinger1": "Wrist", "MiddleFinger1": "Wrist",
+    "RingFinger1": "Cup", "PinkyFinger1": "Cup",
+}
+for _finger in ("Thumb", "Index", "Middle", "Ring", "Pinky"):
+    JointParents[_finger + "Finger2"] = _finger + "Finger1"
+    JointParents[_finger + "Finger3"] = _finger + "Finger2"
+
+SIDES = ("_R", "_L")
+# 不需要左右后缀的骨骼(ADV中Root/Spine等)
+_CENTER_JOINTS = {"Root"}
+
+# 读取方向名称 -> 方向向量(骨骼局部空间)
+Directions = OrderedDict((
+    ("+Y", (0.0, 1.0, 0.0)),
+    ("-Y", (0.0, -1.0, 0.0)),
+    ("+Z", (0.0, 0.0, 1.0)),
+    ("-Z", (0.0, 0.0, -1.0)),
+))
+_DIRECTION_ATTRS = {"+Y": "posY", "-Y": "negY", "+Z": "posZ", "-Z": "negZ"}
+
+# pose名称用作输出节点的属性名称: 必须是合法的Maya属性名, 且不能与读取方向或network节点自带属性重名
+_ATTR_NAME_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+_RESERVED_ATTRS = frozenset(_DIRECTION_ATTRS.values()) | frozenset((
+    "message", "caching", "frozen", "isHistoricallyInteresting", "nodeState", "binMembership", "affects"))
+
+# 整个驱动系统的根节点
+RootGroup = "poseDriver_grp"
+
+# 驱动骨骼: 骨骼名称, 父骨骼名称, 指向轴, 读取方向名称, pose ((名称, 四元数, ((目标属性, 驱动值), ...)), ...)
+DriverSpec = namedtuple("DriverSpec", ["joint", "parent", "axis", "directions", "poses"])
+
+# 构建计划条目, owner为所属驱动骨骼(为空时为共享节点)
+PlanNode = namedtuple("PlanNode", ["name", "type", "parent", "owner"])
+PlanAttr = namedtuple("PlanAttr", ["node", "attr", "type", "owner"])
+PlanValue = namedtuple("PlanValue", ["plug", "value", "owner"])
+PlanConnection = namedtuple("PlanConnection", ["source", "destination", "owner"])
+# 执行时读取source的当前值设置到destination(只记录一次, 不连接)
+PlanBake = namedtuple("PlanBake", ["source", "destination", "owner"])
+
+
+def plugNode(plug):
+    """
+    :param plug: "node.attr"
+    :return: 节点名称
+    """
+    return plug.split(".", 1)[0]
+
+
+def sideName(name, side):
+    """
+    加上左右后缀
+    :param name: 不含后缀的骨骼名称
+    :param side: "_R"或"_L"
+    :return:
+    """
+    return name if name in _CENTER_JOINTS else name + side
+
+
+def validatePoseNames(joint, names):
+    """
+    检查pose名称能否用作输出节点的属性名称
+    :param joint: 骨骼名称(用于错误信息)
+    :param names: pose名称
+    :return:
+    """
+    seen = set()
+    for name in names:
+        if not _ATTR_NAME_RE.match(name):
+            raise ValueError("pose名称不能用作属性名(只能包含字母、数字和下划线, 且不能以数字开头): {}.{}".format(
+                joint, name))
+        if name in _RESERVED_ATTRS:
+            raise ValueError("pose名称与保留属性重名: {}.{}".format(joint, name))
+        if name in seen:
+            raise ValueError("pose名称重复: {}.{}".format(joint, name))
+        seen.add(name)
+
+
+def specsFromGroups(groups, sides = SIDES, directions = tuple(Directions), library = None, axis = rotation.X_AXIS):
+    """
+    由骨骼组生成驱动骨骼描述
+    :param groups: 骨骼组名称, 例如["Wrist", "Finger"], "ALL"表示全部
+    :param sides: 左右后缀
+    :param directions: 读取方向名称
+    :param library: PoseLibrary, 同名骨骼的pose与驱动目标会一起构建
+    :param axis: 骨骼指向轴
+    :return: [DriverSpec, ...]
+    """
+    if "ALL" in groups:
+        groups = list(JointGroups)
+    specs = []
+    for group in groups:
+        for name in JointGroups[group]:
+            for side in sides:
+                joint = sideName(name, side)
+                parent = sideName(JointParents[name], side) if name in JointParents else None
+                specs.append(DriverSpec(joint, parent, tuple(axis), tuple(directions), libraryPoses(library, joint)))
+    return specs
+
+
+def libraryPoses(library, joint):
+    """
+    从pose数据库读取骨骼的pose
+    :param library: PoseLibrary, 可以为空
+    :param joint: 骨骼名称
+    :return: ((pose名称, 四元数, ((目标属性, 驱动值), ...)), ...)
+    """
+    if library is None:
+        return ()
+    j = library.jointIndex(joint)
+    if j < 0:
+        return ()
+    poses = []
+    span = library.poseSlice(j)
+    for p in range(span.start, span.stop):
+        targets, values = library.poseTargets(p)
+        poses.append((library.poseName(p), tuple(library.rotations[p].tolist()),
+                      tuple((library.targetName(int(t)), float(v)) for t, v in zip(targets, values))))
+    return tuple(poses)
+
+
+class BuildPlan(object):
+    """
+    构建计划
+        nodes/attrs/values/connections按执行阶段分开保存, sortNodes后节点按依赖(父节点, 上游连接)排序
+        requires为计划引用但不由计划创建的场景节点(骨骼、blendShape等)
+    """
+
+    def __init__(self):
+        self.nodes = OrderedDict()
+        self.attrs = []
+        self.values = []
+        self.connections = []
+        self.bakes = []
+        self.requires = set()
+
+    def __len__(self):
+        return len(self.nodes) + len(self.attrs) + len(self.values) + len(self.bakes) + len(self.connections)
+
+    def addNode(self, name, node_type, parent = None, owner = None):
+        """
+        添加节点(同名节点只添加一次)
+        :param name: 节点名称
+        :param node_type: 节点类型
+        :param parent: 父节点(dag节点)
+        :param owner: 所属驱动骨骼
+        :return: 节点名称
+        """
+        if name not in self.nodes:
+            self.nodes[name] = PlanNode(name, node_type, parent, owner)
+        return name
+
+    def addAttr(self, node, attr, attr_type = "double", owner = None):
+        """
+        添加自定义属性
+        :param node: 节点名称
+        :param attr: 属性名称
+        :param attr_type: 属性类型
+        :param owner: 所属驱动骨骼
+        :return: "node.attr"
+        """
+        self.attrs.append(PlanAttr(node, attr, attr_type, owner))
+        return node + "." + attr
+
+    def setAttr(self, plug, value, owner = None):
+        """
+        设置属性值
+        :param plug: "node.attr"
+        :param value: 数值或数值元组
+        :param owner: 所属驱动骨骼
+        :return:
+        """
+        self.values.append(PlanValue(plug, value, owner))
+
+    def bake(self, source, destination, owner = None):
+        """
+        执行时把source的当前值设置到destination(不连接, 之后source变化不影响destination)
+        :param source: "node.attr", 计划创建的节点以外的已有节点
+        :param destination: "node.attr"
+        :param owner: 所属驱动骨骼
+        :return:
+        """
+        self.bakes.append(PlanBake(source, destination, owner))
+
+    def connect(self, source, destination, owner = None):
+        """
+        连接属性
+        :param source: "node.attr"
+        :param destination: "node.attr"
+        :param owner: 所属驱动骨骼
+        :return:
+        """
+        self.connections.append(PlanConnection(source, destination, owner))
+
+    def require(self, *names):
+        """
+        标记计划依赖的已有场景节点
+        :param names: 节点名称
+        :return:
+        """
+        self.requires.update(names)
+
+    def sortNodes(self):
+        """
+        按依赖对节点拓扑排序(父节点在前, 上游节点在前, 其余保持添加顺序)
+        :return:
+        """
+        nodes = self.nodes
+        edges = {name: [] for name in nodes}
+        indegree = dict.fromkeys(nodes, 0)
+
+        def link(upstream, downstream):
+            if upstream in nodes and downstream in nodes and upstream != downstream:
+                edges[upstream].append(downstream)
+                indegree[downstream] += 1
+
+        for node in nodes.values():
+            if node.parent is not None:
+                link(node.parent, node.name)
+        for connection in self.connections:
+            link(plugNode(connection.source), plugNode(connection.destination))
+        ready = [name for name, degree in indegree.items() if degree == 0]
+        ordered = []
+        # ready按添加顺序保存, 反转后用作栈保证稳定
+        ready.reverse()
+        while ready:
+            name = ready.pop()
+            ordered.append(name)
+            released = []
+            for downstream in edges[name]:
+                indegree[downstream] -= 1
+                if indegree[downstream] == 0:
+                    released.append(downstream)
+            ready.extend(reversed(released))
+        if len(ordered) != len(nodes):
+            cycle = sorted(name for name, degree in indegree.items() if degree > 0)
+            raise ValueError("构建计划存在循环依赖: {}".format(", ".join(cycle[:10])))
+        self.nodes = OrderedDict((name, nodes[name]) for name in ordered)
+        return self
+
+    def owners(self):
+        """
+        :return: 计划中的驱动骨骼名称
+        """
+        return sorted({node.owner for node in self.nodes.values() if node.owner is not None})
+
+    def ownerNodes(self):
+        """
+        :return: {驱动骨骼名称: [节点名称, ...]}
+        """
+        result = {}
+        for node in self.nodes.values():
+            if node.owner is not None:
+                result.setdefault(node.owner, []).append(node.name)
+        return result
+
+    @tracing.traced("BuildPlan.execute", "scene")
+    def execute(self, scene):
+        """
+        分阶段批量执行: 创建节点 -> 添加属性 -> 读取需要记录的值 -> 设置属性 -> 连接
+        :param scene: SceneBackend
+        :return: 执行统计 {"nodes": 节点数, "attrs": 属性数, "values": 设置次数, "connections": 连接数}
+        """
+        requires = sorted(self.requires)
+        # 共享节点(如根节点)已存在时不再创建, 与依赖节点一起检查
+        shared = [name for name, node in self.nodes.items() if node.owner is None]
+        found = scene.exists(requires + shared)
+        missing = [name for name, exists in zip(requires, found) if not exists]
+        if missing:
+            raise RuntimeError("场景中缺少节点: {}".format(", ".join(missing[:10])))
+        skip = {name for name, exists in zip(shared, found[len(requires):]) if exists}
+        create = [(node.name, node.type, node.parent) for node in self.nodes.values() if node.name not in skip]
+        scene.createNodes(create)
+        scene.addAttrs([(attr.node, attr.attr, attr.type) for attr in self.attrs])
+        values = [(value.plug, value.value) for value in self.values]
+        if self.bakes:
+            # 源属性不存在值时(例如内存场景中未设置的属性)保持目标的默认值
+            baked = scene.getAttrs([bake.source for bake in self.bakes])
+            values.extend((bake.destination, value) for bake, value in zip(self.bakes, baked) if value is not None)
+        scene.setAttrs(values)
+        scene.connectAttrs([(connection.source, connection.destination) for connection in self.connections])
+        return {"nodes": len(create), "attrs": len(self.attrs),
+                "values": len(values), "connections": len(self.connections)}
+
+
+class BuildPlanner(object):
+    """
+    构建计划生成器
+    """
+    # 节点网络结构改变时增加, 使已构建的驱动骨骼全部重建
+    Version = 2
+    # 读取方向与当前方向夹角大于该值(度)时驱动值为0
+    FalloffAngle = 90.0
+
+    @tracing.traced("BuildPlanner.plan", "scene")
+    def plan(self, specs):
+        """
+        生成所有驱动骨骼的构建计划
+        :param specs: [DriverSpec, ...]
+        :return: BuildPlan(已排序)
+        """
+        plan = BuildPlan()
+        plan.addNode(RootGroup, "transform")
+        for spec in specs:
+            self.planDriver(plan, spec)
+        return plan.sortNodes()
+
+    def planDriver(self, plan, spec):
+        """
+        添加一个驱动骨骼的节点网络
+        :param plan: BuildPlan
+        :param spec: DriverSpec
+        :return:
+        """
+        joint = spec.joint
+        validatePoseNames(joint, [name for name, q, targets in spec.poses])
+        prefix = joint + "_poseDriver"
+        grp = plan.addNode(prefix + "_grp", "transform", RootGroup, joint)
+        loc = plan.addNode(prefix + "_loc", "locator", grp, joint)
+        mm = plan.addNode(prefix + "_mm", "multMatrix", owner = joint)
+        vp = plan.addNode(prefix + "_vp", "vectorProduct", owner = joint)
+        out = plan.addNode(prefix + "_out", "network", owner = joint)
+        plan.require(joint)
+        # 组跟随父骨骼, locator记录构建时骨骼的局部矩阵作为静止姿势(不能连接, 否则mm始终为单位矩阵)
+        if spec.parent is not None:
+            plan.require(spec.parent)
+            plan.connect(spec.parent + ".worldMatrix[0]", grp + ".offsetParentMatrix", joint)
+        plan.bake(joint + ".matrix", loc + ".offsetParentMatrix", joint)
+        plan.connect(joint + ".worldMatrix[0]", mm + ".matrixIn[0]", joint)
+        plan.connect(loc + ".worldInverseMatrix[0]", mm + ".matrixIn[1]", joint)
+        plan.setAttr(vp + ".operation", 3, joint)
+        plan.setAttr(vp + ".input1", tuple(spec.axis), joint)
+        plan.setAttr(vp + ".normalizeOutput", True, joint)
+        plan.connect(mm + ".matrixSum", vp + ".matrix", joint)
+
+        readers = [(_DIRECTION_ATTRS.get(d, d), Directions[d]) for d in spec.directions]
+        if spec.poses:
+            directions = rotation.rotateVector([q for name, q, targets in spec.poses], spec.axis)
+            readers.extend((name, tuple(direction)) for (name, q, targets), direction in
+                           zip(spec.poses, np.asarray(directions).tolist()))
+        for attr, direction in readers:
+            ab = plan.addNode("%s_%s_ab" % (joint, attr), "angleBetween", owner = joint)
+            rv = plan.addNode("%s_%s_rv" % (joint, attr), "remapValue", owner = joint)
+            plug = plan.addAttr(out, attr, owner = joint)
+            plan.connect(vp + ".output", ab + ".vector1", joint)
+            plan.setAttr(ab + ".vector2", tuple(direction), joint)
+            plan.connect(ab + ".angle", rv + ".inputValue", joint)
+            plan.setAttr(rv + ".inputMin", self.FalloffAngle, joint)
+            plan.setAttr(rv + ".inputMax", 0.0, joint)
+            plan.connect(rv + ".outValue", plug, joint)
+        for name, q, targets in spec.poses:
+            for target, value in targets:
+                if "." not in target:
+                    continue
+                # 驱动值不为1时经过multDoubleLinear缩放
+                if value == 1.0:
+                    plan.connect(out + "." + name, target, joint)
+                else:
+                    mdl = plan.addNode("%s_%s_%s_mdl" % (joint, name, target.replace(".", "_")),
+                                       "multDoubleLinear", owner = joint)
+                    plan.connect(out + "." + name, mdl + ".input1", joint)
+                    plan.setAttr(mdl + ".input2", value, joint)
+                    plan.connect(mdl + ".output", target, joint)
+                plan.require(plugNode(target))
+
+
+# 增量构建结果: 复用/重建/新增/删除的驱动骨骼名称, 以及执行统计
+BuildReport = namedtuple("BuildReport", ["reused", "rebuilt", "added", "removed", "stats"])
+
+
+def specHash(spec, planner = None):
+    """
+    驱动骨骼内容哈希(pose、方向、目标与生成参数), 内容不变时哈希不变
+    :param spec: DriverSpec
+    :param planner: BuildPlanner, 生成参数也参与哈希
+    :return: str
+    """
+    planner = planner or BuildPlanner
+    content = (planner.Version, planner.FalloffAngle, spec.joint, spec.parent,
+               tuple(float(v) for v in spec.axis), tuple(spec.directions),
+               tuple((name, tuple(float(v) for v in q), tuple((t, float(v)) for t, v in targets))
+                     for name, q, targets in spec.poses))
+    return hashlib.sha1(repr(content).encode("utf-8")).hexdigest()
+
+
+class IncrementalBuilder(object):
+    """
+    增量构建
+        记录每个驱动骨骼上次构建时的内容哈希与节点, 再次构建时只拆除并重建内容变化的驱动骨骼子网络
+    """
+
+    def __init__(self, scene, planner = None, state = None):
+        """
+        :param scene: SceneBackend
+        :param planner: BuildPlanner
+        :param state: dumpState()保存的上次构建状态
+        """
+        self.scene = scene
+        self.planner = planner or BuildPlanner()
+        # 驱动骨骼名称 -> (内容哈希, [节点名称, ...])
+        self.state = {}
+        if state:
+            self.loadState(state)
+
+    def dumpState(self):
+        """
+        :return: 可JSON序列化的构建状态
+        """
+        return json.dumps({joint: [digest, nodes] for joint, (digest, nodes) in self.state.items()})
+
+    def loadState(self, state):
+        """
+        :param state: dumpState()的返回值
+        :return:
+        """
+        self.state = {joint: (digest, list(nodes)) for joint, (digest, nodes) in json.loads(state).items()}
+
+    @tracing.traced("IncrementalBuilder.build", "scene")
+    def build(self, specs, prune = False, verify = True):
+        """
+        构建驱动系统, 只重建内容变化的驱动骨骼
+        :param specs: [DriverSpec, ...]
+        :param prune: 是否删除specs中没有但上次构建过的驱动骨骼(完整重建时使用)
+        :param verify: 是否检查复用的节点仍在场景中(被手动删除时重建)
+        :return: BuildReport
+        """
+        hashes = {spec.joint: specHash(spec, self.planner) for spec in specs}
+        state = self.state
+        dirty = [spec for spec in specs if spec.joint not in state or state[spec.joint][0] != hashes[spec.joint]]
+        reused = [spec.joint for spec in specs if spec.joint in state and state[spec.joint][0] == hashes[spec.joint]]
+        if verify and reused:
+            names = [name for joint in reused for name in state[joint][1]]
+            exists = dict(zip(names, self.scene.exists(names)))
+            broken = {joint for joint in reused if not all(exists[name] for name in state[joint][1])}
+            if broken:
+                dirty.extend(spec for spec in specs if spec.joint in broken)
+                reused = [joint for joint in reused if joint not in broken]
+        removed = sorted(set(state).difference(hashes)) if prune else []
+        rebuilt = [spec.joint for spec in dirty if spec.joint in state]
+        added = [spec.joint for spec in dirty if spec.joint not in state]
+
+        # 拆除变化与删除的子网络
+        teardown = [name for joint in rebuilt + removed for name in state[joint][1]]
+        if teardown:
+            self.scene.deleteNodes(teardown)
+        for joint in removed:
+            del state[joint]
+        stats = {"nodes": 0, "attrs": 0, "values": 0, "connections": 0}
+        if dirty:
+            plan = self.planner.plan(dirty)
+            stats = plan.execute(self.scene)
+            nodes = plan.ownerNodes()
+            for spec in dirty:
+                state[spec.joint] = (hashes[spec.joint], nodes.get(spec.joint, []))
+        return BuildReport(reused, rebuilt, added, removed, stats)
+
+
+class SceneBackend(object):
+    """
+    场景后端接口, 每个方法接收一个阶段的全部操作
+    """
+
+    def exists(self, names):
+        """
+        :param names: 节点名称列表
+        :return: [是否存在, ...]
+        """
+        raise NotImplementedError
+
+    def createNodes(self, nodes):
+        """
+        :param nodes: [(名称, 类型, 父节点), ...] 已按依赖排序
+        :return:
+        """
+        raise NotImplementedError
+
+    def addAttrs(self, attrs):
+        """
+        :param attrs: [(节点, 属性, 类型), ...]
+        :return:
+        """
+        raise NotImplementedError
+
+    def getAttrs(self, plugs):
+        """
+        :param plugs: ["node.attr", ...]
+        :return: [值, ...] 不存在时为None
+        """
+        raise NotImplementedError
+
+    def setAttrs(self, values):
+        """
+        :param values: [("node.attr", 值), ...]
+        :return:
+        """
+        raise NotImplementedError
+
+    def connectAttrs(self, connections):
+        """
+        :param connections: [(源"node.attr", 目标"node.attr"), ...]
+        :return:
+        """
+        raise NotImplementedError
+
+    def deleteNodes(self, names):
+        """
+        :param names: 节点名称列表
+        :return:
+        """
+        raise NotImplementedError
+
+
+class FakeScene(SceneBackend):
+    """
+    内存中的场景(不依赖Maya), 用于测试构建计划与性能
+        call_overhead模拟每次场景调用的固定开销(秒), 用于对比逐个调用与批量调用
+    """
+
+    def __init__(self, nodes = (), call_overhead = 0.0):
+        """
+        :param nodes: 已有节点名称(骨骼、blendShape等)
+        :param call_overhead: 每次调用的额外耗时(秒)
+        """
+        # 名称 -> {"type": 类型, "parent": 父节点, "attrs": {属性: 值}}
+        self.nodes = {name: {"type": "joint", "parent": None, "attrs": {}} for name in nodes}
+        # 目标plug -> 源plug
+        self.connections = {}
+        self.call_overhead = call_overhead
+        self.calls = 0
+
+    def _call(self):
+        """
+        记录调用次数并模拟调用开销
+        :return:
+        """
+        self.calls += 1
+        if self.call_overhead:
+            end = time.perf_counter() + self.call_overhead
+            while time.perf_counter() < end:
+                pass
+
+    def _node(self, plug):
+        """
+        获取plug所在节点
+        :param plug:
+        :return:
+        """
+        name = plugNode(plug)
+        node = self.nodes.get(name)
+        if node is None:
+            raise RuntimeError("节点不存在: {}".format(name))
+        return node
+
+    def exists(self, names):
+        self._call()
+        return [name in self.nodes for name in names]
+
+    def createNodes(self, nodes):
+        self._call()
+        for name, node_type, parent in nodes:
+            if name in self.nodes:
+                raise RuntimeError("节点已存在: {}".format(name))
+            if parent is not None and parent not in self.nodes:
+                raise RuntimeError("父节点不存在: {}".format(parent))
+            self.nodes[name] = {"type": node_type, "parent": parent, "attrs": {}}
+
+    def addAttrs(self, attrs):
+        self._call()
+        for node, attr, attr_type in attrs:
+            self._node(node)["attrs"].setdefault(attr, 0.0)
+
+    def getAttrs(self, plugs):
+        self._call()
+        values = []
+        for plug in plugs:
+            node, attr = plug.split(".", 1)
+            values.append(self.nodes[node]["attrs"].get(attr) if node in self.nodes else None)
+        return values
+
+    def setAttrs(self, values):
+        self._call()
+        for plug, value in values:
+            self._node(plug)["attrs"][plug.split(".", 1)[1]] = value
+
+    def connectAttrs(self, connections):
+        self._call()
+        for source, destination in connections:
+            self._node(source)
+            self._node(destination)
+            self.connections[destination] = source
+
+    def deleteNodes(self, names):
+        self._call()
+        names = set(names)
+        # 同时删除子节点
+        changed = True
+        while changed:
+            children = {name for name, node in self.nodes.items()
+                        if node["parent"] in names and name not in names}
+            changed = bool(children)
+            names |= children
+        for name in names:
+            self.nodes.pop(name, None)
+        for destination, source in list(self.connections.items()):
+            if plugNode(destination) in names or plugNode(source) in names:
+                del self.connections[destination]
+
+
+class MayaScene(SceneBackend):
+    """
+    Maya场景后端
+        节点创建、连接与设置属性分别放入一个MDGModifier/MDagModifier中, 每个阶段只执行一次doIt
+    """
+
+    def __init__(self):
+        if om is None:
+            raise RuntimeError("需要在Maya中使用")
+        self.modifiers = []
+
+    def exists(self, names):
+        return [bool(cmds.objExists(name)) for name in names]
+
+    @staticmethod
+    def _plug(name):
+        """
+        获取MPlug
+        :param name: "node.attr"
+        :return:
+        """
+        selection = om.MSelectionList()
+        selection.add(name)
+        return selection.getPlug(0)
+
+    def createNodes(self, nodes):
+        # dag节点与dg节点分别使用MDagModifier/MDGModifier创建, dg节点不依赖dag节点, 先执行dag
+        dag_modifier = om.MDagModifier()
+        dg_modifier = om.MDGModifier()
+        created = {}
+        for name, node_type, parent in nodes:
+            if parent is not None or node_type in ("transform", "locator"):
+                parent_obj = created.get(parent)
+                if parent_obj is None and parent is not None:
+                    selection = om.MSelectionList()
+                    selection.add(parent)
+                    parent_obj = selection.getDependNode(0)
+                # locator类型创建的是带locator形节点的transform
+                obj = dag_modifier.createNode(node_type, om.MObject.kNullObj if parent_obj is None else parent_obj)
+                dag_modifier.renameNode(obj, name)
+            else:
+                obj = dg_modifier.createNode(node_type)
+                dg_modifier.renameNode(obj, name)
+            created[name] = obj
+        dag_modifier.doIt()
+        dg_modifier.doIt()
+        self.modifiers.extend((dag_modifier, dg_modifier))
+
+    def getAttrs(self, plugs):
+        return [cmds.getAttr(plug) if cmds.objExists(plug) else None for plug in plugs]
+
+    def addAttrs(self, attrs):
+        modifier = om.MDGModifier()
+        for node, attr, attr_type in attrs:
+            modifier.commandToExecute("addAttr -ln \"{}\" -at {} -k 1 {}".format(attr, attr_type, node))
+        modifier.doIt()
+        self.modifiers.append(modifier)
+
+    def setAttrs(self, values):
+        modifier = om.MDGModifier()
+        for name, value in values:
+            plug = self._plug(name)
+            if plug.isArray:
+                # 多元素属性(例如animCurveUL.kv, 每个元素为(驱动值, 被驱动值))一次设置全部元素, 整数(切线类型)保持整数
+                size = len(value) // 2 if plug.isCompound else len(value)
+                modifier.commandToExecute("setAttr -s {0} \"{1}[0:{2}]\" {3}".format(
+                    size, name, size - 1, " ".join(str(v) if isinstance(v, int) else repr(float(v)) for v in value)))
+            elif isinstance(value, (tuple, list)) and not plug.isCompound:
+                # 矩阵属性(16个数值)
+                modifier.newPlugValue(plug, om.MFnMatrixData().create(om.MMatrix([float(v) for v in value])))
+            elif isinstance(value, (tuple, list)):
+                for i, v in enumerate(value):
+                    modifier.newPlugValueDouble(plug.child(i), float(v))
+            elif isinstance(value, bool):
+                modifier.newPlugValueBool(plug, value)
+            elif isinstance(value, int):
+                modifier.newPlugValueInt(plug, value)
+            else:
+                modifier.newPlugValueDouble(plug, float(value))
+        modifier.doIt()
+        self.modifiers.append(modifier)
+
+    def connectAttrs(self, connections):
+        modifier = om.MDGModifier()
+        for source, destination in connections:
+            modifier.connect(self._plug(source), self._plug(destination))
+        modifier.doIt()
+        self.modifiers.append(modifier)
+
+    def deleteNodes(self, names):
+        names = [name for name in names if cmds.objExists(name)]
+        if names:
+            cmds.delete(names)
+
+
+__all__ = ['JointGroups', 'JointParents', 'SIDES', 'Directions', 'RootGroup', 'DriverSpec',
+           'PlanNode', 'PlanAttr', 'PlanValue', 'PlanConnection', 'PlanBake', 'validatePoseNames',
+           'specsFromGroups', 'libraryPoses',
+           'BuildPlan', 'BuildPlanner', 'BuildReport', 'specHash', 'IncrementalBuilder', 'SceneBackend', 'FakeScene', 'MayaScene']
@@ -0,0 +1,464 @@
+# -*- coding: UTF-8 -*-
+# Author  : AitrusC
+# FileName: mirror
+# Time    : 2024-09-28
+# Contact : 906629272@qq.com
+# Description : 镜像SDK / Locator / pose旋转(R>>>L, L>>>R)
+#               名称通过预编译的左右标记表批量映射, 旋转与关键帧按镜像平面做数组运算, 一次生成另一侧全部数据
+#
+#   mirror = Mirror(NameMirror(), plane = "YZ")
+#   left_curves = mirror.mirrorCurves(right_curves, RIGHT_TO_LEFT)
+#   library = mirror.mirrorLibrary(library, RIGHT_TO_LEFT)
+
+import re
+
+import numpy as np
+
+RIGHT_TO_LEFT, LEFT_TO_RIGHT = "R>>>L", "L>>>R"
+
+# 旋转镜像方式
+#   BEHAVIOR: 骨骼按行为镜像(ADV默认), 两侧局部旋转数值相同, 位移取反
+#   REFLECT: 按镜像平面反射(世界空间), 平面法线方向的位移与另外两个轴的旋转取反
+BEHAVIOR, REFLECT = "behavior", "reflect"
+
+# 镜像平面 -> 法线轴
+Planes = {"YZ": 0, "XZ": 1, "XY": 2}
+
+# 默认左右标记(右, 左)
+SideTokens = (("_R", "_L"), ("R_", "L_"), ("Right", "Left"), ("right", "left"), ("_rt", "_lf"))
+
+# animCurve切线类型: 固定
+_FIXED_TANGENT = 1
+
+_TRANSFORM_ATTR_RE = re.compile(r"^(translate|rotate|scale)([XYZ])$")
+_SHORT_ATTRS = {"tx": "translateX", "ty": "translateY", "tz": "translateZ",
+                "rx": "rotateX", "ry": "rotateY", "rz": "rotateZ",
+                "sx": "scaleX", "sy": "scaleY", "sz": "scaleZ"}
+
+
+def _tokenPattern(token):
+    """
+    标记的正则: 标记只在名称边界处匹配, 避免破坏大写或驼峰单词里的字母(如"FOOTROLLER_R"、"Bright_R")
+        以字母数字开头的标记前面必须是名称开头或分隔符(_ | :), 驼峰标记(Right/Left)前面也可以是小写字母或数字;
+        以字母数字结尾的标记后面不能紧贴小写字母或数字(避免"_R"匹配"_Ring"),
+        以分隔符开头的标记结尾也不能紧贴大写字母(避免"_R"匹配"Main_RIG")
+    :param token:
+    :return: str
+    """
+    pattern = re.escape(token)
+    if token[:1].isalnum():
+        camel = token[:1].isupper() and token[1:2].islower()
+        pattern = (r"(?<![^_|:a-z0-9])" if camel else r"(?<![^_|:])") + pattern
+    if token[-1:].isalnum():
+        pattern += r"(?![a-z0-9])" if token[:1].isalnum() else r"(?![A-Za-z0-9])"
+    return pattern
+
+
+class NameMirror(object):
+    """
+    左右名称映射
+        每个方向把全部标记编译为一个正则, 一次替换名称中的所有标记; 结果缓存, 整套绑定的名称只计算一次
+    """
+
+    def __init__(self, tokens = SideTokens):
+        """
+        :param tokens: [(右侧标记, 左侧标记), ...]
+        """
+        self.tokens = tuple(tokens)
+        self._compiled = {}
+        self._cache = {RIGHT_TO_LEFT: {}, LEFT_TO_RIGHT: {}}
+        for direction in (RIGHT_TO_LEFT, LEFT_TO_RIGHT):
+            pairs = self.tokens if direction == RIGHT_TO_LEFT else [(b, a) for a, b in self.tokens]
+            # 长标记优先, 避免"_R"抢先匹配"_Right"之类
+            pairs = sorted(pairs, key = lambda pair: -len(pair[0]))
+            table = dict(pairs)
+            regex = re.compile("|".join(_tokenPattern(a) for a, b in pairs))
+            self._compiled[direction] = (regex, table)
+
+    def counterpart(self, name, direction = RIGHT_TO_LEFT):
+        """
+        获取另一侧名称
+        :param name: 名称(节点或"node.attr")
+        :param direction: RIGHT_TO_LEFT或LEFT_TO_RIGHT
+        :return: 另一侧名称, 名称中没有源侧标记时返回None
+        """
+        cache = self._cache[direction]
+        result = cache.get(name, False)
+        if result is False:
+            regex, table = self._compiled[direction]
+            result, count = regex.subn(lambda m: table[m.group(0)], name)
+            result = cache[name] = result if count else None
+        return result
+
+    def mapNames(self, names, direction = RIGHT_TO_LEFT):
+        """
+        批量获取另一侧名称
+        :param names: 名称列表
+        :param direction: RIGHT_TO_LEFT或LEFT_TO_RIGHT
+        :return: [另一侧名称或None, ...]
+        """
+        counterpart = self.counterpart
+        return [counterpart(name, direction) for name in names]
+
+    def isSource(self, name, direction = RIGHT_TO_LEFT):
+        """
+        :param name: 名称
+        :param direction: RIGHT_TO_LEFT或LEFT_TO_RIGHT
+        :return: 名称是否属于源侧
+        """
+        return self.counterpart(name, direction) is not None
+
+
+def _planeAxis(plane):
+    """
+    :param plane: "YZ"/"XZ"/"XY"
+    :return: 法线轴索引
+    """
+    try:
+        return Planes[plane.upper()]
+    except KeyError:
+        raise ValueError("镜像平面只能是YZ/XZ/XY: {}".format(plane))
+
+
+def mirrorPositions(positions, plane = "YZ"):
+    """
+    批量镜像位置
+    :param positions: (..., 3)
+    :param plane: 镜像平面
+    :return: (..., 3)
+    """
+    positions = np.array(positions, dtype = np.float64)
+    positions[..., _planeAxis(plane)] *= -1.0
+    return positions
+
+
+def mirrorQuaternions(q, plane = "YZ", mode = REFLECT):
+    """
+    批量镜像旋转
+        REFLECT: 旋转轴为伪向量, 反射后取反, 即法线分量不变、另外两个分量取反, 角度不变
+        BEHAVIOR: 行为镜像的骨骼局部旋转两侧相同
+    :param q: (..., 4)
+    :param plane: 镜像平面
+    :param mode: REFLECT或BEHAVIOR
+    :return: (..., 4)
+    """
+    q = np.array(q, dtype = np.float64)
+    if mode == BEHAVIOR:
+        return q
+    axis = _planeAxis(plane)
+    for i in range(3):
+        if i != axis:
+            q[..., i] *= -1.0
+    return q
+
+
+def attrSign(attr, plane = "YZ", mode = REFLECT):
+    """
+    属性值镜像后的符号
+        REFLECT: 法线方向的位移与另外两个轴的旋转取反
+        BEHAVIOR: 位移取反, 旋转不变
+        缩放与自定义属性(blendShape权重、驱动属性等)不变
+    :param attr: 属性名称(可以是"node.attr", 支持tx/rx等短名称)
+    :param plane: 镜像平面
+    :param mode: REFLECT或BEHAVIOR
+    :return: 1.0或-1.0
+    """
+    attr = attr.rsplit(".", 1)[-1]
+    match = _TRANSFORM_ATTR_RE.match(_SHORT_ATTRS.get(attr, attr))
+    if match is None:
+        return 1.0
+    kind, axis = match.group(1), "XYZ".index(match.group(2))
+    normal = _planeAxis(plane)
+    if kind == "translate":
+        return -1.0 if mode == BEHAVIOR or axis == normal else 1.0
+    if kind == "rotate":
+        return -1.0 if mode == REFLECT and axis != normal else 1.0
+    return 1.0
+
+
+class SDKCurves(object):
+    """
+    一组驱动关键帧(set driven key)曲线
+        所有曲线的关键帧保存在连续数组中, 第i条曲线的关键帧为[offsets[i], offsets[i + 1])
+    """
+
+    def __init__(self, drivers, drivens, offsets, inputs, outputs, in_slopes = None, out_slopes = None):
+        """
+        :param drivers: [驱动属性"node.attr", ...] (C,)
+        :param drivens: [被驱动属性"node.attr", ...] (C,)
+        :param offsets: (C + 1,) int64
+        :param inputs: (K,) 驱动值
+        :param outputs: (K,) 被驱动值
+        :param in_slopes: (K,) 入切线斜率, 可以为空
+        :param out_slopes: (K,) 出切线斜率, 可以为空
+        """
+        self.drivers = list(drivers)
+        self.drivens = list(drivens)
+        self.offsets = np.asarray(offsets, dtype = np.int64)
+        self.inputs = np.asarray(inputs, dtype = np.float64)
+        self.outputs = np.asarray(outputs, dtype = np.float64)
+        self.in_slopes = None if in_slopes is None else np.asarray(in_slopes, dtype = np.float64)
+        self.out_slopes = None if out_slopes is None else np.asarray(out_slopes, dtype = np.float64)
+
+    @classmethod
+    def fromCurves(cls, curves):
+        """
+        由曲线列表创建
+        :param curves: 可迭代的 (驱动属性, 被驱动属性, 驱动值列表, 被驱动值列表[, 入切线, 出切线])
+        :return: SDKCurves
+        """
+        drivers, drivens, counts = [], [], []
+        inputs, outputs, in_slopes, out_slopes = [], [], [], []
+        has_slopes = True
+        for curve in curves:
+            drivers.append(curve[0])
+            drivens.append(curve[1])
+            counts.append(len(curve[2]))
+            inputs.extend(curve[2])
+            outputs.extend(curve[3])
+            if len(curve) > 5:
+                in_slopes.extend(curve[4])
+                out_slopes.extend(curve[5])
+            else:
+                has_slopes = False
+        offsets = np.zeros(len(counts) + 1, dtype = np.int64)
+        np.cumsum(counts, out = offsets[1:])
+        if not has_slopes:
+            in_slopes = out_slopes = None
+        return cls(drivers, drivens, offsets, inputs, outputs, in_slopes, out_slopes)
+
+    @classmethod
+    def concatenate(cls, groups):
+        """
+        合并多组曲线
+        :param groups: [SDKCurves, ...]
+        :return: SDKCurves
+        """
+        groups = list(groups)
+        if not groups:
+            return cls([], [], [0], [], [])
+        offsets = [groups[0].offsets]
+        for group in groups[1:]:
+            offsets.append(group.offsets[1:] + offsets[-1][-1])
+        slopes = all(group.in_slopes is not None for group in groups)
+        return cls([d for group in groups for d in group.drivers],
+                   [d for group in groups for d in group.drivens],
+                   np.concatenate(offsets),
+                   np.concatenate([group.inputs for group in groups]),
+                   np.concatenate([group.outputs for group in groups]),
+                   np.concatenate([group.in_slopes for group in groups]) if slopes else None,
+                   np.concatenate([group.out_slopes for group in groups]) if slopes else None)
+
+    def __len__(self):
+        return len(self.drivens)
+
+    @property
+    def keyCount(self):
+        return len(self.inputs)
+
+    def curve(self, index):
+        """
+        :param index: 曲线索引
+        :return: (驱动属性, 被驱动属性, 驱动值 (n,), 被驱动值 (n,))
+        """
+        span = slice(int(self.offsets[index]), int(self.offsets[index + 1]))
+        return self.drivers[index], self.drivens[index], self.inputs[span], self.outputs[span]
+
+    def select(self, mask):
+        """
+        按曲线筛选(关键帧数组批量复制)
+        :param mask: (C,) bool
+        :return: SDKCurves
+        """
+        mask = np.asarray(mask, dtype = bool)
+        counts = np.diff(self.offsets)
+        keys = np.repeat(mask, counts)
+        offsets = np.zeros(int(mask.sum()) + 1, dtype = np.int64)
+        np.cumsum(counts[mask], out = offsets[1:])
+        pick = np.flatnonzero(mask)
+        return SDKCurves([self.drivers[i] for i in pick], [self.drivens[i] for i in pick], offsets,
+                         self.inputs[keys], self.outputs[keys],
+                         None if self.in_slopes is None else self.in_slopes[keys],
+                         None if self.out_slopes is None else self.out_slopes[keys])
+
+
+class Mirror(object):
+    """
+    镜像引擎
+    """
+
+    def __init__(self, names = None, plane = "YZ", mode = BEHAVIOR):
+        """
+        :param names: NameMirror
+        :param plane: 镜像平面
+        :param mode: BEHAVIOR(ADV骨骼默认)或REFLECT
+        """
+        self.names = names or NameMirror()
+        self.plane = plane
+        self.mode = mode
+        _planeAxis(plane)
+        # 属性名称 -> 符号
+        self._signs = {}
+
+    def _attrSigns(self, plugs):
+        """
+        批量获取属性符号
+        :param plugs: ["node.attr", ...]
+        :return: (n,) float64
+        """
+        signs = self._signs
+        result = np.empty(len(plugs))
+        for i, plug in enumerate(plugs):
+            attr = plug.rsplit(".", 1)[-1]
+            sign = signs.get(attr)
+            if sign is None:
+                sign = signs[attr] = attrSign(attr, self.plane, self.mode)
+            result[i] = sign
+        return result
+
+    def mirrorCurves(self, curves, direction = RIGHT_TO_LEFT):
+        """
+        镜像SDK曲线: 只处理被驱动属性属于源侧的曲线(每条曲线的关键帧需按驱动值排序)
+            驱动属性没有左右之分时(例如中间的控制器)保持不变
+            驱动值取反时关键帧顺序反转, 入/出切线交换
+        :param curves: SDKCurves
+        :param direction: RIGHT_TO_LEFT或LEFT_TO_RIGHT
+        :return: 另一侧的SDKCurves
+        """
+        drivens = self.names.mapNames(curves.drivens, direction)
+        mask = np.array([name is not None for name in drivens], dtype = bool)
+        source = curves.select(mask)
+        drivers = [mapped or driver for driver, mapped in
+                   zip(source.drivers, self.names.mapNames(source.drivers, direction))]
+        drivens = [name for name in drivens if name is not None]
+        counts = np.diff(source.offsets)
+        curve_of_key = np.repeat(np.arange(len(source)), counts)
+        in_sign = self._attrSigns(source.drivers)[curve_of_key]
+        out_sign = self._attrSigns(source.drivens)[curve_of_key]
+        inputs = source.inputs * in_sign
+        outputs = source.outputs * out_sign
+        in_slopes = out_slopes = None
+        if source.in_slopes is not None:
+            factor = out_sign * in_sign
+            flipped = in_sign < 0
+            in_slopes = np.where(flipped, source.out_slopes, source.in_slopes) * factor
+            out_slopes = np.where(flipped, source.in_slopes, source.out_slopes) * factor
+        # 关键帧已按驱动值排序, 驱动值取反的曲线只需反转关键帧顺序
+        order = np.arange(len(inputs))
+        flip = in_sign < 0
+        curve_start, curve_stop = source.offsets[:-1][curve_of_key], source.offsets[1:][curve_of_key]
+        order[flip] = (curve_start + curve_stop - 1 - order)[flip]
+        return SDKCurves(drivers, drivens, source.offsets, inputs[order], outputs[order],
+                         None if in_slopes is None else in_slopes[order],
+                         None if out_slopes is None else out_slopes[order])
+
+    def applyCurves(self, curves, direction = RIGHT_TO_LEFT):
+        """
+        镜像并替换目标侧曲线
+        :param curves: 两侧的全部SDKCurves
+        :param direction: RIGHT_TO_LEFT或LEFT_TO_RIGHT
+        :return: (新的全部曲线, 镜像生成的曲线)
+        """
+        mirrored = self.mirrorCurves(curves, direction)
+        replaced = set(zip(mirrored.drivers, mirrored.drivens))
+        keep = np.array([pair not in replaced for pair in zip(curves.drivers, curves.drivens)], dtype = bool)
+        return SDKCurves.concatenate((curves.select(keep), mirrored)), mirrored
+
+    def mirrorLocators(self, names, positions, rotations = None, direction = RIGHT_TO_LEFT):
+        """
+        镜像Locator(世界空间位置与旋转)
+        :param names: Locator名称列表
+        :param positions: (n, 3)
+        :param rotations: (n, 4) 四元数, 可以为空
+        :param direction: RIGHT_TO_LEFT或LEFT_TO_RIGHT
+        :return: (另一侧名称列表, 位置 (m, 3), 旋转 (m, 4)或None), 只包含源侧Locator
+        """
+        mapped = self.names.mapNames(names, direction)
+        mask = np.array([name is not None for name in mapped], dtype = bool)
+        positions = mirrorPositions(np.asarray(positions, dtype = np.float64)[mask], self.plane)
+        if rotations is not None:
+            # Locator在世界空间, 始终按平面反射
+            rotations = mirrorQuaternions(np.asarray(rotations, dtype = np.float64)[mask], self.plane, REFLECT)
+        return [name for name in mapped if name is not None], positions, rotations
+
+    def mirrorLibrary(self, library, direction = RIGHT_TO_LEFT):
+        """
+        镜像pose数据库: 源侧骨骼的全部pose(旋转与驱动目标)生成到另一侧, 替换另一侧原有pose
+        :param library: PoseLibrary
+        :param direction: RIGHT_TO_LEFT或LEFT_TO_RIGHT
+        :return: 新的PoseLibrary
+        """
+        from .poseLibrary import PoseLibrary
+        names = self.names
+        joint_names = library.jointNames()
+        mapped = names.mapNames(joint_names, direction)
+        targets = {name for name in mapped if name is not None}
+        source = [j for j, name in enumerate(mapped) if name is not None]
+        # 一次镜像全部源侧旋转
+        spans = [library.poseSlice(j) for j in source]
+        pose_ids = np.concatenate([np.arange(span.start, span.stop) for span in spans]) if spans else \
+            np.zeros(0, dtype = np.int64)
+        rotations = mirrorQuaternions(library.rotations[pose_ids], self.plane, self.mode)
+        rotation_of = dict(zip(pose_ids.tolist(), rotations))
+
+        def records():
+            # 保持原有骨骼顺序, 目标侧骨骼被替换, 新骨骼追加在末尾
+            for j, joint in enumerate(joint_names):
+                if joint in targets:
+                    continue
+                for record in library.records([j]):
+                    yield record
+            for j in source:
+                joint = mapped[j]
+                span = library.poseSlice(j)
+                for p in range(span.start, span.stop):
+                    edge_targets, values = library.poseTargets(p)
+                    items = []
+                    for t, v in zip(edge_targets.tolist(), values.tolist()):
+                        target = library.targetName(t)
+                        items.append((names.counterpart(target, direction) or target, v,
+                                      int(library.target_kinds[t])))
+                    pose = library.poseName(p)
+                    yield joint, names.counterpart(pose, direction) or pose, rotation_of[p], items
+
+        return PoseLibrary.build(records())
+
+
+def curvesToPlan(curves, plan = None):
+    """
+    把SDK曲线加入构建计划(每条曲线一个animCurve节点, 关键帧一次设置; 有切线斜率时同时设置为固定切线)
+    :param curves: SDKCurves
+    :param plan: interface.builder.BuildPlan, 为空时新建
+    :return: BuildPlan
+    """
+    from .builder import BuildPlan, plugNode
+    plan = plan or BuildPlan()
+    for i in range(len(curves)):
+        driver, driven, inputs, outputs = curves.curve(i)
+        attr = driven.rsplit(".", 1)[-1]
+        attr = _SHORT_ATTRS.get(attr, attr)
+        node_type = "animCurveUL" if attr.startswith("translate") else \
+            "animCurveUA" if attr.startswith("rotate") else "animCurveUU"
+        owner = plugNode(driven)
+        curve = plan.addNode(driven.replace(".", "_").replace("[", "_").replace("]", "") + "_sdk",
+                             node_type, owner = owner)
+        # 驱动关键帧(animCurveU*)的关键帧在keyValue(kv)中, keyTimeValue只属于时间曲线(animCurveT*)
+        plan.setAttr(curve + ".kv", tuple(np.column_stack((inputs, outputs)).ravel().tolist()), owner)
+        if curves.in_slopes is not None:
+            # 固定切线(1), 切线向量为(1, 斜率)
+            keys = slice(curves.offsets[i], curves.offsets[i + 1])
+            count = len(inputs)
+            plan.setAttr(curve + ".kit", (_FIXED_TANGENT,) * count, owner)
+            plan.setAttr(curve + ".kot", (_FIXED_TANGENT,) * count, owner)
+            plan.setAttr(curve + ".kix", (1.0,) * count, owner)
+            plan.setAttr(curve + ".kiy", tuple(curves.in_slopes[keys].tolist()), owner)
+            plan.setAttr(curve + ".kox", (1.0,) * count, owner)
+            plan.setAttr(curve + ".koy", tuple(curves.out_slopes[keys].tolist()), owner)
+        plan.connect(driver, curve + ".input", owner)
+        plan.connect(curve + ".output", driven, owner)
+        plan.require(plugNode(driver))
+    return plan
+
+
+__all__ = ['RIGHT_TO_LEFT', 'LEFT_TO_RIGHT', 'BEHAVIOR', 'REFLECT', 'Planes', 'SideTokens', 'NameMirror',
+           'mirrorPositions', 'mirrorQuaternions', 'attrSign', 'SDKCurves', 'Mirror', 'curvesToPlan']
@@ -0,0 +1,406 @@
+# -*- coding: UTF-8 -*-
+# Author  : AitrusC
+# FileName: poseIO
+# Time    : 2024-09-26
+# Contact : 906629272@qq.com
+# Description : pose设置的流式导入导出(JSON Lines / JSON), 用于在不同ADV绑定版本与角色之间迁移
+#
+#   .jsonl: 第一行为文件头, 之后每行一个pose, 同一骨骼的pose连续写入;
+#           文件末尾为骨骼 -> 字节范围索引行与索引位置行, 按骨骼导入时直接跳到对应范围
+#   .json : {"format": ..., "version": ..., "poses": [pose, ...]}, 逐个对象流式解析
+#
+#   pose记录: {"joint": 骨骼, "pose": pose, "rotation": [x, y, z, w], "targets": [...], "values": [...], "kinds": [...]}
+
+import json
+import os
+
+import numpy as np
+
+from .poseLibrary import BLENDSHAPE, PoseLibrary, _targetItems
+
+FORMAT = "poseDriver"
+VERSION = 1
+
+# 写入缓冲区达到该字节数时写入文件
+ChunkSize = 1 << 20
+# 读取.json时每次读取的字符数
+ReadSize = 1 << 16
+# 读取索引位置行时从文件末尾读取的字节数
+_TAIL_SIZE = 256
+
+_INFINITY = float("inf")
+
+_dumps = json.JSONEncoder(ensure_ascii = False, separators = (",", ":")).encode
+
+
+def _isJsonLines(path):
+    """
+    按扩展名判断文件格式
+    :param path:
+    :return:
+    """
+    return os.path.splitext(path)[1].lower() in (".jsonl", ".ndjson")
+
+
+def _floatText(value):
+    """
+    浮点数转为JSON数字, 与json模块相同: 非有限值写为NaN/Infinity/-Infinity(json.loads可以读取)
+    :param value: float
+    :return: str
+    """
+    if value != value:
+        return "NaN"
+    if value in (_INFINITY, -_INFINITY):
+        return "Infinity" if value > 0 else "-Infinity"
+    return float.__repr__(value)
+
+
+def _floats(values):
+    """
+    浮点数列表转为JSON数组内容(与json模块相同使用repr)
+    :param values: 列表
+    :return: str
+    """
+    text = ",".join(map(float.__repr__, values))
+    # 有限值的repr不含字母n, 出现时说明有nan/inf
+    return ",".join(map(_floatText, values)) if "n" in text else text
+
+
+def _float32Texts(values):
+    """
+    float32数组逐个转为JSON数字(9位有效数字足以让float32精确往返, 避免float64的repr输出0.10000000149011612这类噪声)
+    :param values: float32数组
+    :return: [str, ...]
+    """
+    if not np.isfinite(values).all():
+        return [_floatText(float("%.9g" % v)) for v in values.tolist()]
+    return ["%.9g" % v for v in values.tolist()]
+
+
+def _libraryLines(library, joints = None):
+    """
+    直接由pose数据库数组生成记录行(按骨骼批量转换数组, 比逐个记录编码快)
+    :param library: PoseLibrary
+    :param joints: 骨骼索引, 为空时为全部
+    :return: 生成器 (骨骼名称, 记录行)
+    """
+    # 目标id -> JSON字符串(按需编码并缓存)
+    target_json = {}
+    kinds = library.target_kinds
+    for j in (range(library.jointCount) if joints is None else joints):
+        joint = library.jointName(j)
+        head = '{"joint":' + _dumps(joint) + ',"pose":'
+        span = library.poseSlice(j)
+        rotations = library.jointRotations(j).tolist()
+        offsets, targets, values = library.jointTargets(j)
+        offsets = offsets.tolist()
+        value_texts = _float32Texts(values)
+        target_ids = targets.tolist()
+        for t in set(target_ids).difference(target_json):
+            target_json[t] = _dumps(library.targetName(t))
+        special = (kinds[targets] != BLENDSHAPE) if len(targets) else ()
+        for i, pose in enumerate(range(span.start, span.stop)):
+            start, stop = offsets[i], offsets[i + 1]
+            ids = target_ids[start:stop]
+            line = (head + _dumps(library.poseName(pose)) + ',"rotation":[' + _floats(rotations[i]) +
+                    '],"targets":[' + ",".join([target_json[t] for t in ids]) +
+                    '],"values":[' + ",".join(value_texts[start:stop]) + "]")
+            if start != stop and special[start:stop].any():
+                line += ',"kinds":[' + ",".join(str(int(kinds[t])) for t in ids) + "]"
+            yield joint, line + "}"
+
+
+def _recordLine(joint, pose, rotation_q, targets):
+    """
+    pose记录转为一行JSON
+        "joint"固定为第一个键, 按骨骼过滤时只需比较行首字节
+    :param joint: 骨骼名称
+    :param pose: pose名称
+    :param rotation_q: (4,) 四元数
+    :param targets: {目标名称: 驱动值} 或 [(目标名称, 驱动值, 类型), ...]
+    :return: str
+    """
+    items = _targetItems(targets)
+    record = {"joint": joint, "pose": pose,
+              "rotation": [float(v) for v in rotation_q],
+              "targets": [t for t, v, kind in items],
+              "values": [v for t, v, kind in items]}
+    if any(kind != BLENDSHAPE for t, v, kind in items):
+        record["kinds"] = [kind for t, v, kind in items]
+    return _dumps(record)
+
+
+def _jointPrefix(joint):
+    """
+    骨骼记录行的行首字节
+    :param joint: 骨骼名称
+    :return: bytes
+    """
+    return ('{"joint":' + _dumps(joint) + ",").encode("utf-8")
+
+
+def _fromRecord(record):
+    """
+    JSON对象转为pose记录
+    :param record: dict
+    :return: (骨骼名称, pose名称, 旋转, [(目标名称, 驱动值, 类型), ...])
+    """
+    targets = record.get("targets", ())
+    kinds = record.get("kinds") or [BLENDSHAPE] * len(targets)
+    return (record["joint"], record["pose"], record["rotation"],
+            list(zip(targets, record.get("values", ()), kinds)))
+
+
+def _header(**extra):
+    """
+    文件头
+    :param extra: 其他信息
+    :return: dict
+    """
+    header = {"format": FORMAT, "version": VERSION}
+    header.update(extra)
+    return header
+
+
+def writePoses(records, path, chunk_size = None, **extra):
+    """
+    流式写入pose记录(按扩展名选择.jsonl或.json)
+        记录逐个转换并写入缓冲区, 内存占用与记录总数无关
+    :param records: 可迭代的 (骨骼名称, pose名称, 旋转(4,), 驱动目标), 例如PoseLibrary.records()
+    :param path: 文件路径
+    :param chunk_size: 缓冲区字节数, 默认ChunkSize
+    :param extra: 写入文件头的其他信息
+    :return: 写入的pose数量
+    """
+    return _writeLines(((record[0], _recordLine(*record)) for record in records), path, chunk_size, **extra)
+
+
+def _writeLines(lines, path, chunk_size = None, **extra):
+    """
+    流式写入记录行
+    :param lines: 可迭代的 (骨骼名称, 记录行)
+    :param path: 文件路径
+    :param chunk_size: 缓冲区字节数, 默认ChunkSize
+    :param extra: 写入文件头的其他信息
+    :return: 写入的pose数量
+    """
+    chunk_size = chunk_size or ChunkSize
+    json_lines = _isJsonLines(path)
+    # 骨骼名称 -> [[起始字节, 结束字节], ...]
+    index = {}
+    count = 0
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        buffer = []
+        size = 0
+        if json_lines:
+            head = (_dumps(_header(**extra)) + "\n").encode("utf-8")
+        else:
+            head = _dumps(_header(**extra))[:-1].encode("utf-8") + b',"poses":[\n'
+        f.write(head)
+        position = len(head)
+        current, start = None, position
+        for joint, line in lines:
+            data = ((",\n" if count and not json_lines else "") + line + ("\n" if json_lines else "")).encode("utf-8")
+            if joint != current:
+                if current is not None:
+                    index.setdefault(current, []).append([start, position])
+                current, start = joint, position
+            buffer.append(data)
+            size += len(data)
+            position += len(data)
+            count += 1
+            if size >= chunk_size:
+                f.write(b"".join(buffer))
+                buffer, size = [], 0
+        if current is not None:
+            index.setdefault(current, []).append([start, position])
+        f.write(b"".join(buffer))
+        if json_lines:
+            f.write((_dumps({"index": index}) + "\n").encode("utf-8"))
+            f.write((_dumps({"index_offset": position}) + "\n").encode("utf-8"))
+        else:
+            f.write(b"\n]}\n")
+    os.replace(tmp_path, path)
+    return count
+
+
+def _readJsonHeader(f):
+    """
+    读取.json文件头(poses之前的部分)
+    :param f: 文本模式打开的文件
+    :return: (文件头, 已读取的文本, poses数组之后的位置)
+    """
+    text = ""
+    start = -1
+    while start < 0 or text.find("[", start) < 0:
+        chunk = f.read(ReadSize)
+        if not chunk:
+            raise ValueError("不是pose文件: {}".format(getattr(f, "name", f)))
+        text += chunk
+        start = text.find('"poses"')
+    header = json.loads(text[:start].rstrip().rstrip(",") + "}")
+    if header.get("version", 0) > VERSION:
+        raise ValueError("不支持的pose文件版本: {}".format(header.get("version")))
+    return header, text, text.index("[", start) + 1
+
+
+def readHeader(path):
+    """
+    读取文件头
+    :param path: 文件路径
+    :return: dict(.json文件不包含poses)
+    """
+    if _isJsonLines(path):
+        with open(path, "rb") as f:
+            return json.loads(f.readline())
+    with open(path, "r", encoding = "utf-8") as f:
+        return _readJsonHeader(f)[0]
+
+
+def readIndex(path):
+    """
+    读取.jsonl文件的骨骼索引
+    :param path: 文件路径
+    :return: {骨骼名称: [[起始字节, 结束字节], ...]}, 没有索引时返回None
+    """
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        f.seek(max(0, size - _TAIL_SIZE))
+        lines = f.read().splitlines()
+        if not lines or not lines[-1].startswith(b'{"index_offset":'):
+            return None
+        f.seek(json.loads(lines[-1])["index_offset"])
+        return json.loads(f.readline()).get("index")
+
+
+def _iterJsonLines(path, joints):
+    """
+    逐行读取.jsonl
+    :param path:
+    :param joints: 骨骼名称集合, 为空时读取全部
+    :return: 生成器
+    """
+    index = readIndex(path) if joints is not None else None
+    with open(path, "rb") as f:
+        header = json.loads(f.readline())
+        if header.get("version", 0) > VERSION:
+            raise ValueError("不支持的pose文件版本: {}".format(header.get("version")))
+        if index is not None:
+            # 有索引时只读取所需骨骼的字节范围
+            for joint in joints:
+                for start, stop in index.get(joint, ()):
+                    f.seek(start)
+                    for line in f.read(stop - start).splitlines():
+                        yield _fromRecord(json.loads(line))
+            return
+        prefixes = tuple(_jointPrefix(joint) for joint in joints) if joints is not None else None
+        for line in f:
+            if line.startswith(b'{"index'):
+                break
+            # 不需要的骨骼只比较行首, 不解析JSON
+            if prefixes is not None and not line.startswith(prefixes):
+                continue
+            if line.strip():
+                yield _fromRecord(json.loads(line))
+
+
+def _iterJson(path, joints):
+    """
+    流式解析.json中的poses数组
+    :param path:
+    :param joints: 骨骼名称集合, 为空时读取全部
+    :return: 生成器
+    """
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding = "utf-8") as f:
+        text, position = _readJsonHeader(f)[1:]
+        while True:
+            # 跳过分隔符, 缓冲区不足时继续读取
+            while True:
+                while position < len(text) and text[position] in " \t\r\n,":
+                    position += 1
+                if position < len(text):
+                    break
+                text, position = f.read(ReadSize), 0
+                if not text:
+                    return
+            if text[position] == "]":
+                return
+            try:
+                record, end = decoder.raw_decode(text, position)
+            except ValueError:
+                chunk = f.read(ReadSize)
+                if not chunk:
+                    raise
+                text = text[position:] + chunk
+                position = 0
+                continue
+            position = end
+            if joints is None or record.get("joint") in joints:
+                yield _fromRecord(record)
+
+
+def readPoses(path, joints = None):
+    """
+    流式读取pose记录(按扩展名选择.jsonl或.json)
+        .jsonl按骨骼读取时通过文件末尾的索引只读取对应字节范围, 不解析其他骨骼
+    :param path: 文件路径
+    :param joints: 只读取这些骨骼(例如一条肢体), 为空时读取全部
+    :return: 生成器 (骨骼名称, pose名称, 旋转, [(目标名称, 驱动值, 类型), ...])
+    """
+    if joints is not None:
+        joints = list(dict.fromkeys(joints))
+    if _isJsonLines(path):
+        return _iterJsonLines(path, joints)
+    return _iterJson(path, None if joints is None else set(joints))
+
+
+def exportLibrary(library, path, joints = None, chunk_size = None):
+    """
+    导出pose数据库
+    :param library: PoseLibrary
+    :param path: 文件路径(.jsonl或.json)
+    :param joints: 只导出这些骨骼名称, 为空时导出全部
+    :param chunk_size: 写入缓冲区字节数
+    :return: 导出的pose数量
+    """
+    if joints is not None:
+        joints = [j for j in (library.jointIndex(name) for name in joints) if j >= 0]
+    return _writeLines(_libraryLines(library, joints), path, chunk_size)
+
+
+def importLibrary(path, joints = None):
+    """
+    导入为pose数据库
+    :param path: 文件路径(.jsonl或.json)
+    :param joints: 只导入这些骨骼名称, 为空时导入全部
+    :return: PoseLibrary
+    """
+    return PoseLibrary.build(readPoses(path, joints))
+
+
+def mergeInto(library, path, joints = None):
+    """
+    导入到已有pose数据库(同名pose覆盖旋转与驱动目标)
+    :param library: PoseLibrary
+    :param path: 文件路径(.jsonl或.json)
+    :param joints: 只导入这些骨骼名称, 为空时导入全部
+    :return: 导入的pose数量
+    """
+    count = 0
+    for joint, pose, rotation_q, targets in readPoses(path, joints):
+        j = library.addJoint(joint)
+        p = library.poseIndex(j, pose)
+        if p >= 0:
+            library.removePose(p)
+            library.addPose(j, pose, rotation_q, targets, p - library.poseSlice(j).start)
+        else:
+            library.addPose(j, pose, rotation_q, targets)
+        count += 1
+    return count
+
+
+__all__ = ['FORMAT', 'VERSION', 'writePoses', 'readHeader', 'readIndex', 'readPoses',
+           'exportLibrary', 'importLibrary', 'mergeInto']
@@ -0,0 +1,652 @@
+# -*- coding: UTF-8 -*-
+# Author  : AitrusC
+# FileName: poseLibrary
+# Time    : 2024-09-25
+# Contact : 906629272@qq.com
+# Description : pose数据库(连续NumPy数组 + 字符串表, 可内存映射的二进制文件)
+#
+#   骨骼 -> pose: joint_offsets (J + 1,), 第j个骨骼的pose为[joint_offsets[j], joint_offsets[j + 1])
+#   pose -> 驱动目标: target_offsets (P + 1,), 第p个pose的边为[target_offsets[p], target_offsets[p + 1])
+#   边: edge_targets (E,) 目标id, edge_values (E,) 驱动值
+#   所有名称保存为字符串表中的id
+
+import json
+import os
+
+import numpy as np
+
+# 驱动目标类型
+BLENDSHAPE, JOINT_ATTRIBUTE = range(2)
+
+_MAGIC = b"PDLIB\0"
+_VERSION = 1
+# 数组在文件中的对齐字节数
+_ALIGN = 64
+
+
+class StringTable(object):
+    """
+    字符串表(名称驻留)
+        每个名称只保存一次, 其他数组中只保存id
+        从文件加载时字符串以utf-8字节块 + 偏移数组保存, 只有用到时才解码
+    """
+
+    def __init__(self, strings = None, blob = None, offsets = None):
+        """
+        初始化字符串表
+        :param strings: 字符串列表
+        :param blob: (n,) uint8 utf-8字节块(从文件加载时使用)
+        :param offsets: (count + 1,) int64 每个字符串在blob中的偏移
+        """
+        self._blob = blob
+        self._offsets = offsets
+        self._base_count = 0 if offsets is None else len(offsets) - 1
+        # 已解码的字符串缓存与加载后新增的字符串
+        self._decoded = {}
+        self._extra = []
+        # 字符串 -> id(第一次查找时建立)
+        self._lookup = None
+        for string in strings or ():
+            self.intern(string)
+
+    def __len__(self):
+        return self._base_count + len(self._extra)
+
+    def __getitem__(self, index):
+        """
+        获取字符串
+        :param index: id
+        :return:
+        """
+        if index < 0:
+            index += len(self)
+        if index >= self._base_count:
+            return self._extra[index - self._base_count]
+        string = self._decoded.get(index)
+        if string is None:
+            start, stop = self._offsets[index], self._offsets[index + 1]
+            string = self._decoded[index] = self._blob[start:stop].tobytes().decode("utf-8")
+        return string
+
+    def _buildLookup(self):
+        """
+        建立字符串 -> id表
+        :return:
+        """
+        if self._lookup is None:
+            self._lookup = {self[i]: i for i in range(len(self))}
+        return self._lookup
+
+    def find(self, string):
+        """
+        查找字符串id(第一次调用时会解码全部字符串)
+        :param string:
+        :return: id, 不存在时返回-1
+        """
+        return self._buildLookup().get(string, -1)
+
+    def intern(self, string):
+        """
+        获取字符串id, 不存在时添加
+        :param string:
+        :return: id
+        """
+        lookup = self._buildLookup()
+        index = lookup.get(string)
+        if index is None:
+            index = lookup[string] = len(self)
+            self._extra.append(string)
+        return index
+
+    def loadIntoMemory(self):
+        """
+        把内存映射的字节块复制到内存(之后不再引用映射的文件)
+        :return:
+        """
+        if self._blob is not None:
+            self._blob = np.array(self._blob)
+            self._offsets = np.array(self._offsets)
+
+    def toArrays(self):
+        """
+        转为(blob, offsets)数组
+        :return:
+        """
+        encoded = [self[i].encode("utf-8") for i in range(len(self))]
+        offsets = np.zeros(len(encoded) + 1, dtype = np.int64)
+        np.cumsum([len(b) for b in encoded], out = offsets[1:])
+        blob = np.frombuffer(b"".join(encoded), dtype = np.uint8)
+        return blob, offsets
+
+
+class PoseLibrary(object):
+    """
+    pose数据库
+        所有数据保存在连续数组中, 从文件加载时为只读内存映射, 修改时才复制到内存
+        按骨骼切片(poseSlice/jointRotations等)返回数组视图, 不复制数据
+    """
+    # 数组名称 -> dtype, 用于保存/加载
+    ArrayTypes = {
+        "joint_names": np.int32,
+        "joint_offsets": np.int64,
+        "pose_names": np.int32,
+        "pose_joints": np.int32,
+        "rotations": np.float64,
+        "target_names": np.int32,
+        "target_kinds": np.int8,
+        "target_offsets": np.int64,
+        "edge_targets": np.int32,
+        "edge_values": np.float32,
+    }
+
+    def __init__(self, strings = None, arrays = None, path = None):
+        """
+        初始化(一般通过PoseLibrary.build或PoseLibrary.load创建)
+        :param strings: StringTable
+        :param arrays: {数组名称: 数组}
+        :param path: 加载的文件路径
+        """
+        self.strings = strings if strings is not None else StringTable()
+        arrays = arrays or {}
+        for name, dtype in self.ArrayTypes.items():
+            default = np.zeros(1 if name in ("joint_offsets", "target_offsets") else 0, dtype = dtype)
+            if name == "rotations":
+                default = np.zeros((0, 4), dtype = dtype)
+            setattr(self, name, arrays.get(name, default))
+        self.path = path
+        # 骨骼/目标名称 -> 索引(第一次查找时建立)
+        self._joint_lookup = None
+        self._target_lookup = None
+        # 目标 -> 边的反向索引(第一次使用时建立)
+        self._target_edges = None
+        # 修改计数, 每次修改后加1(界面据此判断数据库是否需要重新同步)
+        self.revision = 0
+
+    @classmethod
+    def build(cls, records):
+        """
+        由pose记录构建
+        :param records: 可迭代的 (骨骼名称, pose名称, 旋转(4,), {目标名称: 驱动值} 或 [(目标名称, 驱动值, 类型), ...])
+        :return: PoseLibrary
+        """
+        library = cls()
+        by_joint = {}
+        for joint, pose, rotation_q, targets in records:
+            by_joint.setdefault(joint, []).append((pose, rotation_q, targets))
+        strings = library.strings
+        joint_names, joint_offsets = [], [0]
+        pose_names, pose_joints, rotations = [], [], []
+        target_ids, target_kinds, target_offsets = {}, [], [0]
+        edge_targets, edge_values = [], []
+        for j, (joint, poses) in enumerate(by_joint.items()):
+            joint_names.append(strings.intern(joint))
+            for pose, rotation_q, targets in poses:
+                pose_names.append(strings.intern(pose))
+                pose_joints.append(j)
+                rotations.append(rotation_q)
+                for target, value, kind in _targetItems(targets):
+                    tid = target_ids.get(target)
+                    if tid is None:
+                        tid = target_ids[target] = len(target_ids)
+                        target_kinds.append(kind)
+                    edge_targets.append(tid)
+                    edge_values.append(value)
+                target_offsets.append(len(edge_targets))
+            joint_offsets.append(len(pose_names))
+        library.joint_names = np.array(joint_names, dtype = np.int32)
+        library.joint_offsets = np.array(joint_offsets, dtype = np.int64)
+        library.pose_names = np.array(pose_names, dtype = np.int32)
+        library.pose_joints = np.array(pose_joints, dtype = np.int32)
+        library.rotations = np.array(rotations, dtype = np.float64).reshape(-1, 4)
+        library.target_names = np.array([strings.intern(t) for t in target_ids], dtype = np.int32)
+        library.target_kinds = np.array(target_kinds, dtype = np.int8)
+        library.target_offsets = np.array(target_offsets, dtype = np.int64)
+        library.edge_targets = np.array(edge_targets, dtype = np.int32)
+        library.edge_values = np.array(edge_values, dtype = np.float32)
+        return library
+
+    # ---------------------------------------------------------------- 查询
+
+    @property
+    def jointCount(self):
+        return len(self.joint_names)
+
+    @property
+    def poseCount(self):
+        return len(self.pose_names)
+
+    @property
+    def targetCount(self):
+        return len(self.target_names)
+
+    def jointName(self, joint):
+        """
+        :param joint: 骨骼索引
+        :return: 骨骼名称
+        """
+        return self.strings[int(self.joint_names[joint])]
+
+    def jointNames(self):
+        """
+        :return: 全部骨骼名称
+        """
+        return [self.strings[int(i)] for i in self.joint_names]
+
+    def poseName(self, pose):
+        """
+        :param pose: pose索引
+        :return: pose名称
+        """
+        return self.strings[int(self.pose_names[pose])]
+
+    def targetName(self, target):
+        """
+        :param target: 目标索引
+        :return: 目标名称
+        """
+        return self.strings[int(self.target_names[target])]
+
+    def jointIndex(self, name):
+        """
+        按名称查找骨骼
+        :param name: 骨骼名称
+        :return: 索引, 不存在时返回-1
+        """
+        if self._joint_lookup is None:
+            self._joint_lookup = {self.strings[int(sid)]: j for j, sid in enumerate(self.joint_names)}
+        return self._joint_lookup.get(name, -1)
+
+    def targetIndex(self, name):
+        """
+        按名称查找驱动目标
+        :param name: 目标名称
+        :return: 索引, 不存在时返回-1
+        """
+        if self._target_lookup is None:
+            self._target_lookup = {self.strings[int(sid)]: t for t, sid in enumerate(self.target_names)}
+        return self._target_lookup.get(name, -1)
+
+    def poseSlice(self, joint):
+        """
+        骨骼的pose范围
+        :param joint: 骨骼索引
+        :return: slice
+        """
+        return slice(int(self.joint_offsets[joint]), int(self.joint_offsets[joint + 1]))
+
+    def poseIndex(self, joint, name):
+        """
+        按名称查找骨骼下的pose
+        :param joint: 骨骼索引
+        :param name: pose名称
+        :return: 全局pose索引, 不存在时返回-1
+        """
+        span = self.poseSlice(joint)
+        for pose in range(span.start, span.stop):
+            if self.poseName(pose) == name:
+                return pose
+        return -1
+
+    def jointPoseNames(self, joint):
+        """
+        :param joint: 骨骼索引
+        :return: 骨骼下的pose名称列表
+        """
+        return [self.strings[int(i)] for i in self.pose_names[self.poseSlice(joint)]]
+
+    def jointRotations(self, joint):
+        """
+        骨骼下全部pose的旋转(数组视图)
+        :param joint: 骨骼索引
+        :return: (n, 4)
+        """
+        return self.rotations[self.poseSlice(joint)]
+
+    def edgeSlice(self, pose):
+        """
+        pose的驱动边范围
+        :param pose: pose索引
+        :return: slice
+        """
+        return slice(int(self.target_offsets[pose]), int(self.target_offsets[pose + 1]))
+
+    def poseTargets(self, pose):
+        """
+        pose驱动的目标与驱动值(数组视图)
+        :param pose: pose索引
+        :return: (目标索引 (n,), 驱动值 (n,))
+        """
+        span = self.edgeSlice(pose)
+        return self.edge_targets[span], self.edge_values[span]
+
+    def jointTargets(self, joint):
+        """
+        骨骼下全部pose的驱动边(数组视图)
+        :param joint: 骨骼索引
+        :return: (边偏移 (n + 1,) 从0开始, 目标索引, 驱动值)
+        """
+        span = self.poseSlice(joint)
+        start, stop = int(self.target_offsets[span.start]), int(self.target_offsets[span.stop])
+        offsets = self.target_offsets[span.start:span.stop + 1] - start
+        return offsets, self.edge_targets[start:stop], self.edge_values[start:stop]
+
+    def targetPoses(self, target):
+        """
+        驱动该目标的全部pose
+        :param target: 目标索引
+        :return: (pose索引 (n,), 驱动值 (n,))
+        """
+        if self._target_edges is None:
+            order = np.argsort(self.edge_targets, kind = "stable")
+            bounds = np.searchsorted(self.edge_targets[order], np.arange(self.targetCount + 1))
+            self._target_edges = (order, bounds)
+        order, bounds = self._target_edges
+        edges = order[bounds[target]:bounds[target + 1]]
+        poses = np.searchsorted(self.target_offsets, edges, side = "right") - 1
+        return poses, self.edge_values[edges]
+
+    def toPoseData(self):
+        """
+        转为PoseTreeModel使用的数据
+        :return: [(骨骼名称, [pose名称, ...]), ...]
+        """
+        return [(self.jointName(j), self.jointPoseNames(j)) for j in range(self.jointCount)]
+
+    def records(self, joints = None):
+        """
+        逐个生成pose记录
+        :param joints: 只生成这些骨骼索引的记录, 为空时生成全部
+        :return: 生成器 (骨骼名称, pose名称, 旋转, [(目标名称, 驱动值, 类型), ...])
+        """
+        for j in (range(self.jointCount) if joints is None else joints):
+            joint = self.jointName(j)
+            span = self.poseSlice(j)
+            for p in range(span.start, span.stop):
+                targets, values = self.poseTargets(p)
+                yield (joint, self.poseName(p), self.rotations[p].copy(),
+                       [(self.targetName(t), float(v), int(self.target_kinds[t])) for t, v in zip(targets, values)])
+
+    # ---------------------------------------------------------------- 修改
+
+    def _invalidate(self):
+        """
+        清除查找缓存
+        :return:
+        """
+        self._joint_lookup = None
+        self._target_lookup = None
+        self._target_edges = None
+
+    def _writable(self, name):
+        """
+        获取可写数组(内存映射的只读数组先复制到内存)
+        :param name: 数组名称
+        :return:
+        """
+        array = getattr(self, name)
+        if not array.flags.writeable:
+            array = np.array(array)
+            setattr(self, name, array)
+        return array
+
+    def loadIntoMemory(self):
+        """
+        把内存映射的数组全部复制到内存, 释放对文件的引用(映射的文件不能被替换或删除, Windows上尤其如此)
+        :return:
+        """
+        for name in self.ArrayTypes:
+            self._writable(name)
+        self.strings.loadIntoMemory()
+
+    def addJoint(self, name):
+        """
+        添加骨骼(已存在时直接返回)
+        :param name: 骨骼名称
+        :return: 骨骼索引
+        """
+        joint = self.jointIndex(name)
+        if joint >= 0:
+            return joint
+        self.revision += 1
+        self.joint_names = np.append(self.joint_names, np.int32(self.strings.intern(name)))
+        self.joint_offsets = np.append(self.joint_offsets, self.joint_offsets[-1])
+        self._joint_lookup = None
+        return self.jointCount - 1
+
+    def addTarget(self, name, kind = BLENDSHAPE):
+        """
+        添加驱动目标(已存在时直接返回)
+        :param name: 目标名称(blendShape权重或骨骼属性)
+        :param kind: BLENDSHAPE或JOINT_ATTRIBUTE
+        :return: 目标索引
+        """
+        target = self.targetIndex(name)
+        if target >= 0:
+            return target
+        self.revision += 1
+        self.target_names = np.append(self.target_names, np.int32(self.strings.intern(name)))
+        self.target_kinds = np.append(self.target_kinds, np.int8(kind))
+        self._target_lookup = None
+        self._target_edges = None
+        return self.targetCount - 1
+
+    def truncateTargets(self, count):
+        """
+        删除索引不小于count的目标(用于撤销添加目标, 这些目标不能再被驱动边引用)
+        :param count: 保留的目标数量
+        :return:
+        """
+        if count >= self.targetCount:
+            return
+        if len(self.edge_targets) and int(self.edge_targets.max()) >= count:
+            raise ValueError("目标仍被pose引用, 不能删除")
+        self.revision += 1
+        self.target_names = self.target_names[:count]
+        self.target_kinds = self.target_kinds[:count]
+        self._target_lookup = None
+        self._target_edges = None
+
+    def addPose(self, joint, name, rotation_q, targets = None, index = None):
+        """
+        添加pose
+        :param joint: 骨骼索引
+        :param name: pose名称
+        :param rotation_q: (4,) 四元数
+        :param targets: {目标名称: 驱动值} 或 [(目标名称, 驱动值, 类型), ...]
+        :param index: 在该骨骼pose中的位置, 默认末尾
+        :return: 全局pose索引
+        """
+        self.revision += 1
+        span = self.poseSlice(joint)
+        pose = span.stop if index is None else span.start + int(index)
+        items = [(self.addTarget(t, kind), v) for t, v, kind in _targetItems(targets)]
+        edge_at = int(self.target_offsets[pose])
+        self.pose_names = np.insert(self.pose_names, pose, self.strings.intern(name))
+        self.pose_joints = np.insert(self.pose_joints, pose, joint)
+        self.rotations = np.insert(self.rotations, pose, np.asarray(rotation_q, dtype = np.float64), axis = 0)
+        self.edge_targets = np.insert(self.edge_targets, edge_at, [t for t, v in items]).astype(np.int32)
+        self.edge_values = np.insert(self.edge_values, edge_at, [v for t, v in items]).astype(np.float32)
+        offsets = np.insert(self.target_offsets, pose + 1, edge_at)
+        offsets[pose + 1:] += len(items)
+        self.target_offsets = offsets
+        joint_offsets = self._writable("joint_offsets")
+        joint_offsets[joint + 1:] += 1
+        self._target_edges = None
+        return pose
+
+    def removePose(self, pose):
+        """
+        删除pose及其驱动边
+        :param pose: 全局pose索引
+        :return:
+        """
+        self.revision += 1
+        span = self.edgeSlice(pose)
+        count = span.stop - span.start
+        self.edge_targets = np.delete(self.edge_targets, span)
+        self.edge_values = np.delete(self.edge_values, span)
+        offsets = np.delete(self.target_offsets, pose + 1)
+        offsets[pose + 1:] -= count
+        self.target_offsets = offsets
+        joint = int(self.pose_joints[pose])
+        self.pose_names = np.delete(self.pose_names, pose)
+        self.pose_joints = np.delete(self.pose_joints, pose)
+        self.rotations = np.delete(self.rotations, pose, axis = 0)
+        joint_offsets = self._writable("joint_offsets")
+        joint_offsets[joint + 1:] -= 1
+        self._target_edges = None
+
+    def movePose(self, pose, index):
+        """
+        在骨骼内移动pose(只移动两个位置之间的行与驱动边)
+        :param pose: 全局pose索引
+        :param index: 在该骨骼pose中的新位置
+        :return: 移动后的全局pose索引
+        """
+        span = self.poseSlice(int(self.pose_joints[pose]))
+        target = span.start + int(index)
+        if not span.start <= target < span.stop:
+            raise IndexError("pose位置超出范围: {}".format(index))
+        if target == pose:
+            return pose
+        self.revision += 1
+        lo, hi = min(pose, target), max(pose, target) + 1
+        shift = -1 if pose < target else 1
+        for name in ("pose_names", "rotations"):
+            array = self._writable(name)
+            array[lo:hi] = np.roll(array[lo:hi], shift, axis = 0)
+        # 驱动边按新的pose顺序重新排列
+        order = np.roll(np.arange(lo, hi), shift)
+        offsets = self._writable("target_offsets")
+        starts, stops = offsets[order], offsets[order + 1]
+        counts = stops - starts
+        edges = np.concatenate([np.arange(start, stop) for start, stop in zip(starts, stops)])
+        first = int(offsets[lo])
+        for name in ("edge_targets", "edge_values"):
+            array = self._writable(name)
+            array[first:first + len(edges)] = array[edges]
+        offsets[lo + 1:hi] = first + np.cumsum(counts)[:-1]
+        self._target_edges = None
+        return target
+
+    def setPoseValues(self, pose, values):
+        """
+        修改pose全部驱动边的驱动值(目标不变)
+        :param pose: 全局pose索引
+        :param values: (n,) 驱动值, n为pose的驱动边数量
+        :return:
+        """
+        self.revision += 1
+        self._writable("edge_values")[self.edgeSlice(pose)] = values
+
+    def setRotation(self, pose, rotation_q):
+        """
+        修改pose旋转
+        :param pose: 全局pose索引
+        :param rotation_q: (4,) 四元数
+        :return:
+        """
+        self.revision += 1
+        self._writable("rotations")[pose] = rotation_q
+
+    def renamePose(self, pose, name):
+        """
+        重命名pose
+        :param pose: 全局pose索引
+        :param name: 新名称
+        :return:
+        """
+        self.revision += 1
+        self._writable("pose_names")[pose] = self.strings.intern(name)
+
+    # ---------------------------------------------------------------- 文件
+
+    def arrays(self):
+        """
+        全部数组(包括字符串表)
+        :return: {名称: 数组}
+        """
+        blob, offsets = self.strings.toArrays()
+        arrays = {name: getattr(self, name) for name in self.ArrayTypes}
+        arrays["string_blob"] = blob
+        arrays["string_offsets"] = offsets
+        return arrays
+
+    def save(self, path):
+        """
+        保存为二进制文件
+            文件头: magic + 版本 + 清单长度 + JSON清单({名称: [dtype, shape, 偏移]})
+            之后为按_ALIGN字节对齐的原始数组数据, 可直接内存映射
+            保存到加载时的文件时先把映射的数据复制到内存(同一文件被其他PoseLibrary映射时Windows上仍无法替换)
+        :param path: 文件路径
+        :return:
+        """
+        arrays = self.arrays()
+        manifest = {}
+        offset = 0
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            arrays[name] = array
+            manifest[name] = [array.dtype.str, list(array.shape), offset]
+            offset += -(-array.nbytes // _ALIGN) * _ALIGN
+        header = json.dumps(manifest).encode("utf-8")
+        data_start = -(-(len(_MAGIC) + 8 + len(header)) // _ALIGN) * _ALIGN
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(_MAGIC)
+            f.write(np.array([_VERSION, len(header)], dtype = "<u4").tobytes())
+            f.write(header)
+            for name, array in arrays.items():
+                f.seek(data_start + manifest[name][2])
+                f.write(array.tobytes())
+            f.truncate(data_start + offset)
+        # 释放对映射数组的引用
+        arrays = array = None
+        if self.path is not None and os.path.exists(path) and os.path.samefile(self.path, path):
+            # 覆盖加载时内存映射的文件: 先复制到内存并释放映射, 否则Windows上无法替换
+            self.loadIntoMemory()
+        os.replace(tmp_path, path)
+        self.path = path
+
+    @classmethod
+    def load(cls, path, mmap = True):
+        """
+        加载二进制文件
+        :param path: 文件路径
+        :param mmap: 是否内存映射(只读, 按需读取); False时读入内存
+        :return: PoseLibrary
+        """
+        with open(path, "rb") as f:
+            if f.read(len(_MAGIC)) != _MAGIC:
+                raise ValueError("不是pose数据库文件: {}".format(path))
+            version, header_size = np.frombuffer(f.read(8), dtype = "<u4")
+            if version > _VERSION:
+                raise ValueError("不支持的pose数据库版本: {}".format(version))
+            manifest = json.loads(f.read(int(header_size)).decode("utf-8"))
+        data_start = -(-(len(_MAGIC) + 8 + int(header_size)) // _ALIGN) * _ALIGN
+        if mmap:
+            buffer = np.memmap(path, dtype = np.uint8, mode = "r")
+        else:
+            buffer = np.fromfile(path, dtype = np.uint8)
+        arrays = {}
+        for name, (dtype, shape, offset) in manifest.items():
+            dtype = np.dtype(dtype)
+            count = int(np.prod(shape)) if shape else 1
+            start = data_start + offset
+            raw = buffer[start:start + count * dtype.itemsize]
+            arrays[name] = np.ndarray(shape, dtype = dtype, buffer = raw) if count else np.zeros(shape, dtype = dtype)
+        strings = StringTable(blob = arrays.pop("string_blob"), offsets = arrays.pop("string_offsets"))
+        return cls(strings, arrays, path)
+
+
+def _targetItems(targets):
+    """
+    整理驱动目标参数
+    :param targets: {目标名称: 驱动值} 或 [(目标名称, 驱动值[, 类型]), ...]
+    :return: [(目标名称, 驱动值, 类型), ...]
+    """
+    if not targets:
+        return []
+    if isinstance(targets, dict):
+        return [(name, float(value), BLENDSHAPE) for name, value in targets.items()]
+    return [(item[0], float(item[1]), item[2] if len(item) > 2 else BLENDSHAPE) for item in targets]
@@ -0,0 +1,239 @@
+# -*- coding: UTF-8 -*-
+# Author  : AitrusC
+# FileName: rotation
+# Time    : 2024-09-22
+# Contact : 906629272@qq.com
+# Description : 四元数与旋转矩阵批量运算(不依赖Maya)
+#               四元数顺序为(x, y, z, w), 与MQuaternion一致
+#               矩阵为Maya约定(行向量, 行为旋转后的坐标轴, 4x4时平移在最后一行)
+
+import numpy as np
+
+X_AXIS = np.array((1.0, 0.0, 0.0))
+Y_AXIS = np.array((0.0, 1.0, 0.0))
+Z_AXIS = np.array((0.0, 0.0, 1.0))
+
+# 扭转分量(w, 扭转轴投影)的平方和小于该值时视为180度摆动
+SingularEpsilon = 1e-12
+
+
+def normalize(q):
+    """
+    单位化四元数
+    :param q: (..., 4)
+    :return: (..., 4)
+    """
+    q = np.asarray(q, dtype = np.float64)
+    norm = np.linalg.norm(q, axis = -1, keepdims = True)
+    return q / np.where(norm == 0.0, 1.0, norm)
+
+
+def conjugate(q):
+    """
+    共轭(单位四元数的逆)
+    :param q: (..., 4)
+    :return: (..., 4)
+    """
+    q = np.asarray(q, dtype = np.float64)
+    return np.concatenate((-q[..., :3], q[..., 3:]), axis = -1)
+
+
+def multiply(a, b):
+    """
+    四元数乘法 a * b(可广播)
+        与MQuaternion相同, 结果表示先旋转a再旋转b
+    :param a: (..., 4)
+    :param b: (..., 4)
+    :return: (..., 4)
+    """
+    a = np.asarray(a, dtype = np.float64)
+    b = np.asarray(b, dtype = np.float64)
+    # Maya四元数乘法顺序: q = a * b 表示先a后b, 等价于数学上的 b ⊗ a
+    ax, ay, az, aw = np.moveaxis(b, -1, 0)
+    bx, by, bz, bw = np.moveaxis(a, -1, 0)
+    return np.stack((aw * bx + ax * bw + ay * bz - az * by,
+                     aw * by - ax * bz + ay * bw + az * bx,
+                     aw * bz + ax * by - ay * bx + az * bw,
+                     aw * bw - ax * bx - ay * by - az * bz), axis = -1)
+
+
+def rotateVector(q, v):
+    """
+    用四元数旋转向量(可广播)
+    :param q: (..., 4) 单位四元数
+    :param v: (..., 3)
+    :return: (..., 3)
+    """
+    q = np.asarray(q, dtype = np.float64)
+    v = np.asarray(v, dtype = np.float64)
+    xyz = q[..., :3]
+    w = q[..., 3:]
+    t = 2.0 * np.cross(xyz, v)
+    return v + w * t + np.cross(xyz, t)
+
+
+def fromAxisAngle(axis, angle):
+    """
+    由旋转轴与角度生成四元数
+    :param axis: (..., 3)
+    :param angle: (...) 弧度
+    :return: (..., 4)
+    """
+    axis = np.asarray(axis, dtype = np.float64)
+    axis = axis / np.linalg.norm(axis, axis = -1, keepdims = True)
+    half = 0.5 * np.asarray(angle, dtype = np.float64)[..., None]
+    return np.concatenate((axis * np.sin(half), np.cos(half)), axis = -1)
+
+
+def fromMatrix(m):
+    """
+    由旋转矩阵生成四元数(批量, 按分量最大值选择分支, 数值稳定)
+    :param m: (..., 3, 3) 或 (..., 4, 4) Maya约定矩阵, 允许带缩放(会先单位化每一行)
+    :return: (..., 4)
+    """
+    m = np.asarray(m, dtype = np.float64)[..., :3, :3]
+    m = m / np.linalg.norm(m, axis = -1, keepdims = True)
+    # 行向量约定转为列向量约定
+    r = np.swapaxes(m, -1, -2)
+    m00, m01, m02 = r[..., 0, 0], r[..., 0, 1], r[..., 0, 2]
+    m10, m11, m12 = r[..., 1, 0], r[..., 1, 1], r[..., 1, 2]
+    m20, m21, m22 = r[..., 2, 0], r[..., 2, 1], r[..., 2, 2]
+    # 四个候选分量的4倍平方
+    candidates = np.stack((1.0 + m00 - m11 - m22,
+                           1.0 - m00 + m11 - m22,
+                           1.0 - m00 - m11 + m22,
+                           1.0 + m00 + m11 + m22), axis = -1)
+    branch = np.argmax(candidates, axis = -1)
+    s = np.sqrt(np.maximum(np.take_along_axis(candidates, branch[..., None], -1)[..., 0], 1e-300)) * 2.0
+    q = np.empty(m.shape[:-2] + (4,))
+    qs = (
+        ((0.25 * s), (m01 + m10) / s, (m02 + m20) / s, (m21 - m12) / s),
+        ((m01 + m10) / s, (0.25 * s), (m12 + m21) / s, (m02 - m20) / s),
+        ((m02 + m20) / s, (m12 + m21) / s, (0.25 * s), (m10 - m01) / s),
+        ((m21 - m12) / s, (m02 - m20) / s, (m10 - m01) / s, (0.25 * s)),
+    )
+    for i in range(4):
+        q[..., i] = np.choose(branch, [qs[b][i] for b in range(4)])
+    return normalize(q)
+
+
+def toMatrix(q):
+    """
+    四元数转为3x3旋转矩阵(Maya约定)
+    :param q: (..., 4)
+    :return: (..., 3, 3)
+    """
+    x, y, z, w = np.moveaxis(normalize(q), -1, 0)
+    r = np.stack((
+        np.stack((1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)), axis = -1),
+        np.stack((2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)), axis = -1),
+        np.stack((2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)), axis = -1),
+    ), axis = -2)
+    return np.swapaxes(r, -1, -2)
+
+
+def angleBetween(a, b):
+    """
+    两组四元数之间的旋转角度(忽略q与-q的符号差异)
+    :param a: (..., 4)
+    :param b: (..., 4)
+    :return: (...) 弧度, 0~pi
+    """
+    dot = np.abs(np.sum(np.asarray(a) * np.asarray(b), axis = -1))
+    return 2.0 * np.arccos(np.clip(dot, 0.0, 1.0))
+
+
+def swingTwist(q, axis = X_AXIS):
+    """
+    分解为摆动(swing)与扭转(twist): q = twist * swing (先扭转后摆动)
+        摆动接近180度时扭转没有定义, 此时扭转取0, 摆动等于q
+    :param q: (..., 4) 单位四元数
+    :param axis: 扭转轴(骨骼指向轴)
+    :return: (swing (..., 4), twist角度 (...) 弧度, -pi~pi)
+    """
+    q = normalize(q)
+    axis = np.asarray(axis, dtype = np.float64)
+    axis = axis / np.linalg.norm(axis, axis = -1, keepdims = True)
+    proj = np.sum(q[..., :3] * axis, axis = -1)
+    singular = proj * proj + q[..., 3] * q[..., 3] < SingularEpsilon
+    twist_angle = np.where(singular, 0.0, 2.0 * np.arctan2(proj, q[..., 3]))
+    twist_angle = (twist_angle + np.pi) % (2.0 * np.pi) - np.pi
+    twist = fromAxisAngle(np.broadcast_to(axis, q.shape[:-1] + (3,)), twist_angle)
+    swing = multiply(conjugate(twist), q)
+    return swing, twist_angle
+
+
+def planeBasis(axis):
+    """
+    获取与扭转轴正交的平面坐标轴(b, c), 满足 axis x b = c
+        X轴 -> (Y, Z), Y轴 -> (Z, X), Z轴 -> (X, Y), 其他方向取与之最接近的情况
+    :param axis: (..., 3)
+    :return: (b (..., 3), c (..., 3))
+    """
+    axis = np.asarray(axis, dtype = np.float64)
+    axis = axis / np.linalg.norm(axis, axis = -1, keepdims = True)
+    # 以绝对值最大的分量所在轴的下一个轴作为参考方向
+    helper = np.roll(np.eye(3), -1, axis = 0)[np.argmax(np.abs(axis), axis = -1)]
+    b = helper - np.sum(helper * axis, axis = -1, keepdims = True) * axis
+    b = b / np.linalg.norm(b, axis = -1, keepdims = True)
+    c = np.cross(axis, b)
+    return b, c
+
+
+def decomposeSwingTwist(q, axis = X_AXIS):
+    """
+    批量分解摆动/扭转, 直接输出二维摆动坐标
+        摆动坐标为摆动旋转向量(旋转轴 * 角度)在planeBasis(axis)平面上的坐标, 单位为弧度
+        摆动接近180度时扭转取0, 摆动坐标模长为pi, 方向为q在平面上的向量部分;
+        除这种情况外q与-q结果相同(接近180度时q与-q得到方向相反的摆动坐标, 例如(pi, 0)与(-pi, 0))
+    :param q: (..., 4) 四元数, 例如(F, J, 4)
+    :param axis: 扭转轴, (3,)或可广播到(..., 3), 例如每个骨骼一个轴(J, 3)
+    :return: (swing (..., 2), twist (...)) 例如(F, J, 2)与(F, J)
+    """
+    q = normalize(q)
+    axis = np.asarray(axis, dtype = np.float64)
+    axis = axis / np.linalg.norm(axis, axis = -1, keepdims = True)
+    b, c = planeBasis(axis)
+    # 一次矩阵乘法得到向量部分在(axis, b, c)下的坐标
+    basis = np.stack((axis, b, c), axis = -2)
+    if basis.ndim == 2:
+        coords = q[..., :3] @ basis.T
+    else:
+        coords = np.einsum("...i,...ji->...j", q[..., :3], basis)
+    p, vb, vc = coords[..., 0], coords[..., 1], coords[..., 2]
+    w = q[..., 3]
+    # n为扭转分量的模长, 也等于摆动四元数的w
+    n = np.sqrt(p * p + w * w)
+    singular = n * n < SingularEpsilon
+    safe_n = np.where(singular, 1.0, n)
+    twist = np.where(singular, 0.0, 2.0 * np.arctan2(p, w))
+    twist = (twist + np.pi) % (2.0 * np.pi) - np.pi
+    # 摆动四元数在平面上的向量部分: (w * v_perp - p * (v x axis)) / n
+    sb = np.where(singular, vb, (w * vb - p * vc) / safe_n)
+    sc = np.where(singular, vc, (w * vc + p * vb) / safe_n)
+    sin_half = np.sqrt(sb * sb + sc * sc)
+    angle = 2.0 * np.arctan2(sin_half, n)
+    # 摆动很小时 angle / sin_half -> 2
+    scale = np.where(sin_half > 1e-12, angle / np.where(sin_half > 1e-12, sin_half, 1.0), 2.0)
+    swing = np.stack((sb * scale, sc * scale), axis = -1)
+    return swing, twist
+
+
+def composeSwingTwist(swing, twist, axis = X_AXIS):
+    """
+    decomposeSwingTwist的逆运算
+    :param swing: (..., 2) 摆动坐标(弧度)
+    :param twist: (...) 扭转角度(弧度)
+    :param axis: 扭转轴, (3,)或可广播到(..., 3)
+    :return: (..., 4) 四元数
+    """
+    swing = np.asarray(swing, dtype = np.float64)
+    axis = np.asarray(axis, dtype = np.float64)
+    axis = axis / np.linalg.norm(axis, axis = -1, keepdims = True)
+    b, c = planeBasis(axis)
+    rotvec = swing[..., 0:1] * b + swing[..., 1:2] * c
+    angle = np.linalg.norm(rotvec, axis = -1)
+    safe = np.where(angle > 1e-12, angle, 1.0)[..., None]
+    swing_q = np.concatenate((rotvec / safe * np.sin(0.5 * angle)[..., None], np.cos(0.5 * angle)[..., None]), axis = -1)
+    twist_q = fromAxisAngle(np.broadcast_to(axis, swing_q.shape[:-1] + (3,)), twist)
+    return multiply(twist_q, swing_q)
@@ -0,0 +1,631 @@
+# -*- coding: UTF-8 -*-
+# Author  : AitrusC
+# FileName: scene
+# Time    : 2024-10-03
+# Contact : 906629272@qq.com
+# Description : 场景查询缓存
+#               界面反复查询骨骼、pose属性与连接的blendShape/骨骼, 在DCC中每次查询都很慢;
+#               SceneCache缓存层级/属性/连接查询结果, 根据场景通知精确失效, 未缓存的查询合并为一次后端调用
+#
+#   source = MayaSceneSource()          # 或 MemoryScene()
+#   cache = SceneCache(source)
+#   cache.listConnections(["Wrist_R_poseDriver_out"])
+#
+#   通知: callback(事件, 节点, 数据)
+#       NODE_ADDED          数据为节点类型
+#       NODE_REMOVED        数据为节点类型
+#       NODE_RENAMED        节点为新名称, 数据为旧名称
+#       PARENT_CHANGED      数据为(旧父节点, 新父节点)
+#       ATTRIBUTE_CHANGED   数据为属性名称, 为空时表示添加/删除了属性
+#       CONNECTION_CHANGED  数据为(源"node.attr", 目标"node.attr")
+
+from .builder import FakeScene, plugNode
+
+try:
+    from maya.api import OpenMaya as om
+    from maya import cmds
+except ImportError:
+    om = None
+    cmds = None
+
+NODE_ADDED, NODE_REMOVED, NODE_RENAMED, PARENT_CHANGED, ATTRIBUTE_CHANGED, CONNECTION_CHANGED = range(6)
+
+
+class SceneSource(object):
+    """
+    场景查询后端接口
+        查询方法接收一批节点/属性, 一次调用返回全部结果
+        节点不存在时对应结果为None
+    """
+
+    def __init__(self):
+        self._callbacks = {}
+        self._callback_id = 0
+
+    def addCallback(self, callback):
+        """
+        注册场景通知
+        :param callback: callback(事件, 节点, 数据)
+        :return: 回调id
+        """
+        self._callback_id += 1
+        self._callbacks[self._callback_id] = callback
+        return self._callback_id
+
+    def removeCallback(self, callback_id):
+        self._callbacks.pop(callback_id, None)
+
+    def notify(self, event, node, data = None):
+        """
+        发送通知
+        :param event: 事件
+        :param node: 节点名称
+        :param data: 事件数据
+        :return:
+        """
+        for callback in list(self._callbacks.values()):
+            callback(event, node, data)
+
+    def watch(self, nodes):
+        """
+        开始监听节点的属性/连接变化(缓存节点数据时调用, 只在需要逐个节点注册回调的后端中实现)
+        :param nodes: 节点名称列表
+        :return:
+        """
+        pass
+
+    def listNodes(self, node_types):
+        """
+        :param node_types: 节点类型列表(精确类型)
+        :return: [(节点名称, ...), ...]
+        """
+        raise NotImplementedError
+
+    def nodeTypes(self, nodes):
+        """
+        :param nodes: 节点名称列表
+        :return: [类型, ...]
+        """
+        raise NotImplementedError
+
+    def parents(self, nodes):
+        """
+        :param nodes: 节点名称列表
+        :return: [父节点, ...] 没有父节点时为""
+        """
+        raise NotImplementedError
+
+    def children(self, nodes):
+        """
+        :param nodes: 节点名称列表
+        :return: [(子节点, ...), ...]
+        """
+        raise NotImplementedError
+
+    def listAttrs(self, nodes):
+        """
+        :param nodes: 节点名称列表
+        :return: [(自定义属性, ...), ...]
+        """
+        raise NotImplementedError
+
+    def getAttrs(self, plugs):
+        """
+        :param plugs: ["node.attr", ...]
+        :return: [值, ...]
+        """
+        raise NotImplementedError
+
+    def listConnections(self, nodes):
+        """
+        :param nodes: 节点名称列表
+        :return: [((源"node.attr", 目标"node.attr"), ...), ...] 包含输入与输出连接
+        """
+        raise NotImplementedError
+
+
+class MemoryScene(FakeScene, SceneSource):
+    """
+    内存中的场景(不依赖Maya), 修改时发送与Maya后端相同的通知
+        可以作为构建计划的执行后端(BuildPlan.execute), 构建时缓存同步失效
+        call_overhead模拟每次查询调用的固定开销(秒)
+    """
+
+    def __init__(self, nodes = (), call_overhead = 0.0):
+        FakeScene.__init__(self, nodes, call_overhead)
+        SceneSource.__init__(self)
+
+    # ---------------------------------------------------------------- 修改
+
+    def createNodes(self, nodes):
+        FakeScene.createNodes(self, nodes)
+        for name, node_type, parent in nodes:
+            self.notify(NODE_ADDED, name, node_type)
+            if parent is not None:
+                self.notify(PARENT_CHANGED, name, (None, parent))
+
+    def addAttrs(self, attrs):
+        FakeScene.addAttrs(self, attrs)
+        for node in {node for node, _, _ in attrs}:
+            self.notify(ATTRIBUTE_CHANGED, node, None)
+
+    def setAttrs(self, values):
+        FakeScene.setAttrs(self, values)
+        for plug, _ in values:
+            node, attr = plug.split(".", 1)
+            self.notify(ATTRIBUTE_CHANGED, node, attr)
+
+    def connectAttrs(self, connections):
+        previous = [(self.connections.get(destination), destination) for _, destination in connections]
+        FakeScene.connectAttrs(self, connections)
+        # 目标已有的连接被替换
+        for source, destination in previous:
+            if source is not None:
+                self.notify(CONNECTION_CHANGED, plugNode(destination), (source, destination))
+        for source, destination in connections:
+            self.notify(CONNECTION_CHANGED, plugNode(destination), (source, destination))
+
+    def disconnectAttrs(self, connections):
+        """
+        断开连接
+        :param connections: [(源"node.attr", 目标"node.attr"), ...]
+        :return:
+        """
+        self._call()
+        for source, destination in connections:
+            if self.connections.get(destination) == source:
+                del self.connections[destination]
+                self.notify(CONNECTION_CHANGED, plugNode(destination), (source, destination))
+
+    def deleteNodes(self, names):
+        before = dict(self.nodes)
+        connections = dict(self.connections)
+        FakeScene.deleteNodes(self, names)
+        removed = [name for name in before if name not in self.nodes]
+        for destination, source in connections.items():
+            if destination not in self.connections:
+                self.notify(CONNECTION_CHANGED, plugNode(destination), (source, destination))
+        for name in removed:
+            if before[name]["parent"] is not None:
+                self.notify(PARENT_CHANGED, name, (before[name]["parent"], None))
+            self.notify(NODE_REMOVED, name, before[name]["type"])
+
+    def renameNode(self, name, new_name):
+        """
+        重命名节点(同时更新子节点与连接)
+        :param name: 节点名称
+        :param new_name: 新名称
+        :return:
+        """
+        self._call()
+        if new_name in self.nodes:
+            raise RuntimeError("节点已存在: {}".format(new_name))
+        self.nodes[new_name] = self.nodes.pop(name)
+        for node in self.nodes.values():
+            if node["parent"] == name:
+                node["parent"] = new_name
+
+        def rename(plug):
+            node, attr = plug.split(".", 1)
+            return new_name + "." + attr if node == name else plug
+
+        self.connections = {rename(destination): rename(source) for destination, source in self.connections.items()}
+        self.notify(NODE_RENAMED, new_name, name)
+
+    def reparent(self, name, parent):
+        """
+        修改父节点
+        :param name: 节点名称
+        :param parent: 父节点, 为空时移到根
+        :return:
+        """
+        self._call()
+        node = self._node(name)
+        old = node["parent"]
+        node["parent"] = parent
+        self.notify(PARENT_CHANGED, name, (old, parent))
+
+    # ---------------------------------------------------------------- 查询
+
+    def listNodes(self, node_types):
+        self._call()
+        return [tuple(name for name, node in self.nodes.items() if node["type"] == node_type)
+                for node_type in node_types]
+
+    def nodeTypes(self, nodes):
+        self._call()
+        return [self.nodes[name]["type"] if name in self.nodes else None for name in nodes]
+
+    def parents(self, nodes):
+        self._call()
+        return [(self.nodes[name]["parent"] or "") if name in self.nodes else None for name in nodes]
+
+    def children(self, nodes):
+        self._call()
+        result = {name: [] for name in nodes if name in self.nodes}
+        for child, node in self.nodes.items():
+            if node["parent"] in result:
+                result[node["parent"]].append(child)
+        return [tuple(result[name]) if name in result else None for name in nodes]
+
+    def listAttrs(self, nodes):
+        self._call()
+        return [tuple(self.nodes[name]["attrs"]) if name in self.nodes else None for name in nodes]
+
+    def listConnections(self, nodes):
+        self._call()
+        result = {name: [] for name in nodes if name in self.nodes}
+        for destination, source in self.connections.items():
+            for node in {plugNode(source), plugNode(destination)}:
+                if node in result:
+                    result[node].append((source, destination))
+        return [tuple(result[name]) if name in result else None for name in nodes]
+
+
+class MayaSceneSource(SceneSource):
+    """
+    Maya场景查询后端
+        节点添加/删除/重命名与层级变化使用全局回调; 属性与连接变化需要逐个节点注册回调(watch)
+    """
+
+    def __init__(self):
+        if om is None:
+            raise RuntimeError("需要在Maya中使用")
+        SceneSource.__init__(self)
+        self._watched = {}
+        self._global_ids = [
+            om.MDGMessage.addNodeAddedCallback(self.__onNodeAdded, "dependNode"),
+            om.MDGMessage.addNodeRemovedCallback(self.__onNodeRemoved, "dependNode"),
+            om.MNodeMessage.addNameChangedCallback(om.MObject.kNullObj, self.__onNameChanged),
+            om.MDagMessage.addParentAddedCallback(self.__onParentAdded),
+            om.MDagMessage.addParentRemovedCallback(self.__onParentRemoved),
+        ]
+
+    def close(self):
+        """
+        删除全部Maya回调
+        :return:
+        """
+        om.MMessage.removeCallbacks(self._global_ids + list(self._watched.values()))
+        self._global_ids = []
+        self._watched.clear()
+
+    @staticmethod
+    def _name(obj):
+        return om.MFnDependencyNode(obj).name()
+
+    def __onNodeAdded(self, obj, *args):
+        self.notify(NODE_ADDED, self._name(obj), om.MFnDependencyNode(obj).typeName)
+
+    def __onNodeRemoved(self, obj, *args):
+        name = self._name(obj)
+        callback_id = self._watched.pop(name, None)
+        if callback_id is not None:
+            om.MMessage.removeCallback(callback_id)
+        self.notify(NODE_REMOVED, name, om.MFnDependencyNode(obj).typeName)
+
+    def __onNameChanged(self, obj, old_name, *args):
+        name = self._name(obj)
+        if old_name and old_name != name:
+            if old_name in self._watched:
+                self._watched[name] = self._watched.pop(old_name)
+            self.notify(NODE_RENAMED, name, old_name)
+
+    def __onParentAdded(self, child, parent, *args):
+        self.notify(PARENT_CHANGED, child.partialPathName(), (None, parent.partialPathName()))
+
+    def __onParentRemoved(self, child, parent, *args):
+        self.notify(PARENT_CHANGED, child.partialPathName(), (parent.partialPathName(), None))
+
+    def __onAttributeChanged(self, message, plug, other_plug, *args):
+        node = self._name(plug.node())
+        if message & (om.MNodeMessage.kConnectionMade | om.MNodeMessage.kConnectionBroken):
+            if message & om.MNodeMessage.kIncomingDirection:
+                self.notify(CONNECTION_CHANGED, node, (other_plug.name(), plug.name()))
+            else:
+                self.notify(CONNECTION_CHANGED, node, (plug.name(), other_plug.name()))
+        elif message & (om.MNodeMessage.kAttributeAdded | om.MNodeMessage.kAttributeRemoved):
+            self.notify(ATTRIBUTE_CHANGED, node, None)
+        elif message & om.MNodeMessage.kAttributeSet:
+            self.notify(ATTRIBUTE_CHANGED, node, plug.partialName(useLongNames = True))
+
+    def watch(self, nodes):
+        nodes = [name for name in nodes if name not in self._watched]
+        if not nodes:
+            return
+        selection = om.MSelectionList()
+        for name in nodes:
+            try:
+                selection.add(name)
+            except RuntimeError:
+                continue
+        for i in range(selection.length()):
+            obj = selection.getDependNode(i)
+            self._watched[self._name(obj)] = om.MNodeMessage.addAttributeChangedCallback(
+                obj, self.__onAttributeChanged)
+
+    def listNodes(self, node_types):
+        return [tuple(cmds.ls(exactType = node_type) or ()) for node_type in node_types]
+
+    def nodeTypes(self, nodes):
+        return [cmds.nodeType(name) if cmds.objExists(name) else None for name in nodes]
+
+    def parents(self, nodes):
+        result = []
+        for name in nodes:
+            if not cmds.objExists(name):
+                result.append(None)
+            else:
+                result.append((cmds.listRelatives(name, parent = True) or [""])[0])
+        return result
+
+    def children(self, nodes):
+        return [tuple(cmds.listRelatives(name, children = True) or ()) if cmds.objExists(name) else None
+                for name in nodes]
+
+    def listAttrs(self, nodes):
+        return [tuple(cmds.listAttr(name, userDefined = True) or ()) if cmds.objExists(name) else None
+                for name in nodes]
+
+    def getAttrs(self, plugs):
+        return [cmds.getAttr(plug) if cmds.objExists(plug) else None for plug in plugs]
+
+    def listConnections(self, nodes):
+        result = []
+        for name in nodes:
+            if not cmds.objExists(name):
+                result.append(None)
+                continue
+            outgoing = cmds.listConnections(name, source = False, connections = True, plugs = True) or []
+            incoming = cmds.listConnections(name, destination = False, connections = True, plugs = True) or []
+            result.append(tuple(zip(outgoing[0::2], outgoing[1::2])) +
+                          tuple((source, destination) for destination, source in zip(incoming[0::2], incoming[1::2])))
+        return result
+
+
+class SceneCache(object):
+    """
+    场景查询缓存
+        每种查询一个字典(键为节点或类型), 收到通知时只删除受影响的条目
+        批量查询时未缓存的键合并为一次后端调用; 节点不存在的结果(None)也会缓存, 节点添加时删除
+        属性值只在属性设置/连接变化时失效, 由上游计算得到的输出值请使用getAttrs(cache = False)
+    """
+    Kinds = ("listNodes", "nodeTypes", "parents", "children", "listAttrs", "listConnections")
+
+    def __init__(self, source):
+        """
+        :param source: SceneSource
+        """
+        self.source = source
+        self._caches = {kind: {} for kind in self.Kinds}
+        # 节点 -> {属性: 值}
+        self._values = {}
+        self.hits = 0
+        self.misses = 0
+        self.calls = 0
+        self.invalidations = 0
+        self._callback_id = source.addCallback(self._onNotify)
+
+    def close(self):
+        """
+        停止接收通知并清空缓存
+        :return:
+        """
+        if self._callback_id is not None:
+            self.source.removeCallback(self._callback_id)
+            self._callback_id = None
+        self.clear()
+
+    def clear(self):
+        for cache in self._caches.values():
+            cache.clear()
+        self._values.clear()
+
+    @property
+    def hitRate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        """
+        :return: {"hits", "misses", "calls", "invalidations", "hit_rate", "entries"}
+        """
+        entries = sum(len(cache) for cache in self._caches.values())
+        entries += sum(len(values) for values in self._values.values())
+        return {"hits": self.hits, "misses": self.misses, "calls": self.calls, "invalidations": self.invalidations,
+                "hit_rate": self.hitRate, "entries": entries}
+
+    def resetStats(self):
+        self.hits = self.misses = self.calls = self.invalidations = 0
+
+    # ---------------------------------------------------------------- 查询
+
+    def _query(self, kind, keys):
+        """
+        批量查询, 未缓存的键合并为一次后端调用
+        :param kind: 查询类型(后端方法名称)
+        :param keys: 键列表
+        :return: [结果, ...]
+        """
+        cache = self._caches[kind]
+        missing = [key for key in dict.fromkeys(keys) if key not in cache]
+        self.misses += len(missing)
+        self.hits += len(keys) - len(missing)
+        if missing:
+            self.calls += 1
+            cache.update(zip(missing, getattr(self.source, kind)(missing)))
+            if kind != "listNodes":
+                self.source.watch([key for key in missing if cache[key] is not None])
+        return [cache[key] for key in keys]
+
+    def listNodes(self, node_types):
+        return self._query("listNodes", list(node_types))
+
+    def nodeTypes(self, nodes):
+        return self._query("nodeTypes", list(nodes))
+
+    def parents(self, nodes):
+        return self._query("parents", list(nodes))
+
+    def children(self, nodes):
+        return self._query("children", list(nodes))
+
+    def listAttrs(self, nodes):
+        return self._query("listAttrs", list(nodes))
+
+    def listConnections(self, nodes):
+        return self._query("listConnections", list(nodes))
+
+    def exists(self, nodes):
+        """
+        :param nodes: 节点名称列表
+        :return: [是否存在, ...]
+        """
+        return [node_type is not None for node_type in self.nodeTypes(nodes)]
+
+    def getAttrs(self, plugs, cache = True):
+        """
+        批量获取属性值
+        :param plugs: ["node.attr", ...]
+        :param cache: 为False时直接查询后端(不读取也不写入缓存)
+        :return: [值, ...]
+        """
+        plugs = list(plugs)
+        if not cache:
+            self.calls += 1
+            return self.source.getAttrs(plugs)
+        split = [plug.split(".", 1) for plug in plugs]
+        missing = list(dict.fromkeys(plug for plug, (node, attr) in zip(plugs, split)
+                                     if attr not in self._values.get(node, ())))
+        self.misses += len(missing)
+        self.hits += len(plugs) - len(missing)
+        if missing:
+            self.calls += 1
+            for plug, value in zip(missing, self.source.getAttrs(missing)):
+                node, attr = plug.split(".", 1)
+                self._values.setdefault(node, {})[attr] = value
+            self.source.watch(list(dict.fromkeys(plugNode(plug) for plug in missing)))
+        return [self._values[node][attr] for node, attr in split]
+
+    def listNodeType(self, node_type):
+        return self.listNodes([node_type])[0]
+
+    def parent(self, node):
+        return self.parents([node])[0]
+
+    def getAttr(self, plug, cache = True):
+        return self.getAttrs([plug], cache)[0]
+
+    def connectedPlugs(self, plugs, source = False):
+        """
+        属性的连接(例如pose输出属性连接的blendShape权重/骨骼属性)
+        :param plugs: ["node.attr", ...]
+        :param source: False为输出连接的目标, True为输入连接的源
+        :return: [(连接的"node.attr", ...), ...]
+        """
+        plugs = list(plugs)
+        connections = dict(zip(plugs, self.listConnections([plugNode(plug) for plug in plugs])))
+        result = []
+        for plug in plugs:
+            pairs = connections[plug] or ()
+            if source:
+                result.append(tuple(src for src, dst in pairs if dst == plug))
+            else:
+                result.append(tuple(dst for src, dst in pairs if src == plug))
+        return result
+
+    # ---------------------------------------------------------------- 失效
+
+    def _pop(self, kind, key):
+        cache = self._caches[kind]
+        if key in cache:
+            del cache[key]
+            self.invalidations += 1
+
+    def _forgetNode(self, node):
+        """
+        删除节点的全部缓存, 以及引用该节点的父节点/子节点/连接缓存
+        :param node: 节点名称
+        :return:
+        """
+        caches = self._caches
+        parent = caches["parents"].get(node)
+        if parent:
+            self._pop("children", parent)
+        for child in caches["children"].get(node) or ():
+            self._pop("parents", child)
+        for source, destination in caches["listConnections"].get(node) or ():
+            for peer in (plugNode(source), plugNode(destination)):
+                self._pop("listConnections", peer)
+        for kind in ("nodeTypes", "parents", "children", "listAttrs", "listConnections"):
+            self._pop(kind, node)
+        if self._values.pop(node, None) is not None:
+            self.invalidations += 1
+
+    def _onNotify(self, event, node, data):
+        """
+        场景通知
+        :param event: 事件
+        :param node: 节点名称
+        :param data: 事件数据
+        :return:
+        """
+        caches = self._caches
+        if event == NODE_ADDED:
+            # 删除"不存在"的缓存
+            for kind in ("nodeTypes", "parents", "children", "listAttrs", "listConnections"):
+                if node in caches[kind] and caches[kind][node] is None:
+                    self._pop(kind, node)
+            self._pop("listNodes", data)
+        elif event == NODE_REMOVED:
+            node_type = caches["nodeTypes"].get(node) or data
+            self._forgetNode(node)
+            self._pop("listNodes", node_type)
+        elif event == NODE_RENAMED:
+            old = data
+            node_type = caches["nodeTypes"].get(old)
+            self._forgetNode(old)
+            self._forgetNode(node)
+            # 其他节点缓存的结果中引用了旧名称(重命名很少发生, 直接遍历)
+            for key, parent in list(caches["parents"].items()):
+                if parent == old:
+                    self._pop("parents", key)
+            for kind in ("children", "listNodes"):
+                for key, names in list(caches[kind].items()):
+                    if names and old in names:
+                        self._pop(kind, key)
+            for key, pairs in list(caches["listConnections"].items()):
+                if pairs and any(plugNode(source) == old or plugNode(destination) == old
+                                 for source, destination in pairs):
+                    self._pop("listConnections", key)
+            if node_type is not None:
+                self._pop("listNodes", node_type)
+        elif event == PARENT_CHANGED:
+            self._pop("parents", node)
+            for parent in data:
+                if parent:
+                    self._pop("children", parent)
+        elif event == ATTRIBUTE_CHANGED:
+            values = self._values.get(node)
+            if data is None:
+                self._pop("listAttrs", node)
+                if values is not None:
+                    del self._values[node]
+                    self.invalidations += 1
+            elif values is not None and data in values:
+                del values[data]
+                self.invalidations += 1
+        elif event == CONNECTION_CHANGED:
+            source, destination = data
+            self._pop("listConnections", plugNode(source))
+            self._pop("listConnections", plugNode(destination))
+            # 目标属性的值随连接改变
+            values = self._values.get(plugNode(destination))
+            attr = destination.split(".", 1)[1]
+            if values is not None and attr in values:
+                del values[attr]
+                self.invalidations += 1
+
+
+__all__ = ['NODE_ADDED', 'NODE_REMOVED', 'NODE_RENAMED', 'PARENT_CHANGED', 'ATTRIBUTE_CHANGED',
+           'CONNECTION_CHANGED', 'SceneSource', 'MemoryScene', 'MayaSceneSource', 'SceneCache']
@@ -0,0 +1,361 @@
+# -*- coding: UTF-8 -*-
+# Author  : AitrusC
+# FileName: search
+# Time    : 2024-09-21
+# Contact : 906629272@qq.com
+# Description : 骨骼/pose/驱动目标名称搜索索引(前缀、子串、驼峰缩写与模糊匹配)
+
+import re
+from bisect import bisect_left, insort
+from collections import namedtuple
+
+from . import tracing
+
+# 搜索结果: key为条目标识, score越小排名越靠前
+SearchResult = namedtuple("SearchResult", ["key", "text", "kind", "score"])
+
+JOINT, POSE, TARGET = "joint", "pose", "target"
+
+# 匹配等级(越小越优先)
+EXACT, PREFIX, TOKEN_PREFIX, SUBSTRING, ACRONYM, FUZZY = range(6)
+
+# 名称分词: 下划线/非字母数字分隔, 小写->大写, 字母<->数字
+_TOKEN_RE = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+")
+
+
+def jointKey(joint):
+    """
+    骨骼条目标识
+    :param joint: 骨骼名称
+    :return:
+    """
+    return JOINT, joint
+
+
+def poseKey(joint, pose):
+    """
+    pose条目标识
+    :param joint: 骨骼名称
+    :param pose: pose名称
+    :return:
+    """
+    return POSE, joint, pose
+
+
+def targetKey(joint, pose, target):
+    """
+    驱动目标(blendShape/骨骼)条目标识
+    :param joint: 骨骼名称
+    :param pose: pose名称
+    :param target: 目标名称
+    :return:
+    """
+    return TARGET, joint, pose, target
+
+
+def _tokenStarts(text):
+    """
+    获取名称中每个分词的起始位置
+    :param text: 名称
+    :return: [起始位置, ...]
+    """
+    return [m.start() for m in _TOKEN_RE.finditer(text)]
+
+
+def _trigrams(text):
+    """
+    获取三元组集合
+    :param text: 小写名称
+    :return:
+    """
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class SearchIndex(object):
+    """
+    名称搜索索引
+        前缀/分词前缀/驼峰缩写: 有序列表 + 二分查找
+        子串: 三元组倒排索引(少于三个字符时使用字符倒排索引)
+        模糊: 字符倒排索引筛选候选后做子序列匹配
+    增删条目均为增量更新, 不需要重建索引:
+        新条目先放入缓冲区, 下次搜索时合并进有序列表
+        删除的条目只从条目表中移除, 有序列表中的失效记录在搜索时跳过, 数量过多时再统一清理
+    """
+    # 每个匹配等级最多检查的候选数量, 保证宽泛的查询(如单个字符)也能在固定时间内返回
+    ScanBudget = 2000
+    # 缓冲区小于该数量时逐个插入, 否则整体排序
+    InsortLimit = 64
+
+    def __init__(self):
+        """
+        初始化搜索索引
+        """
+        self._next_id = 0
+        # 条目id -> (key, text, lower, kind)
+        self._entries = {}
+        # key -> 条目id
+        self._ids = {}
+        # 有序列表: (分词起始处的后缀, 条目id, 起始位置)
+        self._suffixes = []
+        # 有序列表: (驼峰缩写, 条目id)
+        self._acronyms = []
+        # 待合并的新记录
+        self._pending_suffixes = []
+        self._pending_acronyms = []
+        # 有序列表中失效记录数量
+        self._stale = 0
+        # 三元组 -> 条目id集合
+        self._trigram_postings = {}
+        # 字符 -> 条目id集合
+        self._char_postings = {}
+        # 骨骼/pose条目key -> 下级条目key集合(用于级联删除)
+        self._children = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._ids
+
+    def clear(self):
+        """
+        清空索引
+        :return:
+        """
+        self.__init__()
+
+    def add(self, key, text, kind = None):
+        """
+        添加条目(key已存在时先删除旧条目)
+        :param key: 条目标识(可哈希)
+        :param text: 搜索文本
+        :param kind: 条目类型(JOINT/POSE/TARGET)
+        :return:
+        """
+        if key in self._ids:
+            self.remove(key)
+        eid = self._next_id
+        self._next_id += 1
+        lower = text.lower()
+        self._entries[eid] = (key, text, lower, kind)
+        self._ids[key] = eid
+        starts = _tokenStarts(text)
+        if not starts or starts[0] != 0:
+            starts.insert(0, 0)
+        self._pending_suffixes.extend((lower[pos:], eid, pos) for pos in starts)
+        self._pending_acronyms.append(("".join(text[pos] for pos in starts if pos < len(text)).lower(), eid))
+        for gram in _trigrams(lower):
+            self._trigram_postings.setdefault(gram, set()).add(eid)
+        for char in set(lower):
+            self._char_postings.setdefault(char, set()).add(eid)
+
+    def remove(self, key):
+        """
+        删除条目
+        :param key: 条目标识
+        :return: 是否删除成功
+        """
+        eid = self._ids.pop(key, None)
+        if eid is None:
+            return False
+        key, text, lower, kind = self._entries.pop(eid)
+        for gram in _trigrams(lower):
+            self._discardPosting(self._trigram_postings, gram, eid)
+        for char in set(lower):
+            self._discardPosting(self._char_postings, char, eid)
+        self._stale += 1
+        return True
+
+    @staticmethod
+    def _discardPosting(postings, gram, eid):
+        """
+        从倒排索引中删除条目
+        :param postings:
+        :param gram:
+        :param eid:
+        :return:
+        """
+        ids = postings.get(gram)
+        if ids is not None:
+            ids.discard(eid)
+            if not ids:
+                del postings[gram]
+
+    @staticmethod
+    def _merge(sorted_list, pending, insort_limit):
+        """
+        将缓冲区合并进有序列表
+        :param sorted_list:
+        :param pending:
+        :param insort_limit:
+        :return:
+        """
+        if len(pending) <= insort_limit:
+            for item in pending:
+                insort(sorted_list, item)
+        else:
+            sorted_list.extend(pending)
+            sorted_list.sort()
+        del pending[:]
+
+    def _flush(self):
+        """
+        合并缓冲区并清理失效记录
+        :return:
+        """
+        if self._stale and self._stale * 2 > len(self._entries):
+            entries = self._entries
+            self._suffixes = [item for item in self._suffixes if item[1] in entries]
+            self._acronyms = [item for item in self._acronyms if item[1] in entries]
+            self._pending_suffixes = [item for item in self._pending_suffixes if item[1] in entries]
+            self._pending_acronyms = [item for item in self._pending_acronyms if item[1] in entries]
+            self._stale = 0
+        if self._pending_suffixes:
+            self._merge(self._suffixes, self._pending_suffixes, self.InsortLimit)
+        if self._pending_acronyms:
+            self._merge(self._acronyms, self._pending_acronyms, self.InsortLimit)
+
+    @tracing.traced("SearchIndex.search", "search")
+    def search(self, query, limit = 100, kinds = None):
+        """
+        搜索
+            各匹配等级依次查找, 已找到足够数量时不再查找更低等级
+        :param query: 查询文本(忽略大小写)
+        :param limit: 最多返回数量, 为空时返回全部(仍受ScanBudget限制)
+        :param kinds: 只返回指定类型的条目, 为空时返回全部类型
+        :return: 按score排序的[SearchResult, ...]
+        """
+        query = query.strip().lower()
+        if not query:
+            return []
+        self._flush()
+        entries = self._entries
+        found = {}
+        budget = self.ScanBudget
+        wanted = limit if limit else len(entries)
+
+        # 前缀与分词前缀
+        suffixes = self._suffixes
+        i = bisect_left(suffixes, (query,))
+        end = min(len(suffixes), i + budget)
+        while i < end and len(found) < wanted:
+            suffix, eid, pos = suffixes[i]
+            if not suffix.startswith(query):
+                break
+            i += 1
+            entry = entries.get(eid)
+            if entry is None or eid in found or (kinds is not None and entry[3] not in kinds):
+                continue
+            if pos == 0:
+                found[eid] = EXACT if len(suffix) == len(query) else PREFIX
+            else:
+                found[eid] = TOKEN_PREFIX
+        # 子串
+        if len(found) < wanted:
+            if len(query) >= 3:
+                postings = [self._trigram_postings.get(gram) for gram in _trigrams(query)]
+            else:
+                postings = [self._char_postings.get(char) for char in set(query)]
+            if all(postings):
+                postings.sort(key = len)
+                # 最小的倒排集合足够小时直接逐个验证, 否则先求交集缩小候选范围
+                candidates = postings[0]
+                for other in postings[1:]:
+                    if len(candidates) <= budget:
+                        break
+                    candidates = candidates.intersection(other)
+                for n, eid in enumerate(candidates):
+                    if n >= budget or len(found) >= wanted:
+                        break
+                    entry = entries[eid]
+                    if eid not in found and query in entry[2] and (kinds is None or entry[3] in kinds):
+                        found[eid] = SUBSTRING
+        # 驼峰缩写
+        if len(found) < wanted:
+            acronyms = self._acronyms
+            i = bisect_left(acronyms, (query,))
+            end = min(len(acronyms), i + budget)
+            while i < end and len(found) < wanted:
+                acronym, eid = acronyms[i]
+                if not acronym.startswith(query):
+                    break
+                i += 1
+                entry = entries.get(eid)
+                if entry is not None and eid not in found and (kinds is None or entry[3] in kinds):
+                    found[eid] = ACRONYM
+        # 模糊(子序列)
+        if len(query) >= 2 and len(found) < wanted:
+            postings = [self._char_postings.get(char) for char in set(query)]
+            if all(postings):
+                rarest = min(postings, key = len)
+                # 形如 a[^b]*b[^c]*c 的正则不会回溯
+                match = re.compile(re.escape(query[0]) + "".join(
+                    "[^%s]*%s" % (re.escape(char), re.escape(char)) for char in query[1:])).search
+                for n, eid in enumerate(rarest):
+                    if n >= budget or len(found) >= wanted:
+                        break
+                    entry = entries[eid]
+                    if eid not in found and match(entry[2]) and (kinds is None or entry[3] in kinds):
+                        found[eid] = FUZZY
+
+        results = []
+        for eid, tier in found.items():
+            key, text, lower, kind = entries[eid]
+            results.append(SearchResult(key, text, kind, (tier, len(text), lower)))
+        results.sort(key = lambda r: r.score)
+        return results
+
+    def addJoint(self, joint):
+        """
+        添加骨骼条目
+        :param joint: 骨骼名称
+        :return:
+        """
+        self.add(jointKey(joint), joint, JOINT)
+
+    def addPose(self, joint, pose):
+        """
+        添加pose条目
+        :param joint: 骨骼名称
+        :param pose: pose名称
+        :return:
+        """
+        key = poseKey(joint, pose)
+        self.add(key, pose, POSE)
+        self._children.setdefault(jointKey(joint), set()).add(key)
+
+    def addTarget(self, joint, pose, target):
+        """
+        添加驱动目标条目
+        :param joint: 骨骼名称
+        :param pose: pose名称
+        :param target: blendShape或骨骼名称
+        :return:
+        """
+        key = targetKey(joint, pose, target)
+        self.add(key, target, TARGET)
+        self._children.setdefault(poseKey(joint, pose), set()).add(key)
+
+    def removeJoint(self, joint):
+        """
+        删除骨骼条目及其下所有pose与目标条目
+        :param joint: 骨骼名称
+        :return:
+        """
+        key = jointKey(joint)
+        for pose_key in self._children.pop(key, ()):
+            self.removePose(joint, pose_key[2])
+        self.remove(key)
+
+    def removePose(self, joint, pose):
+        """
+        删除pose条目及其下所有目标条目
+        :param joint: 骨骼名称
+        :param pose: pose名称
+        :return:
+        """
+        key = poseKey(joint, pose)
+        for target_key in self._children.pop(key, ()):
+            self.remove(target_key)
+        self._children.get(jointKey(joint), set()).discard(key)
+        self.remove(key)
@@ -0,0 +1,693 @@
+# -*- coding: UTF-8 -*-
+# Author  : AitrusC
+# FileName: solver
+# Time    : 2024-09-22
+# Contact : 906629272@qq.com
+# Description : pose插值求解器(不依赖Maya)
+#               输入N个驱动骨骼的旋转(四元数或矩阵), 批量输出每帧M个pose的权重
+#
+#   solver = RBFSolver(pose_rotations, kernel = "gaussian")
+#   weights = solver.evaluate(frame_rotations)      # (F, N, 4) -> (F, M)
+
+import math
+
+import numpy as np
+
+from . import rotation, tracing
+
+try:
+    from scipy.linalg import solve_triangular as _scipySolveTriangular
+except ImportError:
+    _scipySolveTriangular = None
+
+GAUSSIAN, THIN_PLATE = "gaussian", "thinPlate"
+LINEAR, SMOOTH = "linear", "smooth"
+
+
+def _falloff(t, interpolation):
+    """
+    衰减曲线
+    :param t: 0~1, 1为完全匹配
+    :param interpolation: LINEAR或SMOOTH
+    :return:
+    """
+    t = np.clip(t, 0.0, 1.0)
+    if interpolation == SMOOTH:
+        return t * t * (3.0 - 2.0 * t)
+    return t
+
+
+def _wrapAngle(angle):
+    """
+    角度限制在-pi~pi
+    :param angle:
+    :return:
+    """
+    return (angle + np.pi) % (2.0 * np.pi) - np.pi
+
+
+class PoseSolver(object):
+    """
+    pose求解器基类
+        poses: (M, N, 4) 每个pose下N个驱动骨骼的目标旋转; N为1时也可传入(M, 4)
+        evaluate输入(F, N, 4), N为1时也可传入(F, 4); 输出(F, K), K默认等于pose数量M
+    """
+    # 每次计算的帧数, 避免(F, M, N)中间数组占用过多内存
+    ChunkSize = 8192
+
+    def __init__(self, poses):
+        """
+        初始化求解器
+        :param poses: (M, N, 4) 四元数
+        """
+        poses = rotation.normalize(poses)
+        if poses.ndim == 2:
+            poses = poses[:, None, :]
+        if poses.ndim != 3 or poses.shape[-1] != 4:
+            raise ValueError("poses的形状应为(M, N, 4), 当前为{}".format(poses.shape))
+        self.poses = poses
+
+    @property
+    def poseCount(self):
+        """
+        pose数量M
+        :return:
+        """
+        return self.poses.shape[0]
+
+    @property
+    def driverCount(self):
+        """
+        驱动骨骼数量N
+        :return:
+        """
+        return self.poses.shape[1]
+
+    @property
+    def outputCount(self):
+        """
+        输出数量K
+        :return:
+        """
+        return self.poseCount
+
+    def _asFrames(self, quaternions):
+        """
+        整理输入形状为(F, N, 4)
+        :param quaternions:
+        :return:
+        """
+        q = rotation.normalize(quaternions)
+        if q.ndim == 2 and self.driverCount == 1:
+            q = q[:, None, :]
+        if q.ndim != 3 or q.shape[1:] != (self.driverCount, 4):
+            raise ValueError("输入形状应为(F, {}, 4), 当前为{}".format(self.driverCount, q.shape))
+        return q
+
+    def evaluate(self, quaternions, chunk_size = None, dtype = np.float64):
+        """
+        批量求解
+        :param quaternions: (F, N, 4) 四元数, N为1时也可传入(F, 4)
+        :param chunk_size: 每次计算的帧数
+        :param dtype: 输出类型
+        :return: (F, K)
+        """
+        q = self._asFrames(quaternions)
+        chunk_size = chunk_size or self.ChunkSize
+        out = np.empty((q.shape[0], self.outputCount), dtype = dtype)
+        with tracing.span("PoseSolver.evaluate", "solver", frames = q.shape[0], poses = self.poseCount):
+            for start in range(0, q.shape[0], chunk_size):
+                out[start:start + chunk_size] = self._evaluateChunk(q[start:start + chunk_size])
+        return out
+
+    def evaluateMatrices(self, matrices, chunk_size = None, dtype = np.float64):
+        """
+        以旋转矩阵为输入批量求解
+        :param matrices: (F, N, 3, 3)或(F, N, 4, 4), N为1时也可传入(F, 3, 3)/(F, 4, 4)
+        :param chunk_size: 每次计算的帧数
+        :param dtype: 输出类型
+        :return: (F, K)
+        """
+        return self.evaluate(rotation.fromMatrix(matrices), chunk_size, dtype)
+
+    def _evaluateChunk(self, q):
+        """
+        求解一段帧(子类实现)
+        :param q: (f, N, 4)
+        :return: (f, K)
+        """
+        raise NotImplementedError
+
+
+class VectorAngleReader(PoseSolver):
+    """
+    向量夹角pose读取器
+        比较驱动骨骼的指向轴与pose指向轴的夹角, 夹角为0时权重为1, 达到angle时为0
+        多个驱动骨骼时权重相乘
+    """
+
+    def __init__(self, poses, axis = rotation.X_AXIS, angle = np.pi * 0.5, interpolation = SMOOTH):
+        """
+        初始化
+        :param poses: (M, N, 4)
+        :param axis: 骨骼指向轴
+        :param angle: 影响角度(弧度), 标量或(M,)
+        :param interpolation: LINEAR或SMOOTH
+        """
+        PoseSolver.__init__(self, poses)
+        self.axis = np.asarray(axis, dtype = np.float64) / np.linalg.norm(axis)
+        self.angle = np.broadcast_to(np.asarray(angle, dtype = np.float64), (self.poseCount,)).copy()
+        self.interpolation = interpolation
+        # pose指向 (M, N, 3)
+        self._directions = rotation.rotateVector(self.poses, self.axis)
+
+    def _evaluateChunk(self, q):
+        directions = rotation.rotateVector(q, self.axis)
+        cos = np.einsum("fni,mni->fmn", directions, self._directions)
+        angle = np.arccos(np.clip(cos, -1.0, 1.0))
+        weights = _falloff(1.0 - angle / self.angle[None, :, None], self.interpolation)
+        return np.prod(weights, axis = -1)
+
+
+class ConeReader(PoseSolver):
+    """
+    圆锥(swing/twist)pose读取器
+        摆动: 指向轴落在以pose指向为中心、半角为cone_angle的圆锥内时有权重
+        扭转: 设置twist_range时, 绕指向轴的扭转差超过twist_range时权重为0
+        多个驱动骨骼时权重相乘
+    """
+
+    def __init__(self, poses, axis = rotation.X_AXIS, cone_angle = np.pi * 0.25, twist_range = None,
+                 interpolation = SMOOTH):
+        """
+        初始化
+        :param poses: (M, N, 4)
+        :param axis: 骨骼指向轴(扭转轴)
+        :param cone_angle: 圆锥半角(弧度), 标量或(M,)
+        :param twist_range: 扭转范围(弧度), 为空时忽略扭转
+        :param interpolation: LINEAR或SMOOTH
+        """
+        PoseSolver.__init__(self, poses)
+        self.axis = np.asarray(axis, dtype = np.float64) / np.linalg.norm(axis)
+        self.cone_angle = np.broadcast_to(np.asarray(cone_angle, dtype = np.float64), (self.poseCount,)).copy()
+        self.twist_range = twist_range
+        self.interpolation = interpolation
+        swing, twist = rotation.swingTwist(self.poses, self.axis)
+        self._directions = rotation.rotateVector(swing, self.axis)
+        self._twists = twist
+
+    def _evaluateChunk(self, q):
+        swing, twist = rotation.swingTwist(q, self.axis)
+        directions = rotation.rotateVector(swing, self.axis)
+        cos = np.einsum("fni,mni->fmn", directions, self._directions)
+        angle = np.arccos(np.clip(cos, -1.0, 1.0))
+        weights = _falloff(1.0 - angle / self.cone_angle[None, :, None], self.interpolation)
+        if self.twist_range:
+            delta = np.abs(_wrapAngle(twist[:, None, :] - self._twists[None, :, :]))
+            weights = weights * _falloff(1.0 - delta / self.twist_range, self.interpolation)
+        return np.prod(weights, axis = -1)
+
+
+def _solveTriangular(lower, b, trans = False):
+    """
+    解下三角方程 L x = b (trans为True时解 L^T x = b)
+        有scipy时使用LAPACK, 否则逐行回代(O(n^2))
+    :param lower: (n, n) 下三角矩阵
+    :param b: (n,) 或 (n, k)
+    :param trans: 是否转置
+    :return:
+    """
+    if _scipySolveTriangular is not None:
+        return _scipySolveTriangular(lower, b, lower = True, trans = 1 if trans else 0, check_finite = False)
+    x = np.array(b, dtype = np.float64)
+    n = lower.shape[0]
+    if trans:
+        for i in range(n - 1, -1, -1):
+            x[i] -= lower[i + 1:, i] @ x[i + 1:]
+            x[i] /= lower[i, i]
+    else:
+        for i in range(n):
+            x[i] -= lower[i, :i] @ x[:i]
+            x[i] /= lower[i, i]
+    return x
+
+
+def _rankOneUpdate(lower, x, sign = 1.0):
+    """
+    原地更新Cholesky因子: L L^T + sign * x x^T
+        A + a x x^T = L (I + a p p^T) L^T, p = L^-1 x
+        I + a p p^T 的Cholesky因子为 diag(d) + tril(p beta^T, -1), 其中
+            s_0 = 1 / a, s_k+1 = s_k + p_k^2, d_k = sqrt(s_k+1 / s_k), beta_k = p_k / (s_k d_k)
+        因此 L' = L diag(d) + S diag(beta), S[:, k] = sum(L[:, j] p_j, j > k), 全部为O(n^2)的数组运算
+    :param lower: (n, n) 下三角矩阵(会被修改)
+    :param x: (n,)
+    :param sign: 1为update, -1为downdate
+    :return:
+    """
+    n = lower.shape[0]
+    if n == 0:
+        return
+    p = _solveTriangular(lower, np.asarray(x, dtype = np.float64))
+    s = np.empty(n + 1)
+    s[0] = 1.0 / sign
+    np.cumsum(p * p, out = s[1:])
+    s[1:] += s[0]
+    ratio = s[1:] / s[:-1]
+    if np.any(ratio <= 0.0):
+        raise np.linalg.LinAlgError("Cholesky downdate后矩阵不再正定")
+    d = np.sqrt(ratio)
+    beta = p / (s[:-1] * d)
+    lp = lower * p
+    # 后缀和(不含自身)
+    suffix = np.cumsum(lp[:, ::-1], axis = 1)[:, ::-1]
+    suffix[:, :-1] = suffix[:, 1:]
+    suffix[:, -1] = 0.0
+    lower *= d
+    lower += suffix * beta
+
+
+class _Cholesky(object):
+    """
+    可增量插入/删除行列的Cholesky分解 A = L L^T
+        插入或删除一行一列均为O(n^2)
+    """
+
+    def __init__(self, matrix):
+        """
+        分解矩阵
+        :param matrix: (n, n) 对称正定矩阵
+        """
+        self.lower = np.linalg.cholesky(matrix)
+
+    @property
+    def size(self):
+        return self.lower.shape[0]
+
+    def solve(self, b):
+        """
+        解 A x = b
+        :param b: (n,) 或 (n, k)
+        :return:
+        """
+        return _solveTriangular(self.lower, _solveTriangular(self.lower, b), trans = True)
+
+    def insert(self, i, column, diagonal):
+        """
+        在第i行/列插入
+        :param i: 插入位置
+        :param column: (n,) 新列中除对角线外的元素(按插入前的顺序)
+        :param diagonal: 新的对角线元素
+        :return:
+        """
+        lower = self.lower
+        n = lower.shape[0]
+        l12 = _solveTriangular(lower[:i, :i], column[:i]) if i else np.empty(0)
+        d2 = diagonal - l12 @ l12
+        if d2 <= 0.0:
+            raise np.linalg.LinAlgError("插入后矩阵不再正定")
+        d = math.sqrt(d2)
+        l32 = (column[i:] - lower[i:, :i] @ l12) / d
+        l33 = lower[i:, i:].copy()
+        _rankOneUpdate(l33, l32, -1.0)
+        new = np.zeros((n + 1, n + 1))
+        new[:i, :i] = lower[:i, :i]
+        new[i, :i] = l12
+        new[i, i] = d
+        new[i + 1:, :i] = lower[i:, :i]
+        new[i + 1:, i] = l32
+        new[i + 1:, i + 1:] = l33
+        self.lower = new
+
+    def remove(self, i):
+        """
+        删除第i行/列
+        :param i:
+        :return:
+        """
+        lower = self.lower
+        l33 = lower[i + 1:, i + 1:].copy()
+        _rankOneUpdate(l33, lower[i + 1:, i], 1.0)
+        new = np.delete(np.delete(lower, i, axis = 0), i, axis = 1)
+        new[i:, i:] = l33
+        self.lower = new
+
+
+class RBFSolver(PoseSolver):
+    """
+    径向基函数(RBF)插值求解器
+        距离为各驱动骨骼旋转夹角的欧氏组合: d = sqrt(sum(angle_n ** 2))
+        values为每个pose的输出值(M, K), 为空时输出pose权重, 即在第i个pose处输出第i个权重为1
+    增量更新:
+        高斯核矩阵(加正则化后)对称正定, 缓存其Cholesky分解;
+        addPose/removePose/setPose只做O(M^2)的分解更新与权重矩阵更新, 不重新求解整个方程组
+        半径在构造时确定, 之后增删pose不会改变半径(需要重新计算默认半径时调用rebuild)
+        薄板样条核不是正定矩阵, 修改pose时会整体重新求解;
+        薄板样条加常数项c(增广方程组[[Phi, 1], [1^T, 0]]), 输出为k W + c, 只有一个pose时也能在pose处得到1
+    """
+
+    def __init__(self, poses, values = None, kernel = GAUSSIAN, radius = None, regularization = 1e-8,
+                 clamp = True):
+        """
+        初始化并求解权重矩阵
+        :param poses: (M, N, 4)
+        :param values: (M, K) pose对应的输出值, 为空时输出pose权重
+        :param kernel: GAUSSIAN或THIN_PLATE
+        :param radius: 高斯核半径(弧度), 为空时使用pose之间的平均最近距离
+        :param regularization: 正则化系数(加在核矩阵对角线上)
+        :param clamp: 是否将输出限制在0~1(只在输出pose权重时生效)
+        """
+        PoseSolver.__init__(self, poses)
+        if kernel not in (GAUSSIAN, THIN_PLATE):
+            raise ValueError("未知的核函数: {}".format(kernel))
+        self.kernel = kernel
+        self.regularization = regularization
+        # 为空表示输出pose权重(values为单位矩阵, 不实际存储)
+        self.values = None
+        if values is not None:
+            self.values = np.asarray(values, dtype = np.float64)
+            if self.values.ndim == 1:
+                self.values = self.values[:, None]
+            if self.values.shape[0] != self.poseCount:
+                raise ValueError("values的行数应等于pose数量{}".format(self.poseCount))
+        self.clamp = clamp and values is None
+        self.radius = radius
+        self._factor = None
+        self.weights = None
+        # 薄板样条的常数项(K,), 高斯核为空
+        self.bias = None
+        # 统计: 整体求解次数与增量更新次数
+        self.rebuild_count = 0
+        self.update_count = 0
+        self.rebuild(radius)
+
+    @property
+    def outputCount(self):
+        return self.poseCount if self.values is None else self.values.shape[1]
+
+    @property
+    def isFactorized(self):
+        """
+        是否缓存了Cholesky分解(可以增量更新)
+        :return:
+        """
+        return self._factor is not None
+
+    def rebuild(self, radius = None):
+        """
+        整体重新求解
+        :param radius: 高斯核半径, 为空时使用构造时的半径(构造时也为空则重新计算默认半径)
+        :return:
+        """
+        distances = self.distances(self.poses)
+        if radius is None:
+            radius = self.radius if self.radius is not None else self._defaultRadius(distances)
+        self.radius = float(radius)
+        phi = self._kernel(distances) + np.eye(self.poseCount) * self.regularization
+        values = np.eye(self.poseCount) if self.values is None else self.values
+        self._factor = None
+        self.bias = None
+        if self.kernel == THIN_PLATE and self.poseCount:
+            m = self.poseCount
+            augmented = np.zeros((m + 1, m + 1))
+            augmented[:m, :m] = phi
+            augmented[:m, m] = augmented[m, :m] = 1.0
+            solution = self._solve(augmented, np.vstack((values, np.zeros((1, values.shape[1])))))
+            self.weights, self.bias = solution[:m], solution[m]
+            self.rebuild_count += 1
+            return
+        if self.kernel == GAUSSIAN and self.poseCount:
+            try:
+                self._factor = _Cholesky(phi)
+            except np.linalg.LinAlgError:
+                self._factor = None
+        if self._factor is not None:
+            self.weights = self._factor.solve(values)
+        else:
+            self.weights = self._solve(phi, values)
+        self.rebuild_count += 1
+
+    @staticmethod
+    def _solve(a, b):
+        """
+        求解线性方程组(奇异时使用最小二乘)
+        :param a: (n, n)
+        :param b: (n, k)
+        :return: (n, k)
+        """
+        try:
+            return np.linalg.solve(a, b)
+        except np.linalg.LinAlgError:
+            return np.linalg.lstsq(a, b, rcond = None)[0]
+
+    @staticmethod
+    def _defaultRadius(distances):
+        """
+        默认半径: pose之间最近距离的平均值
+        :param distances: (M, M)
+        :return:
+        """
+        if distances.shape[0] < 2:
+            return 1.0
+        d = distances + np.diag(np.full(distances.shape[0], np.inf))
+        radius = float(np.mean(np.min(d, axis = 1)))
+        return radius if radius > 0.0 else 1.0
+
+    def distances(self, q):
+        """
+        计算帧与pose之间的距离
+        :param q: (f, N, 4)
+        :return: (f, M)
+        """
+        if self.driverCount == 1:
+            dot = np.abs(q[:, 0, :] @ self.poses[:, 0, :].T)
+            return 2.0 * np.arccos(np.minimum(dot, 1.0))
+        dot = np.abs(np.einsum("fni,mni->fmn", q, self.poses))
+        angle = 2.0 * np.arccos(np.minimum(dot, 1.0))
+        return np.sqrt(np.sum(angle * angle, axis = -1))
+
+    def _kernel(self, r):
+        """
+        核函数
+        :param r: 距离
+        :return:
+        """
+        if self.kernel == GAUSSIAN:
+            return np.exp(-(r / self.radius) ** 2)
+        # r^2 * log(r), r为0时取0
+        with np.errstate(divide = "ignore", invalid = "ignore"):
+            return np.where(r > 0.0, r * r * np.log(r), 0.0)
+
+    def _poseRotation(self, rotation_q):
+        """
+        整理单个pose的旋转为(N, 4)
+        :param rotation_q:
+        :return:
+        """
+        q = rotation.normalize(rotation_q)
+        if q.ndim == 1:
+            q = q[None, :]
+        if q.shape != (self.driverCount, 4):
+            raise ValueError("pose旋转形状应为({}, 4), 当前为{}".format(self.driverCount, q.shape))
+        return q
+
+    def _valueRow(self, value):
+        """
+        整理单个pose的输出值为(K,)
+        :param value:
+        :return:
+        """
+        if self.values is None:
+            return None
+        if value is None:
+            raise ValueError("求解器设置了values, 添加pose时需要提供value")
+        value = np.asarray(value, dtype = np.float64).reshape(-1)
+        if value.shape[0] != self.values.shape[1]:
+            raise ValueError("value长度应为{}".format(self.values.shape[1]))
+        return value
+
+    def addPose(self, rotation_q, value = None, index = None):
+        """
+        添加pose(增量更新)
+            u = Phi^-1 k, d^2 = kappa - k.u, r = (v - V^T u) / d^2
+            W' = insert(W - u r, index, r)
+        :param rotation_q: (N, 4) 或 (4,) 四元数
+        :param value: (K,) 输出值(设置了values时必须提供)
+        :param index: 插入位置, 默认末尾
+        :return: 新pose的位置
+        """
+        q = self._poseRotation(rotation_q)
+        value = self._valueRow(value)
+        m = self.poseCount
+        index = m if index is None else int(index)
+        if not 0 <= index <= m:
+            raise IndexError("pose位置超出范围: {}".format(index))
+        column = self._kernel(self.distances(q[None]))[0]
+        old_values = self.values
+        self.poses = np.insert(self.poses, index, q, axis = 0)
+        if self.values is not None:
+            self.values = np.insert(self.values, index, value, axis = 0)
+        factor = self._factor
+        if factor is None or m == 0:
+            self.rebuild()
+            return index
+        diagonal = self._kernel(np.zeros(1))[0] + self.regularization
+        u = factor.solve(column)
+        d2 = diagonal - column @ u
+        try:
+            factor.insert(index, column, diagonal)
+        except np.linalg.LinAlgError:
+            self.rebuild()
+            return index
+        weights = self.weights
+        if self.values is None:
+            # pose权重模式: 新增一列输出, V为单位矩阵插入一列0, v为新列的单位向量
+            weights = np.insert(weights, index, 0.0, axis = 1)
+            r = -np.insert(u, index, 0.0) / d2
+            r[index] = 1.0 / d2
+        else:
+            r = (value - u @ old_values) / d2
+        weights = weights - np.outer(u, r)
+        self.weights = np.insert(weights, index, r, axis = 0)
+        self.update_count += 1
+        return index
+
+    def removePose(self, index):
+        """
+        删除pose(增量更新)
+            b为Phi^-1的第index列, c为其对角元素, W' = delete(W - b W[index] / c, index)
+        :param index: pose位置
+        :return:
+        """
+        m = self.poseCount
+        if not 0 <= index < m:
+            raise IndexError("pose位置超出范围: {}".format(index))
+        factor = self._factor
+        self.poses = np.delete(self.poses, index, axis = 0)
+        if self.values is not None:
+            self.values = np.delete(self.values, index, axis = 0)
+        if factor is None or m == 1:
+            self.rebuild()
+            return
+        e = np.zeros(m)
+        e[index] = 1.0
+        b = factor.solve(e)
+        try:
+            factor.remove(index)
+        except np.linalg.LinAlgError:
+            self.rebuild()
+            return
+        weights = self.weights - np.outer(b, self.weights[index] / b[index])
+        weights = np.delete(weights, index, axis = 0)
+        if self.values is None:
+            weights = np.delete(weights, index, axis = 1)
+        self.weights = weights
+        self.update_count += 1
+
+    def setPose(self, index, rotation_q, value = None):
+        """
+        修改pose的旋转(与输出值), 等价于删除后在原位置插入
+        :param index: pose位置
+        :param rotation_q: (N, 4) 或 (4,) 四元数
+        :param value: (K,) 输出值, 为空时保留原值
+        :return:
+        """
+        if self.values is not None and value is None:
+            value = self.values[index].copy()
+        self.removePose(index)
+        self.addPose(rotation_q, value, index)
+
+    def _evaluateChunk(self, q):
+        out = self._kernel(self.distances(q)) @ self.weights
+        if self.bias is not None:
+            out += self.bias
+        if self.clamp:
+            np.clip(out, 0.0, 1.0, out = out)
+        return out
+
+
+class SolverCache(object):
+    """
+    按驱动骨骼缓存求解器
+        求解器在第一次使用时由factory创建; 修改某个驱动的pose时只更新或失效该驱动的求解器
+    """
+
+    def __init__(self, factory):
+        """
+        初始化
+        :param factory: factory(driver) -> PoseSolver
+        """
+        self._factory = factory
+        self._solvers = {}
+        self.build_count = 0
+
+    def __contains__(self, driver):
+        return driver in self._solvers
+
+    def __len__(self):
+        return len(self._solvers)
+
+    def get(self, driver):
+        """
+        获取驱动的求解器(没有缓存时创建)
+        :param driver: 驱动标识(如骨骼名称)
+        :return: PoseSolver
+        """
+        solver = self._solvers.get(driver)
+        if solver is None:
+            solver = self._solvers[driver] = self._factory(driver)
+            self.build_count += 1
+        return solver
+
+    def invalidate(self, driver = None):
+        """
+        使缓存失效
+        :param driver: 驱动标识, 为空时清空全部
+        :return:
+        """
+        if driver is None:
+            self._solvers.clear()
+        else:
+            self._solvers.pop(driver, None)
+
+    def addPose(self, driver, rotation_q, value = None, index = None):
+        """
+        通知驱动添加了pose: 已缓存的RBF求解器增量更新, 其他求解器失效
+        :param driver: 驱动标识
+        :param rotation_q: pose旋转
+        :param value: 输出值
+        :param index: 插入位置
+        :return:
+        """
+        solver = self._solvers.get(driver)
+        if isinstance(solver, RBFSolver):
+            solver.addPose(rotation_q, value, index)
+        else:
+            self.invalidate(driver)
+
+    def removePose(self, driver, index):
+        """
+        通知驱动删除了pose
+        :param driver: 驱动标识
+        :param index: pose位置
+        :return:
+        """
+        solver = self._solvers.get(driver)
+        if isinstance(solver, RBFSolver):
+            solver.removePose(index)
+        else:
+            self.invalidate(driver)
+
+    def setPose(self, driver, index, rotation_q, value = None):
+        """
+        通知驱动修改了pose
+        :param driver: 驱动标识
+        :param index: pose位置
+        :param rotation_q: pose旋转
+        :param value: 输出值
+        :return:
+        """
+        solver = self._solvers.get(driver)
+        if isinstance(solver, RBFSolver):
+            solver.setPose(index, rotation_q, value)
+        else:
+            self.invalidate(driver)
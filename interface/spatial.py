@@ -0,0 +1,471 @@
+# -*- coding: UTF-8 -*-
+# Author  : AitrusC
+# FileName: spatial
+# Time    : 2024-09-30
+# Contact : 906629272@qq.com
+# Description : 空间索引(不依赖Maya)
+#               GridIndex: 二维均匀网格, 用于pose平面的点选与拖拽
+#               RotationIndex: 四元数最近邻索引(q与-q视为同一旋转), 支持k近邻、半径查询与整段动画批量查询
+
+import math
+
+import numpy as np
+
+try:
+    from scipy.spatial import cKDTree as _KDTree
+except ImportError:
+    _KDTree = None
+
+# 网格坐标偏移, 保证组合键为非负整数
+_CellOffset = 1 << 20
+
+
+class GridIndex(object):
+    """
+    二维均匀网格索引
+        点按所在网格排序存储, 查询时只检查半径覆盖的网格; 点移动后标记为脏, 下次查询时重建
+    """
+    # 查询覆盖的网格数量超过该值时直接逐点计算
+    MaxCells = 256
+
+    def __init__(self, points = None, cell_size = 0.05):
+        """
+        初始化网格索引
+        :param points: (n, 2) 点坐标
+        :param cell_size: 网格大小(与点坐标单位相同)
+        """
+        self.cell_size = float(cell_size)
+        self.points = np.zeros((0, 2), dtype = np.float64)
+        self._keys = None
+        self._order = None
+        if points is not None:
+            self.setPoints(points)
+
+    def __len__(self):
+        return len(self.points)
+
+    def setPoints(self, points):
+        """
+        设置全部点
+        :param points: (n, 2)
+        :return:
+        """
+        self.points = np.array(points, dtype = np.float64).reshape(-1, 2)
+        self._keys = None
+
+    def setPoint(self, index, point):
+        """
+        移动一个点(下次查询时重建索引)
+        :param index: 点索引
+        :param point: (2,)
+        :return:
+        """
+        self.points[index] = point
+        self._keys = None
+
+    def _cellKeys(self, cells):
+        """
+        网格坐标转为组合键
+        :param cells: (..., 2) 整数网格坐标
+        :return: (...) int64
+        """
+        cells = np.clip(cells, -_CellOffset + 1, _CellOffset - 1) + _CellOffset
+        return cells[..., 0] * (2 * _CellOffset) + cells[..., 1]
+
+    def _build(self):
+        """
+        按网格排序, 建立 网格键 -> 点范围 的查找表
+        :return:
+        """
+        cells = np.floor(self.points / self.cell_size).astype(np.int64)
+        keys = self._cellKeys(cells)
+        self._order = np.argsort(keys, kind = "stable")
+        keys = keys[self._order]
+        unique, starts = np.unique(keys, return_index = True)
+        stops = np.append(starts[1:], len(keys))
+        self._keys = dict(zip(unique.tolist(), zip(starts.tolist(), stops.tolist())))
+
+    def query(self, point, radius):
+        """
+        查询半径内的点
+        :param point: (2,)
+        :param radius: 半径
+        :return: (点索引 (k,), 距离 (k,)) 按距离排序
+        """
+        if not len(self.points):
+            return np.zeros(0, dtype = np.int64), np.zeros(0)
+        if self._keys is None:
+            self._build()
+        x, y = float(point[0]), float(point[1])
+        low_x, high_x = int(math.floor((x - radius) / self.cell_size)), int(math.floor((x + radius) / self.cell_size))
+        low_y, high_y = int(math.floor((y - radius) / self.cell_size)), int(math.floor((y + radius) / self.cell_size))
+        if (high_x - low_x + 1) * (high_y - low_y + 1) > self.MaxCells:
+            candidates = np.arange(len(self.points))
+        else:
+            spans = []
+            for cx in range(low_x, high_x + 1):
+                base = (min(max(cx, -_CellOffset + 1), _CellOffset - 1) + _CellOffset) * (2 * _CellOffset)
+                for cy in range(low_y, high_y + 1):
+                    span = self._keys.get(base + min(max(cy, -_CellOffset + 1), _CellOffset - 1) + _CellOffset)
+                    if span is not None:
+                        spans.append(self._order[span[0]:span[1]])
+            if not spans:
+                return np.zeros(0, dtype = np.int64), np.zeros(0)
+            candidates = spans[0] if len(spans) == 1 else np.concatenate(spans)
+        offsets = self.points[candidates] - (x, y)
+        distances = np.sqrt(np.einsum("ij,ij->i", offsets, offsets))
+        inside = distances <= radius
+        candidates, distances = candidates[inside], distances[inside]
+        order = np.argsort(distances, kind = "stable")
+        return candidates[order], distances[order]
+
+    def nearest(self, point, radius):
+        """
+        查询半径内最近的点
+        :param point: (2,)
+        :param radius: 半径
+        :return: 点索引, 没有时返回-1
+        """
+        indices, _ = self.query(point, radius)
+        return int(indices[0]) if len(indices) else -1
+
+    def inRect(self, low, high):
+        """
+        查询矩形内的点
+        :param low: (2,) 最小坐标
+        :param high: (2,) 最大坐标
+        :return: (k,) 点索引
+        """
+        inside = np.all((self.points >= low) & (self.points <= high), axis = -1)
+        return np.flatnonzero(inside)
+
+
+def chordFromAngle(angle):
+    """
+    旋转夹角转为单位四元数之间的弦长(取q与-q中较近者)
+    :param angle: 弧度, 0~pi
+    :return:
+    """
+    return np.sqrt(np.maximum(0.0, 2.0 - 2.0 * np.cos(np.minimum(angle, np.pi) * 0.5)))
+
+
+def angleFromChord(chord):
+    """
+    弦长转为旋转夹角
+    :param chord: 0~sqrt(2)
+    :return: 弧度
+    """
+    return 2.0 * np.arccos(np.clip(1.0 - 0.5 * np.square(chord), 0.0, 1.0))
+
+
+class RotationIndex(object):
+    """
+    四元数最近邻索引
+        距离为旋转夹角 2 * arccos(|q . p|), q与-q为同一旋转
+        存储时统一到w >= 0的半球, 查询时同时查询q与-q并取较近者;
+        有scipy时使用cKDTree, 否则使用numpy实现的两层球树(叶子包围球 + 叶内逐点), 两者结果相同
+    """
+    # 每个叶子的点数(numpy实现)
+    LeafSize = 32
+    # 批量查询时每次处理的查询数量(numpy实现)
+    ChunkSize = 2048
+    # 旋转数量不超过该值时单个nearest查询直接计算全部点积(比树查询的调用开销更小)
+    ScanSize = 16384
+
+    def __init__(self, rotations = None, use_scipy = True):
+        """
+        初始化索引
+        :param rotations: (n, 4) 四元数
+        :param use_scipy: 是否使用scipy(没有安装时自动使用numpy实现)
+        """
+        self.use_scipy = use_scipy and _KDTree is not None
+        self.rotations = np.zeros((0, 4))
+        self._tree = None
+        self._leaves = None
+        if rotations is not None:
+            self.setRotations(rotations)
+
+    def __len__(self):
+        return len(self.rotations)
+
+    @staticmethod
+    def _canonical(q):
+        """
+        统一到w >= 0的半球并归一化
+        :param q: (..., 4)
+        :return:
+        """
+        q = np.asarray(q, dtype = np.float64)
+        q = q / np.linalg.norm(q, axis = -1, keepdims = True)
+        return np.where(q[..., 3:4] < 0.0, -q, q)
+
+    def setRotations(self, rotations):
+        """
+        设置全部旋转并重建索引
+        :param rotations: (n, 4)
+        :return:
+        """
+        self.rotations = self._canonical(np.reshape(rotations, (-1, 4)))
+        self._tree = None
+        self._leaves = None
+
+    def add(self, rotation_q):
+        """
+        添加旋转(下次查询时重建索引)
+        :param rotation_q: (4,)或(k, 4)
+        :return: 第一个新旋转的索引
+        """
+        index = len(self.rotations)
+        self.rotations = np.concatenate((self.rotations, self._canonical(np.reshape(rotation_q, (-1, 4)))))
+        self._tree = None
+        self._leaves = None
+        return index
+
+    # ---------------------------------------------------------------- 构建
+
+    def _build(self):
+        """
+        建立索引
+        :return:
+        """
+        if self.use_scipy:
+            self._tree = _KDTree(self.rotations)
+            return
+        # 按方差最大的轴递归中位数切分, 得到每个叶子的点索引
+        groups, stack = [], [np.arange(len(self.rotations))]
+        while stack:
+            indices = stack.pop()
+            if len(indices) <= self.LeafSize:
+                groups.append(indices)
+                continue
+            points = self.rotations[indices]
+            axis = int(np.argmax(points.var(axis = 0)))
+            order = np.argsort(points[:, axis], kind = "stable")
+            half = len(indices) // 2
+            stack.append(indices[order[half:]])
+            stack.append(indices[order[:half]])
+        count = len(groups)
+        leaf_indices = np.full((count, self.LeafSize), -1, dtype = np.int64)
+        # 不足LeafSize的叶子用索引-1填充, 查询时距离记为inf
+        leaf_points = np.zeros((count, self.LeafSize, 4))
+        centers = np.zeros((count, 4))
+        radii = np.zeros(count)
+        for leaf, indices in enumerate(groups):
+            points = self.rotations[indices]
+            leaf_indices[leaf, :len(indices)] = indices
+            leaf_points[leaf, :len(indices)] = points
+            centers[leaf] = points.mean(axis = 0)
+            radii[leaf] = np.linalg.norm(points - centers[leaf], axis = -1).max()
+        self._leaves = (leaf_indices, leaf_points, centers, radii)
+
+    def _ready(self):
+        if self.use_scipy:
+            if self._tree is None:
+                self._build()
+        elif self._leaves is None:
+            self._build()
+
+    def _leafBounds(self, q):
+        """
+        查询到每个叶子的弦长下界: max(0, min(|q - c|, |q + c|) - r)
+        :param q: (Q, 4)
+        :return: (Q, L)
+        """
+        _, _, centers, radii = self._leaves
+        qq = np.sum(q * q, axis = -1)[:, None]
+        cc = np.sum(centers * centers, axis = -1)[None, :]
+        qc = np.abs(q @ centers.T)
+        near = np.sqrt(np.maximum(0.0, qq + cc - 2.0 * qc))
+        return np.maximum(0.0, near - radii[None, :])
+
+    # ---------------------------------------------------------------- 查询
+
+    def knn(self, rotations, k = 1):
+        """
+        k近邻
+        :param rotations: (4,)或(F, 4) 查询旋转
+        :param k: 近邻数量(超过旋转数量时取旋转数量)
+        :return: (索引 (..., k), 夹角 (..., k)) 按夹角从小到大
+        """
+        q = self._canonical(rotations)
+        single = q.ndim == 1
+        q = q.reshape(-1, 4)
+        k = min(int(k), len(self.rotations))
+        if k <= 0:
+            empty = np.zeros((len(q), 0))
+            return (empty.astype(np.int64), empty) if not single else (empty[0].astype(np.int64), empty[0])
+        self._ready()
+        if self.use_scipy:
+            indices, chords = self._knnScipy(q, k)
+        else:
+            indices = np.empty((len(q), k), dtype = np.int64)
+            chords = np.empty((len(q), k))
+            for start in range(0, len(q), self.ChunkSize):
+                stop = start + self.ChunkSize
+                indices[start:stop], chords[start:stop] = self._knnLeaves(q[start:stop], k)
+        angles = angleFromChord(chords)
+        if single:
+            return indices[0], angles[0]
+        return indices, angles
+
+    def _knnScipy(self, q, k):
+        """
+        cKDTree分别查询q与-q后合并
+        :param q: (Q, 4)
+        :param k:
+        :return: (索引 (Q, k), 弦长 (Q, k))
+        """
+        d1, i1 = self._tree.query(q, k)
+        d1, i1 = np.reshape(d1, (len(q), -1)), np.reshape(i1, (len(q), -1))
+        # 存储点与q都在w >= 0的半球, -q到任意点的弦长不小于q的w分量, 只有第k近的弦长更大时才需要查询-q
+        rows = np.flatnonzero(d1[:, -1] > q[:, 3])
+        if not len(rows):
+            return i1, d1
+        d2, i2 = self._tree.query(-q[rows], k)
+        d2, i2 = np.reshape(d2, (len(rows), -1)), np.reshape(i2, (len(rows), -1))
+        merged_i, merged_d = self._mergeCandidates(np.concatenate((i1[rows], i2), axis = 1),
+                                                   np.concatenate((d1[rows], d2), axis = 1), k)
+        i1[rows], d1[rows] = merged_i, merged_d
+        return i1, d1
+
+    @staticmethod
+    def _mergeCandidates(indices, distances, k):
+        """
+        合并候选, 同一索引只保留距离较近的一个, 取前k个
+        :param indices: (Q, c)
+        :param distances: (Q, c)
+        :param k:
+        :return: (索引 (Q, k), 距离 (Q, k))
+        """
+        order = np.argsort(distances, axis = 1, kind = "stable")
+        indices = np.take_along_axis(indices, order, axis = 1)
+        distances = np.take_along_axis(distances, order, axis = 1)
+        # 排在后面的重复索引(-q方向查到的同一个点)移到末尾
+        same = indices[:, :, None] == indices[:, None, :]
+        duplicate = np.any(np.tril(same, -1), axis = 2)
+        order = np.argsort(duplicate, axis = 1, kind = "stable")[:, :k]
+        return np.take_along_axis(indices, order, axis = 1), np.take_along_axis(distances, order, axis = 1)
+
+    def _knnLeaves(self, q, k):
+        """
+        两层球树k近邻: 按下界从近到远依次检查叶子, 第k近的距离不大于下一个叶子的下界时停止
+        :param q: (Q, 4)
+        :param k:
+        :return: (索引 (Q, k), 弦长 (Q, k))
+        """
+        leaf_indices, leaf_points, _, _ = self._leaves
+        bounds = self._leafBounds(q)
+        order = np.argsort(bounds, axis = 1)
+        bounds = np.take_along_axis(bounds, order, axis = 1)
+        best_i = np.full((len(q), k), -1, dtype = np.int64)
+        best_d = np.full((len(q), k), np.inf)
+        for rank in range(order.shape[1]):
+            active = np.flatnonzero(bounds[:, rank] < best_d[:, -1])
+            if not len(active):
+                break
+            leaf = order[active, rank]
+            dots = np.abs(np.einsum("qsi,qi->qs", leaf_points[leaf], q[active]))
+            d = np.sqrt(np.maximum(0.0, 2.0 - 2.0 * dots))
+            ids = leaf_indices[leaf]
+            d[ids < 0] = np.inf
+            cand_d = np.concatenate((best_d[active], d), axis = 1)
+            cand_i = np.concatenate((best_i[active], ids), axis = 1)
+            top = np.argsort(cand_d, axis = 1, kind = "stable")[:, :k]
+            best_d[active] = np.take_along_axis(cand_d, top, axis = 1)
+            best_i[active] = np.take_along_axis(cand_i, top, axis = 1)
+        return best_i, best_d
+
+    def nearest(self, rotation_q):
+        """
+        最近的旋转
+        :param rotation_q: (4,)
+        :return: (索引, 夹角), 索引为空时返回(-1, inf)
+        """
+        if not len(self.rotations):
+            return -1, np.inf
+        q = self._canonical(rotation_q)
+        if len(self.rotations) <= self.ScanSize:
+            dots = np.abs(self.rotations @ q)
+            index = int(np.argmax(dots))
+            return index, float(2.0 * math.acos(min(1.0, float(dots[index]))))
+        self._ready()
+        if self.use_scipy:
+            chord, index = self._tree.query(q)
+            # 存储点与q都在w >= 0的半球, -q到任意点的弦长不小于q的w分量
+            if chord > q[3]:
+                d2, i2 = self._tree.query(-q)
+                if d2 < chord:
+                    index, chord = i2, d2
+        else:
+            index, chord = self._nearestLeaves(q)
+        return int(index), float(angleFromChord(chord))
+
+    def _nearestLeaves(self, q):
+        """
+        单个查询的最近点(numpy实现): 按下界顺序检查叶子, 避免批量查询的整体开销
+        :param q: (4,)
+        :return: (索引, 弦长)
+        """
+        leaf_indices, leaf_points, _, _ = self._leaves
+        bounds = self._leafBounds(q[None])[0]
+        best_i, best_d = -1, np.inf
+        for leaf in np.argsort(bounds):
+            if bounds[leaf] >= best_d:
+                break
+            dots = np.abs(leaf_points[leaf] @ q)
+            dots[leaf_indices[leaf] < 0] = -1.0
+            j = int(np.argmax(dots))
+            d = math.sqrt(max(0.0, 2.0 - 2.0 * dots[j]))
+            if d < best_d:
+                best_i, best_d = int(leaf_indices[leaf, j]), d
+        return best_i, best_d
+
+    def radius(self, rotations, angle):
+        """
+        半径查询
+        :param rotations: (4,)或(F, 4)
+        :param angle: 夹角半径(弧度)
+        :return: 单个查询时返回(索引, 夹角)按夹角排序; 批量时返回[(索引, 夹角), ...]
+        """
+        q = self._canonical(rotations)
+        single = q.ndim == 1
+        q = q.reshape(-1, 4)
+        results = []
+        if len(self.rotations):
+            self._ready()
+            chord = float(chordFromAngle(angle))
+            if self.use_scipy:
+                plus = self._tree.query_ball_point(q, chord)
+                minus = self._tree.query_ball_point(-q, chord)
+                candidates = [np.unique(np.asarray(a + b, dtype = np.int64)) for a, b in zip(plus, minus)]
+            else:
+                leaf_indices = self._leaves[0]
+                candidates = []
+                for start in range(0, len(q), self.ChunkSize):
+                    bounds = self._leafBounds(q[start:start + self.ChunkSize])
+                    for row in bounds:
+                        ids = leaf_indices[row <= chord].ravel()
+                        candidates.append(ids[ids >= 0])
+            for query, ids in zip(q, candidates):
+                angles = 2.0 * np.arccos(np.clip(np.abs(self.rotations[ids] @ query), 0.0, 1.0))
+                inside = angles <= angle
+                ids, angles = ids[inside], angles[inside]
+                order = np.argsort(angles, kind = "stable")
+                results.append((ids[order], angles[order]))
+        else:
+            results = [(np.zeros(0, dtype = np.int64), np.zeros(0)) for _ in q]
+        return results[0] if single else results
+
+    def duplicates(self, angle = 1e-3):
+        """
+        查找重复的旋转
+        :param angle: 夹角不大于该值视为重复(弧度)
+        :return: [(i, j), ...] i < j
+        """
+        pairs = []
+        for i, (ids, _) in enumerate(self.radius(self.rotations, angle)):
+            pairs.extend((i, int(j)) for j in ids if j > i)
+        return pairs
+
+
+__all__ = ['GridIndex', 'RotationIndex', 'chordFromAngle', 'angleFromChord']
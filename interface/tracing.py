@@ -0,0 +1,387 @@
+# -*- coding: UTF-8 -*-
+# Author  : AitrusC
+# FileName: tracing
+# Time    : 2024-10-05
+# Contact : 906629272@qq.com
+# Description : 性能追踪: 计时区间、计数器、数值与界面线程卡顿检测, 导出为Chrome trace JSON(chrome://tracing或Perfetto打开)
+#               未启用时span返回共享的空上下文, traced装饰器只多一次属性判断
+#
+#   from interface import tracing
+#   tracing.enable()
+#   with tracing.span("build", "scene", joints = 40):
+#       ...
+#   tracing.counter("search.queries")
+#   tracing.exportChrome("trace.json")
+
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from functools import wraps
+
+# 事件类型(Chrome trace的ph字段)
+COMPLETE, COUNTER, INSTANT = "X", "C", "i"
+
+
+class _NullSpan(object):
+    """
+    未启用时的空上下文
+    """
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span(object):
+    """
+    计时区间(退出时记录一个完整事件)
+    """
+    __slots__ = ("tracer", "name", "cat", "args", "start")
+
+    def __init__(self, tracer, name, cat, args):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        end = time.perf_counter()
+        self.tracer.record(COMPLETE, self.name, self.cat, self.start, end - self.start, self.args)
+        return False
+
+
+class Tracer(object):
+    """
+    追踪记录
+        事件保存为元组 (类型, 名称, 分类, 开始时间, 持续时间, 线程id, 参数), 超过MaxEvents时丢弃最早的事件
+        可以在任意线程中记录
+    """
+    MaxEvents = 500000
+
+    def __init__(self):
+        self.enabled = False
+        self._events = deque(maxlen = self.MaxEvents)
+        self._counters = {}
+        self._origin = time.perf_counter()
+
+    def enable(self, clear = False):
+        """
+        启用追踪
+        :param clear: 是否清空已有事件
+        :return:
+        """
+        if clear:
+            self.clear()
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def clear(self):
+        self._events.clear()
+        self._counters.clear()
+        self._origin = time.perf_counter()
+
+    def __len__(self):
+        return len(self._events)
+
+    def record(self, kind, name, cat, start, duration = 0.0, args = None, tid = None):
+        """
+        记录事件(不检查是否启用)
+        :param kind: COMPLETE/COUNTER/INSTANT
+        :param name: 名称
+        :param cat: 分类
+        :param start: time.perf_counter()时间
+        :param duration: 持续时间(秒)
+        :param args: 参数字典
+        :param tid: 线程id, 默认为当前线程
+        :return:
+        """
+        self._events.append((kind, name, cat, start, duration, tid or threading.get_ident(), args))
+
+    def span(self, name, cat = "function", **args):
+        """
+        计时区间
+        :param name: 名称
+        :param cat: 分类
+        :param args: 附加参数(显示在trace查看器中)
+        :return: 上下文管理器
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, cat, args or None)
+
+    def counter(self, name, value = 1):
+        """
+        累加计数器
+        :param name: 名称
+        :param value: 增加值
+        :return:
+        """
+        if not self.enabled:
+            return
+        total = self._counters[name] = self._counters.get(name, 0) + value
+        self.record(COUNTER, name, "counter", time.perf_counter(), 0.0, {name: total})
+
+    def gauge(self, name, value):
+        """
+        记录当前数值(例如内存、延迟)
+        :param name: 名称
+        :param value: 数值
+        :return:
+        """
+        if not self.enabled:
+            return
+        self.record(COUNTER, name, "gauge", time.perf_counter(), 0.0, {name: value})
+
+    def instant(self, name, cat = "event", **args):
+        """
+        记录瞬时事件
+        :param name: 名称
+        :param cat: 分类
+        :param args: 附加参数
+        :return:
+        """
+        if not self.enabled:
+            return
+        self.record(INSTANT, name, cat, time.perf_counter(), 0.0, args or None)
+
+    def counters(self):
+        return dict(self._counters)
+
+    def events(self):
+        """
+        :return: [(类型, 名称, 分类, 开始时间, 持续时间, 线程id, 参数), ...]
+        """
+        return list(self._events)
+
+    def summary(self):
+        """
+        按名称汇总计时区间
+        :return: {名称: {"count", "total_ms", "mean_ms", "max_ms"}}, 按总耗时从大到小
+        """
+        stats = {}
+        for kind, name, cat, start, duration, tid, args in list(self._events):
+            if kind != COMPLETE:
+                continue
+            stat = stats.get(name)
+            if stat is None:
+                stat = stats[name] = [0, 0.0, 0.0]
+            stat[0] += 1
+            stat[1] += duration
+            stat[2] = max(stat[2], duration)
+        ordered = sorted(stats.items(), key = lambda item: item[1][1], reverse = True)
+        return {name: {"count": count, "total_ms": total * 1000, "mean_ms": total * 1000 / count,
+                       "max_ms": longest * 1000} for name, (count, total, longest) in ordered}
+
+    def toChrome(self):
+        """
+        转为Chrome trace格式
+        :return: {"traceEvents": [...], "displayTimeUnit": "ms"}
+        """
+        pid = os.getpid()
+        origin = self._origin
+        trace_events = []
+        tids = set()
+        for kind, name, cat, start, duration, tid, args in list(self._events):
+            event = {"name": name, "cat": cat, "ph": kind, "ts": (start - origin) * 1e6, "pid": pid, "tid": tid}
+            if kind == COMPLETE:
+                event["dur"] = duration * 1e6
+            elif kind == INSTANT:
+                event["s"] = "t"
+            if args:
+                event["args"] = args
+            trace_events.append(event)
+            tids.add(tid)
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for tid in tids:
+            trace_events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+                                 "args": {"name": names.get(tid, str(tid))}})
+        return {"traceEvents": trace_events, "displayTimeUnit": "ms"}
+
+    def exportChrome(self, path):
+        """
+        导出Chrome trace JSON
+        :param path: 文件路径
+        :return: 事件数量
+        """
+        data = self.toChrome()
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding = "utf-8") as f:
+            json.dump(data, f, ensure_ascii = False, default = str)
+        os.replace(tmp_path, path)
+        return len(data["traceEvents"])
+
+
+tracer = Tracer()
+
+
+def enable(clear = False):
+    tracer.enable(clear)
+
+
+def disable():
+    tracer.disable()
+
+
+def isEnabled():
+    return tracer.enabled
+
+
+def span(name, cat = "function", **args):
+    """
+    计时区间(tracer.span)
+    :param name: 名称
+    :param cat: 分类
+    :param args: 附加参数
+    :return: 上下文管理器
+    """
+    if not tracer.enabled:
+        return _NULL_SPAN
+    return _Span(tracer, name, cat, args or None)
+
+
+def counter(name, value = 1):
+    tracer.counter(name, value)
+
+
+def gauge(name, value):
+    tracer.gauge(name, value)
+
+
+def instant(name, cat = "event", **args):
+    tracer.instant(name, cat, **args)
+
+
+def exportChrome(path):
+    return tracer.exportChrome(path)
+
+
+def traced(name = None, cat = "function"):
+    """
+    函数计时装饰器(未启用时直接调用原函数)
+        @traced("JPlistWidget.__init__", "widget")
+        def __init__(self, ...): ...
+    :param name: 名称, 默认为函数的限定名
+    :param cat: 分类
+    :return:
+    """
+
+    def decorator(func):
+        label = name or func.__qualname__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                tracer.record(COMPLETE, label, cat, start, time.perf_counter() - start)
+
+        return wrapper
+
+    return decorator
+
+
+class StallWatchdog(object):
+    """
+    线程卡顿检测
+        被监视的线程(默认为主线程, 即界面线程)定时调用beat; 后台线程发现超过threshold_ms没有beat时记录该线程的Python调用栈,
+        卡顿结束后记录一个"stall"区间(参数中包含调用栈), 不论tracer是否启用都保存在stalls中
+    """
+    # 最多保存的卡顿记录数量
+    MaxStalls = 100
+
+    def __init__(self, threshold_ms = 200.0, thread_id = None, recorder = None):
+        """
+        :param threshold_ms: 卡顿阈值(毫秒)
+        :param thread_id: 被监视的线程id, 默认为主线程
+        :param recorder: 记录卡顿的Tracer, 默认为模块的tracer
+        """
+        self.threshold = threshold_ms / 1000.0
+        self.thread_id = thread_id if thread_id is not None else threading.main_thread().ident
+        self.recorder = recorder if recorder is not None else tracer
+        self.stalls = deque(maxlen = self.MaxStalls)
+        self._last_beat = time.perf_counter()
+        self._stall = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def beat(self):
+        """
+        心跳(在被监视的线程中定时调用)
+        :return:
+        """
+        self._last_beat = time.perf_counter()
+
+    def isRunning(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.isRunning():
+            return
+        self._stop.clear()
+        self._last_beat = time.perf_counter()
+        self._thread = threading.Thread(target = self._run, name = "StallWatchdog", daemon = True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _captureStack(self):
+        """
+        获取被监视线程当前的调用栈
+        :return: [str, ...] 由外到内
+        """
+        frame = sys._current_frames().get(self.thread_id)
+        if frame is None:
+            return []
+        return [line.rstrip() for line in traceback.format_stack(frame)]
+
+    def _run(self):
+        """
+        检测循环: 每隔阈值的1/4检查一次
+        :return:
+        """
+        interval = max(self.threshold / 4.0, 0.001)
+        while not self._stop.wait(interval):
+            last = self._last_beat
+            now = time.perf_counter()
+            if self._stall is None:
+                if now - last > self.threshold:
+                    self._stall = (last, self._captureStack())
+            elif last > self._stall[0]:
+                # 卡顿结束: 卡顿从上一次心跳开始, 到恢复后的第一次心跳结束
+                start, stack = self._stall
+                self._stall = None
+                stall = {"start": start, "ms": (last - start) * 1000, "stack": stack}
+                self.stalls.append(stall)
+                if self.recorder.enabled:
+                    # 显示在被监视的线程上
+                    self.recorder.record(COMPLETE, "stall", "watchdog", start, last - start,
+                                         {"ms": stall["ms"], "stack": stack}, self.thread_id)
+
+
+__all__ = ['Tracer', 'tracer', 'enable', 'disable', 'isEnabled', 'span', 'counter', 'gauge', 'instant',
+           'exportChrome', 'traced', 'StallWatchdog']
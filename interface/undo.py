@@ -0,0 +1,543 @@
+# -*- coding: UTF-8 -*-
+# Author  : AitrusC
+# FileName: undo
+# Time    : 2024-10-04
+# Contact : 906629272@qq.com
+# Description : pose编辑的撤销/重做
+#               每个命令只记录修改的数据(旋转/驱动值的旧值与新值、被删除的pose行), 不保存整个数据库的快照
+#               同一次拖拽(merge_id相同)的连续修改合并为一个命令; 命令占用内存超过预算时丢弃最早的命令
+#
+#   stack = UndoStack(library)
+#   stack.addPose(joint, "pose1", q, {"bs.target": 1.0})
+#   for q in drag:
+#       stack.setRotation(pose, q, merge_id = drag_id)
+#   stack.undo()
+
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+# 命令对象本身的估计内存(字节)
+CommandOverhead = 128
+
+
+class Command(object):
+    """
+    撤销命令
+        redo/undo接收PoseLibrary; merge_id不为空且与栈顶命令相同时尝试mergeWith合并
+        touchedJoints返回修改的骨骼索引, 界面撤销/重做后只刷新这些骨骼
+    """
+    text = ""
+
+    def __init__(self, merge_id = None):
+        self.merge_id = merge_id
+
+    @property
+    def nbytes(self):
+        """
+        估计占用的内存(字节)
+        :return:
+        """
+        return CommandOverhead
+
+    def touchedJoints(self):
+        """
+        :return: 修改的骨骼索引元组
+        """
+        return ()
+
+    def redo(self, library):
+        raise NotImplementedError
+
+    def undo(self, library):
+        raise NotImplementedError
+
+    def mergeWith(self, command):
+        """
+        合并之后的命令(command已执行)
+        :param command: Command
+        :return: 是否合并
+        """
+        return False
+
+
+class _PoseRow(object):
+    """
+    一个pose的完整数据(添加/删除命令使用)
+    """
+    __slots__ = ("joint", "index", "name", "rotation", "targets", "values", "kinds")
+
+    def __init__(self, joint, index, name, rotation, targets, values, kinds):
+        self.joint = joint
+        self.index = index
+        self.name = name
+        self.rotation = rotation
+        self.targets = targets
+        self.values = values
+        self.kinds = kinds
+
+    @classmethod
+    def fromLibrary(cls, library, pose):
+        """
+        读取数据库中的pose
+        :param library: PoseLibrary
+        :param pose: 全局pose索引
+        :return: _PoseRow
+        """
+        joint = int(library.pose_joints[pose])
+        targets, values = library.poseTargets(pose)
+        return cls(joint, pose - library.poseSlice(joint).start, library.poseName(pose),
+                   np.array(library.rotations[pose]), [library.targetName(int(t)) for t in targets],
+                   np.array(values), np.array(library.target_kinds[targets]))
+
+    @property
+    def nbytes(self):
+        return (self.rotation.nbytes + self.values.nbytes + self.kinds.nbytes + len(self.name) +
+                sum(len(target) for target in self.targets))
+
+    def insert(self, library):
+        """
+        插入到数据库
+        :param library: PoseLibrary
+        :return: 全局pose索引
+        """
+        targets = [(target, float(value), int(kind)) for target, value, kind in
+                   zip(self.targets, self.values, self.kinds)]
+        return library.addPose(self.joint, self.name, self.rotation, targets, self.index)
+
+
+class AddPoseCommand(Command):
+    text = "添加pose"
+
+    def __init__(self, row):
+        Command.__init__(self)
+        self.row = row
+        # 添加前的目标数量, 撤销时删除添加pose时新建的目标
+        self.target_count = None
+
+    @property
+    def nbytes(self):
+        return CommandOverhead + self.row.nbytes
+
+    def touchedJoints(self):
+        return self.row.joint,
+
+    def redo(self, library):
+        self.target_count = library.targetCount
+        return self.row.insert(library)
+
+    def undo(self, library):
+        library.removePose(library.poseSlice(self.row.joint).start + self.row.index)
+        if library.targetCount > self.target_count:
+            library.truncateTargets(self.target_count)
+
+
+class RemovePoseCommand(AddPoseCommand):
+    text = "删除pose"
+
+    def redo(self, library):
+        library.removePose(library.poseSlice(self.row.joint).start + self.row.index)
+
+    def undo(self, library):
+        self.row.insert(library)
+
+
+class MovePoseCommand(Command):
+    text = "移动pose"
+
+    def __init__(self, joint, index, new_index):
+        Command.__init__(self)
+        self.joint = joint
+        self.index = index
+        self.new_index = new_index
+
+    def touchedJoints(self):
+        return self.joint,
+
+    def redo(self, library):
+        return library.movePose(library.poseSlice(self.joint).start + self.index, self.new_index)
+
+    def undo(self, library):
+        library.movePose(library.poseSlice(self.joint).start + self.new_index, self.index)
+
+
+class RenamePoseCommand(Command):
+    text = "重命名pose"
+
+    def __init__(self, pose, name, new_name, joint = None):
+        Command.__init__(self)
+        self.pose = pose
+        self.name = name
+        self.new_name = new_name
+        self.joint = joint
+
+    @property
+    def nbytes(self):
+        return CommandOverhead + len(self.name) + len(self.new_name)
+
+    def touchedJoints(self):
+        return () if self.joint is None else (self.joint,)
+
+    def redo(self, library):
+        library.renamePose(self.pose, self.new_name)
+
+    def undo(self, library):
+        library.renamePose(self.pose, self.name)
+
+
+class SetRotationCommand(Command):
+    """
+    修改一组pose的旋转(拖拽时合并为一个命令, 只保留拖拽前与最后的旋转)
+    """
+    text = "修改pose旋转"
+
+    def __init__(self, poses, rotations, new_rotations, merge_id = None, joints = ()):
+        Command.__init__(self, merge_id)
+        self.poses = poses
+        self.rotations = rotations
+        self.new_rotations = new_rotations
+        self.joints = tuple(joints)
+
+    @property
+    def nbytes(self):
+        return CommandOverhead + self.poses.nbytes + self.rotations.nbytes + self.new_rotations.nbytes
+
+    def touchedJoints(self):
+        return self.joints
+
+    def redo(self, library):
+        for pose, rotation_q in zip(self.poses.tolist(), self.new_rotations):
+            library.setRotation(pose, rotation_q)
+
+    def undo(self, library):
+        for pose, rotation_q in zip(self.poses.tolist(), self.rotations):
+            library.setRotation(pose, rotation_q)
+
+    def mergeWith(self, command):
+        if type(command) is not SetRotationCommand or not np.array_equal(command.poses, self.poses):
+            return False
+        self.new_rotations = command.new_rotations
+        return True
+
+
+class SetPoseValuesCommand(Command):
+    """
+    修改pose的驱动值(拖拽数值时合并)
+    """
+    text = "修改驱动值"
+
+    def __init__(self, pose, values, new_values, merge_id = None, joint = None):
+        Command.__init__(self, merge_id)
+        self.pose = pose
+        self.values = values
+        self.new_values = new_values
+        self.joint = joint
+
+    @property
+    def nbytes(self):
+        return CommandOverhead + self.values.nbytes + self.new_values.nbytes
+
+    def touchedJoints(self):
+        return () if self.joint is None else (self.joint,)
+
+    def redo(self, library):
+        library.setPoseValues(self.pose, self.new_values)
+
+    def undo(self, library):
+        library.setPoseValues(self.pose, self.values)
+
+    def mergeWith(self, command):
+        if type(command) is not SetPoseValuesCommand or command.pose != self.pose:
+            return False
+        self.new_values = command.new_values
+        return True
+
+
+class MacroCommand(Command):
+    """
+    一组命令(撤销时倒序)
+    """
+
+    def __init__(self, text):
+        Command.__init__(self)
+        self.text = text
+        self.commands = []
+        self._nbytes = CommandOverhead
+
+    @property
+    def nbytes(self):
+        return self._nbytes
+
+    def append(self, command):
+        self.commands.append(command)
+        self._nbytes += command.nbytes
+
+    def touchedJoints(self):
+        return tuple(sorted({joint for command in self.commands for joint in command.touchedJoints()}))
+
+    def redo(self, library):
+        for command in self.commands:
+            command.redo(library)
+
+    def undo(self, library):
+        for command in reversed(self.commands):
+            command.undo(library)
+
+
+class UndoStack(object):
+    """
+    撤销栈
+        push执行命令并入栈(清除可重做的命令); 命令总内存超过budget或数量超过limit时丢弃最早的命令
+        修改旋转/驱动值/名称与移动pose的撤销/重做只复制命令记录的数据, 与数据库大小无关;
+        添加/删除pose的撤销/重做与直接添加/删除相同(数组插入/删除)
+    """
+    # 默认内存预算(字节)
+    Budget = 16 << 20
+
+    def __init__(self, library, budget = None, limit = 0):
+        """
+        :param library: PoseLibrary
+        :param budget: 内存预算(字节), 默认Budget
+        :param limit: 最多保留的命令数量, 0为不限制
+        """
+        self.library = library
+        self.budget = self.Budget if budget is None else budget
+        self.limit = limit
+        self._commands = deque()
+        # 已执行的命令数量, 之后的命令可以重做
+        self._index = 0
+        self._nbytes = 0
+        self._clean = 0
+        self._macro = None
+        self._macro_depth = 0
+        # 最后一次撤销/重做修改的骨骼索引
+        self.last_joints = ()
+        # 统计
+        self.dropped = 0
+        self.merged = 0
+
+    def __len__(self):
+        return len(self._commands)
+
+    @property
+    def index(self):
+        return self._index
+
+    @property
+    def nbytes(self):
+        return self._nbytes
+
+    def canUndo(self):
+        return self._index > 0
+
+    def canRedo(self):
+        return self._index < len(self._commands)
+
+    def undoText(self):
+        return self._commands[self._index - 1].text if self.canUndo() else ""
+
+    def redoText(self):
+        return self._commands[self._index].text if self.canRedo() else ""
+
+    def isClean(self):
+        return self._clean == self._index
+
+    def setClean(self):
+        """
+        标记当前状态为已保存
+        :return:
+        """
+        self._clean = self._index
+
+    def clear(self):
+        self._commands.clear()
+        self._index = 0
+        self._nbytes = 0
+        self._clean = 0
+
+    def push(self, command, execute = True):
+        """
+        执行命令并入栈
+        :param command: Command
+        :param execute: 是否执行命令(已执行的命令只入栈)
+        :return: command.redo的返回值
+        """
+        result = command.redo(self.library) if execute else None
+        if self._macro is not None:
+            self._macro.append(command)
+            return result
+        while len(self._commands) > self._index:
+            self._nbytes -= self._commands.pop().nbytes
+        if self._clean > self._index:
+            # 已保存的状态被清除, 不再可能回到该状态
+            self._clean = -1
+        top = self._commands[-1] if self._commands else None
+        if (top is not None and command.merge_id is not None and top.merge_id == command.merge_id
+                and self._clean != self._index):
+            before = top.nbytes
+            if top.mergeWith(command):
+                self._nbytes += top.nbytes - before
+                self.merged += 1
+                return result
+        self._commands.append(command)
+        self._index += 1
+        self._nbytes += command.nbytes
+        self._trim()
+        return result
+
+    def _trim(self):
+        """
+        超过内存预算或数量限制时丢弃最早的命令(至少保留最新的命令)
+        :return:
+        """
+        while len(self._commands) > 1 and (self._nbytes > self.budget or
+                                           (self.limit and len(self._commands) > self.limit)):
+            self._nbytes -= self._commands.popleft().nbytes
+            self._index -= 1
+            self._clean -= 1
+            self.dropped += 1
+
+    def undo(self):
+        """
+        撤销一个命令(修改的骨骼记录在last_joints中)
+        :return: 是否撤销
+        """
+        if not self.canUndo():
+            return False
+        self._index -= 1
+        command = self._commands[self._index]
+        command.undo(self.library)
+        self.last_joints = command.touchedJoints()
+        return True
+
+    def redo(self):
+        """
+        重做一个命令(修改的骨骼记录在last_joints中)
+        :return: 是否重做
+        """
+        if not self.canRedo():
+            return False
+        command = self._commands[self._index]
+        command.redo(self.library)
+        self._index += 1
+        self.last_joints = command.touchedJoints()
+        return True
+
+    @contextmanager
+    def macro(self, text):
+        """
+        将多个修改合并为一个命令(出现异常时撤销已执行的修改后重新抛出)
+            with stack.macro("删除pose"):
+                for pose in reversed(selected):
+                    stack.removePose(pose)
+        :param text: 命令名称
+        :return:
+        """
+        if self._macro is not None:
+            self._macro_depth += 1
+            try:
+                yield self._macro
+            finally:
+                self._macro_depth -= 1
+            return
+        macro = self._macro = MacroCommand(text)
+        try:
+            yield macro
+        except BaseException:
+            # 已执行的修改倒序撤销, 数据与撤销历史保持一致(修改的骨骼记录在last_joints中)
+            self._macro = None
+            macro.undo(self.library)
+            self.last_joints = macro.touchedJoints()
+            raise
+        finally:
+            self._macro = None
+        if macro.commands:
+            # 命令已逐个执行, 只入栈
+            self.push(macro, execute = False)
+
+    # ---------------------------------------------------------------- 编辑
+
+    def addPose(self, joint, name, rotation_q, targets = None, index = None):
+        """
+        添加pose
+        :param joint: 骨骼索引
+        :param name: pose名称
+        :param rotation_q: (4,) 四元数
+        :param targets: {目标名称: 驱动值} 或 [(目标名称, 驱动值, 类型), ...]
+        :param index: 在该骨骼pose中的位置, 默认末尾
+        :return: 全局pose索引
+        """
+        from .poseLibrary import _targetItems
+        library = self.library
+        if index is None:
+            span = library.poseSlice(joint)
+            index = span.stop - span.start
+        items = list(_targetItems(targets))
+        row = _PoseRow(joint, int(index), name, np.array(rotation_q, dtype = np.float64),
+                       [t for t, v, kind in items], np.array([v for t, v, kind in items], dtype = np.float32),
+                       np.array([kind for t, v, kind in items], dtype = np.int8))
+        return self.push(AddPoseCommand(row))
+
+    def removePose(self, pose):
+        """
+        删除pose
+        :param pose: 全局pose索引
+        :return:
+        """
+        self.push(RemovePoseCommand(_PoseRow.fromLibrary(self.library, pose)))
+
+    def movePose(self, pose, index):
+        """
+        在骨骼内移动pose
+        :param pose: 全局pose索引
+        :param index: 在该骨骼pose中的新位置
+        :return: 移动后的全局pose索引
+        """
+        joint = int(self.library.pose_joints[pose])
+        start = self.library.poseSlice(joint).start
+        if start + index == pose:
+            return pose
+        return self.push(MovePoseCommand(joint, pose - start, int(index)))
+
+    def renamePose(self, pose, name):
+        self.push(RenamePoseCommand(pose, self.library.poseName(pose), name, int(self.library.pose_joints[pose])))
+
+    def setRotation(self, pose, rotation_q, merge_id = None):
+        """
+        修改pose旋转
+        :param pose: 全局pose索引
+        :param rotation_q: (4,) 四元数
+        :param merge_id: 拖拽标识, 与上一次修改相同时合并
+        :return:
+        """
+        self.setRotations([pose], [rotation_q], merge_id)
+
+    def setRotations(self, poses, rotations, merge_id = None):
+        """
+        修改多个pose的旋转
+        :param poses: 全局pose索引列表
+        :param rotations: (n, 4)
+        :param merge_id: 拖拽标识, 与上一次修改相同时合并
+        :return:
+        """
+        poses = np.asarray(poses, dtype = np.int64)
+        self.push(SetRotationCommand(poses, np.array(self.library.rotations[poses]),
+                                     np.array(rotations, dtype = np.float64).reshape(-1, 4), merge_id,
+                                     np.unique(self.library.pose_joints[poses]).tolist()))
+
+    def setPoseValues(self, pose, values, merge_id = None):
+        """
+        修改pose的驱动值
+        :param pose: 全局pose索引
+        :param values: (n,) 驱动值
+        :param merge_id: 拖拽标识, 与上一次修改相同时合并
+        :return:
+        """
+        old = np.array(self.library.poseTargets(pose)[1])
+        self.push(SetPoseValuesCommand(pose, old, np.array(values, dtype = np.float32).reshape(old.shape),
+                                       merge_id, int(self.library.pose_joints[pose])))
+
+
+__all__ = ['Command', 'AddPoseCommand', 'RemovePoseCommand', 'MovePoseCommand', 'RenamePoseCommand',
+           'SetRotationCommand', 'SetPoseValuesCommand', 'MacroCommand', 'UndoStack']
@@ -6,7 +6,7 @@
 
 import sys
 from PySide2.QtWidgets import QApplication, QVBoxLayout, QWidget
-from gui.ui import MainWindow
+from gui.ui import LeftWidget, MainWindow
 
 class TestUI(QWidget):
     def __init__(self, parent=None):